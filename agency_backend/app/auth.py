@@ -3,14 +3,25 @@ from typing import Optional
 import os
 import secrets
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import Session
 
 from . import models, schemas
-from .database import SessionLocal
+from .hashing import hash_pool
+from .user_cache import get_cached_user, user_cache
+from .database import (
+    SessionLocal,
+    ReadSessionLocal,
+    RoutingSessionLocal,
+    AsyncSessionLocal,
+    ReportSessionLocal,
+    AsyncReportSessionLocal,
+)
 
 # Load from environment or generate secure random key
 SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
@@ -34,14 +45,84 @@ pwd_context = CryptContext(
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def get_db():
-    db = SessionLocal()
+# Методы без побочных эффектов - обслуживаются reader-сессией
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def get_db(request: Request):
+    """Сессия БД для запроса: GET/HEAD - из пула чтения, остальное - RoutingSession
+    (чтение из пула, writer - только на время записи и commit)"""
+    if request.method in READ_ONLY_METHODS:
+        db = ReadSessionLocal()
+    else:
+        db = RoutingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_write_db():
+    """Сессия с правом записи - для GET-маршрутов, которые что-то сохраняют"""
+    db = RoutingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ThreadedSession:
+    """Синхронная сессия с интерфейсом AsyncSession.run_sync (когда async-движок выключен)"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def close(self):
+        # Без threadpool: когда все его потоки ждут подключение из пула, закрытие
+        # в нем же не вернуло бы подключение и не освободило бы их до pool_timeout.
+        # Закрытие - только rollback и возврат подключения в пул, без ожиданий
+        self.session.close()
+
+
+async def get_async_db():
+    """Сессия для async-маршрутов (только чтение).
+
+    Запросы выполняются через ``await db.run_sync(fn, ...)``: с async-движком
+    без threadpool, без него - в threadpool на reader-сессии.
+    """
+    if AsyncSessionLocal is not None:
+        db = AsyncSessionLocal()
+    else:
+        db = ThreadedSession(ReadSessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def get_report_db():
+    """Сессия для тяжелых отчетов и экспорта - с реплики, если она есть и не отстает"""
+    db = ReportSessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
+async def get_async_report_db():
+    """То же, что get_async_db, но с маршрутизацией на реплику"""
+    db = AsyncReportSessionLocal()
+    if db is None:
+        db = ThreadedSession(ReportSessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 def verify_password(plain_password, hashed_password):
     try:
         if not hashed_password:
@@ -66,21 +147,37 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+# Вызывается на каждый авторизованный запрос - запрос собран заранее,
+# username передается связанным параметром
+USER_BY_USERNAME = (
+    select(models.User)
+    .where(models.User.telegram_username == bindparam("username"))
+    .limit(1)
+)
+
+
 def get_user(db: Session, username: str):
-    return db.query(models.User).filter(models.User.telegram_username == username).first()
+    return db.execute(USER_BY_USERNAME, {"username": username}).scalars().first()
+
+
+# Настоящий хеш для проверки несуществующих пользователей: по времени ответ
+# не отличается от неверного пароля (битый хеш падал бы с ошибкой сразу)
+_DUMMY_HASH = pwd_context.hash(secrets.token_urlsafe(16))
+
+
+def _is_valid_login_input(username: str, password: str) -> bool:
+    return bool(username and password) and len(username) <= 100 and len(password) <= 200
 
 
 def authenticate_user(db: Session, username: str, password: str):
     # Validate input
-    if not username or not password:
-        return None
-    if len(username) > 100 or len(password) > 200:
+    if not _is_valid_login_input(username, password):
         return None
     
     user = get_user(db, username)
     if not user:
         # Perform dummy password verification to prevent timing attacks
-        pwd_context.verify("dummy_password", "$2b$12$dummy.hash.to.prevent.timing.attacks")
+        verify_password("dummy_password", _DUMMY_HASH)
         return None
     
     if not verify_password(password, user.hashed_password):
@@ -93,6 +190,53 @@ def authenticate_user(db: Session, username: str, password: str):
     return user
 
 
+def _rehash_password(user_id: int, old_hash: str, password: str):
+    """Перехешировать устаревший (bcrypt) хеш схемой по умолчанию (argon2)"""
+    new_hash = get_password_hash(password)
+    db = SessionLocal()
+    try:
+        # Только если хеш не сменили, пока считали новый
+        db.execute(
+            update(models.User)
+            .where(models.User.id == user_id, models.User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def authenticate_user_async(db, username: str, password: str):
+    """authenticate_user для async-маршрутов: хеширование в hash_pool.
+
+    db - сессия из get_async_db. Если хеш устарел, после успешного входа он
+    пересчитывается в фоне, не задерживая ответ. При переполнении пула
+    выбрасывает HashPoolBusy.
+    """
+    if not _is_valid_login_input(username, password):
+        return None
+
+    user = await db.run_sync(get_user, username)
+    if not user:
+        await hash_pool.run(verify_password, "dummy_password", _DUMMY_HASH)
+        return None
+
+    if not await hash_pool.run(verify_password, password, user.hashed_password):
+        return None
+
+    if user.role == models.RoleEnum.inactive or not user.is_active:
+        return None
+
+    if pwd_context.needs_update(user.hashed_password):
+        try:
+            hash_pool.submit(_rehash_password, user.id, user.hashed_password, password)
+        except Exception as e:
+            # Не критично: попробуем при следующем входе
+            print(f"Password rehash skipped for user {user.id}: {e}")
+
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -101,7 +245,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_username_from_token(token: str) -> str:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -114,13 +258,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username)
+    return username
+
+
+def _check_user_found(user):
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
-def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+def _check_user_active(current_user):
     # Check if user is inactive (either by role or is_active flag)
     if current_user.role == models.RoleEnum.inactive or not current_user.is_active:
         raise HTTPException(
@@ -130,6 +281,30 @@ def get_current_active_user(current_user: models.User = Depends(get_current_user
     return current_user
 
 
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    username = get_username_from_token(token)
+    # Кэш проверяет файл-маркер, промах идет в БД - не в event loop
+    return _check_user_found(await run_in_threadpool(get_cached_user, db, username, get_user))
+
+
+def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+    return _check_user_active(current_user)
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(get_async_db)):
+    """То же, что get_current_user, но через сессию async-маршрутов"""
+    username = get_username_from_token(token)
+    if isinstance(db, ThreadedSession):
+        return _check_user_found(await db.run_sync(get_cached_user, username, get_user))
+    # run_sync async-движка работает в event loop: stat файла-маркера - заранее в threadpool
+    await run_in_threadpool(user_cache.sync)
+    return _check_user_found(await db.run_sync(get_cached_user, username, get_user, False))
+
+
+async def get_current_active_user_async(current_user: models.User = Depends(get_current_user_async)):
+    return _check_user_active(current_user)
+
+
 def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)):
     # Check if user is admin
     if current_user.role != models.RoleEnum.admin:
@@ -0,0 +1,129 @@
+"""Версии справочных таблиц и ETag/304 для их списков.
+
+Каждый flush, затронувший отслеживаемую таблицу, увеличивает ее счетчик в
+change_counters в той же транзакции (хуки сессии ниже). Списки справочников
+строят ETag из версий своих таблиц и запроса: если клиент прислал тот же
+If-None-Match, отвечаем 304, не читая сами строки.
+
+Запись сырым SQL в обход сессии счетчик не меняет; справочники так никто не
+пишет (бот меняет только задачи).
+"""
+
+import hashlib
+import json
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import auth, models
+
+# Таблицы справочников, для которых ведутся версии
+TRACKED_TABLES = frozenset({
+    models.User.__tablename__,
+    models.Project.__tablename__,
+    models.Operator.__tablename__,
+    models.Tax.__tablename__,
+    models.ExpenseCategory.__tablename__,
+    models.DigitalService.__tablename__,
+})
+
+_PENDING_KEY = "change_versions_pending"
+ChangeCounter = models.ChangeCounter.__table__
+
+COUNTER_VERSIONS = (
+    select(ChangeCounter.c.name, ChangeCounter.c.version)
+    .where(ChangeCounter.c.name.in_(bindparam("names", expanding=True)))
+)
+
+
+def _bump_statement(dialect_name: str, names):
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(ChangeCounter).values([{"name": name, "version": 1} for name in sorted(names)])
+    return stmt.on_conflict_do_update(
+        index_elements=[ChangeCounter.c.name],
+        set_={"version": ChangeCounter.c.version + 1},
+    )
+
+
+def _bump(session: Session, names):
+    if not names:
+        return
+    conn = session.connection()
+    conn.execute(_bump_statement(conn.dialect.name, names))
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_flushed_tables(session, flush_context, instances):
+    names = {
+        obj.__table__.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if getattr(obj, "__table__", None) is not None and obj.__table__.name in TRACKED_TABLES
+    }
+    if names:
+        session.info[_PENDING_KEY] = names
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    _bump(session, session.info.pop(_PENDING_KEY, None))
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _bump_bulk_tables(context):
+    name = context.mapper.local_table.name
+    if name in TRACKED_TABLES:
+        _bump(context.session, {name})
+
+
+def table_versions(db: Session, names) -> dict:
+    """Текущие версии таблиц (0 - таблицу еще не меняли)"""
+    rows = db.execute(COUNTER_VERSIONS, {"names": sorted(names)}).all()
+    versions = dict.fromkeys(names, 0)
+    versions.update({row.name: row.version for row in rows})
+    return versions
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def _check_etag(request: Request, response: Response, etag: str):
+    # no-cache: клиент хранит ответ, но перепроверяет его при каждом запросе
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+def etag_for_tables(*tables):
+    """Зависимость FastAPI: ETag по версиям таблиц, 304 на совпадающий If-None-Match.
+
+    Ставится параметром маршрута после пользователя, чтобы 304 отдавался
+    только после авторизации:
+
+        current: models.User = Depends(auth.get_current_active_user),
+        _etag: None = Depends(change_versions.etag_for_tables("taxes")),
+    """
+    names = frozenset(tables)
+    assert names <= TRACKED_TABLES, f"untracked tables: {names - TRACKED_TABLES}"
+
+    async def check(request: Request, response: Response, db=Depends(auth.get_async_db)):
+        versions = await db.run_sync(table_versions, names)
+        _check_etag(request, response, make_etag(request.url.path, str(request.query_params), versions))
+
+    return check
+
+
+def etag_for_static(payload):
+    """То же для ответов, которые не зависят от БД (хеш содержимого)"""
+    content_tag = make_etag(payload)
+
+    async def check(request: Request, response: Response):
+        _check_etag(request, response, make_etag(request.url.path, str(request.query_params), content_tag))
+
+    return check
@@ -1,3 +1,4 @@
+from sqlalchemy import bindparam, or_, select
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -5,6 +6,7 @@ import json
 
 from . import models, schemas, auth
 from .models import get_local_time_utc5
+from .recurrence import compile_rule
 
 
 def get_setting(db: Session, key: str, default: str = None) -> Optional[str]:
@@ -24,112 +26,15 @@ def set_setting(db: Session, key: str, value: str):
     db.commit()
 
 
-def calculate_next_run_at(recurrence_type: str, db: Session = None, generation_time: str = None, recurrence_days: str = None) -> datetime:
-    """Рассчитывает следующее время запуска для повторяющихся задач"""
-    base_date = get_local_time_utc5()
-    
-    # Получаем время генерации (теперь обязательно должно быть передано при создании задачи)
-    if not generation_time:
-        raise ValueError("generation_time is required for recurring tasks")
+def calculate_next_run_at(recurrence_type: str, db: Session = None, generation_time: str = None, recurrence_days: str = None, after: datetime = None) -> datetime:
+    """Рассчитывает следующее время запуска для повторяющихся задач (app.recurrence).
 
-    # Парсим время
-    try:
-        target_hour, target_minute = map(int, generation_time.split(':'))
-    except (ValueError, AttributeError):
-        raise ValueError(f"Invalid generation_time format: {generation_time}. Expected HH:MM")
-    
-    # Парсим дни
-    allowed_days = []
-    if recurrence_days:
-        try:
-            allowed_days = [int(d.strip()) for d in recurrence_days.split(',') if d.strip()]
-        except ValueError:
-            pass
-    
-    if recurrence_type == "daily":
-        # Для ежедневных задач учитываем дни недели (1=Понедельник, 7=Воскресенье)
-        current_date = base_date.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        
-        if allowed_days:
-            # Ищем следующий подходящий день
-            for i in range(7):  # Максимум 7 дней проверяем
-                check_date = current_date + timedelta(days=i)
-                weekday = check_date.isoweekday()  # 1=Monday, 7=Sunday
-                
-                if weekday in allowed_days:
-                    if check_date > base_date:  # Время еще не прошло
-                        return check_date
-        else:
-            # Если дни не указаны, работаем как раньше - каждый день
-            # Убираем валидацию времени - пользователь может ставить задачи на любое время
-            if current_date > base_date:
-                return current_date
-            else:
-                return current_date + timedelta(days=1)
-    
-    elif recurrence_type == "weekly":
-        # Для еженедельных задач тоже учитываем дни недели
-        current_date = base_date.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        
-        if allowed_days:
-            # Ищем следующий подходящий день в пределах недели
-            for i in range(7):
-                check_date = current_date + timedelta(days=i)
-                weekday = check_date.isoweekday()
-                
-                if weekday in allowed_days and check_date > base_date:
-                    return check_date
-            
-            # Если не найден в этой неделе, ищем в следующей
-            for i in range(7, 14):
-                check_date = current_date + timedelta(days=i)
-                weekday = check_date.isoweekday()
-                
-                if weekday in allowed_days:
-                    return check_date
-        else:
-            # Если дни не указаны, каждую неделю
-            if base_date < current_date:
-                return current_date
-            else:
-                return current_date + timedelta(weeks=1)
-    
-    elif recurrence_type == "monthly":
-        # Для месячных задач учитываем день месяца
-        if allowed_days and len(allowed_days) > 0:
-            target_day = allowed_days[0]  # Берем первый день из списка
-            
-            # Попробуем этот месяц
-            try:
-                current_month_date = base_date.replace(day=target_day, hour=target_hour, minute=target_minute, second=0, microsecond=0)
-                if current_month_date > base_date:
-                    return current_month_date
-            except ValueError:
-                pass  # День не существует в текущем месяце
-            
-            # Попробуем следующий месяц
-            if base_date.month == 12:
-                next_month = base_date.replace(year=base_date.year + 1, month=1)
-            else:
-                next_month = base_date.replace(month=base_date.month + 1)
-            
-            try:
-                next_month_date = next_month.replace(day=target_day, hour=target_hour, minute=target_minute, second=0, microsecond=0)
-                return next_month_date
-            except ValueError:
-                # Если день не существует (например, 31 число в феврале), берем последний день месяца
-                import calendar
-                last_day = calendar.monthrange(next_month.year, next_month.month)[1]
-                return next_month.replace(day=min(target_day, last_day), hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        else:
-            # Если день не указан, каждый месяц в тот же день
-            current_date = base_date.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-            if base_date < current_date:
-                return current_date
-            else:
-                return current_date + timedelta(days=30)
-    
-    return None
+    after - момент, после которого ищется запуск (по умолчанию текущее время);
+    планировщик передает прошлый запуск, чтобы восстановить пропущенные.
+    """
+    base_date = after if after is not None else get_local_time_utc5()
+    rule = compile_rule(recurrence_type, generation_time, recurrence_days)
+    return rule.next_after(base_date) if rule is not None else None
 
 
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
@@ -396,60 +301,72 @@ def delete_operator(db: Session, operator_id: int) -> None:
         db.commit()
 
 
-def get_tasks(db: Session, skip: int = 0, limit: int = 100) -> List[models.Task]:
-    # Скрываем архивные задачи из основного списка
-    query = db.query(models.Task).filter(models.Task.status != models.TaskStatus.archived)
-
-    # Сортировка: в работе сверху, новые в середине, завершенные внизу
-    from sqlalchemy import case
-    status_priority = case(
-        (models.Task.status == models.TaskStatus.in_progress, 1),  # В работе - наивысший приоритет
-        (models.Task.status == models.TaskStatus.new, 2),         # Новые - средний приоритет
-        (models.Task.status == models.TaskStatus.overdue, 3),     # Просроченные - важные
-        (models.Task.status == models.TaskStatus.done, 4),        # Завершенные - низкий приоритет
-        (models.Task.status == models.TaskStatus.cancelled, 5),   # Отмененные - самый низкий приоритет
-        else_=6  # На случай других статусов
-    )
+# Готовые select() для горячих запросов: строятся один раз на процесс, значения
+# передаются связанными параметрами. Такой объект не пересобирается на каждый
+# вызов, а его ключ кэша компиляции мемоизируется.
+_STATEMENT_CACHE = {}
 
-    return query.order_by(status_priority, models.Task.created_at.desc()).offset(skip).limit(limit).all()
 
+def _cached_statement(key, build):
+    stmt = _STATEMENT_CACHE.get(key)
+    if stmt is None:
+        stmt = _STATEMENT_CACHE[key] = build()
+    return stmt
 
-def get_tasks_for_user(db: Session, user: models.User, skip: int = 0, limit: int = 100) -> List[models.Task]:
-    # Используем LEFT JOIN, чтобы включить задачи без исполнителя
-    q = db.query(models.Task).outerjoin(models.User, models.Task.executor_id == models.User.id)
-
-    if user.role == models.RoleEnum.admin:
-        # Админ видит все задачи
-        pass
-    elif user.role == models.RoleEnum.smm_manager:
-        # SMM менеджер видит задачи дизайнеров, SMM менеджеров и неназначенные
-        q = q.filter(
-            (models.User.role.in_([models.RoleEnum.designer, models.RoleEnum.smm_manager])) |
-            (models.Task.executor_id.is_(None))
-        )
-    elif user.role == models.RoleEnum.designer:
-        # Дизайнер видит только задачи дизайнеров и неназначенные
-        q = q.filter(
-            (models.User.role == models.RoleEnum.designer) |
-            (models.Task.executor_id.is_(None))
-        )
 
-    # Скрываем архивные задачи из основного списка
-    q = q.filter(models.Task.status != models.TaskStatus.archived)
-
-    # Сортировка: в работе сверху, новые в середине, завершенные внизу
-    # Используем CASE для создания приоритета статусов
-    from sqlalchemy import case
-    status_priority = case(
-        (models.Task.status == models.TaskStatus.in_progress, 1),  # В работе - наивысший приоритет
-        (models.Task.status == models.TaskStatus.new, 2),         # Новые - средний приоритет
-        (models.Task.status == models.TaskStatus.overdue, 3),     # Просроченные - важные
-        (models.Task.status == models.TaskStatus.done, 4),        # Завершенные - низкий приоритет
-        (models.Task.status == models.TaskStatus.cancelled, 5),   # Отмененные - самый низкий приоритет
-        else_=6  # На случай других статусов
+# Сортировка списков: ранг статуса (в работе сверху, завершенные внизу), новые
+# задачи выше, id - для однозначного порядка. Обслуживается ix_tasks_rank_visibility
+TASK_LIST_ORDER = (
+    models.Task.status_rank,
+    models.Task.created_at.desc(),
+    models.Task.id.desc(),
+)
+# Архивные задачи скрыты из основного списка
+TASK_NOT_ARCHIVED = models.Task.status_rank < models.TASK_STATUS_RANK_ARCHIVED
+
+
+def task_visible_to(visible_roles):
+    """Задача видна ролям TASK_VISIBILITY: исполнитель одной из ролей или исполнителя нет.
+
+    Роль берется из tasks.executor_role (копия users.role) - без JOIN с users.
+    """
+    return models.Task.executor_role.in_(visible_roles) | models.Task.executor_id.is_(None)
+
+
+def _build_task_list_statement(visible_roles=None):
+    stmt = select(models.Task)
+    if visible_roles is not None:
+        stmt = stmt.where(task_visible_to(visible_roles))
+    return (
+        stmt.where(TASK_NOT_ARCHIVED)
+        .order_by(*TASK_LIST_ORDER)
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
     )
 
-    return q.order_by(status_priority, models.Task.created_at.desc()).offset(skip).limit(limit).all()
+
+# Какие задачи (по роли исполнителя) видит роль; None - все задачи
+TASK_VISIBILITY = {
+    models.RoleEnum.admin: None,
+    # SMM менеджер видит задачи дизайнеров, SMM менеджеров и неназначенные
+    models.RoleEnum.smm_manager: (models.RoleEnum.designer, models.RoleEnum.smm_manager),
+    # Дизайнер видит только задачи дизайнеров и неназначенные
+    models.RoleEnum.designer: (models.RoleEnum.designer,),
+}
+
+
+def get_tasks(db: Session, skip: int = 0, limit: int = 100) -> List[models.Task]:
+    stmt = _cached_statement(("tasks", None), _build_task_list_statement)
+    return db.execute(stmt, {"skip": skip, "limit": limit}).scalars().all()
+
+
+def get_tasks_for_user(db: Session, user: models.User, skip: int = 0, limit: int = 100) -> List[models.Task]:
+    visible_roles = TASK_VISIBILITY.get(user.role)
+    stmt = _cached_statement(
+        ("tasks", visible_roles),
+        lambda: _build_task_list_statement(visible_roles),
+    )
+    return db.execute(stmt, {"skip": skip, "limit": limit}).scalars().all()
 
 
 
@@ -564,12 +481,19 @@ def update_task_status(db: Session, task_id: int, status: str):
     return task
 
 
-def get_projects(db: Session, include_archived: bool = False) -> List[models.Project]:
-    query = db.query(models.Project)
+def _build_project_list_statement(include_archived: bool):
+    stmt = select(models.Project)
     if not include_archived:
-        from sqlalchemy import or_
-        query = query.filter(or_(models.Project.is_archived == False, models.Project.is_archived == None))
-    return query.all()
+        stmt = stmt.where(or_(models.Project.is_archived == False, models.Project.is_archived == None))
+    return stmt
+
+
+def get_projects(db: Session, include_archived: bool = False) -> List[models.Project]:
+    stmt = _cached_statement(
+        ("projects", include_archived),
+        lambda: _build_project_list_statement(include_archived),
+    )
+    return db.execute(stmt).scalars().all()
 
 
 def create_project(db: Session, project: schemas.ProjectCreate) -> models.Project:
@@ -1498,24 +1422,24 @@ def get_user_statistics(db: Session, user_id: int) -> Optional[schemas.UserStats
         return None
     
     # Общее количество задач пользователя
-    total_tasks_query = db.query(models.Task).filter(models.Task.executor_id == user_id)
+    total_tasks_query = db.query(models.TaskHistory).filter(models.TaskHistory.executor_id == user_id)
     total_assigned_tasks = total_tasks_query.count()
     
     # Выполненные задачи
-    completed_tasks = total_tasks_query.filter(models.Task.status == models.TaskStatus.done).count()
+    completed_tasks = total_tasks_query.filter(models.TaskHistory.status == models.TaskStatus.done).count()
     
     # Незавершенные задачи
-    pending_tasks = total_tasks_query.filter(models.Task.status == models.TaskStatus.in_progress).count()
+    pending_tasks = total_tasks_query.filter(models.TaskHistory.status == models.TaskStatus.in_progress).count()
     
     # Процент выполнения
     completion_rate = (completed_tasks / total_assigned_tasks * 100) if total_assigned_tasks > 0 else 0
     
     # Проекты где пользователь выполнил хотя бы 1 задачу
-    projects_with_completed_tasks = db.query(distinct(models.Task.project)).filter(
+    projects_with_completed_tasks = db.query(distinct(models.TaskHistory.project)).filter(
         and_(
-            models.Task.executor_id == user_id,
-            models.Task.status == models.TaskStatus.done,
-            models.Task.project.isnot(None)
+            models.TaskHistory.executor_id == user_id,
+            models.TaskHistory.status == models.TaskStatus.done,
+            models.TaskHistory.project.isnot(None)
         )
     ).count()
     
@@ -1525,14 +1449,14 @@ def get_user_statistics(db: Session, user_id: int) -> Optional[schemas.UserStats
     month_end = datetime(now.year, now.month + 1, 1) if now.month < 12 else datetime(now.year + 1, 1, 1)
     
     this_month_tasks = total_tasks_query.filter(
-        models.Task.created_at >= month_start,
-        models.Task.created_at < month_end
+        models.TaskHistory.created_at >= month_start,
+        models.TaskHistory.created_at < month_end
     ).count()
     
     this_month_completions = total_tasks_query.filter(
-        models.Task.created_at >= month_start,
-        models.Task.created_at < month_end,
-        models.Task.status == models.TaskStatus.done
+        models.TaskHistory.created_at >= month_start,
+        models.TaskHistory.created_at < month_end,
+        models.TaskHistory.status == models.TaskStatus.done
     ).count()
     
     # Активность за текущую неделю (понедельник - воскресенье)
@@ -1551,15 +1475,15 @@ def get_user_statistics(db: Session, user_id: int) -> Optional[schemas.UserStats
         
         # Задачи поставленные в этот день
         assigned_count = total_tasks_query.filter(
-            models.Task.created_at >= day_start,
-            models.Task.created_at <= day_end
+            models.TaskHistory.created_at >= day_start,
+            models.TaskHistory.created_at <= day_end
         ).count()
         
         # Задачи завершенные в этот день
         completed_count = total_tasks_query.filter(
-            models.Task.finished_at >= day_start,
-            models.Task.finished_at <= day_end,
-            models.Task.status == models.TaskStatus.done
+            models.TaskHistory.finished_at >= day_start,
+            models.TaskHistory.finished_at <= day_end,
+            models.TaskHistory.status == models.TaskStatus.done
         ).count()
         
         weekly_activity.append(schemas.WeeklyActivity(
@@ -1570,8 +1494,8 @@ def get_user_statistics(db: Session, user_id: int) -> Optional[schemas.UserStats
     
     # Последние выполненные задачи
     recent_tasks_query = total_tasks_query.filter(
-        models.Task.status == models.TaskStatus.done
-    ).order_by(models.Task.finished_at.desc()).limit(5)
+        models.TaskHistory.status == models.TaskStatus.done
+    ).order_by(models.TaskHistory.finished_at.desc()).limit(5)
     
     recent_tasks = []
     for task in recent_tasks_query:
@@ -1597,17 +1521,17 @@ def get_user_statistics(db: Session, user_id: int) -> Optional[schemas.UserStats
     # Среднее количество задач в день за последние 30 дней
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     tasks_last_30_days = total_tasks_query.filter(
-        models.Task.finished_at >= thirty_days_ago,
-        models.Task.status == models.TaskStatus.done
+        models.TaskHistory.finished_at >= thirty_days_ago,
+        models.TaskHistory.status == models.TaskStatus.done
     ).count()
     average_tasks_per_day = tasks_last_30_days / 30.0
     
     # Лучшая серия - максимальное количество задач завершенное за один день
-    best_day_query = db.query(func.date(models.Task.finished_at), func.count(models.Task.id)).filter(
-        models.Task.executor_id == user_id,
-        models.Task.status == models.TaskStatus.done,
-        models.Task.finished_at.isnot(None)
-    ).group_by(func.date(models.Task.finished_at)).order_by(func.count(models.Task.id).desc()).first()
+    best_day_query = db.query(func.date(models.TaskHistory.finished_at), func.count(models.TaskHistory.id)).filter(
+        models.TaskHistory.executor_id == user_id,
+        models.TaskHistory.status == models.TaskStatus.done,
+        models.TaskHistory.finished_at.isnot(None)
+    ).group_by(func.date(models.TaskHistory.finished_at)).order_by(func.count(models.TaskHistory.id).desc()).first()
     
     best_streak = best_day_query[1] if best_day_query else 0
     
@@ -1615,17 +1539,17 @@ def get_user_statistics(db: Session, user_id: int) -> Optional[schemas.UserStats
     today_start = datetime.combine(today, datetime.min.time())
     today_end = datetime.combine(today, datetime.max.time())
     current_day_tasks = total_tasks_query.filter(
-        models.Task.finished_at >= today_start,
-        models.Task.finished_at <= today_end,
-        models.Task.status == models.TaskStatus.done
+        models.TaskHistory.finished_at >= today_start,
+        models.TaskHistory.finished_at <= today_end,
+        models.TaskHistory.status == models.TaskStatus.done
     ).count()
     
     # Подсчет активных дней (дни когда пользователь завершал задачи)
     # Это приблизительная метрика - в будущем можно добавить отдельную таблицу для отслеживания активности
-    active_days_count = db.query(func.count(distinct(func.date(models.Task.finished_at)))).filter(
-        models.Task.executor_id == user_id,
-        models.Task.status == models.TaskStatus.done,
-        models.Task.finished_at.isnot(None)
+    active_days_count = db.query(func.count(distinct(func.date(models.TaskHistory.finished_at)))).filter(
+        models.TaskHistory.executor_id == user_id,
+        models.TaskHistory.status == models.TaskStatus.done,
+        models.TaskHistory.finished_at.isnot(None)
     ).scalar() or 0
     
     productivity = schemas.ProductivityMetrics(
@@ -1664,37 +1588,54 @@ def get_leads(
     created_to: Optional[str] = None
 ):
     """Получить список заявок с фильтрацией"""
-    query = db.query(models.Lead).options(
-        joinedload(models.Lead.manager),
-        joinedload(models.Lead.notes).joinedload(models.LeadNote.user),
-        joinedload(models.Lead.attachments),
-        joinedload(models.Lead.history).joinedload(models.LeadHistory.user)
-    )
-
+    params = {"skip": skip, "limit": limit}
     if manager_id:
-        query = query.filter(models.Lead.manager_id == manager_id)
+        params["manager_id"] = manager_id
     if status:
-        query = query.filter(models.Lead.status == status)
+        params["status"] = status
     if source:
-        query = query.filter(models.Lead.source.ilike(f"%{source}%"))
+        params["source"] = f"%{source}%"
     if created_from:
-        from datetime import datetime
         try:
-            from_date = datetime.strptime(created_from, "%Y-%m-%d")
-            query = query.filter(models.Lead.created_at >= from_date)
+            params["created_from"] = datetime.strptime(created_from, "%Y-%m-%d")
         except ValueError:
             pass  # Игнорируем некорректные даты
     if created_to:
-        from datetime import datetime, timedelta
         try:
-            to_date = datetime.strptime(created_to, "%Y-%m-%d")
             # Добавляем один день, чтобы включить весь день "до"
-            to_date = to_date + timedelta(days=1)
-            query = query.filter(models.Lead.created_at < to_date)
+            params["created_to"] = datetime.strptime(created_to, "%Y-%m-%d") + timedelta(days=1)
         except ValueError:
             pass  # Игнорируем некорректные даты
 
-    return query.order_by(models.Lead.last_activity_at.desc()).offset(skip).limit(limit).all()
+    # Отдельный готовый запрос на каждый набор заданных фильтров
+    filters = tuple(sorted(key for key in params if key not in ("skip", "limit")))
+    stmt = _cached_statement(("leads", filters), lambda: _build_lead_list_statement(filters))
+    return db.execute(stmt, params).unique().scalars().all()
+
+
+_LEAD_FILTERS = {
+    "manager_id": lambda: models.Lead.manager_id == bindparam("manager_id"),
+    "status": lambda: models.Lead.status == bindparam("status"),
+    "source": lambda: models.Lead.source.ilike(bindparam("source")),
+    "created_from": lambda: models.Lead.created_at >= bindparam("created_from"),
+    "created_to": lambda: models.Lead.created_at < bindparam("created_to"),
+}
+
+
+def _build_lead_list_statement(filters):
+    stmt = select(models.Lead).options(
+        joinedload(models.Lead.manager),
+        joinedload(models.Lead.notes).joinedload(models.LeadNote.user),
+        joinedload(models.Lead.attachments),
+        joinedload(models.Lead.history).joinedload(models.LeadHistory.user)
+    )
+    for name in filters:
+        stmt = stmt.where(_LEAD_FILTERS[name]())
+    return (
+        stmt.order_by(models.Lead.last_activity_at.desc())
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+    )
 
 
 def get_lead(db: Session, lead_id: int):
@@ -2306,9 +2247,9 @@ def get_service_types_analytics(
     users = users_query.all()
 
     # Получаем все уникальные типы услуг
-    all_service_types = db.query(models.Task.task_type).filter(
-        models.Task.task_type.isnot(None),
-        models.Task.task_type != ''
+    all_service_types = db.query(models.TaskHistory.task_type).filter(
+        models.TaskHistory.task_type.isnot(None),
+        models.TaskHistory.task_type != ''
     ).distinct().all()
     total_service_types = [st[0] for st in all_service_types]
 
@@ -2317,47 +2258,47 @@ def get_service_types_analytics(
     for user in users:
         # Получаем статистику созданных задач (author_id = user.id)
         created_query = db.query(
-            models.Task.task_type,
-            func.count(models.Task.id).label('created_count')
+            models.TaskHistory.task_type,
+            func.count(models.TaskHistory.id).label('created_count')
         ).filter(
-            models.Task.author_id == user.id,
-            models.Task.created_at >= start_datetime,
-            models.Task.created_at < end_datetime,
-            models.Task.task_type.isnot(None),
-            models.Task.task_type != '',
-            models.Task.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
-        ).group_by(models.Task.task_type)
+            models.TaskHistory.author_id == user.id,
+            models.TaskHistory.created_at >= start_datetime,
+            models.TaskHistory.created_at < end_datetime,
+            models.TaskHistory.task_type.isnot(None),
+            models.TaskHistory.task_type != '',
+            models.TaskHistory.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
+        ).group_by(models.TaskHistory.task_type)
 
         created_data = {row.task_type: row.created_count for row in created_query.all()}
 
         # Получаем статистику назначенных задач (executor_id = user.id - все задачи, назначенные на исполнителя)
         assigned_query = db.query(
-            models.Task.task_type,
-            func.count(models.Task.id).label('assigned_count')
+            models.TaskHistory.task_type,
+            func.count(models.TaskHistory.id).label('assigned_count')
         ).filter(
-            models.Task.executor_id == user.id,
-            models.Task.created_at >= start_datetime,
-            models.Task.created_at < end_datetime,
-            models.Task.task_type.isnot(None),
-            models.Task.task_type != '',
-            models.Task.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
-        ).group_by(models.Task.task_type)
+            models.TaskHistory.executor_id == user.id,
+            models.TaskHistory.created_at >= start_datetime,
+            models.TaskHistory.created_at < end_datetime,
+            models.TaskHistory.task_type.isnot(None),
+            models.TaskHistory.task_type != '',
+            models.TaskHistory.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
+        ).group_by(models.TaskHistory.task_type)
 
         assigned_data = {row.task_type: row.assigned_count for row in assigned_query.all()}
 
         # Получаем статистику завершенных задач (executor_id = user.id и status = done)
         completed_query = db.query(
-            models.Task.task_type,
-            func.count(models.Task.id).label('completed_count')
+            models.TaskHistory.task_type,
+            func.count(models.TaskHistory.id).label('completed_count')
         ).filter(
-            models.Task.executor_id == user.id,
-            models.Task.status == models.TaskStatus.done,
-            models.Task.created_at >= start_datetime,
-            models.Task.created_at < end_datetime,
-            models.Task.task_type.isnot(None),
-            models.Task.task_type != '',
-            models.Task.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
-        ).group_by(models.Task.task_type)
+            models.TaskHistory.executor_id == user.id,
+            models.TaskHistory.status == models.TaskStatus.done,
+            models.TaskHistory.created_at >= start_datetime,
+            models.TaskHistory.created_at < end_datetime,
+            models.TaskHistory.task_type.isnot(None),
+            models.TaskHistory.task_type != '',
+            models.TaskHistory.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
+        ).group_by(models.TaskHistory.task_type)
 
         completed_data = {row.task_type: row.completed_count for row in completed_query.all()}
 
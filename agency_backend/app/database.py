@@ -1,6 +1,13 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 
 # Load environment variables from .env file
 try:
@@ -39,21 +46,175 @@ def get_database_url():
 
 SQLALCHEMY_DATABASE_URL = get_database_url()
 
+
+def get_sqlite_profile():
+    """Профиль PRAGMA для SQLite (общий для backend и бота, настраивается через env)"""
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000")),
+        # 256 MB memory-mapped I/O
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        # Отрицательное значение - размер в KiB (64 MB)
+        "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+        "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+        "foreign_keys": os.getenv("SQLITE_FOREIGN_KEYS", "OFF"),
+    }
+
+
+SQLITE_PROFILE = get_sqlite_profile()
+
+
+def apply_sqlite_profile(dbapi_connection, profile=None):
+    """Применить PRAGMA профиля к новому sqlite3-подключению"""
+    profile = profile or SQLITE_PROFILE
+    cursor = dbapi_connection.cursor()
+    try:
+        # busy_timeout первым, чтобы смена journal_mode не упала на блокировке
+        cursor.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+        cursor.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        cursor.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        cursor.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        cursor.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+        cursor.execute(f"PRAGMA foreign_keys = {profile['foreign_keys']}")
+    finally:
+        cursor.close()
+
+
+def read_sqlite_pragmas(connection):
+    """Прочитать фактические значения PRAGMA с подключения (для диагностики)"""
+    result = {}
+    for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size",
+                 "cache_size", "temp_store", "foreign_keys"):
+        result[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    return result
+
+
+class SQLiteWriteQueue:
+    """Метрики очереди записи SQLite.
+
+    Сама очередь - пул writer-движка из одного подключения: сессии, которым
+    нужно писать, ждут его по очереди (FIFO) не дольше SQLITE_WRITE_WAIT_SECONDS.
+    """
+
+    def __init__(self, max_wait: float):
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.total_hold = 0.0
+        self.max_hold = 0.0
+
+    def record_wait(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def record_hold(self, held: float):
+        with self._lock:
+            self.total_hold += held
+            self.max_hold = max(self.max_hold, held)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_wait_seconds": self.max_wait,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "waiting": self.waiting,
+                "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 2) if self.acquired else 0.0,
+                "max_wait_ms": round(self.max_wait_seen * 1000, 2),
+                "avg_hold_ms": round(self.total_hold / self.acquired * 1000, 2) if self.acquired else 0.0,
+                "max_hold_ms": round(self.max_hold * 1000, 2),
+            }
+
+
+class _WriterPool(QueuePool):
+    """QueuePool с учетом времени ожидания единственного writer-подключения"""
+
+    write_queue = None
+
+    def _do_get(self):
+        queue = self.write_queue
+        started = time.monotonic()
+        with queue._lock:
+            queue.waiting += 1
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            queue.record_wait(time.monotonic() - started, timed_out=True)
+            raise
+        finally:
+            with queue._lock:
+                queue.waiting -= 1
+        queue.record_wait(time.monotonic() - started)
+        return conn
+
+
+write_queue = None
+
 # Настройки подключения в зависимости от типа БД
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    write_queue = SQLiteWriteQueue(float(os.getenv("SQLITE_WRITE_WAIT_SECONDS", "30")))
+    _WriterPool.write_queue = write_queue
+
+    # Единственное подключение на запись - все транзакции записи идут по очереди
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
         connect_args={
             "check_same_thread": False,
             "timeout": 30,  # Увеличен таймаут для SQLite
         },
-        # Connection pooling для SQLite
-        pool_size=5,  # Пул из 5 подключений
-        max_overflow=10,  # До 15 одновременных подключений
+        poolclass=_WriterPool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=write_queue.max_wait,
         pool_recycle=3600,  # Переиспользовать соединения каждый час
         pool_pre_ping=True,  # Проверка жизни соединения перед использованием
         echo=False
     )
+
+    # Пул подключений только для чтения (SELECT) - в WAL читатели не блокируют writer
+    read_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": 30,
+        },
+        pool_size=int(os.getenv("SQLITE_READ_POOL_SIZE", "8")),
+        max_overflow=int(os.getenv("SQLITE_READ_POOL_OVERFLOW", "8")),
+        pool_recycle=3600,
+        pool_pre_ping=True,
+        echo=False
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection)
+
+    @event.listens_for(engine, "checkout")
+    def _writer_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checkout_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkin")
+    def _writer_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checkout_at", None)
+        if started is not None:
+            write_queue.record_hold(time.monotonic() - started)
+
+    @event.listens_for(read_engine, "connect")
+    def _set_sqlite_reader_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection)
+        # Любая попытка записи через reader-сессию завершится ошибкой
+        dbapi_connection.execute("PRAGMA query_only = ON")
 else:
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
@@ -62,6 +223,239 @@ else:
         pool_pre_ping=True,
         pool_recycle=3600
     )
+    read_engine = engine
+
+_WRITER_KEY = "routing_writer"
+# Сырой SQL, начинающийся с этих слов, - чтение
+_READ_STATEMENTS = ("select", "with", "pragma", "explain")
+
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().lower().startswith(_READ_STATEMENTS)
+    return False
+
+
+class RoutingSession(Session):
+    """Сессия запроса на запись: writer-подключение берется только под запись.
+
+    SELECT до первой записи идут в пул чтения. flush, INSERT/UPDATE/DELETE и
+    явный session.connection() переключают транзакцию на writer - до commit
+    или rollback все запросы идут через него (видны свои незафиксированные
+    изменения). После commit writer возвращается в очередь, и refresh,
+    ленивые загрузки и отправка уведомлений его уже не держат.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, bind=None, **kw):
+        if bind is not None:
+            return bind
+        if self.info.get(_WRITER_KEY) or self._flushing or _is_write(clause):
+            self.info[_WRITER_KEY] = True
+            return engine
+        if mapper is None and clause is None:
+            # get_bind() без запроса - за диалектом, подключение не берется
+            return engine
+        return read_engine
+
+    def connection(self, bind_arguments=None, execution_options=None):
+        if not bind_arguments:
+            # Явное подключение - для сырой записи (например, счетчики в хуках сессии)
+            self.info[_WRITER_KEY] = True
+            bind_arguments = {"bind": engine}
+        return super().connection(bind_arguments, execution_options)
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_writer(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_WRITER_KEY, None)
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+RoutingSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def get_async_database_url(database_url=None):
+    """URL для async-движка: aiosqlite для SQLite, asyncpg для PostgreSQL"""
+    url = make_url(database_url or SQLALCHEMY_DATABASE_URL)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url.set(drivername="postgresql+asyncpg")
+
+
+# Async-движок (только чтение) для list/analytics маршрутов.
+# Включается DB_ASYNC_ENABLED (по умолчанию да), если установлен драйвер;
+# иначе эти маршруты работают через синхронную сессию в threadpool.
+async_engine = None
+AsyncSessionLocal = None
+
+if os.getenv("DB_ASYNC_ENABLED", "true").lower() in ("1", "true", "yes"):
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+            async_engine = create_async_engine(
+                get_async_database_url(),
+                connect_args={"timeout": 30},
+                pool_size=int(os.getenv("SQLITE_READ_POOL_SIZE", "8")),
+                max_overflow=int(os.getenv("SQLITE_READ_POOL_OVERFLOW", "8")),
+                pool_recycle=3600,
+                pool_pre_ping=True,
+            )
+
+            @event.listens_for(async_engine.sync_engine, "connect")
+            def _set_async_sqlite_pragmas(dbapi_connection, connection_record):
+                apply_sqlite_profile(dbapi_connection)
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA query_only = ON")
+                cursor.close()
+        else:
+            async_engine = create_async_engine(
+                get_async_database_url(),
+                pool_size=10,
+                max_overflow=20,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+            )
+
+        AsyncSessionLocal = async_sessionmaker(
+            async_engine, autoflush=False, expire_on_commit=False
+        )
+        print(f"[OK] Async database engine enabled ({async_engine.url.drivername})")
+    except (ImportError, ValueError) as e:
+        # aiosqlite/asyncpg (или greenlet) не установлены - остаемся на синхронной сессии
+        async_engine = None
+        AsyncSessionLocal = None
+        print(f"[WARN] Async database engine disabled: {e}")
+
+
+# ==================== READ REPLICAS ====================
+# DB_REPLICA_URLS - список URL реплик через запятую (PostgreSQL; для локальной
+# проверки подойдут и копии SQLite-файла). Тяжелые отчеты и экспорт читают с
+# реплики, если ее отставание не больше REPLICA_MAX_LAG_SECONDS, иначе - с primary.
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+
+
+class Replica:
+    """Реплика для чтения отчетов + кэш результата проверки отставания"""
+
+    def __init__(self, url: str):
+        self.url = make_url(url)
+        if self.url.get_backend_name() == "sqlite":
+            self.engine = create_engine(
+                self.url,
+                connect_args={"check_same_thread": False, "timeout": 30},
+                pool_pre_ping=True,
+            )
+
+            @event.listens_for(self.engine, "connect")
+            def _set_replica_pragmas(dbapi_connection, connection_record):
+                apply_sqlite_profile(dbapi_connection)
+                dbapi_connection.execute("PRAGMA query_only = ON")
+        else:
+            self.engine = create_engine(
+                self.url, pool_size=5, max_overflow=10, pool_pre_ping=True, pool_recycle=3600
+            )
+        self.async_engine = None
+        self.lag = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self.error = None
+        self._lock = threading.Lock()
+
+    def measure_lag(self):
+        """Отставание реплики в секундах (0 для SQLite-заглушки)"""
+        with self.engine.connect() as conn:
+            if self.engine.dialect.name != "postgresql":
+                conn.exec_driver_sql("SELECT 1")
+                return 0.0
+            lag = conn.exec_driver_sql(
+                "SELECT CASE WHEN pg_is_in_recovery() "
+                "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            ).scalar()
+            return float(lag or 0)
+
+    def is_usable(self):
+        """Реплика доступна и отстает не больше допустимого (проверка кэшируется)"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self.checked_at < REPLICA_LAG_CHECK_INTERVAL:
+                return self.healthy
+            self.checked_at = now
+            try:
+                self.lag = self.measure_lag()
+                self.error = None
+                self.healthy = self.lag <= REPLICA_MAX_LAG_SECONDS
+            except Exception as e:
+                self.lag = None
+                self.error = str(e)
+                self.healthy = False
+                print(f"[WARN] Replica {self.url.render_as_string(hide_password=True)} unavailable: {e}")
+            return self.healthy
+
+    def status(self):
+        return {
+            "url": self.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.error,
+        }
+
+
+replicas = [
+    Replica(url.strip())
+    for url in os.getenv("DB_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+_replica_counter = 0
+
+if replicas:
+    print(f"[OK] Read replicas configured: {len(replicas)}")
+    if async_engine is not None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        for replica in replicas:
+            replica.async_engine = create_async_engine(
+                get_async_database_url(replica.url), pool_pre_ping=True
+            )
+            if replica.url.get_backend_name() == "sqlite":
+                event.listen(
+                    replica.async_engine.sync_engine, "connect",
+                    lambda dbapi_connection, connection_record: apply_sqlite_profile(dbapi_connection),
+                )
+
+
+def choose_replica():
+    """Следующая пригодная реплика (round-robin) или None - тогда читаем с primary"""
+    global _replica_counter
+    for _ in range(len(replicas)):
+        replica = replicas[_replica_counter % len(replicas)]
+        _replica_counter += 1
+        if replica.is_usable():
+            return replica
+    return None
+
+
+def ReportSessionLocal():
+    """Сессия для тяжелых отчетов/экспорта: реплика, а при ее недоступности - primary"""
+    replica = choose_replica()
+    if replica is None:
+        return ReadSessionLocal()
+    return ReadSessionLocal(bind=replica.engine)
+
+
+def AsyncReportSessionLocal():
+    """Async-вариант ReportSessionLocal (None, если async-движок выключен)"""
+    if AsyncSessionLocal is None:
+        return None
+    replica = choose_replica()
+    if replica is None or replica.async_engine is None:
+        return AsyncSessionLocal()
+    return AsyncSessionLocal(bind=replica.async_engine)
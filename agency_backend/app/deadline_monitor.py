@@ -0,0 +1,267 @@
+"""Монитор дедлайнов: статус overdue и напоминания перед дедлайном.
+
+Раз в DEADLINE_MONITOR_INTERVAL секунд держатель аренды
+scheduler_leases['deadline_monitor'] (см. recurring_scheduler.LeaderLease)
+делает один проход:
+
+- один UPDATE переводит открытые задачи (new, in_progress) с истекшим
+  дедлайном в overdue и увеличивает overdue_count;
+- исполнители задач, у которых до дедлайна осталось не больше
+  DEADLINE_REMINDER_MINUTES минут, получают напоминание в Telegram одним
+  пакетом после commit.
+
+Оба запроса - диапазоны по индексу ix_tasks_status_deadline, без полного
+прохода по tasks. Нижняя граница диапазона - отметка прошлого прохода в
+settings (deadline_monitor.overdue_until / deadline_monitor.reminded_until),
+она пишется в той же транзакции, что и UPDATE. Поэтому каждый дедлайн
+обрабатывается один раз, а после перезапуска или смены лидера проход
+продолжается с отметки.
+
+Задачи, созданные или измененные с дедлайном раньше отметки, проход
+находит по row_version (индекс ix_tasks_row_version): запоминается версия
+счетчика tasks на момент прохода (deadline_monitor.row_version), следующий
+проверяет только строки новее нее. Такая задача помечается, если по этому
+дедлайну в task_events еще нет перехода в overdue, - задача, которую
+исполнитель снова взял в работу после overdue, повторно не помечается.
+Шаблоны повторяющихся задач не трогаются - у них дедлайн задает только
+время суток экземпляров.
+
+Время - местное UTC+5, как в остальных колонках tasks.
+"""
+
+import logging
+import math
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import events, models, telegram_notifier
+from .database import SessionLocal
+from .migrations import TASKS_COUNTER
+from .recurring_scheduler import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+# Период прохода монитора, секунды
+DEADLINE_MONITOR_INTERVAL = float(os.getenv("DEADLINE_MONITOR_INTERVAL", "60"))
+# За сколько минут до дедлайна напоминать исполнителю (0 - не напоминать)
+DEADLINE_REMINDER_MINUTES = int(os.getenv("DEADLINE_REMINDER_MINUTES", "60"))
+# Срок аренды роли монитора, секунды
+DEADLINE_MONITOR_LEASE_SECONDS = float(os.getenv("DEADLINE_MONITOR_LEASE_SECONDS", "180"))
+
+LEASE_NAME = "deadline_monitor"
+OVERDUE_UNTIL = "deadline_monitor.overdue_until"
+REMINDED_UNTIL = "deadline_monitor.reminded_until"
+SEEN_VERSION = "deadline_monitor.row_version"
+
+OPEN_STATUSES = (models.TaskStatus.new, models.TaskStatus.in_progress)
+CLOSED_STATUSES = tuple(status for status in models.TaskStatus if status not in OPEN_STATUSES)
+
+Task = models.Task.__table__
+User = models.User.__table__
+Event = models.TaskEvent.__table__
+ChangeCounter = models.ChangeCounter.__table__
+
+TASKS_VERSION = select(ChangeCounter.c.version).where(ChangeCounter.c.name == TASKS_COUNTER)
+
+_NOT_TEMPLATE = or_(Task.c.is_recurring.is_(None), Task.c.is_recurring == False)  # noqa: E712
+
+
+def _local_now() -> datetime:
+    return models.get_local_time_utc5().replace(tzinfo=None)
+
+
+def _expired(now: datetime, since: Optional[datetime]):
+    conditions = [Task.c.deadline <= now, Task.c.status.in_(OPEN_STATUSES), _NOT_TEMPLATE]
+    if since is not None:
+        conditions.append(Task.c.deadline > since)
+    return conditions
+
+
+def _changed_expired(now: datetime, since: datetime, seen: int):
+    """Истекшие задачи с дедлайном до отметки, созданные или измененные после версии seen"""
+    marked = exists().where(
+        Event.c.task_id == Task.c.id,
+        Event.c.status == models.TaskStatus.overdue,
+        Event.c.at >= Task.c.deadline,
+    )
+    return (
+        select(Task.c.id)
+        .where(
+            Task.c.row_version > seen,
+            Task.c.deadline <= min(now, since),
+            # NOT IN вместо IN (new, in_progress): иначе SQLite выбирает
+            # индекс (status, deadline) со всеми просроченными задачами
+            Task.c.status.not_in(CLOSED_STATUSES),
+            _NOT_TEMPLATE,
+            ~marked,
+        )
+    )
+
+
+def _upcoming(start: datetime, end: datetime):
+    return (
+        select(
+            Task.c.id, Task.c.title, Task.c.description, Task.c.project, Task.c.task_type,
+            Task.c.task_format, Task.c.deadline, User.c.telegram_id,
+        )
+        .join(User, User.c.id == Task.c.executor_id)
+        .where(
+            Task.c.deadline > start,
+            Task.c.deadline <= end,
+            Task.c.status.in_(OPEN_STATUSES),
+            _NOT_TEMPLATE,
+            User.c.telegram_id.is_not(None),
+        )
+        .order_by(Task.c.deadline)
+    )
+
+
+def _watermark(db: Session, key: str) -> Optional[datetime]:
+    setting = db.get(models.Setting, key)
+    return datetime.fromisoformat(setting.value) if setting is not None else None
+
+
+def _set_watermark(db: Session, key: str, value: datetime):
+    db.merge(models.Setting(key=key, value=value.isoformat()))
+
+
+def _seen_version(db: Session) -> int:
+    setting = db.get(models.Setting, SEEN_VERSION)
+    return int(setting.value) if setting is not None else 0
+
+
+def _status_events(rows):
+    collected = []
+    for row in rows:
+        role = None
+        if row.executor_id is not None:
+            role = row.executor_role.value if row.executor_role is not None else ""
+        collected.append({
+            "type": "task.status",
+            "id": row.id,
+            "status": models.TaskStatus.overdue.value,
+            "executor_id": row.executor_id,
+            "executor_roles": [role],
+        })
+    return collected
+
+
+class DeadlineMonitor:
+    """Проходы монитора и счетчики для /admin/deadline-monitor/stats"""
+
+    def __init__(self, lease: LeaderLease, interval: float, reminder_minutes: int):
+        self.lease = lease
+        self.interval = interval
+        self.reminder = timedelta(minutes=reminder_minutes)
+        self.is_leader = False
+        self.counters = Counter()
+        self.last_run_at = None
+
+    def mark_overdue(self, db: Session, now: datetime) -> int:
+        """Перевести в overdue задачи, истекшие с прошлой отметки или измененные после прошлого прохода"""
+        since = _watermark(db, OVERDUE_UNTIL)
+        # Версия до UPDATE: изменения, которые он не увидит, будут новее нее
+        version = db.execute(TASKS_VERSION).scalar() or 0
+        conditions = _expired(now, since)
+        if since is not None:
+            expired = select(Task.c.id).where(*conditions)
+            conditions = [Task.c.id.in_(expired.union(_changed_expired(now, since, _seen_version(db))))]
+        rows = db.execute(
+            update(Task)
+            .where(*conditions)
+            .values(
+                status=models.TaskStatus.overdue,
+                status_rank=models.TASK_STATUS_RANK[models.TaskStatus.overdue],
+                overdue_count=func.coalesce(Task.c.overdue_count, 0) + 1,
+            )
+            .returning(Task.c.id, Task.c.executor_id, Task.c.executor_role)
+        ).all()
+        _set_watermark(db, OVERDUE_UNTIL, now)
+        db.merge(models.Setting(key=SEEN_VERSION, value=str(version)))
+        events.queue(db, _status_events(rows))
+        return len(rows)
+
+    def collect_reminders(self, db: Session, now: datetime) -> list:
+        """Напоминания по дедлайнам, вошедшим в окно DEADLINE_REMINDER_MINUTES с прошлой отметки"""
+        if not self.reminder:
+            return []
+        end = now + self.reminder
+        reminded_until = _watermark(db, REMINDED_UNTIL)
+        start = max(reminded_until, now) if reminded_until is not None else now
+        _set_watermark(db, REMINDED_UNTIL, end)
+        if start >= end:
+            return []
+        return [
+            {
+                "executor_telegram_id": row.telegram_id,
+                "task_id": row.id,
+                "task_data": telegram_notifier.task_notification_data(row._mapping),
+                "minutes_left": math.ceil((row.deadline - now).total_seconds() / 60),
+            }
+            for row in db.execute(_upcoming(start, end))
+        ]
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Один проход (только у лидера); возвращает число задач, ставших overdue"""
+        now = now or _local_now()
+        db = SessionLocal()
+        try:
+            flipped = self.mark_overdue(db, now)
+            reminders = self.collect_reminders(db, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self.counters["runs"] += 1
+        self.counters["overdue"] += flipped
+        self.last_run_at = now
+        if flipped:
+            logger.info(f"[DEADLINE] {flipped} tasks are overdue")
+        if reminders:
+            self.counters["reminders"] += len(reminders)
+            self.counters["reminders_sent"] += telegram_notifier.send_deadline_reminders(reminders)
+        return flipped
+
+    def tick(self):
+        leader = self.lease.acquire()
+        if leader != self.is_leader:
+            self.is_leader = leader
+            self.counters["leader_acquired" if leader else "leader_lost"] += 1
+            logger.info(f"[DEADLINE] Deadline monitor {'is' if leader else 'is no longer'} the leader ({self.lease.holder})")
+        if leader:
+            self.run_once()
+
+    def run_forever(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.error(f"❌ Error in deadline monitor: {e}")
+            time.sleep(self.interval)
+
+    def stats(self):
+        return {
+            "holder": self.lease.holder,
+            "is_leader": self.is_leader,
+            "interval": self.interval,
+            "reminder_minutes": int(self.reminder.total_seconds() // 60),
+            "last_run_at": self.last_run_at,
+            **self.counters,
+        }
+
+
+deadline_monitor = DeadlineMonitor(
+    LeaderLease(LEASE_NAME, DEADLINE_MONITOR_LEASE_SECONDS),
+    DEADLINE_MONITOR_INTERVAL,
+    DEADLINE_REMINDER_MINUTES,
+)
@@ -0,0 +1,366 @@
+"""Push-канал событий задач и проектов (/ws/events).
+
+Хуки сессии собирают задачи и проекты, измененные при flush, и после commit
+публикуют события в брокер:
+
+    task.created / task.updated / task.status / task.accepted / task.deleted
+    project.created / project.updated / project.deleted
+
+Массовые UPDATE/DELETE (query.update()) затрагивают неизвестные строки и
+публикуются как tasks.changed / projects.changed без id: клиент перечитывает
+список. Сырой SQL бота событий не публикует, такие изменения клиент получает
+из /tasks/changes.
+
+Брокер доставляет события в EventHub каждого воркера, а тот раздает их своим
+подключениям с фильтром по роли (crud.TASK_VISIBILITY, как в
+get_tasks_for_user). По умолчанию брокер в памяти процесса (один воркер). Для
+нескольких воркеров задается EVENTS_BROKER_DB - SQLite-файл, общий для
+воркеров хоста; каждый воркер опрашивает его раз в EVENTS_POLL_INTERVAL.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from enum import Enum
+from typing import Optional
+
+from fastapi import WebSocket
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from . import auth, crud, models
+from .database import ReadSessionLocal
+from .user_cache import get_cached_user
+
+# Сколько событий может ждать отправки одному клиенту; при переполнении
+# очередь заменяется одним событием resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+# Пинг простаивающего соединения, чтобы прокси его не закрыл
+EVENTS_PING_SECONDS = float(os.getenv("EVENTS_PING_SECONDS", "25"))
+# Общий брокер для нескольких воркеров (пусто - в памяти процесса)
+EVENTS_BROKER_DB = os.getenv("EVENTS_BROKER_DB", "")
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "0.2"))
+
+_PENDING_KEY = "events_pending"
+
+EXECUTOR_ROLES = select(models.User.id, models.User.role)
+
+
+class InProcessBroker:
+    """События остаются в процессе, который их опубликовал"""
+
+    def start(self, hub, loop):
+        self.hub = hub
+
+    def publish(self, events):
+        hub = getattr(self, "hub", None)
+        if hub is not None:
+            hub.deliver(events)
+
+
+class SQLiteBroker:
+    """События через SQLite-файл: каждый воркер хоста читает все события"""
+
+    # Сколько секунд хранить доставленные события
+    RETENTION_SECONDS = 60
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, poll_interval: float):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._last_id = 0
+        self._publishes = 0
+        self._task = None
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def publish(self, events):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT INTO events (ts, payload) VALUES (?, ?)",
+                [(now, json.dumps(e)) for e in events],
+            )
+            self._publishes += 1
+            if self._publishes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM events WHERE ts < ?", (now - self.RETENTION_SECONDS,))
+        finally:
+            conn.close()
+
+    def _fetch(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, payload FROM events WHERE id > ? ORDER BY id", (self._last_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+        if rows:
+            self._last_id = rows[-1][0]
+        return [json.loads(payload) for _, payload in rows]
+
+    def _skip_existing(self):
+        conn = self._connect()
+        try:
+            self._last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        finally:
+            conn.close()
+
+    async def _poll(self, hub):
+        await asyncio.to_thread(self._skip_existing)
+        while True:
+            try:
+                events = await asyncio.to_thread(self._fetch)
+                if events:
+                    hub.dispatch(events)
+            except Exception as e:
+                print(f"Event broker poll error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self, hub, loop):
+        # Опрос запускается с первым подключением воркера
+        if self._task is None:
+            self._task = loop.create_task(self._poll(hub))
+
+
+class Subscription:
+    """Подключенный клиент: очередь событий и роли исполнителей, которые он видит"""
+
+    def __init__(self, role, queue_size: int):
+        visible_roles = crud.TASK_VISIBILITY.get(role)
+        self.visible_roles = (
+            None if visible_roles is None else frozenset(r.value for r in visible_roles)
+        )
+        self.queue = asyncio.Queue(queue_size)
+
+    def wants(self, evt: dict) -> bool:
+        # executor_roles - роли исполнителя до и после изменения (None - без исполнителя)
+        roles = evt.get("executor_roles")
+        if self.visible_roles is None or roles is None:
+            return True
+        return any(r is None or r in self.visible_roles for r in roles)
+
+    def put(self, evt: dict) -> bool:
+        """Поставить событие в очередь; False - очередь переполнена и сброшена"""
+        try:
+            self.queue.put_nowait(evt)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            return False
+
+
+class EventHub:
+    def __init__(self, broker, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.counters = Counter()
+        self._subscribers = set()
+        self._loop = None
+
+    def subscribe(self, role) -> Subscription:
+        """Вызывается из event loop при подключении клиента"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self.broker.start(self, self._loop)
+        subscription = Subscription(role, self.queue_size)
+        self._subscribers.add(subscription)
+        self.counters["connections"] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, events):
+        """Из любого потока: отдать события брокеру"""
+        if events:
+            self.counters["published"] += len(events)
+            self.broker.publish(events)
+
+    def deliver(self, events):
+        """Из любого потока: разослать события подключениям этого воркера"""
+        loop = self._loop
+        if loop is not None and self._subscribers:
+            loop.call_soon_threadsafe(self.dispatch, events)
+
+    def dispatch(self, events):
+        """В event loop: раскладывает события по очередям подписчиков"""
+        for subscription in list(self._subscribers):
+            for evt in events:
+                if subscription.wants(evt):
+                    self.counters["delivered"] += 1
+                    if not subscription.put(evt):
+                        self.counters["overflows"] += 1
+                        break
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__,
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            **{name: self.counters[name] for name in ("connections", "published", "delivered", "overflows")},
+        }
+
+
+event_hub = EventHub(
+    SQLiteBroker(EVENTS_BROKER_DB, EVENTS_POLL_INTERVAL) if EVENTS_BROKER_DB else InProcessBroker(),
+    EVENTS_QUEUE_SIZE,
+)
+
+
+def authenticate(token: str) -> Optional[models.RoleEnum]:
+    """Роль активного пользователя по JWT (None - отказ). Сессия закрывается сразу:
+    соединение WebSocket живет долго и не должно держать подключение к БД"""
+    try:
+        username = auth.get_username_from_token(token)
+    except Exception:
+        return None
+    db = ReadSessionLocal()
+    try:
+        user = get_cached_user(db, username, auth.get_user)
+        if user is None or user.role == models.RoleEnum.inactive or not user.is_active:
+            return None
+        return user.role
+    finally:
+        db.close()
+
+
+async def stream(websocket: WebSocket, subscription: Subscription):
+    """Отправлять события клиенту, пока он не отключится"""
+
+    async def send():
+        while True:
+            try:
+                evt = await asyncio.wait_for(subscription.queue.get(), EVENTS_PING_SECONDS)
+            except asyncio.TimeoutError:
+                evt = {"type": "ping"}
+            await websocket.send_json(evt)
+
+    async def receive():
+        # Входящие сообщения не нужны - ждем только отключения
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # Ошибка отправки означает, что клиент уже отключился
+            task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# --- Сбор событий в сессии ---
+
+def queue(session: Session, evts):
+    """Опубликовать события после commit сессии - для изменений в обход ORM.
+
+    Если событий больше половины очереди клиента, вместо них уходит одно
+    tasks.changed: клиенту дешевле перечитать список.
+    """
+    if len(evts) > EVENTS_QUEUE_SIZE // 2:
+        evts = [{"type": "tasks.changed"}]
+    if evts:
+        session.info.setdefault(_PENDING_KEY, []).extend(evts)
+
+
+def _value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _task_event(state, kind):
+    history = state.attrs.executor_id.history
+    executor_ids = {*history.added, *history.unchanged, *history.deleted}
+    if kind == "updated" and state.attrs.status.history.has_changes():
+        accepted = state.attrs.accepted_at.history.has_changes()
+        kind = "accepted" if accepted and state.dict.get("status") == models.TaskStatus.in_progress else "status"
+    return {
+        "type": f"task.{kind}",
+        "id": state.dict.get("id"),
+        "status": _value(state.dict.get("status")),
+        "executor_id": state.dict.get("executor_id"),
+        "executor_ids": executor_ids,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_events(session, flush_context):
+    collected = []
+    for objects, kind in ((session.new, "created"), (session.dirty, "updated"), (session.deleted, "deleted")):
+        for obj in objects:
+            if isinstance(obj, models.Task):
+                if kind == "updated" and not session.is_modified(obj, include_collections=False):
+                    continue
+                collected.append(_task_event(inspect(obj), kind))
+            elif isinstance(obj, models.Project):
+                collected.append({"type": f"project.{kind}", "id": inspect(obj).dict.get("id")})
+            elif isinstance(obj, models.ProjectPost):
+                # Посты - часть проекта (сводка на странице проектов)
+                collected.append({"type": "project.updated", "id": inspect(obj).dict.get("project_id")})
+    if not collected:
+        return
+
+    # Роли исполнителей нужны для фильтра по видимости - одним запросом
+    executor_ids = set().union(*(e.get("executor_ids", ()) for e in collected)) - {None}
+    roles = {}
+    if executor_ids:
+        rows = session.connection().execute(
+            EXECUTOR_ROLES.where(models.User.id.in_(executor_ids))
+        ).all()
+        roles = {row.id: _value(row.role) for row in rows}
+    for evt in collected:
+        if "executor_ids" in evt:
+            # Без исполнителя (None) задачу видят все; удаленный пользователь - никто, кроме admin
+            evt["executor_roles"] = sorted(
+                {None if i is None else roles.get(i, "") for i in evt.pop("executor_ids") or {None}},
+                key=str,
+            )
+    session.info.setdefault(_PENDING_KEY, []).extend(collected)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _collect_bulk_events(context):
+    # query(...).update()/delete(): какие строки затронуты, неизвестно
+    if context.mapper.class_ is models.Task:
+        session_event = {"type": "tasks.changed"}
+    elif context.mapper.class_ is models.Project:
+        session_event = {"type": "projects.changed"}
+    else:
+        return
+    context.session.info.setdefault(_PENDING_KEY, []).append(session_event)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        try:
+            event_hub.publish(pending)
+        except Exception as e:
+            # Запись уже зафиксирована - сбой доставки ее не отменяет
+            print(f"Event publish error: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session):
+    session.info.pop(_PENDING_KEY, None)
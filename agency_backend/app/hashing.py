@@ -0,0 +1,98 @@
+"""Пул потоков для хеширования и проверки паролей.
+
+argon2 (memory_cost=64 МБ, time_cost=3) и bcrypt занимают CPU на сотни
+миллисекунд. Вызванные прямо из async-маршрута, они останавливают event
+loop для всех запросов. Пул ограничивает число одновременных хешей
+(HASH_POOL_WORKERS), длину очереди (HASH_QUEUE_LIMIT) и время ожидания
+результата (HASH_TIMEOUT_SECONDS). C-реализации argon2/bcrypt отпускают GIL,
+поэтому потоков достаточно.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Сколько заданий может ждать свободный поток; сверх этого - отказ (503)
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+HASH_TIMEOUT_SECONDS = float(os.getenv("HASH_TIMEOUT_SECONDS", "10"))
+
+
+class HashPoolBusy(Exception):
+    """Очередь пула заполнена или результат не получен за таймаут"""
+
+
+class HashPool:
+    def __init__(self, workers: int, queue_limit: int, timeout: float):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.counters = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwd-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._max_pending = 0
+        self._busy_seconds = 0.0
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self.counters["rejected"] += 1
+                raise HashPoolBusy("password hashing queue is full")
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+
+    def _run(self, fn, args):
+        with self._lock:
+            self._running += 1
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._busy_seconds += time.perf_counter() - started
+                self.counters["completed"] += 1
+
+    def _release(self, future):
+        # И для выполненных, и для отмененных до старта заданий
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args):
+        """Фоновое задание без ожидания результата (например, rehash)"""
+        self._admit()
+        future = self._executor.submit(self._run, fn, args)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        """Выполнить fn(*args) в пуле, не блокируя event loop"""
+        future = asyncio.wrap_future(self.submit(fn, *args))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # Начатый хеш поток досчитает сам, запрос освобождаем сразу
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise HashPoolBusy("password hashing timed out")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "timeout_seconds": self.timeout,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "max_pending": self._max_pending,
+                "busy_seconds": round(self._busy_seconds, 3),
+                **{name: self.counters[name] for name in ("completed", "rejected", "timeouts")},
+            }
+
+
+hash_pool = HashPool(HASH_POOL_WORKERS, HASH_QUEUE_LIMIT, HASH_TIMEOUT_SECONDS)
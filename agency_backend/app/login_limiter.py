@@ -0,0 +1,244 @@
+"""Ограничение попыток входа до проверки пароля.
+
+Каждая попытка /token стоит сотни миллисекунд CPU на argon2 (включая
+фиктивную проверку для несуществующих пользователей), поэтому перебор
+отсекается раньше: скользящее окно LOGIN_WINDOW_SECONDS по двум ключам -
+имени пользователя и IP клиента. Попытка записывается при входе в /token,
+успешный вход очищает окно пользователя и вычеркивает себя из окна IP -
+в окне IP копятся только неудачные попытки, и офис за одним NAT не
+блокирует сам себя обычными входами. Превысивший лимит ключ
+блокируется на LOGIN_LOCKOUT_SECONDS, ответ - 429 без хеширования.
+
+IP клиента - адрес TCP-соединения. Заголовок прокси (LOGIN_CLIENT_IP_HEADER,
+например X-Real-IP от nginx) учитывается, только если он задан явно: без
+прокси перед приложением клиент подставил бы в заголовок новый адрес на
+каждую попытку, и окно IP ничего бы не ограничивало.
+
+По умолчанию состояние хранится в памяти процесса. Для нескольких воркеров
+можно задать LOGIN_LIMITER_DB - путь к SQLite-файлу, общему для воркеров.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Optional
+
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "900"))
+LOGIN_MAX_ATTEMPTS_PER_USER = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_USER", "5"))
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "20"))
+LOGIN_LOCKOUT_SECONDS = float(os.getenv("LOGIN_LOCKOUT_SECONDS", "900"))
+# Общее хранилище для нескольких воркеров (пусто - в памяти процесса)
+LOGIN_LIMITER_DB = os.getenv("LOGIN_LIMITER_DB", "")
+# Заголовок с адресом клиента от прокси (пусто - адрес TCP-соединения).
+# Задавать, только если приложение доступно исключительно через этот прокси
+LOGIN_CLIENT_IP_HEADER = os.getenv("LOGIN_CLIENT_IP_HEADER", "")
+
+
+class MemoryAttemptStore:
+    """Попытки и блокировки в памяти процесса"""
+
+    # Раз в сколько вызовов удалять ключи с истекшими окнами
+    SWEEP_EVERY = 1024
+
+    def __init__(self):
+        self._attempts = defaultdict(deque)
+        self._locked_until = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _sweep(self, now: float, window: float):
+        for key in [k for k, a in self._attempts.items() if not a or a[-1] <= now - window]:
+            del self._attempts[key]
+        for key in [k for k, until in self._locked_until.items() if until <= now]:
+            del self._locked_until[key]
+
+    def hit(self, keys, limits, now: float, window: float, lockout: float) -> Optional[float]:
+        """Записать попытку по всем ключам; если какой-то ключ уже исчерпал
+        лимит - ничего не записывать и вернуть, сколько секунд ждать"""
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now, window)
+            retry_after = 0.0
+            for key, limit in zip(keys, limits):
+                locked_until = self._locked_until.get(key, 0.0)
+                if locked_until > now:
+                    retry_after = max(retry_after, locked_until - now)
+                    continue
+                attempts = self._attempts[key]
+                while attempts and attempts[0] <= now - window:
+                    attempts.popleft()
+                if len(attempts) >= limit:
+                    self._locked_until[key] = now + lockout
+                    retry_after = max(retry_after, lockout)
+            if retry_after:
+                return retry_after
+            for key in keys:
+                self._attempts[key].append(now)
+            return None
+
+    def reset(self, key: str):
+        with self._lock:
+            self._attempts.pop(key, None)
+            self._locked_until.pop(key, None)
+
+    def discard_latest(self, key: str):
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts:
+                attempts.pop()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._attempts)
+
+
+class SQLiteAttemptStore:
+    """То же в SQLite-файле: одно состояние на все воркеры хоста"""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, ts REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_login_attempts_key_ts ON login_attempts (key, ts)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_lockouts (key TEXT PRIMARY KEY, locked_until REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def hit(self, keys, limits, now: float, window: float, lockout: float) -> Optional[float]:
+        conn = self._connect()
+        try:
+            # IMMEDIATE: проверка и запись атомарны между воркерами
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM login_attempts WHERE ts <= ?", (now - window,))
+            conn.execute("DELETE FROM login_lockouts WHERE locked_until <= ?", (now,))
+            retry_after = 0.0
+            for key, limit in zip(keys, limits):
+                row = conn.execute(
+                    "SELECT locked_until FROM login_lockouts WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    retry_after = max(retry_after, row[0] - now)
+                    continue
+                (count,) = conn.execute(
+                    "SELECT COUNT(*) FROM login_attempts WHERE key = ?", (key,)
+                ).fetchone()
+                if count >= limit:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO login_lockouts (key, locked_until) VALUES (?, ?)",
+                        (key, now + lockout),
+                    )
+                    retry_after = max(retry_after, lockout)
+            if not retry_after:
+                conn.executemany(
+                    "INSERT INTO login_attempts (key, ts) VALUES (?, ?)", [(key, now) for key in keys]
+                )
+            conn.execute("COMMIT")
+            return retry_after or None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def reset(self, key: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+            conn.execute("DELETE FROM login_lockouts WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def discard_latest(self, key: str):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM login_attempts WHERE rowid = "
+                "(SELECT rowid FROM login_attempts WHERE key = ? ORDER BY ts DESC LIMIT 1)",
+                (key,),
+            )
+        finally:
+            conn.close()
+
+    def size(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(DISTINCT key) FROM login_attempts").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class LoginRateLimiter:
+    def __init__(self, store, window: float, max_per_user: int, max_per_ip: int, lockout: float):
+        self.store = store
+        self.window = window
+        self.max_per_user = max_per_user
+        self.max_per_ip = max_per_ip
+        self.lockout = lockout
+        self.counters = Counter()
+
+    @staticmethod
+    def _user_key(username: str) -> str:
+        return "user:" + (username or "").strip().lower()
+
+    @staticmethod
+    def _ip_key(client_ip: str) -> str:
+        return "ip:" + (client_ip or "unknown")
+
+    def hit(self, username: str, client_ip: str) -> Optional[float]:
+        """Учесть попытку входа; вернуть Retry-After в секундах, если ее надо отклонить"""
+        keys = [self._user_key(username), self._ip_key(client_ip)]
+        retry_after = self.store.hit(
+            keys, [self.max_per_user, self.max_per_ip], time.time(), self.window, self.lockout
+        )
+        self.counters["rejected" if retry_after else "allowed"] += 1
+        return retry_after
+
+    def login_succeeded(self, username: str, client_ip: str):
+        """Успешный вход: окно пользователя начинается заново, а сама попытка
+        не считается в окне IP"""
+        self.store.reset(self._user_key(username))
+        self.store.discard_latest(self._ip_key(client_ip))
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self.store).__name__,
+            "window_seconds": self.window,
+            "max_attempts_per_user": self.max_per_user,
+            "max_attempts_per_ip": self.max_per_ip,
+            "lockout_seconds": self.lockout,
+            "tracked_keys": self.store.size(),
+            "allowed": self.counters["allowed"],
+            "rejected": self.counters["rejected"],
+        }
+
+
+def client_ip(request) -> str:
+    if LOGIN_CLIENT_IP_HEADER:
+        forwarded = request.headers.get(LOGIN_CLIENT_IP_HEADER)
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+login_limiter = LoginRateLimiter(
+    SQLiteAttemptStore(LOGIN_LIMITER_DB) if LOGIN_LIMITER_DB else MemoryAttemptStore(),
+    LOGIN_WINDOW_SECONDS,
+    LOGIN_MAX_ATTEMPTS_PER_USER,
+    LOGIN_MAX_ATTEMPTS_PER_IP,
+    LOGIN_LOCKOUT_SECONDS,
+)
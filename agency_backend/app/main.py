@@ -1,13 +1,14 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, status, Body, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, status, Body, Request, Response, WebSocket, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, HTMLResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session, joinedload, sessionmaker
 from sqlalchemy import inspect, text, create_engine
 from dotenv import load_dotenv
 from datetime import datetime, date, timedelta, time as datetime_time
-from typing import List, Optional
+from typing import List, Literal, Optional
 import os
 import json
 import shutil
@@ -18,9 +19,9 @@ import time
 import logging
 from fastapi.staticfiles import StaticFiles
 
-from . import models, schemas, crud, auth, telegram_notifier
+from . import models, schemas, crud, auth, telegram_notifier, database, sql_metrics, migrations, read_models, user_cache, hashing, login_limiter, change_versions, events, task_bulk, task_archive, task_search, recurring_scheduler, deadline_monitor, task_journal
 from .models import get_local_time_utc5
-from .database import engine, Base, SessionLocal
+from .database import engine, Base, SessionLocal, RoutingSessionLocal
 from .auth import get_db
 
 load_dotenv()
@@ -32,56 +33,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create tables including new expense models
-try:
-    Base.metadata.create_all(bind=engine)
-    print("[OK] Database tables created successfully")
-except Exception as e:
-    print(f"[WARN] Error creating database tables: {e}")
-
-# Ensure expense tables exist
-def ensure_expense_tables():
-    with engine.connect() as conn:
-        inspector = inspect(conn)
-        
-        # Check if new expense tables exist
-        tables = inspector.get_table_names()
-        
-        if "expense_categories" not in tables:
-            print("[DB] Creating expense_categories table...")
-            models.ExpenseCategory.__table__.create(bind=engine, checkfirst=True)
-
-        if "common_expenses" not in tables:
-            print("[DB] Creating common_expenses table...")
-            models.CommonExpense.__table__.create(bind=engine, checkfirst=True)
-
-        # Add new columns to existing project_expenses if they don't exist
-        if "project_expenses" in tables:
-            cols = [c["name"] for c in inspector.get_columns("project_expenses")]
-
-            if "category_id" not in cols:
-                print("[DB] Adding category_id to project_expenses...")
-                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN category_id INTEGER"))
-            if "description" not in cols:
-                print("[DB] Adding description to project_expenses...")
-                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN description TEXT"))
-            if "date" not in cols:
-                print("[DB] Adding date to project_expenses...")
-                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN date DATE DEFAULT CURRENT_DATE"))
-            if "created_by" not in cols:
-                print("[DB] Adding created_by to project_expenses...")
-                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN created_by INTEGER"))
-            if "amount" in cols:
-                # Check if amount is still INTEGER, convert to FLOAT
-                try:
-                    conn.execute(text("SELECT amount FROM project_expenses LIMIT 1"))
-                    # If this works, the column exists, might need to handle type change
-                except:
-                    pass
-        
-        conn.commit()
-
-ensure_expense_tables()
+# Схема и начальные данные создаются отдельным шагом до запуска воркеров:
+#   python -m app.migrations
+# Здесь - только одна проверка по database_version, без инспекции схемы.
+pending_migrations = migrations.get_pending_migrations()
+if pending_migrations:
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP", "false").lower() in ("1", "true", "yes"):
+        migrations.run_migrations()
+    else:
+        logger.warning(
+            f"[DB] Pending migrations: {', '.join(pending_migrations)}. "
+            f"Run 'python -m app.migrations' before starting workers"
+        )
 
 
 # Список основных 15 проектов, которые должны импортироваться
@@ -241,308 +204,25 @@ def normalize_project_name(project_name: str) -> str:
     return ""
 
 
-def ensure_digital_task_priority_column():
-    with engine.connect() as conn:
-        inspector = inspect(conn)
-        cols = [c["name"] for c in inspector.get_columns("digital_project_tasks")]
-        if "high_priority" not in cols:
-            conn.execute(text(
-                "ALTER TABLE digital_project_tasks "
-                "ADD COLUMN high_priority BOOLEAN DEFAULT 0"
-            ))
-        if "status" not in cols:
-            conn.execute(text(
-                "ALTER TABLE digital_project_tasks "
-                "ADD COLUMN status VARCHAR(50) DEFAULT 'in_progress'"
-            ))
-        conn.commit()
-
-
-def ensure_task_columns():
-    """Ensure tasks table has all required columns"""
-    with engine.connect() as conn:
-        inspector = inspect(conn)
-        cols = [c["name"] for c in inspector.get_columns("tasks")]
-        
-        # List of columns to add if missing
-        columns_to_add = [
-            ("accepted_at", "DATETIME"),
-            ("finished_at", "DATETIME"),
-            ("is_recurring", "BOOLEAN DEFAULT 0"),
-            ("recurrence_type", "VARCHAR"),
-            ("recurrence_time", "VARCHAR"),
-            ("recurrence_days", "VARCHAR"),
-            ("next_run_at", "DATETIME"),
-            ("original_task_id", "INTEGER"),
-            ("overdue_count", "INTEGER DEFAULT 0")
-        ]
-        
-        for col_name, col_type in columns_to_add:
-            if col_name not in cols:
-                conn.execute(text(f"ALTER TABLE tasks ADD COLUMN {col_name} {col_type}"))
-                print(f"[OK] Added {col_name} column to tasks table")
-        
-        conn.commit()
-
-
-
-
-ensure_digital_task_priority_column()
-ensure_task_columns()
 
 # ========== RECURRING TASKS SCHEDULER ==========
-def recurring_tasks_scheduler():
-    """Планировщик для генерации повторяющихся задач"""
-    import time
-    from datetime import datetime, timedelta
-    
-    while True:
-        try:
-            current_time = get_local_time_utc5()
-            # Убираем timezone info для корректного сравнения с naive datetime в БД
-            current_time_naive = current_time.replace(tzinfo=None)
-            logger.info(f"[CRON] Recurring tasks check: {current_time_naive.strftime('%Y-%m-%d %H:%M:%S')}")
-
-            # Создаем новую сессию базы данных для планировщика
-            db = SessionLocal()
-            try:
-                # Проверяем все повторяющиеся задачи для отладки
-                all_recurring = db.query(models.Task).filter(models.Task.is_recurring == True).all()
-                logger.info(f"🔍 Found {len(all_recurring)} recurring tasks:")
-                for task in all_recurring:
-                    logger.info(f"   Task: {task.title}, Status: {task.status}, Next run: {task.next_run_at}, Current: {current_time_naive}")
-                    logger.info(f"   Comparison: {task.next_run_at} <= {current_time_naive} = {task.next_run_at <= current_time_naive if task.next_run_at else 'None'}")
-
-                # Находим задачи, которые нужно повторить
-                # ВАЖНО: Пропускаем шаблоны со статусом 'done' или 'cancelled' (приостановленные)
-                # Автосоздание работает только для шаблонов в статусах 'new' или 'in_progress'
-                due_tasks = db.query(models.Task).filter(
-                    models.Task.is_recurring == True,
-                    models.Task.next_run_at <= current_time_naive,
-                    models.Task.status.in_(['new', 'in_progress'])  # Только активные шаблоны
-                ).all()
-                logger.info(f"🔍 Query filter: is_recurring=True, next_run_at <= '{current_time}', status IN ('new', 'in_progress')")
-
-                for template_task in due_tasks:
-                    logger.info(f"🔄 Creating new instance of recurring task: {template_task.title}")
-                    logger.info(f"   Template task status: {template_task.status}")
-
-                    # Вычисляем новый дедлайн: берем время из шаблона и применяем к текущей дате
-                    new_deadline = None
-                    if template_task.deadline:
-                        deadline_time = template_task.deadline.time()
-                        current_date = models.get_local_time_utc5().date()
-                        new_deadline = datetime.combine(current_date, deadline_time)
-                        logger.info(f"   Updated deadline: {template_task.deadline} -> {new_deadline}")
-
-                    # Создаем НОВУЮ задачу на основе шаблона
-                    # ВАЖНО: Явно устанавливаем status='new' (строка), а не копируем из шаблона
-                    new_task = models.Task(
-                        title=template_task.title,
-                        description=template_task.description,
-                        project=template_task.project,
-                        task_type=template_task.task_type,
-                        task_format=template_task.task_format,
-                        deadline=new_deadline,
-                        executor_id=template_task.executor_id,
-                        author_id=template_task.author_id,
-                        status='new',  # Явно устанавливаем строку 'new', а не enum
-                        created_at=models.get_local_time_utc5(),
-                        accepted_at=None,
-                        finished_at=None,
-                        is_recurring=False,  # Новая задача не является повторяющейся
-                        recurrence_type=None,
-                        recurrence_time=None,
-                        recurrence_days=None,
-                        next_run_at=None,
-                        overdue_count=0,
-                        resume_count=0
-                    )
-                    logger.info(f"   New task status set to: {new_task.status}")
-
-                    db.add(new_task)
-                    logger.info(f"   After db.add, status: {new_task.status}")
-                    db.flush()  # Получаем ID новой задачи
-                    logger.info(f"   After db.flush, status: {new_task.status}")
-                    logger.info(f"[OK] Created new task instance from template: {template_task.title}")
-
-                    # Отправляем уведомление исполнителю о новой задаче
-                    if new_task.executor_id:
-                        executor = db.query(models.User).filter(models.User.id == new_task.executor_id).first()
-                        if executor and executor.telegram_id:
-                            task_data = {
-                                'title': new_task.title,
-                                'description': new_task.description,
-                                'project_name': new_task.project or 'Не указан',
-                                'task_type': new_task.task_type or 'Не указан',
-                                'format': new_task.task_format,
-                                'deadline_text': new_task.deadline.strftime('%d.%m.%Y %H:%M') if new_task.deadline else 'Не установлен'
-                            }
-                            telegram_notifier.send_task_notification(executor.telegram_id, new_task.id, task_data)
-                            logger.info(f"📨 Sent notification to executor {executor.name} (telegram_id: {executor.telegram_id})")
-
-                    # Обновляем next_run_at в шаблоне для следующего повтора
-                    template_task.next_run_at = crud.calculate_next_run_at(
-                        template_task.recurrence_type.value,
-                        db,
-                        template_task.recurrence_time,
-                        template_task.recurrence_days
-                    )
-
-                    logger.info(f"[OK] Template updated, next run: {template_task.next_run_at}")
-
-                if due_tasks:
-                    db.commit()
-                    logger.info(f"[INFO] Created {len(due_tasks)} new task instances from recurring templates")
-                else:
-                    logger.info("📭 No recurring tasks due")
-
-            except Exception as e:
-                logger.error(f"❌ Error in recurring tasks scheduler: {e}")
-                db.rollback()
-            finally:
-                db.close()
-
-        except Exception as e:
-            logger.error(f"❌ Critical error in scheduler: {e}")
-
-        # Проверяем каждые 5 минут
-        time.sleep(30)  # Ждем 30 секунд до следующей проверки (для тестирования)
-
-# Запуск планировщика повторяющихся задач в фоновом потоке
-scheduler_thread = threading.Thread(target=recurring_tasks_scheduler, daemon=True)
+# Поток есть в каждом воркере, экземпляры создает только держатель аренды
+# (app.recurring_scheduler)
+scheduler_thread = threading.Thread(target=recurring_scheduler.recurring_scheduler.run_forever, daemon=True)
 scheduler_thread.start()
 logger.info("[START] Recurring tasks scheduler started")
 
+# Перенос старых закрытых задач в tasks_archive (app.task_archive)
+if task_archive.task_archiver.enabled:
+    archive_thread = threading.Thread(target=task_archive.archive_loop, daemon=True)
+    archive_thread.start()
+    logger.info("[START] Task archive job started")
 
-def create_default_admin():
-    db = SessionLocal()
-    try:
-        if not crud.get_user_by_login(db, "admin"):
-            admin = schemas.UserCreate(
-                telegram_username="admin",
-                name="Administrator", 
-                password=os.getenv("ADMIN_PASSWORD", "admin123"),
-                role=models.RoleEnum.admin,
-            )
-            crud.create_user(db, admin)
-    finally:
-        db.close()
-
-def create_default_taxes():
-    db = SessionLocal()
-    try:
-        if not crud.get_taxes(db):
-            crud.create_tax(db, "ЯТТ", 0.95)
-            crud.create_tax(db, "ООО", 0.83)
-            crud.create_tax(db, "Нал", 1.0)
-    finally:
-        db.close()
-
-
-def create_default_timezone():
-    db = SessionLocal()
-    try:
-        if not db.query(models.Setting).filter(models.Setting.key == "timezone").first():
-            db.add(models.Setting(key="timezone", value="Asia/Tashkent"))
-            db.commit()
-    finally:
-        db.close()
-
-
-def create_default_expense_categories():
-    db = SessionLocal()
-    try:
-        if not db.query(models.ExpenseCategory).first():
-            default_categories = [
-                {"name": "Аренда", "description": "Аренда офиса, помещений"},
-                {"name": "Реклама", "description": "Расходы на рекламу и маркетинг"},
-                {"name": "Зарплата", "description": "Заработная плата сотрудников"},
-                {"name": "Коммунальные", "description": "Электричество, интернет, связь"},
-                {"name": "Канцтовары", "description": "Офисные принадлежности"},
-                {"name": "Транспорт", "description": "Транспортные расходы"},
-                {"name": "Питание", "description": "Питание сотрудников"},
-                {"name": "Оборудование", "description": "Покупка и обслуживание техники"},
-            ]
-            for cat_data in default_categories:
-                category = models.ExpenseCategory(**cat_data)
-                db.add(category)
-            db.commit()
-    finally:
-        db.close()
-
-
-def create_sample_expenses():
-    """Create sample expenses for testing"""
-    db = SessionLocal()
-    try:
-        # Only create if no expenses exist
-        if (db.query(models.CommonExpense).count() == 0 and 
-            db.query(models.ProjectExpense).count() == 0):
-            
-            # Get admin user and categories
-            admin = db.query(models.User).filter(models.User.telegram_username == "admin").first()
-            if not admin:
-                return
-                
-            categories = db.query(models.ExpenseCategory).all()
-            if not categories:
-                return
-            
-            # Get first project if exists
-            project = db.query(models.Project).first()
-            
-            from datetime import date, timedelta
-            import random
-            
-            # Create sample common expenses
-            common_sample_data = [
-                {"name": "Аренда офиса за декабрь", "amount": 2000000, "category_id": categories[0].id, "description": "Ежемесячная аренда офиса"},
-                {"name": "Интернет и связь", "amount": 500000, "category_id": categories[3].id, "description": "Оплата интернета и мобильной связи"},
-                {"name": "Канцелярские товары", "amount": 150000, "category_id": categories[4].id, "description": "Покупка бумаги, ручек, скрепок"},
-                {"name": "Обед для команды", "amount": 300000, "category_id": categories[6].id, "description": "Корпоративный обед"},
-                {"name": "Реклама в Google", "amount": 750000, "category_id": categories[1].id, "description": "Контекстная реклама"},
-            ]
-            
-            for i, expense_data in enumerate(common_sample_data):
-                expense = models.CommonExpense(
-                    **expense_data,
-                    date=date.today() - timedelta(days=random.randint(1, 30)),
-                    created_by=admin.id
-                )
-                db.add(expense)
-            
-            # Create sample project expenses if project exists
-            if project:
-                project_sample_data = [
-                    {"name": "Дизайн логотипа", "amount": 500000, "category_id": categories[1].id, "description": "Создание фирменного стиля"},
-                    {"name": "Видеосъемка", "amount": 1200000, "category_id": categories[1].id, "description": "Съемка рекламного ролика"},
-                    {"name": "Транспорт на съемку", "amount": 80000, "category_id": categories[5].id, "description": "Аренда автомобиля"},
-                ]
-                
-                for expense_data in project_sample_data:
-                    expense = models.ProjectExpense(
-                        **expense_data,
-                        project_id=project.id,
-                        date=date.today() - timedelta(days=random.randint(1, 15)),
-                        created_by=admin.id
-                    )
-                    db.add(expense)
-            
-            db.commit()
-            print("[OK] Sample expenses created")
-    except Exception as e:
-        print(f"Warning: Could not create sample expenses: {e}")
-        db.rollback()
-    finally:
-        db.close()
-
+# Статус overdue и напоминания перед дедлайном (app.deadline_monitor)
+deadline_thread = threading.Thread(target=deadline_monitor.deadline_monitor.run_forever, daemon=True)
+deadline_thread.start()
+logger.info("[START] Deadline monitor started")
 
-create_default_admin()
-create_default_taxes()
-create_default_timezone()
-create_default_expense_categories()
-create_sample_expenses()
 
 # Ensure the static directory exists before mounting it
 os.makedirs("static", exist_ok=True)
@@ -604,16 +284,70 @@ class CORSErrorMiddleware(BaseHTTPMiddleware):
 app.add_middleware(CORSErrorMiddleware)
 
 
+class SQLMetricsMiddleware(BaseHTTPMiddleware):
+    """Число и время SQL-запросов на HTTP-запрос: Server-Timing, лог, N+1, бюджет"""
+
+    async def dispatch(self, request: Request, call_next):
+        stats = sql_metrics.RequestQueryStats()
+        token = sql_metrics.current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            sql_metrics.current_stats.reset(token)
+
+        repeated = stats.repeated_shapes()
+        log_line = json.dumps({
+            "event": "sql_stats",
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(stats.total_time * 1000, 1),
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            "n_plus_one": [{"count": n, "statement": shape[:200]} for shape, n in repeated],
+        }, ensure_ascii=False)
+        if repeated or stats.over_budget():
+            logger.warning(log_line)
+        else:
+            logger.info(log_line)
+
+        if stats.over_budget() and sql_metrics.QUERY_BUDGET_MODE == "raise":
+            return Response(
+                content=json.dumps({
+                    "detail": f"Query budget exceeded: {stats.count} > {stats.budget}"
+                }),
+                status_code=500,
+                media_type="application/json",
+            )
+        response.headers["Server-Timing"] = stats.server_timing()
+        return response
+
+
+app.add_middleware(SQLMetricsMiddleware)
+
+
 @app.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(auth.get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(auth.get_async_db)):
+    limiter = login_limiter.login_limiter
+    # До любой проверки пароля: перебор не должен занимать CPU на argon2
+    client_ip = login_limiter.client_ip(request)
+    retry_after = await run_in_threadpool(limiter.hit, form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
     try:
-        user = auth.authenticate_user(db, form_data.username, form_data.password)
+        user = await auth.authenticate_user_async(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        await run_in_threadpool(limiter.login_succeeded, form_data.username, client_ip)
         access_token = auth.create_access_token(
             data={"sub": user.telegram_username, "role": user.role.value}
         )
@@ -627,6 +361,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     except HTTPException:
         # Re-raise HTTPExceptions (like 401) as-is
         raise
+    except hashing.HashPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         print(f"Login error: {e}")
         raise HTTPException(
@@ -645,8 +385,17 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(auth.get_db), cu
     return crud.create_user(db, user)
 
 
-@app.get("/users/")
-def list_users(db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
+# Бюджет SQL-запросов горячих списков: версия/ETag, выборка и пользователь
+# токена при промахе кэша. В режиме SQL_QUERY_BUDGET_MODE=raise превышение - 500
+HOT_LIST_QUERY_BUDGET = 3
+
+
+@app.get("/users/", dependencies=[Depends(sql_metrics.query_budget(HOT_LIST_QUERY_BUDGET))])
+def list_users(
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_active_user),
+    _etag: None = Depends(change_versions.etag_for_tables("users")),
+):
     return crud.get_users(db)
 
 
@@ -656,7 +405,7 @@ def read_current_user(current: models.User = Depends(auth.get_current_active_use
 
 
 @app.get("/users/by-telegram/{telegram_id}")
-def get_user_by_telegram(telegram_id: int, username: str = None, db: Session = Depends(auth.get_db)):
+def get_user_by_telegram(telegram_id: int, username: str = None, db: Session = Depends(auth.get_write_db)):
     """Получить пользователя по Telegram ID или username (для бота)"""
     # Сначала ищем по telegram_id
     user = db.query(models.User).filter(models.User.telegram_id == telegram_id).first()
@@ -874,25 +623,145 @@ def auto_authorize_telegram_user(
         )
 
 
-@app.get("/tasks/")
-def read_tasks(skip: int = 0, limit: int = 10000, db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
-    return crud.get_tasks_for_user(db, current, skip=skip, limit=limit)
+# Размер страницы списков задач: по умолчанию и максимум
+TASK_PAGE_SIZE = 200
+TASK_PAGE_MAX = 1000
+
 
+def _task_page_or_400(db: Session, role, limit: int, cursor: Optional[str]):
+    try:
+        return read_models.task_page(db, role, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
+def _versioned_task_page(db: Session, role, limit: int, cursor: Optional[str]):
+    # Версия читается до страницы: изменения, попавшие между чтениями,
+    # клиент получит еще раз из /tasks/changes?since=version
+    version = db.execute(read_models.TASKS_COUNTER_VERSION).scalar() or 0
+    rows, next_cursor = _task_page_or_400(db, role, limit, cursor)
+    return version, rows, next_cursor
 
 
+@app.get(
+    "/tasks/",
+    response_model=schemas.VersionedTaskPage,
+    dependencies=[Depends(sql_metrics.query_budget(HOT_LIST_QUERY_BUDGET))],
+)
+async def read_tasks(
+    limit: int = Query(TASK_PAGE_SIZE, ge=1, le=TASK_PAGE_MAX),
+    cursor: Optional[str] = None,
+    db=Depends(auth.get_async_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Страница задач; version - с какой версии догонять список через /tasks/changes"""
+    version, rows, next_cursor = await db.run_sync(_versioned_task_page, current.role, limit, cursor)
+    return {"items": rows, "next_cursor": next_cursor, "version": version}
 
-@app.get("/tasks/all", response_model=list[schemas.Task])
-def read_all_tasks(skip: int = 0, limit: int = 10000, db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
+
+@app.get(
+    "/tasks/all",
+    response_model=schemas.TaskPage,
+    dependencies=[Depends(sql_metrics.query_budget(HOT_LIST_QUERY_BUDGET))],
+)
+def read_all_tasks(
+    limit: int = Query(TASK_PAGE_SIZE, ge=1, le=TASK_PAGE_MAX),
+    cursor: Optional[str] = None,
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_active_user),
+):
     # Only admins and smm_managers can access all tasks for reports
     if current.role not in [models.RoleEnum.admin, models.RoleEnum.smm_manager]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return crud.get_tasks(db, skip=skip, limit=limit)
+    rows, next_cursor = _task_page_or_400(db, None, limit, cursor)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+@app.get("/tasks/changes")
+async def read_task_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=TASK_PAGE_MAX),
+    db=Depends(auth.get_async_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Дельта задач для локальной копии клиента: изменения и удаления после since"""
+    return await db.run_sync(read_models.task_changes, current.role, since, limit)
+
+
+# Размер страницы поиска задач: по умолчанию и максимум
+TASK_SEARCH_PAGE_SIZE = 50
+TASK_SEARCH_PAGE_MAX = 200
+
+
+@app.get("/tasks/search")
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(TASK_SEARCH_PAGE_SIZE, ge=1, le=TASK_SEARCH_PAGE_MAX),
+    offset: int = Query(0, ge=0, le=10000),
+    db=Depends(auth.get_async_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Полнотекстовый поиск задач по релевантности с фильтром по роли (см. app.task_search)"""
+    rows, next_offset = await db.run_sync(task_search.search_tasks, q, current.role, limit, offset)
+    return {"items": [row._asdict() for row in rows], "next_offset": next_offset}
+
+
+# Окно виртуальных запусков повторяющихся задач: максимум дней и экземпляров
+RECURRING_WINDOW_MAX_DAYS = 366
+RECURRING_OCCURRENCES_MAX = 5000
+
+
+@app.get("/tasks/recurring/occurrences")
+async def read_recurring_occurrences(
+    start: date,
+    end: date,
+    executor_id: Optional[int] = None,
+    db=Depends(auth.get_async_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Будущие запуски повторяющихся задач в днях [start, end] без создания задач
+    (календарь, планирование загрузки исполнителей; см. app.recurrence)"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be earlier than start")
+    if (end - start).days >= RECURRING_WINDOW_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window is limited to {RECURRING_WINDOW_MAX_DAYS} days")
+    window_start = datetime.combine(start, datetime_time.min)
+    window_end = datetime.combine(end + timedelta(days=1), datetime_time.min)
+    items, truncated = await db.run_sync(
+        read_models.recurring_occurrences,
+        current.role, window_start, window_end, executor_id, RECURRING_OCCURRENCES_MAX,
+    )
+    return {"items": items, "truncated": truncated}
+
+
+@app.websocket("/ws/events")
+async def events_socket(websocket: WebSocket):
+    """События задач и проектов с фильтром по роли (см. app.events).
+
+    Браузер не задает заголовки WebSocket, поэтому JWT передается подпротоколом:
+    new WebSocket(url, ["bearer", token]) - не в URL, который попадает в логи.
+    """
+    protocols = [p.strip() for p in websocket.headers.get("sec-websocket-protocol", "").split(",")]
+    token = protocols[1] if len(protocols) == 2 and protocols[0] == "bearer" else ""
+    role = await run_in_threadpool(events.authenticate, token)
+    if role is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept(subprotocol="bearer")
+    subscription = events.event_hub.subscribe(role)
+    try:
+        await events.stream(websocket, subscription)
+    finally:
+        events.event_hub.unsubscribe(subscription)
 
 
 @app.post("/tasks/", response_model=schemas.Task)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
+def create_task(
+    task: schemas.TaskCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_active_user),
+):
     # Создаем задачу
     created_task = crud.create_task(db, task, author_id=current.id)
 
@@ -913,8 +782,9 @@ def create_task(task: schemas.TaskCreate, db: Session = Depends(auth.get_db), cu
             if created_task.deadline:
                 deadline_text = created_task.deadline.strftime("%d.%m.%Y %H:%M")
 
-            # Отправляем уведомление
-            telegram_notifier.send_task_notification(
+            # Отправляем уведомление после ответа - запрос к Telegram не держит сессию
+            background_tasks.add_task(
+                telegram_notifier.send_task_notification,
                 executor_telegram_id=executor.telegram_id,
                 task_id=created_task.id,
                 task_data={
@@ -930,6 +800,27 @@ def create_task(task: schemas.TaskCreate, db: Session = Depends(auth.get_db), cu
     return created_task
 
 
+@app.post("/tasks/bulk", response_model=schemas.TaskBulkResult)
+def bulk_tasks(
+    request: schemas.TaskBulkRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_admin_user),
+):
+    """Пакет операций над задачами в одной транзакции (см. app.task_bulk)"""
+    if len(request.operations) > task_bulk.TASK_BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many operations (max {task_bulk.TASK_BULK_MAX_OPERATIONS})",
+        )
+    results, notifications = task_bulk.apply_operations(db, request.operations, author_id=current.id)
+    if notifications:
+        # Одним пакетом после ответа, а не по запросу к Telegram на задачу
+        background_tasks.add_task(telegram_notifier.send_task_notifications, notifications)
+    applied = sum(1 for r in results if r["ok"])
+    return {"applied": applied, "failed": len(results) - applied, "results": results}
+
+
 @app.put("/tasks/{task_id}", response_model=schemas.Task)
 def update_task(task_id: int, task: schemas.TaskCreate, db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
     updated = crud.update_task(db, task_id, task)
@@ -1076,67 +967,69 @@ def update_task_priority(
 
 
 # Task types and formats endpoints
+# Типы задач по ролям: статичны, ETag - по содержимому
+TASK_TYPES = {
+    'designer': [
+        {'name': 'Motion', 'icon': '🎞️'},
+        {'name': 'Статика', 'icon': '🖼️'},
+        {'name': 'Видео', 'icon': '🎬'},
+        {'name': 'Карусель', 'icon': '🖼️'},
+        {'name': 'Другое', 'icon': '📌'}
+    ],
+    'smm_manager': [
+        {'name': 'Публикация', 'icon': '[INFO]'},
+        {'name': 'Контент план', 'icon': '[INFO]'},
+        {'name': 'Отчет', 'icon': '📊'},
+        {'name': 'Съемка', 'icon': '📹'},
+        {'name': 'Встреча', 'icon': '🤝'},
+        {'name': 'Стратегия', 'icon': '📈'},
+        {'name': 'Презентация', 'icon': '🎤'},
+        {'name': 'Админ задачи', 'icon': '🗂️'},
+        {'name': 'Анализ', 'icon': '🔎'},
+        {'name': 'Брифинг', 'icon': '[DB]'},
+        {'name': 'Сценарий', 'icon': '📜'},
+        {'name': 'Другое', 'icon': '📌'}
+    ],
+    'digital': [
+        {'name': 'Настройка рекламы', 'icon': '🎯'},
+        {'name': 'Анализ эффективности', 'icon': '📈'},
+        {'name': 'A/B тестирование', 'icon': '🧪'},
+        {'name': 'Настройка аналитики', 'icon': '📊'},
+        {'name': 'Оптимизация конверсий', 'icon': '[DB]'},
+        {'name': 'Email-маркетинг', 'icon': '📧'},
+        {'name': 'Контекстная реклама', 'icon': '🔍'},
+        {'name': 'Таргетированная реклама', 'icon': '🎯'},
+        {'name': 'SEO оптимизация', 'icon': '🔍'},
+        {'name': 'Веб-аналитика', 'icon': '📊'},
+        {'name': 'Другое', 'icon': '📌'}
+    ],
+    'admin': [
+        {'name': 'Публикация', 'icon': '[INFO]'},
+        {'name': 'Съемки', 'icon': '🎥'},
+        {'name': 'Стратегия', 'icon': '📈'},
+        {'name': 'Отчет', 'icon': '📊'},
+        {'name': 'Бухгалтерия', 'icon': '[DB]'},
+        {'name': 'Встреча', 'icon': '🤝'},
+        {'name': 'Документы', 'icon': '📄'},
+        {'name': 'Работа с кадрами', 'icon': '👥'},
+        {'name': 'Планерка', 'icon': '🗓️'},
+        {'name': 'Администраторские задачи', 'icon': '🛠️'},
+        {'name': 'Собеседование', 'icon': '🧑‍💼'},
+        {'name': 'Договор', 'icon': '✍️'},
+        {'name': 'Другое', 'icon': '📌'}
+    ]
+}
+
+
 @app.get("/tasks/types")
-def get_task_types(
+async def get_task_types(
     role: str = None,
-    db: Session = Depends(auth.get_db)
+    _etag: None = Depends(change_versions.etag_for_static(TASK_TYPES)),
 ):
     """Получить типы задач по роли (публичный эндпоинт для бота)"""
-    task_types = {
-        'designer': [
-            {'name': 'Motion', 'icon': '🎞️'},
-            {'name': 'Статика', 'icon': '🖼️'},
-            {'name': 'Видео', 'icon': '🎬'},
-            {'name': 'Карусель', 'icon': '🖼️'},
-            {'name': 'Другое', 'icon': '📌'}
-        ],
-        'smm_manager': [
-            {'name': 'Публикация', 'icon': '[INFO]'},
-            {'name': 'Контент план', 'icon': '[INFO]'},
-            {'name': 'Отчет', 'icon': '📊'},
-            {'name': 'Съемка', 'icon': '📹'},
-            {'name': 'Встреча', 'icon': '🤝'},
-            {'name': 'Стратегия', 'icon': '📈'},
-            {'name': 'Презентация', 'icon': '🎤'},
-            {'name': 'Админ задачи', 'icon': '🗂️'},
-            {'name': 'Анализ', 'icon': '🔎'},
-            {'name': 'Брифинг', 'icon': '[DB]'},
-            {'name': 'Сценарий', 'icon': '📜'},
-            {'name': 'Другое', 'icon': '📌'}
-        ],
-        'digital': [
-            {'name': 'Настройка рекламы', 'icon': '🎯'},
-            {'name': 'Анализ эффективности', 'icon': '📈'},
-            {'name': 'A/B тестирование', 'icon': '🧪'},
-            {'name': 'Настройка аналитики', 'icon': '📊'},
-            {'name': 'Оптимизация конверсий', 'icon': '[DB]'},
-            {'name': 'Email-маркетинг', 'icon': '📧'},
-            {'name': 'Контекстная реклама', 'icon': '🔍'},
-            {'name': 'Таргетированная реклама', 'icon': '🎯'},
-            {'name': 'SEO оптимизация', 'icon': '🔍'},
-            {'name': 'Веб-аналитика', 'icon': '📊'},
-            {'name': 'Другое', 'icon': '📌'}
-        ],
-        'admin': [
-            {'name': 'Публикация', 'icon': '[INFO]'},
-            {'name': 'Съемки', 'icon': '🎥'},
-            {'name': 'Стратегия', 'icon': '📈'},
-            {'name': 'Отчет', 'icon': '📊'},
-            {'name': 'Бухгалтерия', 'icon': '[DB]'},
-            {'name': 'Встреча', 'icon': '🤝'},
-            {'name': 'Документы', 'icon': '📄'},
-            {'name': 'Работа с кадрами', 'icon': '👥'},
-            {'name': 'Планерка', 'icon': '🗓️'},
-            {'name': 'Администраторские задачи', 'icon': '🛠️'},
-            {'name': 'Собеседование', 'icon': '🧑‍💼'},
-            {'name': 'Договор', 'icon': '✍️'},
-            {'name': 'Другое', 'icon': '📌'}
-        ]
-    }
-
     if role:
-        return task_types.get(role, [])
-    return task_types
+        return TASK_TYPES.get(role, [])
+    return TASK_TYPES
 
 
 @app.get("/tasks/formats")
@@ -1154,7 +1047,11 @@ def get_task_formats(
 
 
 @app.get("/operators/", response_model=list[schemas.Operator])
-def list_operators(db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
+def list_operators(
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_active_user),
+    _etag: None = Depends(change_versions.etag_for_tables("operators")),
+):
     return crud.get_operators(db)
 
 
@@ -1184,8 +1081,13 @@ def delete_operator(op_id: int, db: Session = Depends(auth.get_db), current: mod
 
 
 @app.get("/projects/", response_model=list[schemas.Project])
-def list_projects(db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user), include_archived: bool = False):
-    return crud.get_projects(db, include_archived=include_archived)
+async def list_projects(
+    db=Depends(auth.get_async_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+    include_archived: bool = False,
+    _etag: None = Depends(change_versions.etag_for_tables("projects")),
+):
+    return await db.run_sync(crud.get_projects, include_archived=include_archived)
 
 
 @app.post("/projects/", response_model=schemas.Project)
@@ -1281,7 +1183,7 @@ def delete_project_logo(
 def get_project_report(
     project_id: int,
     month: int | None = None,
-    db: Session = Depends(auth.get_db),
+    db: Session = Depends(auth.get_write_db),
     current: models.User = Depends(auth.get_current_active_user),
 ):
     today = datetime.utcnow()
@@ -1495,7 +1397,11 @@ def remove_receipt(receipt_id: int, db: Session = Depends(auth.get_db), current:
 
 
 @app.get("/taxes/", response_model=list[schemas.Tax])
-def list_taxes(db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
+def list_taxes(
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_active_user),
+    _etag: None = Depends(change_versions.etag_for_tables("taxes")),
+):
     return crud.get_taxes(db)
 
 
@@ -1553,7 +1459,7 @@ def list_project_posts(
     project_id: int,
     month: int | None = None,
     year: int | None = None,
-    db: Session = Depends(auth.get_db),
+    db: Session = Depends(auth.get_write_db),
     current: models.User = Depends(auth.get_current_active_user),
 ):
     if month:
@@ -1653,7 +1559,11 @@ def set_timezone(data: schemas.TimezoneUpdate, db: Session = Depends(auth.get_db
 
 
 @app.get("/digital/services", response_model=list[schemas.DigitalService])
-def list_digital_services(db: Session = Depends(auth.get_db), current: models.User = Depends(auth.get_current_active_user)):
+def list_digital_services(
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_active_user),
+    _etag: None = Depends(change_versions.etag_for_tables("digital_services")),
+):
     return crud.get_digital_services(db)
 
 
@@ -1906,12 +1816,16 @@ def delete_digital_project_expense(
 
 
 @app.get("/analytics")
-def get_analytics(
+async def get_analytics(
     time_range: str = "30d",
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user),
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
 ):
     """Получение аналитических данных"""
+    return await db.run_sync(get_analytics_sync, time_range, current)
+
+
+def get_analytics_sync(db: Session, time_range: str, current: models.User):
     from datetime import datetime, timedelta
     from sqlalchemy import func, and_
     
@@ -1929,19 +1843,16 @@ def get_analytics(
         start_date = end_date - timedelta(days=30)
     
     # Статистика задач (исключаем экземпляры повторяющихся задач)
-    total_tasks = db.query(models.Task).filter(models.Task.original_task_id.is_(None)).count()
-    completed_tasks = db.query(models.Task).filter(
-        and_(models.Task.status == "done", models.Task.original_task_id.is_(None))
+    total_tasks = db.query(models.TaskHistory).filter(models.TaskHistory.original_task_id.is_(None)).count()
+    completed_tasks = db.query(models.TaskHistory).filter(
+        and_(models.TaskHistory.status == "done", models.TaskHistory.original_task_id.is_(None))
     ).count()
-    in_progress_tasks = db.query(models.Task).filter(
-        and_(models.Task.status == "in_progress", models.Task.original_task_id.is_(None))
+    in_progress_tasks = db.query(models.TaskHistory).filter(
+        and_(models.TaskHistory.status == "in_progress", models.TaskHistory.original_task_id.is_(None))
     ).count()
-    overdue_tasks = db.query(models.Task).filter(
-        and_(
-            models.Task.deadline < datetime.utcnow(),
-            models.Task.status != "done",
-            models.Task.original_task_id.is_(None)
-        )
+    # Статус overdue ставит монитор дедлайнов (app.deadline_monitor)
+    overdue_tasks = db.query(models.TaskHistory).filter(
+        and_(models.TaskHistory.status == "overdue", models.TaskHistory.original_task_id.is_(None))
     ).count()
     
     # Статистика проектов
@@ -1957,12 +1868,12 @@ def get_analytics(
     users = db.query(models.User).filter(models.User.role != models.RoleEnum.admin).all()
     team_productivity = []
     for user in users:
-        tasks_completed = db.query(models.Task).filter(
+        tasks_completed = db.query(models.TaskHistory).filter(
             and_(
-                models.Task.executor_id == user.id,
-                models.Task.status == "done",
-                models.Task.finished_at >= start_date,
-                models.Task.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
+                models.TaskHistory.executor_id == user.id,
+                models.TaskHistory.status == "done",
+                models.TaskHistory.finished_at >= start_date,
+                models.TaskHistory.original_task_id.is_(None)  # Исключаем повторяющиеся задачи
             )
         ).count()
         
@@ -1983,15 +1894,15 @@ def get_analytics(
         month_end = month_end - timedelta(days=month_end.day - 1) + timedelta(days=31)
         month_end = min(month_end, month_start.replace(day=28) + timedelta(days=4))
         
-        created_count = db.query(models.Task).filter(
-            and_(models.Task.created_at >= month_start, models.Task.created_at < month_end)
+        created_count = db.query(models.TaskHistory).filter(
+            and_(models.TaskHistory.created_at >= month_start, models.TaskHistory.created_at < month_end)
         ).count()
         
-        completed_count = db.query(models.Task).filter(
+        completed_count = db.query(models.TaskHistory).filter(
             and_(
-                models.Task.finished_at >= month_start,
-                models.Task.finished_at < month_end,
-                models.Task.status == "done"
+                models.TaskHistory.finished_at >= month_start,
+                models.TaskHistory.finished_at < month_end,
+                models.TaskHistory.status == "done"
             )
         ).count()
         
@@ -2133,7 +2044,7 @@ def delete_resource_file(
 @app.get("/resource-files/{file_id}/download")
 def download_resource_file(
     file_id: int,
-    db: Session = Depends(auth.get_db),
+    db: Session = Depends(auth.get_write_db),
     current: models.User = Depends(auth.get_current_active_user),
 ):
     file = crud.get_resource_file(db, file_id)
@@ -2235,7 +2146,8 @@ async def import_database(
 
     # Запускаем импорт в отдельном потоке
     def run_import_in_background():
-        db_session = SessionLocal()
+        # Writer берется только на запись каждого раздела (см. perform_database_import)
+        db_session = RoutingSessionLocal()
         try:
             perform_database_import(
                 tmp_upload_path,
@@ -2251,6 +2163,8 @@ async def import_database(
             import traceback
             traceback.print_exc()
         finally:
+            # Импорт пишет users сырым SQL - хуки сессии его не видят
+            user_cache.user_cache.invalidate()
             import_status["is_running"] = False
             import_status["completed_at"] = datetime.utcnow().isoformat()
             db_session.close()
@@ -2432,6 +2346,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         db.add(new_user)
                         imported_data["users"] += 1
                         
+                db.commit()
             except Exception as e:
                 print(f"Error importing users: {e}")
                 db.rollback()
@@ -2503,6 +2418,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                     else:
                         project_mapping[project_data['id']] = existing_project.id
                         
+                db.commit()
             except Exception as e:
                 print(f"Error importing projects: {e}")
                 db.rollback()
@@ -2569,6 +2485,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         db.add(new_post)
                         imported_data["project_posts"] += 1
 
+                db.commit()
             except Exception as e:
                 print(f"Error importing project posts: {e}")
                 db.rollback()
@@ -2821,6 +2738,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         db.add(new_task)
                         imported_data["tasks"] += 1
                         
+                db.commit()
             except Exception as e:
                 print(f"Error importing from Downloads tasks.db: {e}")
                 db.rollback()
@@ -2888,25 +2806,31 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         imported_data["users"] += 1
                         print(f"Создан пользователь: {old_user_id} -> {new_user.id} ({username}, {user_name}, {user_role})")
 
+            db.commit()
+
         # Улучшенный импорт задач с правильным маппингом пользователей для любой БД
         if "tasks" in available_tables:
             try:
 
-                # Получаем задачи из экспорта
-                cursor.execute("SELECT * FROM tasks")  # Импортируем все задачи из экспорта
-                rows = cursor.fetchall()
+                # Получаем задачи из экспорта, вместе с перенесенными в архив:
+                # они попадают в tasks, архиватор потом снова перенесет старые закрытые
+                task_rows = []
+                for task_table in ("tasks", "tasks_archive"):
+                    if task_table not in available_tables:
+                        continue
+                    cursor.execute(f"SELECT * FROM {task_table}")
+                    rows = cursor.fetchall()
 
-                # Получаем названия колонок
-                cursor.execute("PRAGMA table_info(tasks)")
-                columns = [col[1] for col in cursor.fetchall()]
+                    # Получаем названия колонок
+                    cursor.execute(f"PRAGMA table_info({task_table})")
+                    columns = [col[1] for col in cursor.fetchall()]
+                    task_rows.extend(dict(zip(columns, row)) for row in rows)
 
-                import_status["message"] = f"Импорт задач ({len(rows)} задач)..."
+                import_status["message"] = f"Импорт задач ({len(task_rows)} задач)..."
                 import_status["progress"] = 50
-                print(f"Импортируем задачи из экспорта приложения: {len(rows)} задач")
+                print(f"Импортируем задачи из экспорта приложения: {len(task_rows)} задач")
 
-                for row in rows:
-                    # Создаем словарь из строки
-                    task_data = dict(zip(columns, row))
+                for task_data in task_rows:
 
                     # Находим автора и исполнителя по ID из экспорта через маппинг
                     author_id = None
@@ -3040,6 +2964,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                     else:
                         print(f"Пропускаем задачу '{task_data.get('title', 'БЕЗ НАЗВАНИЯ')}' - не найдены автор ({author_id}) или исполнитель ({executor_id})")
                             
+                db.commit()
             except Exception as e:
                 print(f"Error importing tasks: {e}")
                 db.rollback()
@@ -3114,6 +3039,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                             db.add(new_digital)
                             imported_data["digital_projects"] += 1
                             print(f"Создан цифровой проект: project_id={project_id}, исполнитель_id={executor_id}")
+                db.commit()
             except Exception as e:
                 print(f"Error importing digital projects: {e}")
                 db.rollback()
@@ -3141,6 +3067,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_operator)
                         imported_data["operators"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing operators: {e}")
                 db.rollback()
@@ -3167,6 +3094,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_item)
                         imported_data["expense_items"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing expense items: {e}")
                 db.rollback()
@@ -3192,6 +3120,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_tax)
                         imported_data["taxes"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing taxes: {e}")
                 db.rollback()
@@ -3332,6 +3261,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                             print(f"Маппинг заявки: {old_lead_id} -> {new_lead.id}")
 
                         imported_data["leads"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing leads: {e}")
                 db.rollback()
@@ -3375,6 +3305,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_note)
                         imported_data["lead_notes"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing lead notes: {e}")
                 db.rollback()
@@ -3404,6 +3335,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_category)
                         imported_data["expense_categories"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing expense categories: {e}")
                 db.rollback()
@@ -3447,6 +3379,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_expense)
                         imported_data["project_expenses"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing project expenses: {e}")
                 db.rollback()
@@ -3486,6 +3419,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                     )
                     db.add(new_expense)
                     imported_data["common_expenses"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing common expenses: {e}")
                 db.rollback()
@@ -3531,6 +3465,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_expense)
                         imported_data["digital_project_expenses"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing digital project expenses: {e}")
                 db.rollback()
@@ -3581,6 +3516,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                     db.add(new_expense)
                     db.flush()  # Применяем изменения сразу, чтобы отловить ошибки FK
                     imported_data["employee_expenses"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing employee expenses: {e}")
                 db.rollback()
@@ -3647,6 +3583,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_report)
                         imported_data["project_reports"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing project reports: {e}")
                 db.rollback()
@@ -3692,6 +3629,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_attachment)
                         imported_data["lead_attachments"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing lead attachments: {e}")
                 db.rollback()
@@ -3737,6 +3675,7 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
                         )
                         db.add(new_history)
                         imported_data["lead_history"] += 1
+                db.commit()
             except Exception as e:
                 print(f"Error importing lead history: {e}")
                 db.rollback()
@@ -3759,7 +3698,9 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
         try:
             # Create or update database version record
             version_timestamp = datetime.utcnow().isoformat()
-            version_record = db.query(models.DatabaseVersion).first()
+            version_record = db.query(models.DatabaseVersion).filter(
+                ~models.DatabaseVersion.version.like(migrations.MIGRATION_PREFIX + "%")
+            ).first()
             if version_record:
                 version_record.version = version_timestamp
                 version_record.description = "Database imported"
@@ -3810,15 +3751,21 @@ def perform_database_import(tmp_upload_path, filter_by_roles, db, backend_dir, o
 
 # Database version endpoint (public, no auth required)
 @app.get("/database/version")
-async def get_database_version(db: Session = Depends(auth.get_db)):
+async def get_database_version(db: Session = Depends(auth.get_write_db)):
     """Get current database version for cache invalidation"""
     try:
-        version_record = db.query(models.DatabaseVersion).first()
+        version_record = db.query(models.DatabaseVersion).filter(
+            ~models.DatabaseVersion.version.like(migrations.MIGRATION_PREFIX + "%")
+        ).first()
         if version_record:
             return {
                 "version": version_record.version,
                 "updated_at": version_record.updated_at.isoformat() if version_record.updated_at else None,
-                "description": version_record.description
+                "description": version_record.description,
+                # Версии справочников и задач - меняются при каждой записи
+                "tables": change_versions.table_versions(
+                    db, change_versions.TRACKED_TABLES | {migrations.TASKS_COUNTER}
+                ),
             }
         else:
             # If no version record exists, create one
@@ -3832,7 +3779,10 @@ async def get_database_version(db: Session = Depends(auth.get_db)):
             return {
                 "version": initial_version,
                 "updated_at": None,
-                "description": "Initial version"
+                "description": "Initial version",
+                "tables": change_versions.table_versions(
+                    db, change_versions.TRACKED_TABLES | {migrations.TASKS_COUNTER}
+                ),
             }
     except Exception as e:
         print(f"Error getting database version: {e}")
@@ -3844,9 +3794,86 @@ async def get_database_version(db: Session = Depends(auth.get_db)):
         }
 
 
+@app.get("/admin/database/profile")
+def get_database_profile(
+    db: Session = Depends(auth.get_db),
+    current: models.User = Depends(auth.get_current_admin_user),
+):
+    """Активный профиль подключения к БД (PRAGMA для SQLite)"""
+    dialect = db.bind.dialect.name
+    if dialect != "sqlite":
+        return {
+            "dialect": dialect,
+            "configured": None,
+            "active": None,
+            "write_queue": None,
+            "replicas": [replica.status() for replica in database.replicas],
+        }
+    return {
+        "dialect": dialect,
+        "configured": database.SQLITE_PROFILE,
+        "active": database.read_sqlite_pragmas(db.connection()),
+        "write_queue": database.write_queue.stats(),
+        "replicas": [replica.status() for replica in database.replicas],
+    }
+
+
+@app.get("/admin/sql-cache/stats")
+def get_sql_cache_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Статистика кэша скомпилированных SQL-запросов"""
+    engines = [database.engine, database.read_engine] + [r.engine for r in database.replicas]
+    if database.async_engine is not None:
+        engines.append(database.async_engine.sync_engine)
+    # Один движок может обслуживать и запись, и чтение (PostgreSQL)
+    unique_engines = list({id(e): e for e in engines}.values())
+    return sql_metrics.compiled_cache_stats(unique_engines)
+
+
+@app.get("/admin/user-cache/stats")
+def get_user_cache_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Статистика кэша авторизованных пользователей"""
+    return user_cache.user_cache.stats()
+
+
+@app.get("/admin/password-hashing/stats")
+def get_password_hashing_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Загрузка пула хеширования паролей: потоки, очередь, отказы, таймауты"""
+    return hashing.hash_pool.stats()
+
+
+@app.get("/admin/login-limiter/stats")
+def get_login_limiter_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Ограничитель попыток входа: лимиты, отслеживаемые ключи, отказы"""
+    return login_limiter.login_limiter.stats()
+
+
+@app.get("/admin/events/stats")
+def get_events_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Push-канал событий: брокер, подключения, доставленные события, переполнения"""
+    return events.event_hub.stats()
+
+
+@app.get("/admin/task-archive/stats")
+def get_task_archive_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Перенос закрытых задач в архив: настройки, размеры таблиц, перенесено строк"""
+    return task_archive.task_archiver.stats()
+
+
+@app.get("/admin/recurring-scheduler/stats")
+def get_recurring_scheduler_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Планировщик повторяющихся задач этого воркера: лидерство, куча сроков, созданные экземпляры"""
+    return recurring_scheduler.recurring_scheduler.stats()
+
+
+@app.get("/admin/deadline-monitor/stats")
+def get_deadline_monitor_stats(current: models.User = Depends(auth.get_current_admin_user)):
+    """Монитор дедлайнов этого воркера: лидерство, помеченные overdue задачи, напоминания"""
+    return deadline_monitor.deadline_monitor.stats()
+
+
 @app.get("/admin/export-database")
 async def export_database(
-    db: Session = Depends(auth.get_db),
+    db: Session = Depends(auth.get_report_db),
     current: models.User = Depends(auth.get_current_active_user),
 ):
     """Экспорт текущей базы данных с файлами"""
@@ -3889,52 +3916,13 @@ async def export_database(
         # Создаем новую БД для экспорта
         export_conn = sqlite3.connect(export_db_path)
 
-        # Экспортируем схему и данные всех таблиц
+        # Копия через backup API SQLite: вся база целиком - таблицы, представление
+        # tasks_all, триггеры, полнотекстовый индекс tasks_fts с его служебными
+        # таблицами и sqlite_sequence. Пересоздание таблиц по их CREATE ломается
+        # на tasks_fts (его служебные таблицы создаются вместе с ним) и теряет
+        # представления и триггеры
         print(f"Начинаем экспорт базы данных в {export_db_path}")
-
-        # Получаем список всех таблиц
-        tables_query = source_conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in tables_query.fetchall()]
-
-        print(f"Найдено таблиц для экспорта: {len(tables)}")
-        print(f"Таблицы: {tables}")
-
-        # Экспортируем каждую таблицу
-        for table_name in tables:
-            if table_name.startswith('sqlite_'):
-                continue  # Пропускаем системные таблицы
-
-            print(f"Экспортируем таблицу: {table_name}")
-
-            # Получаем схему таблицы
-            schema_query = source_conn.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-            schema = schema_query.fetchone()
-
-            if schema and schema[0]:
-                # Создаем таблицу в новой БД
-                export_conn.execute(schema[0])
-
-                # Копируем данные
-                data_query = source_conn.execute(f"SELECT * FROM {table_name}")
-                rows = data_query.fetchall()
-
-                if rows:
-                    # Получаем информацию о столбцах
-                    columns_info = source_conn.execute(f"PRAGMA table_info({table_name})")
-                    columns = [col[1] for col in columns_info.fetchall()]
-
-                    # Формируем запрос для вставки
-                    placeholders = ','.join(['?' for _ in columns])
-                    insert_query = f"INSERT INTO {table_name} VALUES ({placeholders})"
-
-                    # Вставляем данные
-                    export_conn.executemany(insert_query, rows)
-                    print(f"Скопировано {len(rows)} строк в таблицу {table_name}")
-                else:
-                    print(f"Таблица {table_name} пуста")
-
-        # Сохраняем изменения
-        export_conn.commit()
+        source_conn.backup(export_conn)
 
         # Закрываем соединения
         source_conn.close()
@@ -4199,6 +4187,17 @@ async def clear_database(
     try:
         # Удаляем задачи
         safe_delete("tasks", lambda: db.query(models.Task).delete() if hasattr(models, 'Task') else 0)
+        # Архив и журнал задач: иначе удаленные задачи остаются в tasks_all и отчетах.
+        # Удаление из tasks/tasks_archive пишет в task_events и task_tombstones,
+        # поэтому они чистятся после
+        safe_delete("tasks_archive", lambda: db.query(models.TaskArchive).delete())
+        safe_delete("task_events", lambda: db.query(models.TaskEvent).delete())
+        safe_delete("task_tombstones", lambda: db.query(models.TaskTombstone).delete())
+        # Без надгробий клиенты /tasks/changes не узнают об удалении: счетчик с нуля,
+        # их since оказывается новее базы, и они загружают список заново (reset)
+        safe_delete("task_change_counter", lambda: db.query(models.ChangeCounter).filter(
+            models.ChangeCounter.name == "tasks"
+        ).update({models.ChangeCounter.version: 0}))
 
         # Удаляем посты проектов
         safe_delete("posts", lambda: db.query(models.ProjectPost).delete() if hasattr(models, 'ProjectPost') else 0)
@@ -4306,37 +4305,25 @@ async def clear_database(
 async def check_sync_status(current_user = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """Проверка синхронизации данных между приложением и Telegram ботом"""
     try:
-        # Получаем статистику по базе данных
-        users = db.query(models.User).all()
-        active_users = [u for u in users if u.is_active]
-        users_with_telegram = [u for u in active_users if u.telegram_id]
-        
-        projects = db.query(models.Project).all()
-        active_projects = [p for p in projects if not p.is_archived]
-        
-        tasks = db.query(models.Task).all()
-        active_tasks = [t for t in tasks if t.status not in [models.TaskStatus.done, models.TaskStatus.cancelled]]
-        recent_tasks = [t for t in tasks if t.created_at and (datetime.now() - t.created_at.replace(tzinfo=None)).days <= 7]
+        # Получаем статистику по базе данных (агрегаты считает БД)
+        summary = read_models.sync_summary(db)
+        users = summary["users"]
+        projects = summary["projects"]
+        tasks = summary["tasks"]
+        users_without_telegram = summary["users_without_telegram"]
         
         # Проверяем целостность данных
         issues = []
         
         # Задачи без исполнителя
-        tasks_no_executor = db.query(models.Task).filter(models.Task.executor_id == None).count()
-        if tasks_no_executor > 0:
-            issues.append(f"Задач без исполнителя: {tasks_no_executor}")
+        if tasks.no_executor > 0:
+            issues.append(f"Задач без исполнителя: {tasks.no_executor}")
         
         # Задачи с несуществующими исполнителями
-        all_user_ids = {u.id for u in users}
-        tasks_invalid_executor = 0
-        for task in tasks:
-            if task.executor_id and task.executor_id not in all_user_ids:
-                tasks_invalid_executor += 1
-        if tasks_invalid_executor > 0:
-            issues.append(f"Задач с несуществующими исполнителями: {tasks_invalid_executor}")
+        if tasks.invalid_executor > 0:
+            issues.append(f"Задач с несуществующими исполнителями: {tasks.invalid_executor}")
         
         # Пользователи без Telegram
-        users_without_telegram = [u for u in active_users if not u.telegram_id]
         if users_without_telegram:
             issues.append(f"Активных пользователей без Telegram: {len(users_without_telegram)}")
         
@@ -4346,19 +4333,19 @@ async def check_sync_status(current_user = Depends(auth.get_current_active_user)
             "timestamp": datetime.now().isoformat(),
             "database": {
                 "users": {
-                    "total": len(users),
-                    "active": len(active_users),
-                    "with_telegram": len(users_with_telegram),
+                    "total": users.total,
+                    "active": users.active,
+                    "with_telegram": users.with_telegram,
                     "without_telegram": [{"name": u.name, "role": u.role.value} for u in users_without_telegram]
                 },
                 "projects": {
-                    "total": len(projects),
-                    "active": len(active_projects)
+                    "total": projects.total,
+                    "active": projects.active
                 },
                 "tasks": {
-                    "total": len(tasks),
-                    "active": len(active_tasks),
-                    "recent": len(recent_tasks)
+                    "total": tasks.total,
+                    "active": tasks.active,
+                    "recent": tasks.recent
                 }
             },
             "issues": issues,
@@ -4414,7 +4401,8 @@ def get_expense_categories(
     limit: int = 100,
     active_only: bool = False,
     db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user)
+    current: models.User = Depends(auth.get_current_active_user),
+    _etag: None = Depends(change_versions.etag_for_tables("expense_categories")),
 ):
     """Get all expense categories"""
     query = db.query(models.ExpenseCategory)
@@ -4788,15 +4776,19 @@ def update_project_expense(
 
 # ========== EXPENSE REPORTS ==========
 @app.get("/expense-reports/", response_model=schemas.ExpenseReport)
-def get_expense_report(
+async def get_expense_report(
     start_date: Optional[date] = Query(None, description="Start date for report"),
     end_date: Optional[date] = Query(None, description="End date for report"),
     category_id: Optional[int] = Query(None, description="Filter by category"),
     project_id: Optional[int] = Query(None, description="Filter by project"),
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user)
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async)
 ):
     """Generate expense report with filters"""
+    return await db.run_sync(get_expense_report_sync, start_date, end_date, category_id, project_id, current)
+
+
+def get_expense_report_sync(db: Session, start_date: Optional[date], end_date: Optional[date], category_id: Optional[int], project_id: Optional[int], current: models.User):
     from sqlalchemy import func
     from collections import defaultdict
     
@@ -5027,13 +5019,17 @@ def delete_employee_expense(
 
 # ========== COMPREHENSIVE EXPENSE REPORTS ==========
 @app.get("/expense-reports/summary", response_model=schemas.ExpenseReportSummary)
-def get_expense_report_summary(
+async def get_expense_report_summary(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user)
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async)
 ):
     """Get expense report summary"""
+    return await db.run_sync(get_expense_report_summary_sync, start_date, end_date, current)
+
+
+def get_expense_report_summary_sync(db: Session, start_date: Optional[date], end_date: Optional[date], current: models.User):
     from datetime import datetime
     from sqlalchemy import func
     
@@ -5072,15 +5068,19 @@ def get_expense_report_summary(
 
 
 @app.get("/expense-reports/employees", response_model=List[schemas.EmployeeExpenseReport])
-def get_employee_expense_report(
+async def get_employee_expense_report(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     role: Optional[str] = Query(None),
     user_id: Optional[int] = Query(None),
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user)
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async)
 ):
     """Get employee expense report"""
+    return await db.run_sync(get_employee_expense_report_sync, start_date, end_date, role, user_id, current)
+
+
+def get_employee_expense_report_sync(db: Session, start_date: Optional[date], end_date: Optional[date], role: Optional[str], user_id: Optional[int], current: models.User):
     from datetime import datetime
     from sqlalchemy import func
     
@@ -5095,45 +5095,23 @@ def get_employee_expense_report(
         else:
             end_date = date(now.year, now.month + 1, 1) - timedelta(days=1)
     
-    # Query users
-    user_query = db.query(models.User).filter(models.User.is_active == True)
-    if role:
-        user_query = user_query.filter(models.User.role == role)
-    if user_id:
-        user_query = user_query.filter(models.User.id == user_id)
-    
-    users = user_query.all()
-    reports = []
-    
-    for user in users:
-        expenses = db.query(models.EmployeeExpense).filter(
-            models.EmployeeExpense.user_id == user.id,
-            models.EmployeeExpense.date >= start_date,
-            models.EmployeeExpense.date <= end_date
-        ).all()
-        
-        total = sum(e.amount for e in expenses)
-        
-        reports.append(schemas.EmployeeExpenseReport(
-            user_id=user.id,
-            user_name=user.name,
-            role=user.role,
-            total_amount=float(total),
-            expenses=expenses
-        ))
-    
-    return reports
+    reports = read_models.employee_expense_report(db, start_date, end_date, role=role, user_id=user_id)
+    return [schemas.EmployeeExpenseReport.model_validate(report, from_attributes=True) for report in reports]
 
 
 @app.get("/expense-reports/operators", response_model=List[schemas.OperatorExpenseReport])
-def get_operator_expense_report(
+async def get_operator_expense_report(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     operator_id: Optional[int] = Query(None),
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user)
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async)
 ):
     """Get operator expense report"""
+    return await db.run_sync(get_operator_expense_report_sync, start_date, end_date, operator_id, current)
+
+
+def get_operator_expense_report_sync(db: Session, start_date: Optional[date], end_date: Optional[date], operator_id: Optional[int], current: models.User):
     from datetime import datetime
     from sqlalchemy import func
     
@@ -5189,15 +5167,18 @@ def get_operator_expense_report(
 
 # ========== PROJECT EXPENSES SUMMARY ==========
 @app.get("/expense-reports/projects")
-def get_project_expenses_summary(
+async def get_project_expenses_summary(
     project_id: Optional[int] = Query(None, description="Filter by project ID"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user)
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async)
 ):
     """Get project expenses summary including all types of expenses per project"""
-    print(f"[DEBUG /expense-reports/projects] project_id={project_id}, start_date={start_date}, end_date={end_date}")
+    return await db.run_sync(get_project_expenses_summary_sync, project_id, start_date, end_date, current)
+
+
+def get_project_expenses_summary_sync(db: Session, project_id: Optional[int], start_date: Optional[str], end_date: Optional[str], current: models.User):
     return crud.get_project_expenses_summary(db, project_id, start_date, end_date)
 
 
@@ -5260,7 +5241,7 @@ async def get_all_settings(db: Session = Depends(get_db)):
 # =============================================================================
 
 @app.get("/leads/", response_model=List[schemas.Lead])
-def get_leads(
+async def get_leads(
     skip: int = 0,
     limit: int = 100,
     manager_id: Optional[int] = None,
@@ -5268,10 +5249,14 @@ def get_leads(
     source: Optional[str] = None,
     created_from: Optional[str] = None,
     created_to: Optional[str] = None,
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_user)
+    db=Depends(auth.get_async_db),
+    current: models.User = Depends(auth.get_current_user_async)
 ):
     """Получить список заявок с фильтрацией"""
+    return await db.run_sync(get_leads_sync, skip, limit, manager_id, status, source, created_from, created_to, current)
+
+
+def get_leads_sync(db: Session, skip: int, limit: int, manager_id: Optional[int], status: Optional[str], source: Optional[str], created_from: Optional[str], created_to: Optional[str], current: models.User):
     leads = crud.get_leads(
         db=db,
         skip=skip,
@@ -5282,7 +5267,8 @@ def get_leads(
         created_from=created_from,
         created_to=created_to
     )
-    return leads
+    # Сериализуем внутри сессии: связи (например, attachments.user) подгружаются лениво
+    return [schemas.Lead.model_validate(lead) for lead in leads]
 
 
 @app.post("/leads/", response_model=schemas.Lead)
@@ -5469,15 +5455,95 @@ def get_leads_analytics(
     return analytics
 
 
+TASK_EVENTS_WINDOW_MAX_DAYS = 366
+
+
+@app.get("/analytics/tasks/summary")
+async def get_task_summary(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    previous_start: Optional[datetime] = None,
+    previous_end: Optional[datetime] = None,
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Сводка по задачам за период [start, end) для страницы аналитики (см. read_models.task_summary)"""
+    return await db.run_sync(
+        read_models.task_summary, current.role, start, end, previous_start, previous_end
+    )
+
+
+@app.get("/analytics/tasks/report")
+async def get_task_report(
+    start: date,
+    end: date,
+    executor_id: Optional[int] = None,
+    project: Optional[str] = None,
+    source: Literal["all", "tasks", "smm"] = "all",
+    task_status: Literal["all", "new", "in_progress", "done"] = Query("all", alias="status"),
+    limit: int = Query(TASK_PAGE_SIZE, ge=1, le=TASK_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Отчет по сотрудникам: счетчики по статусам и страница задач за дни [start, end]"""
+    if current.role not in [models.RoleEnum.admin, models.RoleEnum.smm_manager]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be earlier than start")
+    counts, rows, next_offset = await db.run_sync(
+        read_models.task_report,
+        datetime.combine(start, datetime_time.min),
+        datetime.combine(end + timedelta(days=1), datetime_time.min),
+        executor_id, project, source, task_status, limit, offset,
+    )
+    return {"counts": counts, "items": [row._asdict() for row in rows], "next_offset": next_offset}
+
+
+@app.get("/analytics/tasks/as-of")
+async def get_task_status_counts_as_of(
+    at: Optional[datetime] = None,
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Сколько задач было в каждом статусе на момент at (по умолчанию - сейчас; см. app.task_journal)"""
+    at = at or models.get_local_time_utc5().replace(tzinfo=None)
+    counts = await db.run_sync(task_journal.status_counts_as_of, at)
+    return {"at": at, "statuses": counts}
+
+
+@app.get("/analytics/tasks/transitions")
+async def get_task_transitions(
+    start: date,
+    end: date,
+    from_status: Optional[models.TaskStatus] = None,
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
+):
+    """Переходы между статусами в днях [start, end] и время в прежнем статусе (см. app.task_journal)"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be earlier than start")
+    if (end - start).days >= TASK_EVENTS_WINDOW_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window is limited to {TASK_EVENTS_WINDOW_MAX_DAYS} days")
+    window_start = datetime.combine(start, datetime_time.min)
+    window_end = datetime.combine(end + timedelta(days=1), datetime_time.min)
+    items = await db.run_sync(task_journal.transition_stats, window_start, window_end, from_status)
+    return {"items": items}
+
+
 @app.get("/analytics/service-types", response_model=schemas.ServiceTypesAnalytics)
-def get_service_types_analytics(
+async def get_service_types_analytics(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     employee_id: Optional[int] = None,
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_user)
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_user_async)
 ):
     """Получить аналитику по типам услуг для сотрудников"""
+    return await db.run_sync(get_service_types_analytics_sync, start_date, end_date, employee_id, current)
+
+
+def get_service_types_analytics_sync(db: Session, start_date: Optional[str], end_date: Optional[str], employee_id: Optional[int], current: models.User):
     analytics = crud.get_service_types_analytics(
         db=db,
         start_date=start_date,
@@ -5488,15 +5554,19 @@ def get_service_types_analytics(
 
 
 @app.get("/analytics/recurring-tasks")
-def get_recurring_tasks_analytics(
+async def get_recurring_tasks_analytics(
     time_range: str = "30d",
     employee_id: Optional[int] = None,
-    db: Session = Depends(auth.get_db),
-    current: models.User = Depends(auth.get_current_active_user),
+    db=Depends(auth.get_async_report_db),
+    current: models.User = Depends(auth.get_current_active_user_async),
 ):
     """Получение аналитики по повторяющимся задачам"""
+    return await db.run_sync(get_recurring_tasks_analytics_sync, time_range, employee_id, current)
+
+
+def get_recurring_tasks_analytics_sync(db: Session, time_range: str, employee_id: Optional[int], current: models.User):
     from datetime import datetime, timedelta
-    from sqlalchemy import func, and_
+    from sqlalchemy import func, and_, case
 
     # Определяем период для анализа
     end_date = datetime.utcnow()
@@ -5513,43 +5583,43 @@ def get_recurring_tasks_analytics(
 
     # Базовый фильтр для повторяющихся задач (только экземпляры)
     base_filter = and_(
-        models.Task.original_task_id.isnot(None),
-        models.Task.created_at >= start_date,
-        models.Task.created_at <= end_date
+        models.TaskHistory.original_task_id.isnot(None),
+        models.TaskHistory.created_at >= start_date,
+        models.TaskHistory.created_at <= end_date
     )
 
     # Дополнительный фильтр по сотруднику
     if employee_id:
-        base_filter = and_(base_filter, models.Task.executor_id == employee_id)
+        base_filter = and_(base_filter, models.TaskHistory.executor_id == employee_id)
 
     # Статистика повторяющихся задач
-    total_recurring_instances = db.query(models.Task).filter(base_filter).count()
-    completed_recurring = db.query(models.Task).filter(
-        and_(base_filter, models.Task.status == "done")
+    total_recurring_instances = db.query(models.TaskHistory).filter(base_filter).count()
+    completed_recurring = db.query(models.TaskHistory).filter(
+        and_(base_filter, models.TaskHistory.status == "done")
     ).count()
-    in_progress_recurring = db.query(models.Task).filter(
-        and_(base_filter, models.Task.status == "in_progress")
+    in_progress_recurring = db.query(models.TaskHistory).filter(
+        and_(base_filter, models.TaskHistory.status == "in_progress")
     ).count()
 
     # Статистика по типам задач среди повторяющихся
     task_types_stats = db.query(
-        models.Task.task_type,
-        func.count(models.Task.id).label('count')
-    ).filter(base_filter).group_by(models.Task.task_type).all()
+        models.TaskHistory.task_type,
+        func.count(models.TaskHistory.id).label('count')
+    ).filter(base_filter).group_by(models.TaskHistory.task_type).all()
 
     # Статистика по исполнителям
     executor_stats = db.query(
         models.User.name,
-        func.count(models.Task.id).label('total_tasks'),
-        func.sum(func.case((models.Task.status == 'done', 1), else_=0)).label('completed_tasks')
-    ).join(models.Task, models.Task.executor_id == models.User.id)\
+        func.count(models.TaskHistory.id).label('total_tasks'),
+        func.sum(case((models.TaskHistory.status == 'done', 1), else_=0)).label('completed_tasks')
+    ).join(models.TaskHistory, models.TaskHistory.executor_id == models.User.id)\
      .filter(base_filter)\
      .group_by(models.User.id, models.User.name).all()
 
     # Количество активных повторяющихся шаблонов
-    active_templates = db.query(models.Task).filter(
-        models.Task.is_recurring == True,
-        models.Task.next_run_at.isnot(None)
+    active_templates = db.query(models.TaskHistory).filter(
+        models.TaskHistory.is_recurring == True,
+        models.TaskHistory.next_run_at.isnot(None)
     ).count()
 
     return {
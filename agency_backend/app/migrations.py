@@ -0,0 +1,1183 @@
+"""Версионированные миграции схемы и начальных данных.
+
+Запускаются один раз отдельным шагом перед стартом воркеров:
+
+    python -m app.migrations           # применить недостающие
+    python -m app.migrations --status  # показать состояние
+
+Примененные миграции хранятся в database_version строками вида
+"migration:<id>" (в description - время выполнения). Воркеры при старте
+схему не проверяют - только предупреждают, если миграции не применены.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+from . import models, schemas, crud, task_search
+from .database import engine, Base, SessionLocal, SQLITE_PROFILE
+
+MIGRATION_PREFIX = "migration:"
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine)
+
+
+def ensure_expense_tables():
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        
+        # Check if new expense tables exist
+        tables = inspector.get_table_names()
+        
+        if "expense_categories" not in tables:
+            print("[DB] Creating expense_categories table...")
+            models.ExpenseCategory.__table__.create(bind=engine, checkfirst=True)
+
+        if "common_expenses" not in tables:
+            print("[DB] Creating common_expenses table...")
+            models.CommonExpense.__table__.create(bind=engine, checkfirst=True)
+
+        # Add new columns to existing project_expenses if they don't exist
+        if "project_expenses" in tables:
+            cols = [c["name"] for c in inspector.get_columns("project_expenses")]
+
+            if "category_id" not in cols:
+                print("[DB] Adding category_id to project_expenses...")
+                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN category_id INTEGER"))
+            if "description" not in cols:
+                print("[DB] Adding description to project_expenses...")
+                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN description TEXT"))
+            if "date" not in cols:
+                print("[DB] Adding date to project_expenses...")
+                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN date DATE DEFAULT CURRENT_DATE"))
+            if "created_by" not in cols:
+                print("[DB] Adding created_by to project_expenses...")
+                conn.execute(text("ALTER TABLE project_expenses ADD COLUMN created_by INTEGER"))
+            if "amount" in cols:
+                # Check if amount is still INTEGER, convert to FLOAT
+                try:
+                    conn.execute(text("SELECT amount FROM project_expenses LIMIT 1"))
+                    # If this works, the column exists, might need to handle type change
+                except:
+                    pass
+        
+        conn.commit()
+
+
+def ensure_digital_task_priority_column():
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        cols = [c["name"] for c in inspector.get_columns("digital_project_tasks")]
+        if "high_priority" not in cols:
+            conn.execute(text(
+                "ALTER TABLE digital_project_tasks "
+                "ADD COLUMN high_priority BOOLEAN DEFAULT 0"
+            ))
+        if "status" not in cols:
+            conn.execute(text(
+                "ALTER TABLE digital_project_tasks "
+                "ADD COLUMN status VARCHAR(50) DEFAULT 'in_progress'"
+            ))
+        conn.commit()
+
+
+def ensure_task_columns():
+    """Ensure tasks table has all required columns"""
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        cols = [c["name"] for c in inspector.get_columns("tasks")]
+        
+        # List of columns to add if missing
+        columns_to_add = [
+            ("accepted_at", "DATETIME"),
+            ("finished_at", "DATETIME"),
+            ("is_recurring", "BOOLEAN DEFAULT 0"),
+            ("recurrence_type", "VARCHAR"),
+            ("recurrence_time", "VARCHAR"),
+            ("recurrence_days", "VARCHAR"),
+            ("next_run_at", "DATETIME"),
+            ("original_task_id", "INTEGER"),
+            ("overdue_count", "INTEGER DEFAULT 0")
+        ]
+        
+        for col_name, col_type in columns_to_add:
+            if col_name not in cols:
+                conn.execute(text(f"ALTER TABLE tasks ADD COLUMN {col_name} {col_type}"))
+                print(f"[OK] Added {col_name} column to tasks table")
+        
+        conn.commit()
+
+
+
+
+# Индексы, которые создает 0005: набор на момент ее выпуска. Индексы,
+# добавленные в модели позже, создают собственные миграции (0013, 0018),
+# иначе 0005 на новой базе делала бы больше, чем на уже обновленных
+INDEXES_0005 = frozenset({
+    "ix_tasks_id", "ix_tasks_title", "ix_tasks_project", "ix_tasks_status_created_at",
+    "ix_tasks_executor_status_finished", "ix_tasks_original_created_at", "ix_tasks_recurring_due",
+    "ix_project_expenses_id", "ix_project_expenses_project_date", "ix_project_expenses_date",
+    "ix_employee_expenses_id", "ix_employee_expenses_user_date", "ix_employee_expenses_date",
+    "ix_common_expenses_id", "ix_common_expenses_date",
+    "ix_project_receipts_id", "ix_project_receipts_project_created",
+    "ix_shootings_id", "ix_shootings_operator_datetime", "ix_shootings_datetime",
+    "ix_leads_id", "ix_leads_last_activity_at",
+})
+
+
+def ensure_indexes():
+    """Создать составные индексы горячих таблиц, если их еще нет (идемпотентно)"""
+    indexed_models = [
+        models.Task,
+        models.ProjectExpense,
+        models.EmployeeExpense,
+        models.CommonExpense,
+        models.ProjectReceipt,
+        models.Shooting,
+        models.Lead,
+    ]
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        for model in indexed_models:
+            table = model.__table__
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in INDEXES_0005 and index.name not in existing:
+                    index.create(bind=conn, checkfirst=True)
+                    print(f"[OK] Created index {index.name} on {table.name} table")
+        conn.commit()
+
+
+def _status_rank_case(column: str) -> str:
+    whens = " ".join(
+        f"WHEN '{status.name}' THEN {rank}" for status, rank in models.TASK_STATUS_RANK.items()
+    )
+    return f"CASE {column} {whens} ELSE {models.TASK_STATUS_RANK_OTHER} END"
+
+
+def ensure_task_status_rank():
+    """tasks.status_rank: колонка, триггеры синхронизации, заполнение и индекс.
+
+    ORM выставляет ранг сам (событие на Task.status), триггеры нужны для
+    записей сырым SQL - бот меняет статусы напрямую в БД.
+    """
+    with engine.connect() as conn:
+        cols = [c["name"] for c in inspect(conn).get_columns("tasks")]
+        if "status_rank" not in cols:
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN status_rank INTEGER"))
+
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_sync_status_rank() RETURNS trigger AS $$
+                BEGIN
+                    NEW.status_rank := {_status_rank_case("NEW.status::text")};
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_status_rank ON tasks"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_tasks_status_rank
+                BEFORE INSERT OR UPDATE OF status ON tasks
+                FOR EACH ROW EXECUTE FUNCTION tasks_sync_status_rank()
+            """))
+        else:
+            # SQLite не умеет менять NEW в BEFORE-триггере - обновляем строку после записи
+            for name, event in (
+                ("trg_tasks_status_rank_insert", "AFTER INSERT ON tasks"),
+                ("trg_tasks_status_rank_update", "AFTER UPDATE OF status ON tasks"),
+            ):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"""
+                    CREATE TRIGGER {name} {event}
+                    BEGIN
+                        UPDATE tasks SET status_rank = {_status_rank_case("NEW.status")}
+                        WHERE id = NEW.id;
+                    END
+                """))
+
+        status_column = "status::text" if engine.dialect.name == "postgresql" else "status"
+        conn.execute(text(f"UPDATE tasks SET status_rank = {_status_rank_case(status_column)}"))
+        # Keyset-курсор идет по created_at: пустые значения заполняем
+        conn.execute(text(
+            "UPDATE tasks SET created_at = COALESCE(accepted_at, finished_at, deadline, CURRENT_TIMESTAMP) "
+            "WHERE created_at IS NULL"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_rank_created_id "
+            "ON tasks (status_rank, created_at DESC, id DESC)"
+        ))
+        conn.commit()
+
+
+TASKS_COUNTER = "tasks"
+
+
+def ensure_task_change_versions():
+    """Версии строк tasks и таблица удаленных задач для /tasks/changes.
+
+    Версию берет триггер из change_counters['tasks'] (UPDATE ... +1): строка
+    счетчика блокируется до конца транзакции, поэтому версии фиксируются в
+    том же порядке, в каком выданы. Триггеры ловят и ORM, и сырой SQL бота.
+    """
+    models.ChangeCounter.__table__.create(bind=engine, checkfirst=True)
+    models.TaskTombstone.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        cols = [c["name"] for c in inspect(conn).get_columns("tasks")]
+        if "row_version" not in cols:
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN row_version BIGINT"))
+
+        # Существующие строки получают версии 1..N, счетчик продолжает с N
+        conn.execute(text("UPDATE tasks SET row_version = id"))
+        conn.execute(
+            text("DELETE FROM change_counters WHERE name = :name"), {"name": TASKS_COUNTER}
+        )
+        conn.execute(
+            text(
+                "INSERT INTO change_counters (name, version) "
+                "SELECT :name, COALESCE(MAX(id), 0) FROM tasks"
+            ),
+            {"name": TASKS_COUNTER},
+        )
+
+        bump = f"UPDATE change_counters SET version = version + 1 WHERE name = '{TASKS_COUNTER}'"
+        current = f"(SELECT version FROM change_counters WHERE name = '{TASKS_COUNTER}')"
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_bump_row_version() RETURNS trigger AS $$
+                BEGIN
+                    {bump} RETURNING version INTO NEW.row_version;
+                    IF TG_OP = 'INSERT' THEN
+                        DELETE FROM task_tombstones WHERE task_id = NEW.id;
+                    END IF;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_write_tombstone() RETURNS trigger AS $$
+                DECLARE v BIGINT;
+                BEGIN
+                    {bump} RETURNING version INTO v;
+                    INSERT INTO task_tombstones (task_id, version, deleted_at)
+                    VALUES (OLD.id, v, now())
+                    ON CONFLICT (task_id) DO UPDATE
+                    SET version = EXCLUDED.version, deleted_at = EXCLUDED.deleted_at;
+                    RETURN OLD;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_row_version ON tasks"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_tasks_row_version
+                BEFORE INSERT OR UPDATE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION tasks_bump_row_version()
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_tombstone ON tasks"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_tasks_tombstone
+                AFTER DELETE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION tasks_write_tombstone()
+            """))
+        else:
+            set_version = f"UPDATE tasks SET row_version = {current} WHERE id = NEW.id;"
+            triggers = {
+                # Id в SQLite может переиспользоваться - старая запись об удалении не нужна
+                "trg_tasks_row_version_insert": (
+                    "AFTER INSERT ON tasks",
+                    f"{bump}; {set_version} DELETE FROM task_tombstones WHERE task_id = NEW.id;",
+                ),
+                # WHEN: собственный UPDATE row_version триггер повторно не запускает
+                "trg_tasks_row_version_update": (
+                    "AFTER UPDATE ON tasks WHEN NEW.row_version IS OLD.row_version",
+                    f"{bump}; {set_version}",
+                ),
+                "trg_tasks_tombstone": (
+                    "AFTER DELETE ON tasks",
+                    f"{bump}; INSERT OR REPLACE INTO task_tombstones (task_id, version, deleted_at) "
+                    f"VALUES (OLD.id, {current}, CURRENT_TIMESTAMP);",
+                ),
+            }
+            for name, (event, body) in triggers.items():
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {body} END"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_row_version ON tasks (row_version)"))
+        conn.commit()
+
+
+TASKS_VIEW = models.TaskHistory.__table__.name
+
+
+def ensure_task_archive():
+    """tasks_archive и представление tasks_all = tasks UNION ALL tasks_archive.
+
+    Идемпотентна; миграции, добавляющие колонки в tasks, вызывают ее повторно:
+    недостающие колонки появятся в архиве, представление пересоздается с
+    явным списком колонок (SELECT * в представлении фиксируется при создании).
+    """
+    archive = models.TaskArchive.__table__
+    archive.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        existing = {c["name"] for c in inspect(conn).get_columns(archive.name)}
+        for column in models.Task.__table__.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {archive.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"[OK] Added {column.name} column to {archive.name} table")
+        for index in archive.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+        # Колонки, которые появятся в tasks в более поздних миграциях, в
+        # представление попадут при их повторном вызове ensure_task_archive
+        hot = {c["name"] for c in inspect(conn).get_columns("tasks")}
+        columns = ", ".join(c.name for c in models.Task.__table__.columns if c.name in hot)
+        conn.execute(text(f"DROP VIEW IF EXISTS {TASKS_VIEW}"))
+        conn.execute(text(
+            f"CREATE VIEW {TASKS_VIEW} AS "
+            f"SELECT {columns} FROM tasks UNION ALL SELECT {columns} FROM {archive.name}"
+        ))
+        conn.commit()
+
+
+def _fold_yo(expr: str) -> str:
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def ensure_task_search():
+    """Полнотекстовый индекс задач (app.task_search): таблица, триггеры, заполнение.
+
+    Индекс пересобирается целиком, поэтому миграцию можно повторить после
+    изменения набора колонок. Триггеры обновляют строку индекса при изменении
+    индексируемых полей или исполнителя и при переименовании пользователя.
+    """
+    fields = {
+        "title": "NEW.title",
+        "description": "NEW.description",
+        "project": "NEW.project",
+        "task_type": "NEW.task_type",
+        "executor_name": "(SELECT name FROM users WHERE id = NEW.executor_id)",
+    }
+    watched = "title, description, project, task_type, executor_id"
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            table = task_search.POSTGRES_TABLE
+            config = task_search.POSTGRES_CONFIG
+            params = ", ".join(f"{name} text" for name in task_search.SEARCH_COLUMNS)
+            parts = []
+            for name in task_search.SEARCH_COLUMNS:
+                value = _fold_yo(f"coalesce({name}, '')")
+                parts.append(f"setweight(to_tsvector('{config}', {value}), '{task_search.POSTGRES_WEIGHTS[name]}')")
+            document = " || ".join(parts)
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    task_id INTEGER PRIMARY KEY,
+                    document tsvector NOT NULL
+                )
+            """))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_document ON {table} USING GIN (document)"))
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_search_document({params}) RETURNS tsvector AS $$
+                    SELECT {document}
+                $$ LANGUAGE sql IMMUTABLE
+            """))
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_search_sync() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        DELETE FROM {table} WHERE task_id = OLD.id;
+                        RETURN OLD;
+                    END IF;
+                    INSERT INTO {table} (task_id, document)
+                    VALUES (NEW.id, tasks_search_document({", ".join(fields.values())}))
+                    ON CONFLICT (task_id) DO UPDATE SET document = EXCLUDED.document;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION users_search_sync() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE {table} s
+                    SET document = tasks_search_document(t.title, t.description, t.project, t.task_type, NEW.name)
+                    FROM tasks t
+                    WHERE t.executor_id = NEW.id AND s.task_id = t.id;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_search ON tasks"))
+            conn.execute(text(f"""
+                CREATE TRIGGER trg_tasks_search
+                AFTER INSERT OR DELETE OR UPDATE OF {watched} ON tasks
+                FOR EACH ROW EXECUTE FUNCTION tasks_search_sync()
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_users_search ON users"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_users_search
+                AFTER UPDATE OF name ON users
+                FOR EACH ROW WHEN (NEW.name IS DISTINCT FROM OLD.name)
+                EXECUTE FUNCTION users_search_sync()
+            """))
+            conn.execute(text(f"DELETE FROM {table}"))
+            conn.execute(text(f"""
+                INSERT INTO {table} (task_id, document)
+                SELECT t.id, tasks_search_document(t.title, t.description, t.project, t.task_type, u.name)
+                FROM tasks t LEFT JOIN users u ON u.id = t.executor_id
+            """))
+        else:
+            table = task_search.SQLITE_TABLE
+            columns = ", ".join(task_search.SEARCH_COLUMNS)
+            values = ", ".join(_fold_yo(expr) for expr in fields.values())
+            insert_row = f"INSERT INTO {table} (rowid, {columns}) VALUES (NEW.id, {values});"
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            # prefix: префиксные запросы (слово*) идут по индексу
+            conn.execute(text(f"""
+                CREATE VIRTUAL TABLE {table} USING fts5(
+                    {columns}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+                )
+            """))
+            triggers = {
+                "trg_tasks_search_insert": ("AFTER INSERT ON tasks", insert_row),
+                "trg_tasks_search_update": (
+                    f"AFTER UPDATE OF {watched} ON tasks",
+                    f"DELETE FROM {table} WHERE rowid = OLD.id; {insert_row}",
+                ),
+                "trg_tasks_search_delete": ("AFTER DELETE ON tasks", f"DELETE FROM {table} WHERE rowid = OLD.id;"),
+                "trg_users_search_name": (
+                    "AFTER UPDATE OF name ON users WHEN NEW.name IS NOT OLD.name",
+                    f"UPDATE {table} SET executor_name = {_fold_yo('NEW.name')} "
+                    f"WHERE rowid IN (SELECT id FROM tasks WHERE executor_id = NEW.id);",
+                ),
+            }
+            for name, (event, body) in triggers.items():
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {body} END"))
+            backfill = ", ".join(_fold_yo(expr) for expr in ("t.title", "t.description", "t.project", "t.task_type", "u.name"))
+            conn.execute(text(f"""
+                INSERT INTO {table} (rowid, {columns})
+                SELECT t.id, {backfill}
+                FROM tasks t LEFT JOIN users u ON u.id = t.executor_id
+            """))
+            conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+        conn.commit()
+
+
+def ensure_task_executor_role():
+    """tasks.executor_role: колонка, триггеры синхронизации, заполнение и индекс.
+
+    Роль копируется из users при вставке задачи и смене исполнителя, а при
+    смене роли пользователя - во все его задачи (это же меняет row_version,
+    и /tasks/changes пересчитывает видимость). Триггеры ловят и ORM, и бота.
+    """
+    column = models.Task.__table__.c.executor_role
+    with engine.connect() as conn:
+        cols = [c["name"] for c in inspect(conn).get_columns("tasks")]
+        if column.name not in cols:
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE tasks ADD COLUMN {column.name} {column_type}"))
+
+        role_of_executor = "(SELECT role FROM users WHERE id = NEW.executor_id)"
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_sync_executor_role() RETURNS trigger AS $$
+                BEGIN
+                    NEW.executor_role := {role_of_executor};
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_executor_role ON tasks"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_tasks_executor_role
+                BEFORE INSERT OR UPDATE OF executor_id ON tasks
+                FOR EACH ROW EXECUTE FUNCTION tasks_sync_executor_role()
+            """))
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION users_sync_task_executor_role() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE tasks SET executor_role = NEW.role WHERE executor_id = NEW.id;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_users_task_executor_role ON users"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_users_task_executor_role
+                AFTER UPDATE OF role ON users
+                FOR EACH ROW WHEN (NEW.role IS DISTINCT FROM OLD.role)
+                EXECUTE FUNCTION users_sync_task_executor_role()
+            """))
+        else:
+            set_role = f"UPDATE tasks SET executor_role = {role_of_executor} WHERE id = NEW.id;"
+            triggers = {
+                # Задача без исполнителя уже с NULL - лишний UPDATE не нужен
+                "trg_tasks_executor_role_insert": (
+                    "AFTER INSERT ON tasks WHEN NEW.executor_id IS NOT NULL",
+                    set_role,
+                ),
+                "trg_tasks_executor_role_update": (
+                    "AFTER UPDATE OF executor_id ON tasks WHEN NEW.executor_id IS NOT OLD.executor_id",
+                    set_role,
+                ),
+                "trg_users_task_executor_role": (
+                    "AFTER UPDATE OF role ON users WHEN NEW.role IS NOT OLD.role",
+                    "UPDATE tasks SET executor_role = NEW.role WHERE executor_id = NEW.id;",
+                ),
+            }
+            for name, (event, body) in triggers.items():
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {body} END"))
+
+        conn.execute(text(
+            "UPDATE tasks SET executor_role = (SELECT role FROM users WHERE users.id = tasks.executor_id) "
+            "WHERE executor_id IS NOT NULL"
+        ))
+        # Заменен ix_tasks_rank_visibility (те же первые колонки + роль и исполнитель)
+        conn.execute(text("DROP INDEX IF EXISTS ix_tasks_rank_created_id"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_rank_visibility "
+            "ON tasks (status_rank, created_at DESC, id DESC, executor_role, executor_id)"
+        ))
+        conn.commit()
+    # Новая колонка tasks - в архиве и в представлении tasks_all
+    ensure_task_archive()
+
+
+def ensure_scheduler_leases():
+    """Таблица аренды роли планировщика (app.recurring_scheduler)"""
+    models.SchedulerLease.__table__.create(bind=engine, checkfirst=True)
+
+
+def ensure_task_deadline_index():
+    """Индекс tasks (status, deadline) для монитора дедлайнов"""
+    index = next(ix for ix in models.Task.__table__.indexes if ix.name == "ix_tasks_status_deadline")
+    index.create(bind=engine, checkfirst=True)
+
+
+def ensure_employee_expense_project_index():
+    """Индекс employee_expenses (project_id, date, amount) для сумм по проектам"""
+    index = next(
+        ix for ix in models.EmployeeExpense.__table__.indexes if ix.name == "ix_employee_expenses_project_date"
+    )
+    index.create(bind=engine, checkfirst=True)
+
+
+def ensure_task_events():
+    """Журнал task_events: таблица, триггеры на tasks и начальное заполнение.
+
+    События пишут триггеры в той же транзакции, что и изменение задачи, -
+    и для ORM, и для сырого SQL бота и пакетных UPDATE. Шаблоны повторяющихся
+    задач в журнал не попадают. Удаление строки, уже скопированной в
+    tasks_archive, - перенос в архив, а не удаление задачи.
+
+    Для задач, созданных до миграции, история восстанавливается по их
+    колонкам: создание в статусе new в created_at и, если статус другой,
+    один переход в него в finished_at / accepted_at.
+    """
+    events_table = models.TaskEvent.__table__
+    events_table.create(bind=engine, checkfirst=True)
+    archive = models.TaskArchive.__table__.name
+    last_status_at = "(SELECT MAX(at) FROM task_events WHERE task_id = {row}.id AND status IS NOT NULL)"
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            now = "((now() AT TIME ZONE 'UTC') + interval '5 hours')"
+            not_template = "{row}.is_recurring IS NOT TRUE"
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_write_events() RETURNS trigger AS $$
+                DECLARE ts TIMESTAMP := {now};
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        IF {not_template.format(row="NEW")} THEN
+                            INSERT INTO task_events (task_id, kind, at, status, executor_id, high_priority)
+                            VALUES (NEW.id, 'created', ts, COALESCE(NEW.status, 'new'), NEW.executor_id, NEW.high_priority);
+                        END IF;
+                        RETURN NULL;
+                    END IF;
+                    IF TG_OP = 'DELETE' THEN
+                        IF {not_template.format(row="OLD")} AND NOT EXISTS (SELECT 1 FROM {archive} WHERE id = OLD.id) THEN
+                            INSERT INTO task_events (task_id, kind, at, from_status, from_at)
+                            VALUES (OLD.id, 'deleted', ts, OLD.status, {last_status_at.format(row="OLD")});
+                        END IF;
+                        RETURN NULL;
+                    END IF;
+                    IF NOT ({not_template.format(row="NEW")}) THEN
+                        RETURN NULL;
+                    END IF;
+                    IF NEW.status IS DISTINCT FROM OLD.status THEN
+                        INSERT INTO task_events (task_id, kind, at, status, from_status, from_at)
+                        VALUES (NEW.id, 'status', ts, NEW.status, OLD.status, {last_status_at.format(row="NEW")});
+                    END IF;
+                    IF NEW.executor_id IS DISTINCT FROM OLD.executor_id THEN
+                        INSERT INTO task_events (task_id, kind, at, executor_id, from_executor_id)
+                        VALUES (NEW.id, 'executor', ts, NEW.executor_id, OLD.executor_id);
+                    END IF;
+                    IF NEW.high_priority IS DISTINCT FROM OLD.high_priority THEN
+                        INSERT INTO task_events (task_id, kind, at, high_priority)
+                        VALUES (NEW.id, 'priority', ts, NEW.high_priority);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_events ON tasks"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_tasks_events
+                AFTER INSERT OR UPDATE OF status, executor_id, high_priority OR DELETE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION tasks_write_events()
+            """))
+        else:
+            # Миллисекунды, как и у времени из ORM, - события одной секунды упорядочены
+            now = "strftime('%Y-%m-%d %H:%M:%f', 'now', '+5 hours')"
+            not_template = "COALESCE({row}.is_recurring, 0) = 0"
+            triggers = {
+                "trg_task_events_insert": (
+                    f"AFTER INSERT ON tasks WHEN {not_template.format(row='NEW')}",
+                    "INSERT INTO task_events (task_id, kind, at, status, executor_id, high_priority) "
+                    f"VALUES (NEW.id, 'created', {now}, COALESCE(NEW.status, 'new'), NEW.executor_id, NEW.high_priority);",
+                ),
+                "trg_task_events_status": (
+                    "AFTER UPDATE OF status ON tasks "
+                    f"WHEN NEW.status IS NOT OLD.status AND {not_template.format(row='NEW')}",
+                    "INSERT INTO task_events (task_id, kind, at, status, from_status, from_at) "
+                    f"VALUES (NEW.id, 'status', {now}, NEW.status, OLD.status, {last_status_at.format(row='NEW')});",
+                ),
+                "trg_task_events_executor": (
+                    "AFTER UPDATE OF executor_id ON tasks "
+                    f"WHEN NEW.executor_id IS NOT OLD.executor_id AND {not_template.format(row='NEW')}",
+                    "INSERT INTO task_events (task_id, kind, at, executor_id, from_executor_id) "
+                    f"VALUES (NEW.id, 'executor', {now}, NEW.executor_id, OLD.executor_id);",
+                ),
+                "trg_task_events_priority": (
+                    "AFTER UPDATE OF high_priority ON tasks "
+                    f"WHEN NEW.high_priority IS NOT OLD.high_priority AND {not_template.format(row='NEW')}",
+                    "INSERT INTO task_events (task_id, kind, at, high_priority) "
+                    f"VALUES (NEW.id, 'priority', {now}, NEW.high_priority);",
+                ),
+                "trg_task_events_delete": (
+                    f"AFTER DELETE ON tasks WHEN {not_template.format(row='OLD')} "
+                    f"AND NOT EXISTS (SELECT 1 FROM {archive} WHERE id = OLD.id)",
+                    "INSERT INTO task_events (task_id, kind, at, from_status, from_at) "
+                    f"VALUES (OLD.id, 'deleted', {now}, OLD.status, {last_status_at.format(row='OLD')});",
+                ),
+            }
+            for name, (event, body) in triggers.items():
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {body} END"))
+
+        # Начальная история - один раз, по tasks и архиву (tasks_all)
+        if conn.execute(text("SELECT 1 FROM task_events LIMIT 1")).first() is None:
+            history = f"FROM {TASKS_VIEW} t WHERE {not_template.format(row='t')}"
+            created_at = f"COALESCE(t.created_at, {now})"
+            conn.execute(text(
+                "INSERT INTO task_events (task_id, kind, at, status, executor_id, high_priority) "
+                f"SELECT t.id, 'created', {created_at}, 'new', t.executor_id, t.high_priority {history}"
+            ))
+            conn.execute(text(
+                "INSERT INTO task_events (task_id, kind, at, status, from_status, from_at) "
+                f"SELECT t.id, 'status', COALESCE(t.finished_at, t.accepted_at, {created_at}), t.status, 'new', "
+                f"{created_at} {history} AND t.status IS NOT NULL AND t.status <> 'new'"
+            ))
+        conn.commit()
+
+
+def ensure_task_id_autoincrement():
+    """SQLite: tasks.id с AUTOINCREMENT - id задачи никогда не выдается повторно.
+
+    Без AUTOINCREMENT SQLite выдает MAX(id) + 1 и после переноса в архив или
+    удаления последних задач повторяет id, уже записанный в tasks_archive,
+    task_tombstones и task_events. Таблица пересобирается (SQLite не меняет
+    первичный ключ через ALTER): строки, индексы и триггеры переносятся как
+    есть, счетчик sqlite_sequence начинается с наибольшего id, известного
+    базе. В PostgreSQL id из последовательности и так не повторяются.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    table = models.Task.__table__
+    known_ids = (
+        "SELECT MAX(id) AS id FROM tasks UNION ALL SELECT MAX(id) FROM tasks_archive "
+        "UNION ALL SELECT MAX(task_id) FROM task_tombstones UNION ALL SELECT MAX(task_id) FROM task_events"
+    )
+    with engine.connect() as conn:
+        # DROP TABLE при включенных внешних ключах удалял бы ссылки на задачи
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        table_sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+        ).scalar()
+        if "AUTOINCREMENT" not in table_sql.upper():
+            dependents = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master "
+                "WHERE tbl_name = 'tasks' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+            ).scalars().all()
+            existing = conn.exec_driver_sql("PRAGMA table_info(tasks)").all()
+
+            conn.execute(text(f"DROP VIEW IF EXISTS {TASKS_VIEW}"))
+            create_sql = str(CreateTable(table).compile(dialect=engine.dialect))
+            conn.exec_driver_sql(create_sql.replace("CREATE TABLE tasks ", "CREATE TABLE tasks_rebuild ", 1))
+            # Колонки, которых нет в модели, переносятся как есть
+            for column in existing:
+                if column.name not in table.c:
+                    conn.execute(text(f"ALTER TABLE tasks_rebuild ADD COLUMN {column.name} {column.type}"))
+            columns = ", ".join(column.name for column in existing)
+            conn.execute(text(f"INSERT INTO tasks_rebuild ({columns}) SELECT {columns} FROM tasks"))
+            conn.execute(text("DROP TABLE tasks"))
+            # Триггеры других таблиц ссылаются на tasks по имени - не переписывать их
+            conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+            conn.execute(text("ALTER TABLE tasks_rebuild RENAME TO tasks"))
+            conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+            for sql in dependents:
+                conn.exec_driver_sql(sql)
+            print("[OK] Rebuilt tasks table with AUTOINCREMENT id")
+
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'tasks'"))
+        conn.execute(text(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT 'tasks', COALESCE(MAX(id), 0) FROM ({known_ids})"
+        ))
+        conn.commit()
+        conn.exec_driver_sql(f"PRAGMA foreign_keys = {SQLITE_PROFILE['foreign_keys']}")
+    # Представление tasks_all - поверх пересобранной таблицы
+    ensure_task_archive()
+
+
+def ensure_task_archive_delete_events():
+    """Событие 'deleted' в task_events при удалении задачи из tasks_archive.
+
+    Триггер 0014 на tasks не видит удаления из архива (бот удаляет архивные
+    задачи своим DELETE), а перенос в архив удалением из архива не бывает -
+    любое такое удаление и есть удаление задачи.
+    """
+    archive = models.TaskArchive.__table__.name
+    last_status_at = "(SELECT MAX(at) FROM task_events WHERE task_id = OLD.id AND status IS NOT NULL)"
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION tasks_archive_write_deleted_event() RETURNS trigger AS $$
+                BEGIN
+                    IF OLD.is_recurring IS NOT TRUE THEN
+                        INSERT INTO task_events (task_id, kind, at, from_status, from_at)
+                        VALUES (OLD.id, 'deleted', (now() AT TIME ZONE 'UTC') + interval '5 hours',
+                                OLD.status, {last_status_at});
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text(f"DROP TRIGGER IF EXISTS trg_tasks_archive_events ON {archive}"))
+            conn.execute(text(f"""
+                CREATE TRIGGER trg_tasks_archive_events
+                AFTER DELETE ON {archive}
+                FOR EACH ROW EXECUTE FUNCTION tasks_archive_write_deleted_event()
+            """))
+        else:
+            now = "strftime('%Y-%m-%d %H:%M:%f', 'now', '+5 hours')"
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_tasks_archive_events"))
+            conn.execute(text(f"""
+                CREATE TRIGGER trg_tasks_archive_events
+                AFTER DELETE ON {archive} WHEN COALESCE(OLD.is_recurring, 0) = 0
+                BEGIN
+                    INSERT INTO task_events (task_id, kind, at, from_status, from_at)
+                    VALUES (OLD.id, 'deleted', {now}, OLD.status, {last_status_at});
+                END
+            """))
+        conn.commit()
+
+
+# Даты задач, которые SQLite хранит текстом и сравнивает как строки
+TASK_DATETIME_COLUMNS = ("created_at", "deadline", "accepted_at", "finished_at")
+
+
+def _orm_datetime(column: str) -> str:
+    """Дата в формате SQLAlchemy для SQLite: 'YYYY-MM-DD HH:MM:SS.ffffff'.
+
+    'T' между датой и временем меняется на пробел, недостающие время и
+    доли секунды дописываются нулями. Другие значения не меняются.
+    """
+    spaced = (
+        f"CASE WHEN substr({column}, 11, 1) = 'T' "
+        f"THEN substr({column}, 1, 10) || ' ' || substr({column}, 12) ELSE {column} END"
+    )
+    return (
+        f"CASE WHEN length({column}) = 10 THEN {column} || ' 00:00:00.000000' "
+        f"WHEN length({column}) = 19 THEN {spaced} || '.000000' "
+        f"WHEN length({column}) BETWEEN 21 AND 25 AND substr({column}, 20, 1) = '.' "
+        f"THEN {spaced} || substr('000000', 1, 26 - length({column})) "
+        f"ELSE {spaced} END"
+    )
+
+
+def ensure_task_datetime_format():
+    """Один формат дат задач в SQLite: 'YYYY-MM-DD HH:MM:SS.ffffff'.
+
+    SQLite сравнивает даты как текст, а параметры SQLAlchemy пишет с шестью
+    знаками долей секунды. Бот пишет isoformat() ('T', без долей при нулевых
+    микросекундах), CURRENT_TIMESTAMP - без долей: 'HH:MM:SS' < 'HH:MM:SS.000000',
+    и такие строки выпадают из диапазонов по дате и повторяются на границе
+    страниц keyset-пагинации по created_at. Существующие строки приводятся
+    к формату ORM, триггеры приводят новые. В PostgreSQL колонки типа
+    timestamp - ничего делать не нужно.
+    """
+    if engine.dialect.name == "postgresql":
+        return
+    archive = models.TaskArchive.__table__.name
+    assignments = ", ".join(f"{c} = {_orm_datetime(c)}" for c in TASK_DATETIME_COLUMNS)
+    with engine.connect() as conn:
+        for table in ("tasks", archive):
+            unnormalized = " OR ".join(f"{c} != {_orm_datetime(c)}" for c in TASK_DATETIME_COLUMNS)
+            conn.execute(text(f"UPDATE {table} SET {assignments} WHERE {unnormalized}"))
+        new_unnormalized = " OR ".join(f"NEW.{c} != {_orm_datetime('NEW.' + c)}" for c in TASK_DATETIME_COLUMNS)
+        for name, event in (
+            ("trg_tasks_datetime_insert", "AFTER INSERT ON tasks"),
+            ("trg_tasks_datetime_update", f"AFTER UPDATE OF {', '.join(TASK_DATETIME_COLUMNS)} ON tasks"),
+        ):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(f"""
+                CREATE TRIGGER {name} {event} WHEN {new_unnormalized}
+                BEGIN
+                    UPDATE tasks SET {assignments} WHERE id = NEW.id;
+                END
+            """))
+        conn.commit()
+
+
+def ensure_task_created_at():
+    """tasks.created_at всегда заполнена: по ней идет курсор списка задач.
+
+    Пустые значения в tasks и архиве заполняются, как в 0007: временем
+    принятия, завершения или дедлайном, иначе текущим. PostgreSQL получает
+    DEFAULT и NOT NULL. SQLite не меняет ограничения колонки без пересборки
+    таблицы - NULL при вставке и обновлении заменяют триггеры.
+    """
+    archive = models.TaskArchive.__table__.name
+    if engine.dialect.name == "postgresql":
+        now = "(now() AT TIME ZONE 'UTC' + interval '5 hours')"
+    else:
+        # Формат ORM: шесть знаков долей секунды
+        now = "(strftime('%Y-%m-%d %H:%M:%f', 'now', '+5 hours') || '000')"
+    with engine.connect() as conn:
+        for table in ("tasks", archive):
+            conn.execute(text(
+                f"UPDATE {table} SET created_at = COALESCE(accepted_at, finished_at, deadline, {now}) "
+                "WHERE created_at IS NULL"
+            ))
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE tasks ALTER COLUMN created_at SET DEFAULT {now}"))
+            conn.execute(text("ALTER TABLE tasks ALTER COLUMN created_at SET NOT NULL"))
+        else:
+            triggers = {
+                "trg_tasks_created_at_insert": (
+                    "AFTER INSERT ON tasks WHEN NEW.created_at IS NULL",
+                    f"UPDATE tasks SET created_at = {now} WHERE id = NEW.id;",
+                ),
+                "trg_tasks_created_at_update": (
+                    "AFTER UPDATE OF created_at ON tasks WHEN NEW.created_at IS NULL",
+                    f"UPDATE tasks SET created_at = COALESCE(OLD.created_at, {now}) WHERE id = NEW.id;",
+                ),
+            }
+            for name, (event, body) in triggers.items():
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {body} END"))
+        conn.commit()
+
+
+def ensure_task_single_row_version():
+    """SQLite: одно изменение задачи - одна новая row_version.
+
+    Триггеры status_rank, executor_role, формата дат и created_at дописывали
+    колонки отдельным UPDATE tasks после записи, и каждый такой UPDATE снова
+    запускал trg_tasks_row_version_update: версия и счетчик росли на 2-3 за
+    одно изменение. Теперь все производные колонки выставляет тот же UPDATE,
+    что пишет row_version, - он триггер версии не запускает, а отдельные
+    триггеры удаляются. В PostgreSQL производные колонки меняются в NEW
+    BEFORE-триггеров, лишних UPDATE там нет.
+    """
+    if engine.dialect.name == "postgresql":
+        return
+    bump = f"UPDATE change_counters SET version = version + 1 WHERE name = '{TASKS_COUNTER}'"
+    current = f"(SELECT version FROM change_counters WHERE name = '{TASKS_COUNTER}')"
+    now = "(strftime('%Y-%m-%d %H:%M:%f', 'now', '+5 hours') || '000')"
+
+    def set_version(previous_created_at):
+        derived = [
+            f"row_version = {current}",
+            f"status_rank = {_status_rank_case('NEW.status')}",
+            "executor_role = (SELECT role FROM users WHERE id = NEW.executor_id)",
+        ]
+        for column in TASK_DATETIME_COLUMNS:
+            value = _orm_datetime(f"NEW.{column}")
+            if column == "created_at":
+                value = f"COALESCE({value}, {previous_created_at}{now})"
+            derived.append(f"{column} = {value}")
+        return f"UPDATE tasks SET {', '.join(derived)} WHERE id = NEW.id;"
+
+    triggers = {
+        "trg_tasks_row_version_insert": (
+            "AFTER INSERT ON tasks",
+            f"{bump}; {set_version('')} DELETE FROM task_tombstones WHERE task_id = NEW.id;",
+        ),
+        # WHEN: собственный UPDATE row_version триггер повторно не запускает
+        "trg_tasks_row_version_update": (
+            "AFTER UPDATE ON tasks WHEN NEW.row_version IS OLD.row_version",
+            f"{bump}; {set_version('OLD.created_at, ')}",
+        ),
+    }
+    replaced = (
+        "trg_tasks_status_rank_insert", "trg_tasks_status_rank_update",
+        "trg_tasks_executor_role_insert", "trg_tasks_executor_role_update",
+        "trg_tasks_datetime_insert", "trg_tasks_datetime_update",
+        "trg_tasks_created_at_insert", "trg_tasks_created_at_update",
+    )
+    with engine.connect() as conn:
+        for name in replaced:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        for name, (event, body) in triggers.items():
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {body} END"))
+        conn.commit()
+
+
+def create_default_admin():
+    db = SessionLocal()
+    try:
+        if not crud.get_user_by_login(db, "admin"):
+            admin = schemas.UserCreate(
+                telegram_username="admin",
+                name="Administrator", 
+                password=os.getenv("ADMIN_PASSWORD", "admin123"),
+                role=models.RoleEnum.admin,
+            )
+            crud.create_user(db, admin)
+    finally:
+        db.close()
+
+def create_default_taxes():
+    db = SessionLocal()
+    try:
+        if not crud.get_taxes(db):
+            crud.create_tax(db, "ЯТТ", 0.95)
+            crud.create_tax(db, "ООО", 0.83)
+            crud.create_tax(db, "Нал", 1.0)
+    finally:
+        db.close()
+
+
+def create_default_timezone():
+    db = SessionLocal()
+    try:
+        if not db.query(models.Setting).filter(models.Setting.key == "timezone").first():
+            db.add(models.Setting(key="timezone", value="Asia/Tashkent"))
+            db.commit()
+    finally:
+        db.close()
+
+
+def create_default_expense_categories():
+    db = SessionLocal()
+    try:
+        if not db.query(models.ExpenseCategory).first():
+            default_categories = [
+                {"name": "Аренда", "description": "Аренда офиса, помещений"},
+                {"name": "Реклама", "description": "Расходы на рекламу и маркетинг"},
+                {"name": "Зарплата", "description": "Заработная плата сотрудников"},
+                {"name": "Коммунальные", "description": "Электричество, интернет, связь"},
+                {"name": "Канцтовары", "description": "Офисные принадлежности"},
+                {"name": "Транспорт", "description": "Транспортные расходы"},
+                {"name": "Питание", "description": "Питание сотрудников"},
+                {"name": "Оборудование", "description": "Покупка и обслуживание техники"},
+            ]
+            for cat_data in default_categories:
+                category = models.ExpenseCategory(**cat_data)
+                db.add(category)
+            db.commit()
+    finally:
+        db.close()
+
+
+def create_sample_expenses():
+    """Create sample expenses for testing"""
+    db = SessionLocal()
+    try:
+        # Only create if no expenses exist
+        if (db.query(models.CommonExpense).count() == 0 and 
+            db.query(models.ProjectExpense).count() == 0):
+            
+            # Get admin user and categories
+            admin = db.query(models.User).filter(models.User.telegram_username == "admin").first()
+            if not admin:
+                return
+                
+            categories = db.query(models.ExpenseCategory).all()
+            if not categories:
+                return
+            
+            # Get first project if exists
+            project = db.query(models.Project).first()
+            
+            from datetime import date, timedelta
+            import random
+            
+            # Create sample common expenses
+            common_sample_data = [
+                {"name": "Аренда офиса за декабрь", "amount": 2000000, "category_id": categories[0].id, "description": "Ежемесячная аренда офиса"},
+                {"name": "Интернет и связь", "amount": 500000, "category_id": categories[3].id, "description": "Оплата интернета и мобильной связи"},
+                {"name": "Канцелярские товары", "amount": 150000, "category_id": categories[4].id, "description": "Покупка бумаги, ручек, скрепок"},
+                {"name": "Обед для команды", "amount": 300000, "category_id": categories[6].id, "description": "Корпоративный обед"},
+                {"name": "Реклама в Google", "amount": 750000, "category_id": categories[1].id, "description": "Контекстная реклама"},
+            ]
+            
+            for i, expense_data in enumerate(common_sample_data):
+                expense = models.CommonExpense(
+                    **expense_data,
+                    date=date.today() - timedelta(days=random.randint(1, 30)),
+                    created_by=admin.id
+                )
+                db.add(expense)
+            
+            # Create sample project expenses if project exists
+            if project:
+                project_sample_data = [
+                    {"name": "Дизайн логотипа", "amount": 500000, "category_id": categories[1].id, "description": "Создание фирменного стиля"},
+                    {"name": "Видеосъемка", "amount": 1200000, "category_id": categories[1].id, "description": "Съемка рекламного ролика"},
+                    {"name": "Транспорт на съемку", "amount": 80000, "category_id": categories[5].id, "description": "Аренда автомобиля"},
+                ]
+                
+                for expense_data in project_sample_data:
+                    expense = models.ProjectExpense(
+                        **expense_data,
+                        project_id=project.id,
+                        date=date.today() - timedelta(days=random.randint(1, 15)),
+                        created_by=admin.id
+                    )
+                    db.add(expense)
+            
+            db.commit()
+            print("[OK] Sample expenses created")
+    except Exception as e:
+        print(f"Warning: Could not create sample expenses: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def seed_defaults():
+    create_default_admin()
+    create_default_taxes()
+    create_default_timezone()
+    create_default_expense_categories()
+    create_sample_expenses()
+
+
+# Порядок важен: новые миграции добавляются только в конец списка
+MIGRATIONS = [
+    ("0001_create_tables", "Create tables from models", create_tables),
+    ("0002_expense_tables", "Expense tables and project_expenses columns", ensure_expense_tables),
+    ("0003_digital_task_columns", "digital_project_tasks.high_priority/status", ensure_digital_task_priority_column),
+    ("0004_task_columns", "Recurring/overdue columns on tasks", ensure_task_columns),
+    ("0005_indexes", "Composite indexes for tasks, finance, shootings, leads", ensure_indexes),
+    ("0006_seed_defaults", "Default admin, taxes, timezone, expense categories", seed_defaults),
+    ("0007_task_status_rank", "tasks.status_rank column, sync triggers and keyset index", ensure_task_status_rank),
+    ("0008_task_change_versions", "tasks.row_version, task_tombstones and change counter triggers", ensure_task_change_versions),
+    ("0009_task_archive", "tasks_archive table and tasks_all union view", ensure_task_archive),
+    ("0010_task_search", "Full-text task index (FTS5 / tsvector) with sync triggers", ensure_task_search),
+    ("0011_task_executor_role", "tasks.executor_role column, sync triggers and list visibility index", ensure_task_executor_role),
+    ("0012_scheduler_leases", "scheduler_leases table for the recurring tasks scheduler lease", ensure_scheduler_leases),
+    ("0013_task_deadline_index", "tasks (status, deadline) index for the deadline monitor", ensure_task_deadline_index),
+    ("0014_task_events", "Append-only task_events journal with tasks triggers and initial history", ensure_task_events),
+    ("0015_task_id_autoincrement", "SQLite tasks.id AUTOINCREMENT so archived and deleted ids are never reused", ensure_task_id_autoincrement),
+    ("0016_task_archive_delete_events", "task_events 'deleted' rows for deletes from tasks_archive", ensure_task_archive_delete_events),
+    ("0017_task_datetime_format", "SQLite task dates in one text format with normalizing triggers", ensure_task_datetime_format),
+    ("0018_employee_expense_project_index", "employee_expenses (project_id, date, amount) index for project summaries", ensure_employee_expense_project_index),
+    ("0019_task_datetime_fraction", "SQLite task dates with six-digit fractions, triggers recreated", ensure_task_datetime_format),
+    ("0020_task_created_at_not_null", "tasks.created_at backfilled and kept non-NULL for the list cursor", ensure_task_created_at),
+    ("0021_task_single_row_version", "SQLite derived task columns written by the row_version trigger, one version per change", ensure_task_single_row_version),
+]
+
+
+def get_applied_migrations(conn):
+    rows = conn.execute(
+        text("SELECT version FROM database_version WHERE version LIKE :prefix"),
+        {"prefix": MIGRATION_PREFIX + "%"},
+    ).fetchall()
+    return {row[0][len(MIGRATION_PREFIX):] for row in rows}
+
+
+@contextmanager
+def migration_lock():
+    """Не даем двум процессам мигрировать одновременно.
+
+    PostgreSQL - advisory lock на отдельном подключении. В SQLite у writer-движка
+    одно подключение, и миграции и так идут последовательно.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(804201)"))
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(804201)"))
+            conn.commit()
+
+
+def run_migrations():
+    """Применить все недостающие миграции, вернуть [(id, ms)] примененных"""
+    applied_now = []
+    started_total = time.perf_counter()
+    with migration_lock():
+        models.DatabaseVersion.__table__.create(bind=engine, checkfirst=True)
+        with engine.connect() as conn:
+            applied = get_applied_migrations(conn)
+
+        for migration_id, description, migrate in MIGRATIONS:
+            if migration_id in applied:
+                continue
+            started = time.perf_counter()
+            migrate()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with engine.begin() as conn:
+                conn.execute(
+                    models.DatabaseVersion.__table__.insert().values(
+                        version=MIGRATION_PREFIX + migration_id,
+                        updated_at=models.get_local_time_utc5(),
+                        description=f"{description} ({elapsed_ms:.1f} ms)",
+                    )
+                )
+            applied_now.append((migration_id, elapsed_ms))
+            print(f"[OK] Migration {migration_id} applied in {elapsed_ms:.1f} ms")
+
+    total_ms = (time.perf_counter() - started_total) * 1000
+    if applied_now:
+        print(f"[OK] Applied {len(applied_now)} migration(s) in {total_ms:.1f} ms")
+    else:
+        print(f"[OK] Database schema is up to date ({total_ms:.1f} ms)")
+    return applied_now
+
+
+def get_pending_migrations():
+    """Неприменённые миграции - без инспекции схемы, одним SELECT"""
+    try:
+        with engine.connect() as conn:
+            applied = get_applied_migrations(conn)
+    except Exception:
+        # Таблицы database_version еще нет - база не мигрирована
+        return [migration_id for migration_id, _, _ in MIGRATIONS]
+    return [migration_id for migration_id, _, _ in MIGRATIONS if migration_id not in applied]
+
+
+def print_status():
+    pending = set(get_pending_migrations())
+    for migration_id, description, _ in MIGRATIONS:
+        mark = "pending" if migration_id in pending else "applied"
+        print(f"[{mark:>7}] {migration_id}: {description}")
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        print_status()
+    else:
+        run_migrations()
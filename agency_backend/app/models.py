@@ -11,7 +11,13 @@ from sqlalchemy import (
     Date,
     Float,
     BigInteger,
+    Index,
+    FetchedValue,
+    MetaData,
+    Table,
+    text,
 )
+from sqlalchemy import event
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta, timezone
 import enum
@@ -65,6 +71,28 @@ class TaskStatus(str, enum.Enum):
     overdue = "overdue"  # Задача просрочена
     archived = "archived"  # Задача заархивирована (скрыта)
 
+
+class TaskEventKind(str, enum.Enum):
+    created = "created"  # Задача создана
+    status = "status"  # Смена статуса
+    executor = "executor"  # Смена исполнителя
+    priority = "priority"  # Смена high_priority
+    deleted = "deleted"  # Задача удалена (перенос в архив событием не считается)
+
+
+# Порядок статусов в списках задач: в работе сверху, новые в середине,
+# завершенные внизу. Хранится в tasks.status_rank (индекс для keyset-пагинации)
+TASK_STATUS_RANK = {
+    TaskStatus.in_progress: 1,  # В работе - наивысший приоритет
+    TaskStatus.new: 2,          # Новые - средний приоритет
+    TaskStatus.overdue: 3,      # Просроченные - важные
+    TaskStatus.done: 4,         # Завершенные - низкий приоритет
+    TaskStatus.cancelled: 5,    # Отмененные - самый низкий приоритет
+    TaskStatus.archived: 7,     # Архив - не показывается в списках
+}
+TASK_STATUS_RANK_OTHER = 6  # На случай других статусов
+TASK_STATUS_RANK_ARCHIVED = TASK_STATUS_RANK[TaskStatus.archived]
+
 class RecurrenceType(str, enum.Enum):
     daily = "daily"
     weekly = "weekly"
@@ -97,7 +125,42 @@ class Task(Base):
     recurrence_days = Column(String, nullable=True)  # Дни недели/месяца для повтора (1,2,3,4,5 или 15)
     next_run_at = Column(DateTime, nullable=True)  # Когда создать следующую копию
     original_task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True)  # Ссылка на оригинальную повторяющуюся задачу
-    
+    # Ранг статуса для сортировки списков (TASK_STATUS_RANK); при сырых SQL-записях
+    # (бот) его выставляют триггеры из миграции 0007
+    status_rank = Column(Integer, default=TASK_STATUS_RANK[TaskStatus.new], nullable=True)
+    # Версия последнего изменения строки (счетчик change_counters['tasks']);
+    # выставляется триггерами миграции 0008 на любую вставку/изменение
+    row_version = Column(BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    # Роль исполнителя (копия users.role) для фильтра видимости без JOIN с users;
+    # выставляют триггеры миграции 0011 при назначении исполнителя и смене роли
+    executor_role = Column(Enum(RoleEnum), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+
+    __table_args__ = (
+        # Списки задач: фильтр по статусу + сортировка по дате создания
+        Index("ix_tasks_status_created_at", "status", "created_at"),
+        # Аналитика по исполнителям: executor_id + status + finished_at
+        Index("ix_tasks_executor_status_finished", "executor_id", "status", "finished_at"),
+        # Экземпляры повторяющихся задач по шаблону
+        Index(
+            "ix_tasks_original_created_at", "original_task_id", "created_at",
+            sqlite_where=text("original_task_id IS NOT NULL"),
+            postgresql_where=text("original_task_id IS NOT NULL"),
+        ),
+        # Планировщик: только шаблоны повторяющихся задач
+        Index(
+            "ix_tasks_recurring_due", "status", "next_run_at",
+            sqlite_where=text("is_recurring = 1"),
+            postgresql_where=text("is_recurring = true"),
+        ),
+        # Индексы по status_rank, row_version и executor_role создают миграции
+        # 0007, 0008 и 0011 вместе с колонками: ix_tasks_rank_visibility
+        # (status_rank, created_at DESC, id DESC, executor_role, executor_id) и
+        # ix_tasks_row_version (row_version)
+        # Монитор дедлайнов: для каждого открытого статуса - диапазон по deadline
+        Index("ix_tasks_status_deadline", "status", "deadline"),
+        # id не переиспользуются после переноса в архив и удаления (миграция 0015)
+        {"sqlite_autoincrement": True},
+    )
 
     executor = relationship(
         "User",
@@ -110,6 +173,45 @@ class Task(Base):
         back_populates="authored_tasks",
     )
 
+
+@event.listens_for(Task.status, "set")
+def _sync_task_status_rank(task, value, oldvalue, initiator):
+    task.status_rank = TASK_STATUS_RANK.get(value, TASK_STATUS_RANK_OTHER)
+
+
+def _task_columns():
+    """Колонки tasks без внешних ключей и автоинкремента - для архива и tasks_all"""
+    return [
+        Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False)
+        for c in Task.__table__.columns
+    ]
+
+
+class TaskArchive(Base):
+    """Холодные задачи: закрытые задачи старше TASK_ARCHIVE_AFTER_DAYS.
+
+    Строки переносит app.task_archive; колонки те же, что у tasks
+    (недостающие добавляет миграция 0009). Интерактивные запросы сюда не ходят.
+    """
+    __table__ = Table(
+        "tasks_archive",
+        Base.metadata,
+        *_task_columns(),
+        Index("ix_tasks_archive_executor_status_finished", "executor_id", "status", "finished_at"),
+        Index("ix_tasks_archive_created_at", "created_at"),
+    )
+
+
+class TaskHistory(Base):
+    """Все задачи - представление tasks_all (tasks UNION ALL tasks_archive).
+
+    Только для чтения: аналитика и история. Таблица описана в отдельной
+    MetaData, чтобы create_all не создавал ее как обычную таблицу; само
+    представление создает миграция 0009.
+    """
+    __table__ = Table("tasks_all", MetaData(), *_task_columns())
+
+
 class OperatorRole(str, enum.Enum):
     mobile = "mobile"
     video = "video"
@@ -169,6 +271,12 @@ class Shooting(Base):
     completed_managers = Column(String, nullable=True)
     completed_operators = Column(String, nullable=True)
 
+    __table_args__ = (
+        # Отчеты по операторам за период
+        Index("ix_shootings_operator_datetime", "operator_id", "datetime"),
+        Index("ix_shootings_datetime", "datetime"),
+    )
+
     operator = relationship("Operator")
 
 
@@ -228,6 +336,12 @@ class ProjectExpense(Base):
     category = relationship("ExpenseCategory", back_populates="project_expenses")
     creator = relationship("User")
 
+    __table_args__ = (
+        # Отчеты по проекту за месяц; amount в индексе - суммы без чтения таблицы
+        Index("ix_project_expenses_project_date", "project_id", "date", "amount"),
+        Index("ix_project_expenses_date", "date", "amount"),
+    )
+
 
 class CommonExpense(Base):
     __tablename__ = "common_expenses"
@@ -244,6 +358,10 @@ class CommonExpense(Base):
     category = relationship("ExpenseCategory", back_populates="common_expenses")
     creator = relationship("User")
 
+    __table_args__ = (
+        Index("ix_common_expenses_date", "date", "amount"),
+    )
+
 
 class ProjectReceipt(Base):
     __tablename__ = "project_receipts"
@@ -257,6 +375,10 @@ class ProjectReceipt(Base):
 
     project = relationship("Project")
 
+    __table_args__ = (
+        Index("ix_project_receipts_project_created", "project_id", "created_at", "amount"),
+    )
+
 
 class ProjectClientExpense(Base):
     __tablename__ = "project_client_expenses"
@@ -416,6 +538,12 @@ class EmployeeExpense(Base):
     user = relationship("User", back_populates="expenses")
     project = relationship("Project")
 
+    __table_args__ = (
+        Index("ix_employee_expenses_user_date", "user_id", "date", "amount"),
+        Index("ix_employee_expenses_project_date", "project_id", "date", "amount"),
+        Index("ix_employee_expenses_date", "date", "amount"),
+    )
+
 
 class Setting(Base):
     __tablename__ = "settings"
@@ -471,6 +599,11 @@ class Lead(Base):
     attachments = relationship("LeadAttachment", back_populates="lead", cascade="all, delete-orphan")
     history = relationship("LeadHistory", back_populates="lead", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Список заявок сортируется по последней активности
+        Index("ix_leads_last_activity_at", "last_activity_at"),
+    )
+
 
 class LeadNote(Base):
     __tablename__ = "lead_notes"
@@ -564,6 +697,63 @@ class DatabaseVersion(Base):
     description = Column(String, nullable=True)  # Description of what changed
 
 
+class ChangeCounter(Base):
+    """Монотонные счетчики изменений по имени (для tasks - версии строк)"""
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class SchedulerLease(Base):
+    """Аренда роли фонового планировщика: ее держит один процесс до expires_at"""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class TaskTombstone(Base):
+    """Удаленные задачи: id и версия удаления для /tasks/changes"""
+    __tablename__ = "task_tombstones"
+
+    task_id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime, nullable=True)
+
+
+class TaskEvent(Base):
+    """Журнал задач (только добавление): создание, смена статуса, исполнителя и приоритета.
+
+    Пишут триггеры миграций 0014 (tasks) и 0016 (удаление из tasks_archive)
+    в транзакции изменения задачи. Колонки заполнены только те, что относятся
+    к виду события: status - статус после события (created, status),
+    from_status/from_at - прежний статус и когда он начался (status, deleted).
+    """
+    __tablename__ = "task_events"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)  # Без внешнего ключа: журнал переживает архив и удаление
+    kind = Column(Enum(TaskEventKind), nullable=False)
+    at = Column(DateTime, nullable=False)  # Местное время UTC+5, как в tasks
+    status = Column(Enum(TaskStatus), nullable=True)
+    from_status = Column(Enum(TaskStatus), nullable=True)
+    from_at = Column(DateTime, nullable=True)
+    executor_id = Column(Integer, nullable=True)
+    from_executor_id = Column(Integer, nullable=True)
+    high_priority = Column(Boolean, nullable=True)
+
+    __table_args__ = (
+        # История задачи
+        Index("ix_task_events_task_at", "task_id", "at"),
+        # Срез на момент: сколько задач вошло в статус / вышло из него до момента
+        Index("ix_task_events_status_at", "status", "at"),
+        # Переходы за период и время в прежнем статусе - по записям индекса
+        Index("ix_task_events_from_status_at", "from_status", "at", "status", "from_at"),
+    )
+
+
 class WhiteboardBoard(Base):
     __tablename__ = "whiteboard_boards"
 
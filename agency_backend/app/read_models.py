@@ -0,0 +1,489 @@
+"""Read-модели для списков и отчетов.
+
+Запросы на Core select() по нужным колонкам: результат - компактные Row
+(namedtuple-подобные, без identity map и ленивых связей). Row читаются
+pydantic-схемами с from_attributes как есть, а для ответов без схемы
+превращаются в dict через ``_asdict()``.
+"""
+
+import base64
+import heapq
+import json
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .crud import TASK_LIST_ORDER, TASK_NOT_ARCHIVED, TASK_VISIBILITY, _cached_statement, task_visible_to
+from .recurrence import ACTIVE_TEMPLATE_STATUSES, compile_rule, instance_deadline
+
+Task = models.Task.__table__
+# Все задачи, вместе с перенесенными в tasks_archive - для отчетов
+TaskAll = models.TaskHistory.__table__
+User = models.User.__table__
+Project = models.Project.__table__
+EmployeeExpense = models.EmployeeExpense.__table__
+TaskTombstone = models.TaskTombstone.__table__
+ChangeCounter = models.ChangeCounter.__table__
+
+
+def encode_task_cursor(row) -> str:
+    """Непрозрачный курсор: позиция строки в порядке TASK_LIST_ORDER"""
+    raw = json.dumps([row.status_rank, row.created_at.isoformat(), row.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_task_cursor(cursor: str) -> dict:
+    """Параметры keyset-условия из курсора; ValueError, если курсор битый"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, created_at, task_id = json.loads(raw)
+        return {
+            "after_rank": int(rank),
+            "after_created_at": datetime.fromisoformat(created_at),
+            "after_id": int(task_id),
+        }
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _build_task_page_statement(visible_roles=None, after_cursor=False):
+    stmt = select(*Task.c)
+    if visible_roles is not None:
+        stmt = stmt.where(task_visible_to(visible_roles))
+    if after_cursor:
+        # Строки после курсора в порядке (status_rank, created_at DESC, id DESC);
+        # первое условие дает границу диапазона по индексу
+        rank = bindparam("after_rank")
+        created_at = bindparam("after_created_at")
+        stmt = stmt.where(
+            Task.c.status_rank >= rank,
+            (Task.c.status_rank > rank)
+            | (Task.c.created_at < created_at)
+            | ((Task.c.created_at == created_at) & (Task.c.id < bindparam("after_id"))),
+        )
+    return (
+        stmt.where(TASK_NOT_ARCHIVED)
+        .order_by(*TASK_LIST_ORDER)
+        .limit(bindparam("limit"))
+    )
+
+
+def task_page(
+    db: Session,
+    role: Optional[models.RoleEnum] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[list, Optional[str]]:
+    """Страница задач (без архивных) в порядке списка задач и курсор следующей.
+
+    role - фильтр видимости как в crud (None - все задачи). Пагинация по ключу
+    (status_rank, created_at, id), без OFFSET: каждая страница - диапазон индекса.
+    """
+    visible_roles = TASK_VISIBILITY.get(role) if role is not None else None
+    params = decode_task_cursor(cursor) if cursor else {}
+    stmt = _cached_statement(
+        ("task_page", visible_roles, bool(cursor)),
+        lambda: _build_task_page_statement(visible_roles, bool(cursor)),
+    )
+    # Одна лишняя строка показывает, есть ли следующая страница
+    rows = db.execute(stmt, {**params, "limit": limit + 1}).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_task_cursor(rows[-1])
+
+
+def _build_task_changes_statement(visible_roles=None):
+    # Видна ли строка в списке задач пользователя: невидимые клиент удаляет у себя
+    visible = TASK_NOT_ARCHIVED
+    if visible_roles is not None:
+        visible = visible & task_visible_to(visible_roles)
+    return (
+        select(*Task.c, visible.label("visible"))
+        .where(Task.c.row_version > bindparam("since"), Task.c.row_version <= bindparam("upto"))
+        .order_by(Task.c.row_version)
+        .limit(bindparam("limit"))
+    )
+
+
+TASK_TOMBSTONES_SINCE = (
+    select(TaskTombstone.c.task_id, TaskTombstone.c.version)
+    .where(TaskTombstone.c.version > bindparam("since"), TaskTombstone.c.version <= bindparam("upto"))
+    .order_by(TaskTombstone.c.version)
+    .limit(bindparam("limit"))
+)
+TASKS_COUNTER_VERSION = select(ChangeCounter.c.version).where(ChangeCounter.c.name == "tasks")
+
+
+def task_changes(
+    db: Session, role: Optional[models.RoleEnum] = None, since: int = 0, limit: int = 500
+) -> dict:
+    """Изменения задач после версии since (не больше limit записей).
+
+    changes - измененные и видимые пользователю строки; deleted - id удаленных
+    задач и задач, которые перестали быть видны (архив, смена исполнителя).
+    version - следующий since для клиента; has_more - есть ли еще изменения;
+    reset - версия клиента новее базы (например, после восстановления из
+    бэкапа), локальную копию нужно загрузить заново.
+    """
+    # Верхняя граница читается первой: строки, записанные во время ответа,
+    # уйдут в следующий запрос, а не потеряются
+    upto = db.execute(TASKS_COUNTER_VERSION).scalar() or 0
+    if since > upto:
+        return {"version": upto, "changes": [], "deleted": [], "has_more": False, "reset": True}
+    visible_roles = TASK_VISIBILITY.get(role) if role is not None else None
+    stmt = _cached_statement(
+        ("task_changes", visible_roles),
+        lambda: _build_task_changes_statement(visible_roles),
+    )
+    params = {"since": since, "upto": upto, "limit": limit + 1}
+    entries = [(row.row_version, row) for row in db.execute(stmt, params).all()]
+    entries += [(row.version, row.task_id) for row in db.execute(TASK_TOMBSTONES_SINCE, params).all()]
+    entries.sort(key=lambda entry: entry[0])
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changes, deleted = [], []
+    for _, entry in entries:
+        if isinstance(entry, int):
+            deleted.append(entry)
+        elif entry.visible:
+            changes.append({k: v for k, v in entry._asdict().items() if k != "visible"})
+        else:
+            deleted.append(entry.id)
+    return {
+        "version": entries[-1][0] if has_more else upto,
+        "changes": changes,
+        "deleted": deleted,
+        "has_more": has_more,
+        "reset": False,
+    }
+
+
+def _task_scope(role: Optional[models.RoleEnum], start: Optional[datetime], end: Optional[datetime]) -> list:
+    """Условия на tasks_all: задачи не в статусе archived, видимые роли и
+    созданные в [start, end) - как в списке задач, но вместе с tasks_archive"""
+    conditions = [TaskAll.c.status_rank < models.TASK_STATUS_RANK_ARCHIVED]
+    visible_roles = TASK_VISIBILITY.get(role) if role is not None else None
+    if visible_roles is not None:
+        conditions.append(TaskAll.c.executor_role.in_(visible_roles) | TaskAll.c.executor_id.is_(None))
+    if start is not None:
+        conditions.append(TaskAll.c.created_at >= start)
+    if end is not None:
+        conditions.append(TaskAll.c.created_at < end)
+    return conditions
+
+
+def _sum_of(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+TASK_DONE = TaskAll.c.status == models.TaskStatus.done
+
+
+def _summary_counts(db: Session, conditions: list) -> dict:
+    # Просрочена - статус overdue, его выставляет монитор дедлайнов (как в /analytics)
+    row = db.execute(
+        select(
+            func.count().label("total"),
+            _sum_of(TASK_DONE).label("completed"),
+            _sum_of(TaskAll.c.status == models.TaskStatus.overdue).label("overdue"),
+        ).where(*conditions)
+    ).one()
+    return row._asdict()
+
+
+def task_summary(
+    db: Session,
+    role: Optional[models.RoleEnum],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    previous_start: Optional[datetime] = None,
+    previous_end: Optional[datetime] = None,
+) -> dict:
+    """Сводка по задачам, созданным в [start, end), для страницы аналитики.
+
+    current/previous - всего, завершено и просрочено за период и за прошлый
+    период (для трендов); executors - назначено и завершено по исполнителям;
+    days - создано и завершено по дням; roles - все задачи по роли
+    исполнителя, без фильтра по периоду. Видимость - как у /tasks/; задачи
+    из tasks_archive учитываются (читается tasks_all).
+    """
+    conditions = _task_scope(role, start, end)
+    previous = None
+    if previous_start is not None and previous_end is not None:
+        previous = _summary_counts(db, _task_scope(role, previous_start, previous_end))
+
+    executors = db.execute(
+        select(
+            TaskAll.c.executor_id,
+            func.count().label("assigned"),
+            _sum_of(TASK_DONE).label("completed"),
+        )
+        .where(*conditions, TaskAll.c.executor_id.isnot(None))
+        .group_by(TaskAll.c.executor_id)
+    ).all()
+
+    days = {}
+    created_day = func.date(TaskAll.c.created_at)
+    for day, count in db.execute(
+        select(created_day, func.count()).where(*conditions).group_by(created_day)
+    ).all():
+        days[str(day)] = {"day": str(day), "created": count, "completed": 0}
+    finished_day = func.date(TaskAll.c.finished_at)
+    for day, count in db.execute(
+        select(finished_day, func.count())
+        .where(*conditions, TaskAll.c.finished_at.isnot(None))
+        .group_by(finished_day)
+    ).all():
+        days.setdefault(str(day), {"day": str(day), "created": 0, "completed": 0})["completed"] = count
+
+    roles = db.execute(
+        select(TaskAll.c.executor_role.label("role"), func.count().label("count"))
+        .where(*_task_scope(role, None, None), TaskAll.c.executor_role.isnot(None))
+        .group_by(TaskAll.c.executor_role)
+    ).all()
+
+    return {
+        "current": _summary_counts(db, conditions),
+        "previous": previous,
+        "executors": [row._asdict() for row in executors],
+        "days": sorted(days.values(), key=lambda entry: entry["day"]),
+        "roles": [row._asdict() for row in roles],
+    }
+
+
+def task_report(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    executor_id: Optional[int] = None,
+    project: Optional[str] = None,
+    source: str = "all",
+    status: str = "all",
+    limit: int = 100,
+    offset: int = 0,
+) -> Tuple[dict, list, Optional[int]]:
+    """Отчет по сотрудникам: счетчики по статусам и страница задач.
+
+    Фильтры - исполнитель, проект, период создания [start, end) и источник
+    (smm - тип задачи содержит "smm", tasks - остальные). Счетчики считаются
+    без фильтра status, страница - с ним; незавершенные идут первыми, дальше
+    по дедлайну (или дате создания). Читается tasks_all - вместе с задачами
+    из tasks_archive. Возвращает (счетчики, строки, next_offset).
+    """
+    conditions = _task_scope(None, start, end)
+    if executor_id is not None:
+        conditions.append(TaskAll.c.executor_id == executor_id)
+    if project:
+        conditions.append(TaskAll.c.project == project)
+    smm = func.lower(func.coalesce(TaskAll.c.task_type, "")).like("%smm%")
+    if source == "smm":
+        conditions.append(smm)
+    elif source == "tasks":
+        conditions.append(~smm)
+
+    counts = db.execute(
+        select(
+            func.count().label("all"),
+            _sum_of(TASK_DONE).label("done"),
+            _sum_of(TaskAll.c.status == models.TaskStatus.in_progress).label("in_progress"),
+            _sum_of(TaskAll.c.status == models.TaskStatus.new).label("new"),
+        ).where(*conditions)
+    ).one()
+
+    if status == "new":
+        conditions.append(TaskAll.c.status == models.TaskStatus.new)
+    elif status == "done":
+        conditions.append(TASK_DONE)
+    elif status == "in_progress":
+        conditions.append(TaskAll.c.status.not_in(
+            [models.TaskStatus.done, models.TaskStatus.cancelled, models.TaskStatus.new]
+        ))
+    rows = db.execute(
+        select(*TaskAll.c)
+        .where(*conditions)
+        .order_by(case((TASK_DONE, 1), else_=0), func.coalesce(TaskAll.c.deadline, TaskAll.c.created_at), TaskAll.c.id)
+        .offset(offset)
+        .limit(limit + 1)
+    ).all()
+    next_offset = offset + limit if len(rows) > limit else None
+    return counts._asdict(), rows[:limit], next_offset
+
+
+def _build_recurring_templates_statement(visible_roles=None, by_executor=False):
+    stmt = select(
+        Task.c.id, Task.c.title, Task.c.project, Task.c.task_type, Task.c.task_format,
+        Task.c.high_priority, Task.c.executor_id, Task.c.deadline,
+        Task.c.recurrence_type, Task.c.recurrence_time, Task.c.recurrence_days, Task.c.next_run_at,
+    ).where(
+        # Условия частичного индекса ix_tasks_recurring_due
+        Task.c.is_recurring == True,  # noqa: E712
+        Task.c.status.in_(ACTIVE_TEMPLATE_STATUSES),
+        Task.c.next_run_at < bindparam("end"),
+    )
+    if visible_roles is not None:
+        stmt = stmt.where(task_visible_to(visible_roles))
+    if by_executor:
+        stmt = stmt.where(Task.c.executor_id == bindparam("executor_id"))
+    return stmt
+
+
+def _template_runs(template, rule, start: datetime, end: datetime):
+    for run_at in rule.occurrences(template.next_run_at, start, end):
+        yield run_at, template.id, template
+
+
+def recurring_occurrences(
+    db: Session,
+    role: Optional[models.RoleEnum] = None,
+    start: datetime = None,
+    end: datetime = None,
+    executor_id: Optional[int] = None,
+    limit: int = 5000,
+) -> Tuple[list, bool]:
+    """Виртуальные экземпляры повторяющихся задач с запуском в [start, end).
+
+    Запуски каждого шаблона перечисляет его правило (app.recurrence), потоки
+    шаблонов сливаются по времени запуска. В tasks ничего не пишется.
+    Возвращает (экземпляры, обрезан ли список по limit).
+    """
+    visible_roles = TASK_VISIBILITY.get(role) if role is not None else None
+    by_executor = executor_id is not None
+    stmt = _cached_statement(
+        ("recurring_templates", visible_roles, by_executor),
+        lambda: _build_recurring_templates_statement(visible_roles, by_executor),
+    )
+    params = {"end": end}
+    if by_executor:
+        params["executor_id"] = executor_id
+
+    streams = []
+    for template in db.execute(stmt, params).all():
+        try:
+            rule = compile_rule(template.recurrence_type, template.recurrence_time, template.recurrence_days)
+        except ValueError:
+            # Шаблон без корректного времени планировщик тоже пропускает
+            continue
+        if rule is not None:
+            streams.append(_template_runs(template, rule, start, end))
+
+    items = []
+    for run_at, _, template in islice(heapq.merge(*streams), limit + 1):
+        items.append({
+            "template_id": template.id,
+            "run_at": run_at,
+            "deadline": instance_deadline(template.deadline, run_at),
+            "title": template.title,
+            "project": template.project,
+            "task_type": template.task_type,
+            "task_format": template.task_format,
+            "high_priority": template.high_priority,
+            "executor_id": template.executor_id,
+        })
+    return items[:limit], len(items) > limit
+
+
+def sync_summary(db: Session) -> dict:
+    """Сводка для /sync/check агрегатами в БД, без загрузки всех строк"""
+    active_user = (User.c.is_active == True)
+    users = db.execute(
+        select(
+            func.count().label("total"),
+            func.coalesce(func.sum(case((active_user, 1), else_=0)), 0).label("active"),
+            func.coalesce(func.sum(
+                case((active_user & User.c.telegram_id.isnot(None), 1), else_=0)
+            ), 0).label("with_telegram"),
+        ).select_from(User)
+    ).one()
+    users_without_telegram = db.execute(
+        select(User.c.name, User.c.role).where(active_user, User.c.telegram_id.is_(None))
+    ).all()
+
+    projects = db.execute(
+        select(
+            func.count().label("total"),
+            func.coalesce(func.sum(case((Project.c.is_archived == True, 0), else_=1)), 0).label("active"),
+        ).select_from(Project)
+    ).one()
+
+    # (now - created_at).days <= 7  <=>  created_at > now - 8 дней
+    recent_since = datetime.now() - timedelta(days=8)
+    closed = Task.c.status.in_([models.TaskStatus.done, models.TaskStatus.cancelled])
+    tasks = db.execute(
+        select(
+            func.count().label("total"),
+            func.coalesce(func.sum(case((closed, 0), else_=1)), 0).label("active"),
+            func.coalesce(func.sum(case((Task.c.created_at > recent_since, 1), else_=0)), 0).label("recent"),
+            func.coalesce(func.sum(case((Task.c.executor_id.is_(None), 1), else_=0)), 0).label("no_executor"),
+            func.coalesce(func.sum(case(
+                (Task.c.executor_id.isnot(None) & User.c.id.is_(None), 1), else_=0
+            )), 0).label("invalid_executor"),
+        ).select_from(Task.outerjoin(User, Task.c.executor_id == User.c.id))
+    ).one()
+
+    return {
+        "users": users,
+        "users_without_telegram": users_without_telegram,
+        "projects": projects,
+        "tasks": tasks,
+    }
+
+
+def employee_expense_report(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    role: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> List[dict]:
+    """Отчет по расходам сотрудников тремя запросами вместо запроса на каждого"""
+    user_stmt = select(*User.c).where(User.c.is_active == True)
+    if role:
+        user_stmt = user_stmt.where(User.c.role == role)
+    if user_id:
+        user_stmt = user_stmt.where(User.c.id == user_id)
+    users = db.execute(user_stmt).all()
+    if not users:
+        return []
+
+    expenses = db.execute(
+        select(*EmployeeExpense.c)
+        .where(
+            EmployeeExpense.c.user_id.in_([u.id for u in users]),
+            EmployeeExpense.c.date >= start_date,
+            EmployeeExpense.c.date <= end_date,
+        )
+        .order_by(EmployeeExpense.c.id)
+    ).all()
+
+    project_ids = {e.project_id for e in expenses if e.project_id}
+    projects = {}
+    if project_ids:
+        projects = {
+            p.id: p for p in db.execute(select(*Project.c).where(Project.c.id.in_(project_ids))).all()
+        }
+
+    users_by_id = {u.id: u for u in users}
+    expenses_by_user = {u.id: [] for u in users}
+    for expense in expenses:
+        expenses_by_user[expense.user_id].append({
+            **expense._asdict(),
+            "user": users_by_id[expense.user_id],
+            "project": projects.get(expense.project_id),
+        })
+
+    return [
+        {
+            "user_id": user.id,
+            "user_name": user.name,
+            "role": user.role,
+            "total_amount": float(sum(e["amount"] for e in expenses_by_user[user.id])),
+            "expenses": expenses_by_user[user.id],
+        }
+        for user in users
+    ]
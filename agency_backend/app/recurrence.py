@@ -0,0 +1,165 @@
+"""Правила повторения задач: следующий запуск и все запуски в окне дат.
+
+Поля шаблона recurrence_type, recurrence_time и recurrence_days
+компилируются в правило (compile_rule, с кэшем по этим трем полям):
+
+- WeekdayRule - HH:MM в выбранные дни недели 1..7 (daily и weekly с
+  recurrence_days; daily без дней - каждый день);
+- MonthDayRule - HH:MM в день месяца (monthly с днем); если в месяце нет
+  такого дня, запуск переносится на последний день;
+- IntervalRule - HH:MM каждые 7 или 30 дней от предыдущего запуска (weekly и
+  monthly без дней).
+
+next_after(t) дает следующий запуск за O(1). Через него считают
+crud.calculate_next_run_at и планировщик. occurrences(anchor, start, end)
+перечисляет запуски в окне за O(числа запусков): первый запуск окна
+вычисляется сразу, без перебора дней от anchor. anchor - next_run_at
+шаблона: раньше него запусков нет, от него отсчитываются интервалы.
+
+Правила ничего не пишут в БД - read_models.recurring_occurrences строит по
+ним виртуальные экземпляры для календаря и планирования загрузки.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from . import models
+
+# Шаблон создает экземпляры только в этих статусах (done/cancelled - приостановлен)
+ACTIVE_TEMPLATE_STATUSES = (models.TaskStatus.new, models.TaskStatus.in_progress)
+
+ALL_WEEKDAYS = (1, 2, 3, 4, 5, 6, 7)
+DAY = timedelta(days=1)
+
+
+class RecurrenceRule:
+    """Время запуска HH:MM; подклассы задают, в какие дни"""
+
+    def __init__(self, hour: int, minute: int):
+        self.hour = hour
+        self.minute = minute
+
+    def _at(self, day: datetime) -> datetime:
+        return day.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+
+    def next_after(self, after: datetime) -> Optional[datetime]:
+        """Первый запуск строго после after (None - запусков нет)"""
+        raise NotImplementedError
+
+    def _first_from(self, anchor: datetime, start: datetime) -> Optional[datetime]:
+        # Календарные правила: первый запуск не раньше start (start > anchor)
+        return self.next_after(start - timedelta(microseconds=1))
+
+    def occurrences(self, anchor: datetime, start: datetime, end: datetime) -> Iterator[datetime]:
+        """Запуски в [start, end) из последовательности anchor, next_after(anchor), ..."""
+        run_at = anchor if anchor >= start else self._first_from(anchor, start)
+        while run_at is not None and run_at < end:
+            yield run_at
+            run_at = self.next_after(run_at)
+
+
+class WeekdayRule(RecurrenceRule):
+    def __init__(self, hour: int, minute: int, weekdays):
+        super().__init__(hour, minute)
+        self.weekdays = tuple(sorted(set(weekdays)))
+        # Для каждого дня недели - сколько дней до ближайшего выбранного (включая его самого)
+        self._offsets = {
+            weekday: min(((d - weekday) % 7 for d in self.weekdays), default=None)
+            for weekday in ALL_WEEKDAYS
+        }
+
+    def next_after(self, after):
+        run_at = self._at(after)
+        if run_at <= after:
+            run_at += DAY
+        offset = self._offsets[run_at.isoweekday()]
+        return None if offset is None else run_at + timedelta(days=offset)
+
+
+class MonthDayRule(RecurrenceRule):
+    def __init__(self, hour: int, minute: int, day: int):
+        super().__init__(hour, minute)
+        self.day = min(max(day, 1), 31)
+
+    def _in_month(self, like: datetime, year: int, month: int) -> datetime:
+        day = min(self.day, calendar.monthrange(year, month)[1])
+        return self._at(like.replace(year=year, month=month, day=day))
+
+    def next_after(self, after):
+        run_at = self._in_month(after, after.year, after.month)
+        if run_at <= after:
+            year, month = (after.year + 1, 1) if after.month == 12 else (after.year, after.month + 1)
+            run_at = self._in_month(after, year, month)
+        return run_at
+
+
+class IntervalRule(RecurrenceRule):
+    def __init__(self, hour: int, minute: int, days: int):
+        super().__init__(hour, minute)
+        self.period = timedelta(days=days)
+
+    def next_after(self, after):
+        run_at = self._at(after)
+        return run_at if run_at > after else run_at + self.period
+
+    def _first_from(self, anchor, start):
+        # Интервалы идут от запуска после anchor - сразу к нужному номеру шага
+        first = self.next_after(anchor)
+        if first >= start:
+            return first
+        steps = -((first - start) // self.period)
+        return first + steps * self.period
+
+
+def _parse_days(recurrence_days: Optional[str]):
+    if not recurrence_days:
+        return []
+    try:
+        return [int(d.strip()) for d in recurrence_days.split(",") if d.strip()]
+    except ValueError:
+        return []
+
+
+@lru_cache(maxsize=1024)
+def _compile(recurrence_type: str, recurrence_time: str, recurrence_days: Optional[str]) -> Optional[RecurrenceRule]:
+    try:
+        hour, minute = map(int, recurrence_time.split(":"))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError
+    except (ValueError, AttributeError):
+        raise ValueError(f"Invalid generation_time format: {recurrence_time}. Expected HH:MM")
+
+    days = _parse_days(recurrence_days)
+    if recurrence_type == models.RecurrenceType.daily.value:
+        # Дни заданы, но ни одного корректного - запусков нет
+        return WeekdayRule(hour, minute, [d for d in days if d in ALL_WEEKDAYS] if days else ALL_WEEKDAYS)
+    if recurrence_type == models.RecurrenceType.weekly.value:
+        if days:
+            return WeekdayRule(hour, minute, [d for d in days if d in ALL_WEEKDAYS])
+        return IntervalRule(hour, minute, 7)
+    if recurrence_type == models.RecurrenceType.monthly.value:
+        if days:
+            # Используется первый день из списка
+            return MonthDayRule(hour, minute, days[0])
+        return IntervalRule(hour, minute, 30)
+    return None
+
+
+def compile_rule(recurrence_type, recurrence_time: Optional[str], recurrence_days: Optional[str] = None) -> Optional[RecurrenceRule]:
+    """Правило по полям шаблона; None - неизвестный тип повторения.
+
+    ValueError - время не задано или не в формате HH:MM.
+    """
+    if not recurrence_time:
+        raise ValueError("generation_time is required for recurring tasks")
+    recurrence_type = getattr(recurrence_type, "value", recurrence_type)
+    return _compile(recurrence_type, recurrence_time, recurrence_days)
+
+
+def instance_deadline(template_deadline: Optional[datetime], run_at: datetime) -> Optional[datetime]:
+    """Дедлайн экземпляра: время дедлайна шаблона на дату запуска"""
+    if template_deadline is None:
+        return None
+    return datetime.combine(run_at.date(), template_deadline.time())
@@ -0,0 +1,381 @@
+"""Планировщик повторяющихся задач: куча сроков и аренда роли в БД.
+
+Поток планировщика стартует в каждом воркере, но экземпляры создает только
+процесс, который держит аренду scheduler_leases['recurring_tasks']. Аренда
+продлевается каждые RECURRING_LEASE_SECONDS / 3 секунд; если держатель
+упал, через RECURRING_LEASE_SECONDS ее забирает другой воркер.
+
+Лидер держит в памяти min-кучу (next_run_at, id шаблона) и спит до
+ближайшего срока. Создание и изменение шаблона через сессию (API,
+/tasks/bulk) увеличивает счетчик change_counters['recurring_templates'] и
+сразу будит поток своего процесса; лидер в другом процессе замечает новый
+счетчик за RECURRING_WAKE_POLL секунд. Тогда куча перечитывается. Раз в
+RECURRING_RESYNC_SECONDS она перечитывается и без сигнала: так учитываются
+правки бота сырым SQL.
+
+Куча задает только время пробуждения. Сработавшие шаблоны выбираются из БД
+по индексу ix_tasks_recurring_due. На каждый пропущенный запуск (например,
+после простоя) создается экземпляр, но не больше RECURRING_CATCHUP_MAX на
+шаблон; остальные пропуски не восстанавливаются. Все экземпляры вставляются
+одним многострочным INSERT. next_run_at шаблона сдвигается условным UPDATE
+(... WHERE row_version = прочитанная версия), поэтому запуск не создается
+дважды, даже если аренды пересеклись. Уведомления исполнителям отправляются
+одним пакетом после commit.
+"""
+
+import heapq
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, event, inspect, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import events, models, telegram_notifier
+from .change_versions import _bump
+from .crud import calculate_next_run_at
+from .database import ReadSessionLocal, SessionLocal
+from .recurrence import ACTIVE_TEMPLATE_STATUSES, instance_deadline
+
+logger = logging.getLogger(__name__)
+
+# Срок аренды роли планировщика, секунды
+RECURRING_LEASE_SECONDS = float(os.getenv("RECURRING_LEASE_SECONDS", "30"))
+# Как часто лидер проверяет счетчик изменений шаблонов из других процессов
+RECURRING_WAKE_POLL = float(os.getenv("RECURRING_WAKE_POLL", "2"))
+# Полное перечитывание кучи без сигнала (правки сырым SQL)
+RECURRING_RESYNC_SECONDS = float(os.getenv("RECURRING_RESYNC_SECONDS", "300"))
+# Сколько пропущенных запусков одного шаблона восстанавливать за раз
+RECURRING_CATCHUP_MAX = int(os.getenv("RECURRING_CATCHUP_MAX", "31"))
+
+LEASE_NAME = "recurring_tasks"
+TEMPLATES_COUNTER = "recurring_templates"
+# Поля задачи, от которых зависит расписание
+SCHEDULE_FIELDS = ("is_recurring", "recurrence_type", "recurrence_time", "recurrence_days", "next_run_at", "status")
+
+_PENDING_KEY = "recurring_templates_changed"
+
+Task = models.Task.__table__
+User = models.User.__table__
+Lease = models.SchedulerLease.__table__
+ChangeCounter = models.ChangeCounter.__table__
+
+_IS_TEMPLATE = Task.c.is_recurring == True  # noqa: E712 - условие частичного индекса
+SCHEDULE = select(Task.c.next_run_at, Task.c.id).where(
+    _IS_TEMPLATE, Task.c.status.in_(ACTIVE_TEMPLATE_STATUSES), Task.c.next_run_at.is_not(None)
+)
+DUE_TEMPLATES = (
+    select(Task)
+    .where(_IS_TEMPLATE, Task.c.status.in_(ACTIVE_TEMPLATE_STATUSES), Task.c.next_run_at <= bindparam("now"))
+    .order_by(Task.c.next_run_at)
+)
+TEMPLATES_VERSION = select(ChangeCounter.c.version).where(ChangeCounter.c.name == TEMPLATES_COUNTER)
+EXECUTORS = select(User.c.id, User.c.role, User.c.telegram_id)
+
+
+def _local_now() -> datetime:
+    # В БД время хранится без часового пояса
+    return models.get_local_time_utc5().replace(tzinfo=None)
+
+
+class LeaderLease:
+    """Аренда роли в scheduler_leases: строка name принадлежит holder до expires_at"""
+
+    def __init__(self, name: str, seconds: float):
+        self.name = name
+        self.seconds = seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """Взять или продлить аренду; False - ее держит другой живой процесс"""
+        now = datetime.utcnow()
+        values = {"holder": self.holder, "expires_at": now + timedelta(seconds=self.seconds)}
+        db = SessionLocal()
+        try:
+            taken = db.execute(
+                update(Lease)
+                .where(Lease.c.name == self.name, or_(Lease.c.holder == self.holder, Lease.c.expires_at < now))
+                .values(**values)
+            ).rowcount
+            if not taken:
+                insert_ = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+                taken = db.execute(
+                    insert_(Lease).values(name=self.name, **values).on_conflict_do_nothing(index_elements=[Lease.c.name])
+                ).rowcount
+            db.commit()
+            return bool(taken)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class RecurringScheduler:
+    """Поток планировщика и счетчики для /admin/recurring-scheduler/stats"""
+
+    def __init__(self, lease: LeaderLease, wake_poll: float, resync_seconds: float, catchup_max: int):
+        self.lease = lease
+        self.wake_poll = wake_poll
+        self.resync_seconds = resync_seconds
+        self.catchup_max = catchup_max
+        self.counters = Counter()
+        self.is_leader = False
+        self.last_run_at = None
+        self._heap = []            # (next_run_at, id шаблона)
+        self._version = None       # счетчик шаблонов на момент чтения кучи
+        self._stale = True
+        self._loaded_at = 0.0
+        self._renew_at = 0.0
+        self._poll_at = 0.0
+        self._wake = threading.Event()
+
+    def wake(self):
+        """Из любого потока: шаблоны изменились, перечитать кучу"""
+        self._wake.set()
+
+    def reload(self, db: Session):
+        self._version = db.execute(TEMPLATES_VERSION).scalar()
+        self._heap = [tuple(row) for row in db.execute(SCHEDULE)]
+        heapq.heapify(self._heap)
+        self._stale = False
+        self._loaded_at = time.monotonic()
+        self._poll_at = self._loaded_at + self.wake_poll
+        self.counters["reloads"] += 1
+
+    def _next_runs(self, template, now: datetime):
+        """Пропущенные запуски шаблона до now и следующий запуск после них"""
+        runs = []
+        run_at = template.next_run_at
+        while run_at is not None and run_at <= now:
+            if len(runs) == self.catchup_max:
+                self.counters["skipped_runs"] += 1
+                run_at = calculate_next_run_at(
+                    template.recurrence_type, None, template.recurrence_time, template.recurrence_days, after=now
+                )
+                break
+            runs.append(run_at)
+            run_at = calculate_next_run_at(
+                template.recurrence_type, None, template.recurrence_time, template.recurrence_days, after=run_at
+            )
+        return runs, run_at
+
+    def run_due(self, now: datetime) -> int:
+        """Создать экземпляры сработавших шаблонов; возвращает их число"""
+        db = SessionLocal()
+        try:
+            rows = []
+            for template in db.execute(DUE_TEMPLATES, {"now": now}).all():
+                try:
+                    runs, next_run_at = self._next_runs(template, now)
+                except ValueError as e:
+                    self.counters["invalid_templates"] += 1
+                    logger.warning(f"[CRON] Recurring template {template.id} skipped: {e}")
+                    continue
+                moved = db.execute(
+                    update(Task)
+                    .where(Task.c.id == template.id, Task.c.row_version == template.row_version)
+                    .values(next_run_at=next_run_at)
+                ).rowcount
+                if not moved:
+                    # Шаблон изменили после чтения, а из кучи он уже снят -
+                    # следующий tick сразу перечитает расписание из БД
+                    self.counters["conflicts"] += 1
+                    self._stale = True
+                    continue
+                if next_run_at is not None:
+                    heapq.heappush(self._heap, (next_run_at, template.id))
+                rows.extend(_instance_row(template, run_at, now) for run_at in runs)
+
+            task_ids = []
+            if rows:
+                task_ids = db.execute(
+                    insert(Task).returning(Task.c.id, sort_by_parameter_order=True), rows
+                ).scalars().all()
+            executor_ids = {row["executor_id"] for row in rows} - {None}
+            executors = {}
+            if executor_ids:
+                executors = {e.id: e for e in db.execute(EXECUTORS.where(User.c.id.in_(executor_ids)))}
+            events.queue(db, _created_events(rows, task_ids, executors))
+            notifications = _notifications(rows, task_ids, executors)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self.counters["created"] += len(task_ids)
+        if task_ids:
+            logger.info(f"[CRON] Created {len(task_ids)} task instances from recurring templates")
+        if notifications:
+            telegram_notifier.send_task_notifications(notifications)
+        return len(task_ids)
+
+    def tick(self) -> float:
+        """Один проход: аренда, куча, сработавшие шаблоны. Возвращает паузу до следующего"""
+        clock = time.monotonic()
+        if clock >= self._renew_at:
+            leader = self.lease.acquire()
+            self._renew_at = clock + self.lease.seconds / 3
+            if leader != self.is_leader:
+                self.is_leader = leader
+                self._stale = True
+                self.counters["leader_acquired" if leader else "leader_lost"] += 1
+                logger.info(f"[CRON] Recurring scheduler {'is' if leader else 'is no longer'} the leader ({self.lease.holder})")
+        if not self.is_leader:
+            self._heap = []
+            return max(self._renew_at - clock, 0)
+
+        db = ReadSessionLocal()
+        try:
+            if not self._stale and clock >= self._poll_at:
+                self._poll_at = clock + self.wake_poll
+                self._stale = db.execute(TEMPLATES_VERSION).scalar() != self._version
+            if self._stale or clock - self._loaded_at >= self.resync_seconds:
+                self.reload(db)
+        finally:
+            db.close()
+
+        now = _local_now()
+        if self._heap and self._heap[0][0] <= now:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+            self.counters["runs"] += 1
+            self.last_run_at = now
+            self.run_due(now)
+            if self._stale:
+                return 0
+
+        pause = min(self._renew_at - clock, self._poll_at - clock, self.resync_seconds)
+        if self._heap:
+            pause = min(pause, (self._heap[0][0] - _local_now()).total_seconds())
+        return max(pause, 0)
+
+    def run_forever(self):
+        while True:
+            try:
+                pause = self.tick()
+            except Exception as e:
+                self.counters["errors"] += 1
+                self._stale = True
+                logger.error(f"❌ Error in recurring tasks scheduler: {e}")
+                pause = self.wake_poll
+            if self._wake.wait(pause):
+                self._wake.clear()
+                self._stale = True
+
+    def stats(self):
+        return {
+            "holder": self.lease.holder,
+            "is_leader": self.is_leader,
+            "scheduled": len(self._heap),
+            "next_run_at": self._heap[0][0] if self._heap else None,
+            "last_run_at": self.last_run_at,
+            **self.counters,
+        }
+
+
+def _instance_row(template, run_at: datetime, now: datetime) -> dict:
+    """Экземпляр шаблона для запуска run_at: новая задача, не повторяющаяся"""
+    return {
+        "title": template.title,
+        "description": template.description,
+        "project": template.project,
+        "task_type": template.task_type,
+        "task_format": template.task_format,
+        "deadline": instance_deadline(template.deadline, run_at),
+        "executor_id": template.executor_id,
+        "author_id": template.author_id,
+        "status": models.TaskStatus.new,
+        "status_rank": models.TASK_STATUS_RANK[models.TaskStatus.new],
+        "created_at": now,
+        "is_recurring": False,
+        "overdue_count": 0,
+        "resume_count": 0,
+    }
+
+
+def _created_events(rows, task_ids, executors):
+    collected = []
+    for row, task_id in zip(rows, task_ids):
+        executor = executors.get(row["executor_id"])
+        role = None
+        if row["executor_id"] is not None:
+            role = executor.role.value if executor is not None and executor.role is not None else ""
+        collected.append({
+            "type": "task.created",
+            "id": task_id,
+            "status": models.TaskStatus.new.value,
+            "executor_id": row["executor_id"],
+            "executor_roles": [role],
+        })
+    return collected
+
+
+def _notifications(rows, task_ids, executors):
+    notifications = []
+    for row, task_id in zip(rows, task_ids):
+        executor = executors.get(row["executor_id"])
+        if executor is not None and executor.telegram_id:
+            notifications.append({
+                "executor_telegram_id": executor.telegram_id,
+                "task_id": task_id,
+                "task_data": telegram_notifier.task_notification_data(row),
+            })
+    return notifications
+
+
+recurring_scheduler = RecurringScheduler(
+    LeaderLease(LEASE_NAME, RECURRING_LEASE_SECONDS),
+    RECURRING_WAKE_POLL,
+    RECURRING_RESYNC_SECONDS,
+    RECURRING_CATCHUP_MAX,
+)
+
+
+# --- Сигнал об изменении шаблонов ---
+
+def mark_templates_changed(session: Session):
+    """Шаблоны изменены в транзакции сессии: после commit планировщики перечитают кучу"""
+    if not session.info.get(_PENDING_KEY):
+        _bump(session, {TEMPLATES_COUNTER})
+        session.info[_PENDING_KEY] = True
+
+
+def _changes_schedule(obj, kind: str) -> bool:
+    state = inspect(obj)
+    if kind != "updated":
+        return bool(state.dict.get("is_recurring"))
+    was_template = any(state.attrs.is_recurring.history.deleted)
+    if not (state.dict.get("is_recurring") or was_template):
+        return False
+    return any(state.attrs[name].history.has_changes() for name in SCHEDULE_FIELDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_template_changes(session, flush_context):
+    if session.info.get(_PENDING_KEY):
+        return
+    for objects, kind in ((session.new, "created"), (session.dirty, "updated"), (session.deleted, "deleted")):
+        if any(isinstance(obj, models.Task) and _changes_schedule(obj, kind) for obj in objects):
+            mark_templates_changed(session)
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_scheduler(session):
+    if session.info.pop(_PENDING_KEY, None):
+        recurring_scheduler.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_template_changes(session):
+    session.info.pop(_PENDING_KEY, None)
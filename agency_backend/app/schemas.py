@@ -1,6 +1,6 @@
 from datetime import datetime
 from datetime import date as DateType  # Rename to avoid conflicts
-from typing import Optional, List, Union
+from typing import Optional, List, Literal, Union
 from pydantic import BaseModel, field_validator, ConfigDict
 
 class UserBase(BaseModel):
@@ -60,6 +60,36 @@ class Task(TaskBase):
     next_run_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+class TaskPage(BaseModel):
+    items: List[Task]
+    next_cursor: Optional[str] = None  # None - последняя страница
+
+class VersionedTaskPage(TaskPage):
+    version: int  # с какой версии догонять список через /tasks/changes
+
+class TaskBulkOperation(BaseModel):
+    op: Literal["create", "status", "priority", "executor", "archive", "delete"]
+    task_id: Optional[int] = None  # для всех операций, кроме create
+    task: Optional[TaskCreate] = None  # create
+    status: Optional[str] = None  # status: new, in_progress, done, cancelled
+    high_priority: Optional[bool] = None  # priority
+    executor_id: Optional[int] = None  # executor (None - снять исполнителя)
+
+class TaskBulkRequest(BaseModel):
+    operations: List[TaskBulkOperation]
+
+class TaskBulkItemResult(BaseModel):
+    index: int
+    op: str
+    ok: bool
+    task_id: Optional[int] = None
+    error: Optional[str] = None
+
+class TaskBulkResult(BaseModel):
+    applied: int
+    failed: int
+    results: List[TaskBulkItemResult]
+
 class TaskWithDetails(Task):
     created_by: Optional[str] = None  # Имя создателя задачи
     project_name: Optional[str] = None  # Название проекта для отображения
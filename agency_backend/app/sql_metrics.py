@@ -0,0 +1,124 @@
+"""Учет SQL-запросов в рамках одного HTTP-запроса.
+
+Хуки cursor_execute считают количество запросов, суммарное время в БД и
+повторы одинаковых "форм" запроса. Middleware в main.py отдает эти данные
+в заголовке Server-Timing и в лог-строке, помечает N+1 и, в режиме
+SQL_QUERY_BUDGET_MODE=raise, превращает превышение бюджета в ошибку.
+"""
+
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import default as engine_default
+
+# Сколько одинаковых запросов за один HTTP-запрос считается N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+# Бюджет запросов по умолчанию (0 - без ограничения)
+DEFAULT_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "0"))
+# warn - только лог, raise - ответ 500 (для тестов/CI)
+QUERY_BUDGET_MODE = os.getenv("SQL_QUERY_BUDGET_MODE", "warn").lower()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Нормализованная форма запроса: без литералов и с IN (?...) вместо списков"""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("(?...)", shape)
+    shape = _LITERAL_RE.sub("?", shape)
+    return shape
+
+
+class RequestQueryStats:
+    """Статистика SQL одного HTTP-запроса"""
+
+    __slots__ = ("count", "total_time", "shapes", "budget")
+
+    def __init__(self, budget: int = DEFAULT_QUERY_BUDGET):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+        self.budget = budget
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int = None):
+        """Формы запросов, повторенные больше порога (кандидаты в N+1)"""
+        threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.count > self.budget
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_time * 1000:.1f};desc="{self.count} queries"'
+
+
+# Кэш компиляции SQLAlchemy: счетчики по всем запросам процесса
+_CACHE_OUTCOMES = {
+    engine_default.CACHE_HIT: "hits",
+    engine_default.CACHE_MISS: "misses",
+    engine_default.CACHING_DISABLED: "disabled",
+    engine_default.NO_CACHE_KEY: "no_cache_key",
+    engine_default.NO_DIALECT_SUPPORT: "no_dialect_support",
+}
+compiled_cache_counters = Counter()
+
+
+def compiled_cache_stats(engines=()):
+    """Доля попаданий в кэш скомпилированных запросов (+ размер кэша движков)"""
+    counters = dict(compiled_cache_counters)
+    cacheable = counters.get("hits", 0) + counters.get("misses", 0)
+    return {
+        **{name: counters.get(name, 0) for name in _CACHE_OUTCOMES.values()},
+        "hit_ratio": round(counters.get("hits", 0) / cacheable, 4) if cacheable else None,
+        "cache_entries": {
+            str(eng.url.render_as_string(hide_password=True)): len(eng._compiled_cache)
+            for eng in engines
+            if getattr(eng, "_compiled_cache", None) is not None
+        },
+    }
+
+
+current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+
+def query_budget(limit: int):
+    """Зависимость FastAPI: задать маршруту свой бюджет SQL-запросов
+
+    @app.get("/tasks/", dependencies=[Depends(sql_metrics.query_budget(5))])
+    """
+    def set_budget():
+        stats = current_stats.get()
+        if stats is not None:
+            stats.budget = limit
+    return set_budget
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats.get() is not None:
+        conn.info.setdefault("sql_metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    outcome = _CACHE_OUTCOMES.get(getattr(context, "cache_hit", None))
+    if outcome is not None:
+        compiled_cache_counters[outcome] += 1
+    stats = current_stats.get()
+    started = conn.info.get("sql_metrics_started")
+    if stats is None or not started:
+        return
+    stats.record(statement, time.perf_counter() - started.pop())
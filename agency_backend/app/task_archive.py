@@ -0,0 +1,215 @@
+"""Перенос старых закрытых задач в tasks_archive (горячая/холодная таблицы).
+
+Экземпляры повторяющихся задач копятся в tasks бесконечно, а списки и бот
+работают только с открытыми и недавними задачами. Задачи в статусах done,
+cancelled и archived, закрытые раньше TASK_ARCHIVE_AFTER_DAYS дней назад,
+переносятся в tasks_archive той же структуры. Аналитика и архивные экраны
+бота читают представление tasks_all (models.TaskHistory).
+
+Перенос идет пачками по TASK_ARCHIVE_BATCH строк: INSERT ... SELECT в архив
+и DELETE из tasks в одной транзакции. Прерванный запуск ничего не теряет -
+следующий продолжит с оставшихся строк. Задача запускается потоком воркера
+раз в TASK_ARCHIVE_INTERVAL секунд или вручную:
+
+    python -m app.task_archive
+
+Переносит только держатель аренды scheduler_leases['task_archive'] (см.
+recurring_scheduler.LeaderLease): поток стартует в каждом воркере, но пачки
+разных воркеров не сталкиваются на одних строках. Аренда продлевается после
+каждой пачки; если ее забрал другой процесс, запуск останавливается.
+
+Шаблоны повторяющихся задач не переносятся. id перенесенных задач не
+выдаются повторно (tasks.id с AUTOINCREMENT, миграция 0015). Удаление из
+tasks пишет task_tombstones, поэтому клиенты /tasks/changes убирают
+перенесенные задачи из своих списков.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import events, models
+from .database import SessionLocal
+from .recurring_scheduler import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+# Возраст закрытой задачи в днях, после которого она уходит в архив (0 - не переносить)
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv("TASK_ARCHIVE_AFTER_DAYS", "90"))
+# Строк в одной транзакции - под лимит параметров SQLite в IN (...)
+TASK_ARCHIVE_BATCH = int(os.getenv("TASK_ARCHIVE_BATCH", "500"))
+# Период запуска в воркере, секунды
+TASK_ARCHIVE_INTERVAL = float(os.getenv("TASK_ARCHIVE_INTERVAL", "3600"))
+# Пауза между пачками, чтобы не держать запись (бот, API) подряд
+TASK_ARCHIVE_PAUSE = float(os.getenv("TASK_ARCHIVE_PAUSE", "0.2"))
+# Срок аренды роли архиватора, секунды (продлевается после каждой пачки)
+TASK_ARCHIVE_LEASE_SECONDS = float(os.getenv("TASK_ARCHIVE_LEASE_SECONDS", "300"))
+
+LEASE_NAME = "task_archive"
+
+ARCHIVABLE_STATUSES = (
+    models.TaskStatus.done,
+    models.TaskStatus.cancelled,
+    models.TaskStatus.archived,
+)
+
+Task = models.Task.__table__
+TaskArchive = models.TaskArchive.__table__
+COLUMNS = [c.name for c in Task.columns]
+
+
+def _candidates(cutoff, limit: int):
+    return (
+        select(Task.c.id)
+        .where(
+            Task.c.status.in_(ARCHIVABLE_STATUSES),
+            # created_at - по индексу (status, created_at); закрыта задача не раньше создания
+            Task.c.created_at < cutoff,
+            func.coalesce(Task.c.finished_at, Task.c.created_at) < cutoff,
+            or_(Task.c.is_recurring.is_(None), Task.c.is_recurring == False),  # noqa: E712
+        )
+        .order_by(Task.c.id)
+        .limit(limit)
+        # PostgreSQL: строки блокируются до commit, параллельный воркер берет следующие
+        .with_for_update(skip_locked=True)
+    )
+
+
+class TaskArchiver:
+    """Пакетный перенос закрытых задач и счетчики для /admin/task-archive/stats"""
+
+    def __init__(self, lease: LeaderLease, after_days: int, batch_size: int, pause: float):
+        self.lease = lease
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.counters = Counter()
+        self.last_run_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.after_days > 0 and self.batch_size > 0
+
+    def cutoff(self):
+        now = models.get_local_time_utc5().replace(tzinfo=None)
+        return now - timedelta(days=self.after_days)
+
+    def archive_batch(self, cutoff) -> int:
+        """Перенести одну пачку; возвращает число перенесенных строк"""
+        db = SessionLocal()
+        try:
+            ids = db.execute(_candidates(cutoff, self.batch_size)).scalars().all()
+            if not ids:
+                db.rollback()
+                return 0
+            db.execute(insert(TaskArchive).from_select(
+                COLUMNS, select(*(Task.c[name] for name in COLUMNS)).where(Task.c.id.in_(ids))
+            ))
+            db.execute(delete(Task).where(Task.c.id.in_(ids)))
+            events.queue(db, [{"type": "tasks.changed"}])
+            db.commit()
+            return len(ids)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def run(self, max_batches: int = None) -> int:
+        """Переносить пачки, пока есть кандидаты; возвращает число строк.
+
+        Без аренды запуск пропускается. Ошибка пачки или потеря аренды
+        останавливают запуск - следующий продолжит с того же места.
+        """
+        if not self.enabled:
+            return 0
+        if not self._lock.acquire(blocking=False):
+            self.counters["skipped_busy"] += 1
+            return 0
+        moved = 0
+        try:
+            if not self.lease.acquire():
+                self.counters["skipped_not_leader"] += 1
+                return 0
+            cutoff = self.cutoff()
+            self.counters["runs"] += 1
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                try:
+                    count = self.archive_batch(cutoff)
+                except SQLAlchemyError as e:
+                    self.counters["failed_batches"] += 1
+                    logger.warning(f"[ARCHIVE] Batch failed, will retry next run: {e}")
+                    break
+                if not count:
+                    break
+                batches += 1
+                moved += count
+                self.counters["batches"] += 1
+                self.counters["moved"] += count
+                if self.pause:
+                    time.sleep(self.pause)
+                if not self.lease.acquire():
+                    self.counters["lease_lost"] += 1
+                    break
+        finally:
+            self.last_run_at = models.get_local_time_utc5().replace(tzinfo=None)
+            self._lock.release()
+        if moved:
+            logger.info(f"[ARCHIVE] Moved {moved} closed tasks to {TaskArchive.name}")
+        return moved
+
+    def stats(self):
+        db = SessionLocal()
+        try:
+            hot = db.execute(select(func.count()).select_from(Task)).scalar()
+            archived = db.execute(select(func.count()).select_from(TaskArchive)).scalar()
+        finally:
+            db.close()
+        return {
+            "enabled": self.enabled,
+            "holder": self.lease.holder,
+            "after_days": self.after_days,
+            "batch_size": self.batch_size,
+            "last_run_at": self.last_run_at,
+            "hot_rows": hot,
+            "archive_rows": archived,
+            **self.counters,
+        }
+
+
+task_archiver = TaskArchiver(
+    LeaderLease(LEASE_NAME, TASK_ARCHIVE_LEASE_SECONDS),
+    TASK_ARCHIVE_AFTER_DAYS,
+    TASK_ARCHIVE_BATCH,
+    TASK_ARCHIVE_PAUSE,
+)
+
+
+def archive_loop():
+    """Поток воркера: перенос раз в TASK_ARCHIVE_INTERVAL"""
+    while True:
+        time.sleep(TASK_ARCHIVE_INTERVAL)
+        try:
+            task_archiver.run()
+        except Exception as e:
+            logger.error(f"❌ Error in task archive job: {e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not task_archiver.enabled:
+        print("TASK_ARCHIVE_AFTER_DAYS=0: archiving is disabled")
+    else:
+        moved = task_archiver.run()
+        if task_archiver.counters["skipped_not_leader"]:
+            print("Another process holds the task_archive lease: archiving skipped")
+        else:
+            print(f"Moved {moved} tasks to {TaskArchive.name}")
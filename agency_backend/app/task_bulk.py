@@ -0,0 +1,338 @@
+"""Пакетные операции над задачами (POST /tasks/bulk).
+
+Операции проверяются пачкой: задачи и исполнители, на которые они ссылаются,
+читаются двумя запросами. Корректные операции применяются set-based SQL в
+одной транзакции - по одному UPDATE на группу одинаковых изменений (статус,
+приоритет, исполнитель), один DELETE и одна многострочная вставка. Для
+каждой операции возвращается результат; ошибочные не мешают остальным.
+
+Порядок применения фиксирован: create, executor, priority, status/archive,
+delete. Для одной задачи из нескольких однотипных операций действует
+последняя; после delete операции над задачей отклоняются. status_rank,
+row_version и удаленные задачи поддерживают триггеры миграций 0007/0008.
+
+Уведомления исполнителям (новые задачи и переназначение, кроме шаблонов
+повторяющихся задач) возвращаются списком и отправляются одним пакетом
+после ответа.
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import events, models, schemas
+from .crud import calculate_next_run_at
+from .models import get_local_time_utc5
+from .recurring_scheduler import mark_templates_changed
+from .telegram_notifier import task_notification_data
+
+# Максимум операций в одном запросе
+TASK_BULK_MAX_OPERATIONS = int(os.getenv("TASK_BULK_MAX_OPERATIONS", "5000"))
+# Размер пачки id в IN (...) - под лимит параметров SQLite
+ID_CHUNK = 500
+
+# Статусы, которые можно выставить пакетно (archive - отдельная операция)
+BULK_STATUSES = {
+    s.value: s for s in (
+        models.TaskStatus.new,
+        models.TaskStatus.in_progress,
+        models.TaskStatus.done,
+        models.TaskStatus.cancelled,
+    )
+}
+
+Task = models.Task.__table__
+User = models.User.__table__
+
+TASK_STATE = (
+    select(Task.c.id, Task.c.status, Task.c.executor_id, Task.c.is_recurring, User.c.role)
+    .outerjoin(User, User.c.id == Task.c.executor_id)
+)
+EXECUTORS = select(User.c.id, User.c.role, User.c.is_active, User.c.telegram_id)
+NOTIFY_FIELDS = select(
+    Task.c.id, Task.c.title, Task.c.description, Task.c.project,
+    Task.c.task_type, Task.c.task_format, Task.c.deadline,
+)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_CHUNK):
+        yield ids[start:start + ID_CHUNK]
+
+
+def _fetch_by_ids(db: Session, stmt, column, ids) -> dict:
+    rows = {}
+    for chunk in _chunks(ids):
+        rows.update({row.id: row for row in db.execute(stmt.where(column.in_(chunk)))})
+    return rows
+
+
+def _role(value):
+    return value.value if value is not None and hasattr(value, "value") else value
+
+
+def _create_row(db: Session, data: schemas.TaskCreate, author_id: int) -> dict:
+    """Строка для вставки - как в crud.create_task"""
+    next_run_at = None
+    if data.is_recurring and data.recurrence_type:
+        next_run_at = calculate_next_run_at(data.recurrence_type, db, data.recurrence_time, data.recurrence_days)
+    return {
+        "title": data.title,
+        "description": data.description,
+        "project": data.project,
+        "deadline": data.deadline,
+        "executor_id": data.executor_id,
+        "author_id": author_id,
+        "task_type": data.task_type,
+        "task_format": data.task_format,
+        "high_priority": data.high_priority or False,
+        "is_recurring": data.is_recurring or False,
+        "recurrence_type": data.recurrence_type,
+        "recurrence_time": data.recurrence_time,
+        "recurrence_days": data.recurrence_days,
+        "next_run_at": next_run_at,
+        "created_at": datetime.utcnow(),
+        "status": models.TaskStatus.new,
+        "status_rank": models.TASK_STATUS_RANK[models.TaskStatus.new],
+        "resume_count": 0,
+        "overdue_count": 0,
+    }
+
+
+def apply_operations(db: Session, operations, author_id: int):
+    """Проверить и применить операции в одной транзакции.
+
+    Возвращает (результаты по операциям, уведомления исполнителям). Результат:
+    {"index", "op", "ok", "task_id", "error"}.
+    """
+    results = [
+        {"index": i, "op": op.op, "ok": False, "task_id": op.task_id, "error": None}
+        for i, op in enumerate(operations)
+    ]
+
+    def fail(i, error):
+        results[i]["error"] = error
+
+    task_ids = {op.task_id for op in operations if op.op != "create" and op.task_id is not None}
+    executor_ids = {op.executor_id for op in operations if op.op == "executor" and op.executor_id is not None}
+    executor_ids |= {op.task.executor_id for op in operations if op.op == "create" and op.task and op.task.executor_id}
+    tasks = _fetch_by_ids(db, TASK_STATE, Task.c.id, task_ids)
+    executors = _fetch_by_ids(db, EXECUTORS, User.c.id, executor_ids)
+
+    def check_executor(executor_id):
+        if executor_id is None:
+            return None
+        executor = executors.get(executor_id)
+        if executor is None:
+            return "executor not found"
+        if not executor.is_active or executor.role == models.RoleEnum.inactive:
+            return "executor is inactive"
+        return None
+
+    now = get_local_time_utc5()
+    creates = []                     # (index, row)
+    new_executor = {}                # task_id -> executor_id
+    new_priority = {}                # task_id -> bool
+    new_status = {}                  # task_id -> TaskStatus
+    deleted = set()
+    accepted = defaultdict(list)     # task_id -> индексы операций
+
+    for i, op in enumerate(operations):
+        if op.op == "create":
+            if op.task is None:
+                fail(i, "task is required")
+                continue
+            error = check_executor(op.task.executor_id)
+            if error:
+                fail(i, error)
+                continue
+            try:
+                creates.append((i, _create_row(db, op.task, author_id)))
+            except ValueError as e:
+                fail(i, str(e))
+            continue
+
+        if op.task_id is None:
+            fail(i, "task_id is required")
+            continue
+        if op.task_id not in tasks:
+            fail(i, "task not found")
+            continue
+        if op.task_id in deleted:
+            fail(i, "task is deleted earlier in this batch")
+            continue
+
+        if op.op == "status":
+            status = BULK_STATUSES.get(op.status)
+            if status is None:
+                fail(i, f"status must be one of: {', '.join(BULK_STATUSES)}")
+                continue
+            new_status[op.task_id] = status
+        elif op.op == "archive":
+            new_status[op.task_id] = models.TaskStatus.archived
+        elif op.op == "priority":
+            if op.high_priority is None:
+                fail(i, "high_priority is required")
+                continue
+            new_priority[op.task_id] = op.high_priority
+        elif op.op == "executor":
+            error = check_executor(op.executor_id)
+            if error:
+                fail(i, error)
+                continue
+            new_executor[op.task_id] = op.executor_id
+        elif op.op == "delete":
+            deleted.add(op.task_id)
+        accepted[op.task_id].append(i)
+
+    # Изменения удаляемых задач не нужны
+    for changes in (new_executor, new_priority, new_status):
+        for task_id in deleted & changes.keys():
+            del changes[task_id]
+
+    created_ids = []
+    if creates:
+        rows = [row for _, row in creates]
+        created_ids = db.execute(
+            insert(Task).returning(Task.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        for (i, _), task_id in zip(creates, created_ids):
+            results[i]["task_id"] = task_id
+
+    for executor_id, ids in _group(new_executor).items():
+        for chunk in _chunks(ids):
+            db.execute(update(Task).where(Task.c.id.in_(chunk)).values(executor_id=executor_id))
+
+    for high_priority, ids in _group(new_priority).items():
+        for chunk in _chunks(ids):
+            db.execute(update(Task).where(Task.c.id.in_(chunk)).values(high_priority=high_priority))
+
+    for status, ids in _group(new_status).items():
+        values = {"status": status}
+        # Как crud.update_task_status: время завершения и счетчик возобновлений
+        if status == models.TaskStatus.done:
+            values["finished_at"] = now
+        elif status in (models.TaskStatus.in_progress, models.TaskStatus.cancelled):
+            values["finished_at"] = None
+        if status == models.TaskStatus.in_progress:
+            values["resume_count"] = case(
+                (Task.c.status.in_([models.TaskStatus.done, models.TaskStatus.cancelled]),
+                 func.coalesce(Task.c.resume_count, 0) + 1),
+                else_=Task.c.resume_count,
+            )
+        for chunk in _chunks(ids):
+            db.execute(update(Task).where(Task.c.id.in_(chunk)).values(**values))
+
+    for chunk in _chunks(deleted):
+        # Экземпляры удаляемых шаблонов остаются, ссылка на шаблон снимается
+        db.execute(update(Task).where(Task.c.original_task_id.in_(chunk)).values(original_task_id=None))
+        db.execute(delete(Task).where(Task.c.id.in_(chunk)))
+
+    for indexes in accepted.values():
+        for i in indexes:
+            results[i]["ok"] = True
+    for i, _ in creates:
+        results[i]["ok"] = True
+
+    # Новые шаблоны, смена статуса и удаление шаблонов меняют расписание планировщика
+    if any(row["is_recurring"] for _, row in creates) or any(
+        tasks[task_id].is_recurring for task_id in new_status.keys() | deleted
+    ):
+        mark_templates_changed(db)
+    events.queue(db, _events(tasks, executors, creates, created_ids, new_executor, new_priority, new_status, deleted))
+    notifications = _notifications(db, tasks, executors, creates, created_ids, new_executor, deleted)
+    db.commit()
+    return results, notifications
+
+
+def _group(changes: dict) -> dict:
+    groups = defaultdict(list)
+    for task_id, value in changes.items():
+        groups[value].append(task_id)
+    return groups
+
+
+def _executor_role(executor_id, role):
+    # None - без исполнителя (задачу видят все), "" - исполнитель не найден
+    if executor_id is None:
+        return None
+    return _role(role) or ""
+
+
+def _events(tasks, executors, creates, created_ids, new_executor, new_priority, new_status, deleted):
+    """События для /ws/events (app.events) - как их публикуют хуки сессии"""
+    def new_role(executor_id):
+        executor = executors.get(executor_id)
+        return _executor_role(executor_id, executor.role if executor else None)
+
+    collected = []
+    for (_, row), task_id in zip(creates, created_ids):
+        collected.append({
+            "type": "task.created",
+            "id": task_id,
+            "status": models.TaskStatus.new.value,
+            "executor_id": row["executor_id"],
+            "executor_roles": [new_role(row["executor_id"])],
+        })
+    for task_id in new_executor.keys() | new_priority.keys() | new_status.keys():
+        task = tasks[task_id]
+        roles = {_executor_role(task.executor_id, task.role)}
+        executor_id = task.executor_id
+        if task_id in new_executor:
+            executor_id = new_executor[task_id]
+            roles.add(new_role(executor_id))
+        status = new_status.get(task_id, task.status)
+        collected.append({
+            "type": "task.status" if task_id in new_status else "task.updated",
+            "id": task_id,
+            "status": _role(status),
+            "executor_id": executor_id,
+            "executor_roles": sorted(roles, key=str),
+        })
+    for task_id in deleted:
+        task = tasks[task_id]
+        collected.append({
+            "type": "task.deleted",
+            "id": task_id,
+            "status": _role(task.status),
+            "executor_id": task.executor_id,
+            "executor_roles": [_executor_role(task.executor_id, task.role)],
+        })
+    return collected
+
+
+def _notifications(db, tasks, executors, creates, created_ids, new_executor, deleted):
+    """Уведомления о назначении - как в POST /tasks/ (шаблоны повторяющихся задач без уведомлений)"""
+    def telegram_id(executor_id):
+        executor = executors.get(executor_id)
+        return executor.telegram_id if executor is not None else None
+
+    notifications = []
+    for (_, row), task_id in zip(creates, created_ids):
+        if row["executor_id"] and not row["is_recurring"] and telegram_id(row["executor_id"]):
+            notifications.append({
+                "executor_telegram_id": telegram_id(row["executor_id"]),
+                "task_id": task_id,
+                "task_data": task_notification_data(row),
+            })
+
+    reassigned = {
+        task_id: executor_id for task_id, executor_id in new_executor.items()
+        if executor_id is not None
+        and executor_id != tasks[task_id].executor_id
+        and not tasks[task_id].is_recurring
+        and telegram_id(executor_id)
+    }
+    if reassigned:
+        rows = _fetch_by_ids(db, NOTIFY_FIELDS, Task.c.id, reassigned)
+        for task_id, executor_id in reassigned.items():
+            notifications.append({
+                "executor_telegram_id": telegram_id(executor_id),
+                "task_id": task_id,
+                "task_data": task_notification_data(rows[task_id]._mapping),
+            })
+    return notifications
@@ -0,0 +1,96 @@
+"""Журнал задач task_events: срез статусов на момент и переходы за период.
+
+Журнал только дополняется: триггеры миграций 0014 и 0016 пишут строку на
+создание задачи, смену статуса, исполнителя, high_priority и удаление (в том
+числе из tasks_archive) - в той же транзакции, что и изменение (см.
+models.TaskEvent). Событие смены статуса хранит прежний статус и момент,
+когда он начался, поэтому обе выборки ниже - диапазоны по индексам
+журнала, без чтения tasks и без восстановления истории каждой задачи:
+
+- срез на момент: задач в статусе s = вошло в s до момента (индекс
+  status, at) минус вышло из s до момента (индекс from_status, at);
+- переходы за период: события с from_status и at в [start, end) - по
+  записям индекса (from_status, at, status, from_at); время в прежнем
+  статусе = at - from_at.
+
+Время - местное UTC+5, как в tasks. Шаблоны повторяющихся задач в журнал не
+пишутся; история задач, созданных до миграции, восстановлена приближенно.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from statistics import median
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+Event = models.TaskEvent.__table__
+STATUSES = tuple(models.TaskStatus)
+
+ENTERED = (
+    select(Event.c.status, func.count())
+    .where(Event.c.status.in_(STATUSES), Event.c.at <= bindparam("at"))
+    .group_by(Event.c.status)
+)
+LEFT = (
+    select(Event.c.from_status, func.count())
+    .where(Event.c.from_status.in_(STATUSES), Event.c.at <= bindparam("at"))
+    .group_by(Event.c.from_status)
+)
+
+
+def _transitions(from_statuses):
+    return (
+        select(Event.c.from_status, Event.c.status, Event.c.from_at, Event.c.at)
+        .where(
+            Event.c.from_status.in_(from_statuses),
+            Event.c.at >= bindparam("start"),
+            Event.c.at < bindparam("end"),
+        )
+    )
+
+
+def status_counts_as_of(db: Session, at: datetime) -> dict:
+    """Сколько задач было в каждом статусе на момент at"""
+    counts = dict.fromkeys((status.value for status in STATUSES), 0)
+    for status, count in db.execute(ENTERED, {"at": at}):
+        counts[status.value] += count
+    for status, count in db.execute(LEFT, {"at": at}):
+        counts[status.value] -= count
+    return counts
+
+
+def transition_stats(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    from_status: Optional[models.TaskStatus] = None,
+) -> list:
+    """Переходы между статусами в [start, end) и сколько задачи были в прежнем статусе.
+
+    Удаление задачи - переход в to_status None. Часы считаются по переходам,
+    для которых известно начало прежнего статуса.
+    """
+    from_statuses = (from_status,) if from_status is not None else STATUSES
+    hours = defaultdict(list)
+    counts = defaultdict(int)
+    for row in db.execute(_transitions(from_statuses), {"start": start, "end": end}):
+        key = (row.from_status.value, row.status.value if row.status is not None else None)
+        counts[key] += 1
+        if row.from_at is not None:
+            hours[key].append((row.at - row.from_at).total_seconds() / 3600)
+    stats = []
+    for (from_value, to_value), count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))):
+        spent = hours[(from_value, to_value)]
+        stats.append({
+            "from_status": from_value,
+            "to_status": to_value,
+            "count": count,
+            "avg_hours": round(sum(spent) / len(spent), 2) if spent else None,
+            "median_hours": round(median(spent), 2) if spent else None,
+            "max_hours": round(max(spent), 2) if spent else None,
+        })
+    return stats
@@ -0,0 +1,171 @@
+"""Полнотекстовый поиск задач (/tasks/search).
+
+Индекс покрывает название, описание, проект, тип задачи и имя исполнителя.
+Его создает миграция 0010 и поддерживают триггеры на tasks и users.name, так
+что индекс видит и записи бота сырым SQL:
+
+- SQLite: FTS5-таблица tasks_fts (rowid = id задачи, токенизатор unicode61).
+  Стеммера для русского в FTS5 нет, поэтому слова запроса обрезаются до
+  основы (stem_ru) и ищутся по префиксу: "задачами" -> задач*.
+- PostgreSQL: task_search(task_id, document tsvector) с GIN-индексом,
+  конфигурация russian (Snowball), префиксный to_tsquery.
+
+Буква ё в индексе и в запросе заменяется на е. Ранжируются
+TASK_SEARCH_CANDIDATES самых новых совпадений: по релевантности (bm25 /
+ts_rank с весами колонок), затем новые задачи. Видимость по роли - как в
+списке задач, архивные задачи не ищутся.
+"""
+
+import os
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, column, func, literal_column, select, table
+from sqlalchemy.orm import Session
+
+from . import models
+from .crud import TASK_NOT_ARCHIVED, TASK_VISIBILITY, _cached_statement, task_visible_to
+
+SQLITE_TABLE = "tasks_fts"
+POSTGRES_TABLE = "task_search"
+POSTGRES_CONFIG = "russian"
+
+# Индексируемые колонки в порядке FTS5-таблицы и их веса в bm25
+SEARCH_COLUMNS = ("title", "description", "project", "task_type", "executor_name")
+SQLITE_WEIGHTS = (10.0, 1.0, 4.0, 2.0, 3.0)
+# Веса tsvector в PostgreSQL: A - название, B - проект и исполнитель, C - тип, D - описание
+POSTGRES_WEIGHTS = {"title": "A", "project": "B", "executor_name": "B", "task_type": "C", "description": "D"}
+
+# Больше слов в запросе не учитываем
+MAX_TERMS = 8
+# Сколько самых новых совпадений ранжируется: расчет релевантности по всем
+# совпадениям короткого слова на миллионе задач стоит сотни миллисекунд
+TASK_SEARCH_CANDIDATES = int(os.getenv("TASK_SEARCH_CANDIDATES", "5000"))
+
+Task = models.Task.__table__
+TasksFts = table(SQLITE_TABLE, column("rowid"))
+TaskSearch = table(POSTGRES_TABLE, column("task_id"), column("document"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC = re.compile(r"[а-я]")
+# Окончания русских слов, от длинных к коротким
+_RU_ENDINGS = sorted(
+    """
+    иями ями ами иях ях ах иям ям ам ией ием ем ом ого его ому ему ыми ими
+    ая яя ое ее ые ие ой ей ий ый ую юю ов ев ью ия ию ии
+    а я о е ы и у ю ь й
+    """.split(),
+    key=len,
+    reverse=True,
+)
+_RU_MIN_STEM = 3
+
+
+def normalize(text: str) -> str:
+    return text.lower().replace("ё", "е")
+
+
+def stem_ru(word: str) -> str:
+    """Грубая основа русского слова: без окончания, не короче _RU_MIN_STEM букв"""
+    if not _CYRILLIC.search(word):
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _RU_MIN_STEM:
+            return word[: -len(ending)]
+    return word
+
+
+def query_terms(q: str) -> List[str]:
+    """Слова запроса (только буквы и цифры - синтаксис FTS из запроса не проходит)"""
+    terms = []
+    for word in _WORD.findall(normalize(q)):
+        word = word.strip("_")
+        if word and word not in terms:
+            terms.append(word)
+    return terms[:MAX_TERMS]
+
+
+def sqlite_match(terms: List[str]) -> str:
+    # Все слова обязательны; каждое - префикс основы
+    return " ".join(f'"{stem_ru(term)}"*' for term in terms)
+
+
+def postgres_query(terms: List[str]) -> str:
+    # to_tsquery сам приводит слова к основе конфигурации russian
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _visible(stmt, visible_roles):
+    if visible_roles is None:
+        return stmt
+    return stmt.where(task_visible_to(visible_roles))
+
+
+def _ranked(candidates, visible_roles):
+    stmt = (
+        select(*Task.c, candidates.c.score)
+        .select_from(candidates)
+        .join(Task, Task.c.id == candidates.c.task_id)
+    )
+    return (
+        _visible(stmt, visible_roles)
+        .where(TASK_NOT_ARCHIVED)
+        .order_by(candidates.c.score.desc(), Task.c.created_at.desc(), Task.c.id.desc())
+        .offset(bindparam("offset"))
+        .limit(bindparam("limit"))
+    )
+
+
+def _build_sqlite_statement(visible_roles=None):
+    weights = ", ".join(str(w) for w in SQLITE_WEIGHTS)
+    # bm25 меньше - лучше; наружу отдаем score "больше - лучше"
+    bm25 = literal_column(f"bm25({SQLITE_TABLE}, {weights})")
+    candidates = (
+        select(TasksFts.c.rowid.label("task_id"), (-bm25).label("score"))
+        .where(literal_column(SQLITE_TABLE).op("MATCH")(bindparam("query")))
+        .order_by(TasksFts.c.rowid.desc())
+        .limit(bindparam("candidates"))
+        .subquery()
+    )
+    return _ranked(candidates, visible_roles)
+
+
+def _build_postgres_statement(visible_roles=None):
+    tsquery = func.to_tsquery(literal_column(f"'{POSTGRES_CONFIG}'::regconfig"), bindparam("query"))
+    candidates = (
+        select(TaskSearch.c.task_id, func.ts_rank(TaskSearch.c.document, tsquery).label("score"))
+        .where(TaskSearch.c.document.op("@@")(tsquery))
+        .order_by(TaskSearch.c.task_id.desc())
+        .limit(bindparam("candidates"))
+        .subquery()
+    )
+    return _ranked(candidates, visible_roles)
+
+
+def search_tasks(
+    db: Session,
+    q: str,
+    role: Optional[models.RoleEnum] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> Tuple[list, Optional[int]]:
+    """Страница найденных задач по релевантности и offset следующей страницы.
+
+    role - фильтр видимости как в списке задач (None - все задачи).
+    """
+    terms = query_terms(q)
+    if not terms:
+        return [], None
+    visible_roles = TASK_VISIBILITY.get(role) if role is not None else None
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query, build = postgres_query(terms), _build_postgres_statement
+    else:
+        query, build = sqlite_match(terms), _build_sqlite_statement
+    stmt = _cached_statement(("task_search", dialect, visible_roles), lambda: build(visible_roles))
+    # Одна лишняя строка показывает, есть ли следующая страница
+    params = {"query": query, "candidates": TASK_SEARCH_CANDIDATES, "offset": offset, "limit": limit + 1}
+    rows = db.execute(stmt, params).all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], offset + limit
@@ -4,7 +4,7 @@
 import os
 import requests
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +12,19 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
 
-def send_task_notification(executor_telegram_id: int, task_id: int, task_data: Dict) -> bool:
+def task_notification_data(row) -> Dict:
+    """task_data для send_task_notification из строки задачи (mapping колонок tasks)"""
+    return {
+        "title": row["title"],
+        "description": row["description"],
+        "project_name": row["project"] or "Не указан",
+        "task_type": row["task_type"] or "Не указан",
+        "format": row["task_format"],
+        "deadline_text": row["deadline"].strftime("%d.%m.%Y %H:%M") if row["deadline"] else "Не установлен",
+    }
+
+
+def send_task_notification(executor_telegram_id: int, task_id: int, task_data: Dict, http=requests) -> bool:
     """
     Отправка уведомления исполнителю о новой задаче через Telegram API
 
@@ -20,6 +32,7 @@ def send_task_notification(executor_telegram_id: int, task_id: int, task_data: D
         executor_telegram_id: Telegram ID исполнителя
         task_id: ID задачи
         task_data: Данные задачи (title, project_name, task_type, deadline_text, format)
+        http: requests или requests.Session (одно соединение на пакет уведомлений)
 
     Returns:
         bool: True если уведомление отправлено успешно
@@ -69,7 +82,7 @@ def send_task_notification(executor_telegram_id: int, task_id: int, task_data: D
         }
 
         # Отправляем сообщение через Telegram API
-        response = requests.post(
+        response = http.post(
             f"{TELEGRAM_API_URL}/sendMessage",
             json={
                 "chat_id": executor_telegram_id,
@@ -91,3 +104,92 @@ def send_task_notification(executor_telegram_id: int, task_id: int, task_data: D
     except Exception as e:
         logger.error(f"❌ Исключение при отправке уведомления о задаче #{task_id}: {e}")
         return False
+
+
+def send_task_notifications(notifications: List[Dict]) -> int:
+    """
+    Отправка пакета уведомлений о задачах через одно соединение с Telegram API
+
+    Args:
+        notifications: Аргументы send_task_notification (executor_telegram_id, task_id, task_data)
+
+    Returns:
+        int: Количество отправленных уведомлений
+    """
+    with requests.Session() as http:
+        sent = sum(send_task_notification(**notification, http=http) for notification in notifications)
+    logger.info(f"Пакет уведомлений о задачах: отправлено {sent} из {len(notifications)}")
+    return sent
+
+
+def send_deadline_reminder(executor_telegram_id: int, task_id: int, task_data: Dict, minutes_left: int, http=requests) -> bool:
+    """
+    Напоминание исполнителю о приближении дедлайна задачи
+
+    Args:
+        executor_telegram_id: Telegram ID исполнителя
+        task_id: ID задачи
+        task_data: Данные задачи (как в send_task_notification)
+        minutes_left: Сколько минут осталось до дедлайна
+        http: requests или requests.Session (одно соединение на пакет напоминаний)
+
+    Returns:
+        bool: True если напоминание отправлено успешно
+    """
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN not configured")
+        return False
+
+    if not executor_telegram_id:
+        return False
+
+    left = f"{minutes_left // 60} ч {minutes_left % 60} мин" if minutes_left >= 60 else f"{minutes_left} мин"
+    try:
+        reminder_text = f"""
+⏰ **До дедлайна осталось {left}**
+
+📋 **Задача #{task_id}**
+┌─────────────────────────────────┐
+│ 📝 **Название:** {task_data.get('title', 'Без названия')}
+│ 📁 **Проект:** {task_data.get('project_name', 'Не указан')}
+│ ⏰ **Дедлайн:** {task_data.get('deadline_text', 'Не установлен')}
+└─────────────────────────────────┘
+"""
+
+        response = http.post(
+            f"{TELEGRAM_API_URL}/sendMessage",
+            json={
+                "chat_id": executor_telegram_id,
+                "text": reminder_text,
+                "parse_mode": "Markdown",
+            },
+            timeout=10
+        )
+
+        if response.status_code == 200:
+            logger.info(f"✅ Напоминание о дедлайне задачи #{task_id} отправлено пользователю {executor_telegram_id}")
+            return True
+        else:
+            error_data = response.json()
+            logger.error(f"❌ Ошибка отправки напоминания: {error_data}")
+            return False
+
+    except Exception as e:
+        logger.error(f"❌ Исключение при отправке напоминания о задаче #{task_id}: {e}")
+        return False
+
+
+def send_deadline_reminders(reminders: List[Dict]) -> int:
+    """
+    Отправка пакета напоминаний о дедлайнах через одно соединение с Telegram API
+
+    Args:
+        reminders: Аргументы send_deadline_reminder (executor_telegram_id, task_id, task_data, minutes_left)
+
+    Returns:
+        int: Количество отправленных напоминаний
+    """
+    with requests.Session() as http:
+        sent = sum(send_deadline_reminder(**reminder, http=http) for reminder in reminders)
+    logger.info(f"Пакет напоминаний о дедлайнах: отправлено {sent} из {len(reminders)}")
+    return sent
@@ -0,0 +1,202 @@
+"""Кэш авторизованных пользователей по subject JWT.
+
+Каждый авторизованный запрос разрешает ``sub`` токена в пользователя. Кэш
+хранит отсоединенную копию строки users (LRU с TTL), и на попадании она
+вливается в сессию запроса через ``merge(load=False)`` - без SQL.
+
+Инвалидация: хуки сессии собирают измененных/удаленных пользователей при
+flush и сбрасывают их после commit. Чтобы сброс дошел до других воркеров,
+после него обновляется mtime файла-маркера (USER_CACHE_SYNC_FILE); воркер,
+увидевший новый mtime, очищает свой кэш целиком. Проверка mtime - файловый
+ввод-вывод, поэтому async-код зовет get_cached_user в threadpool или
+проверяет маркер заранее через ``sync()`` в threadpool.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from . import models
+
+# Время жизни записи в секундах (0 - кэш выключен)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+# Общий для воркеров файл-маркер инвалидации
+USER_CACHE_SYNC_FILE = os.getenv(
+    "USER_CACHE_SYNC_FILE", os.path.join(tempfile.gettempdir(), "agency_user_cache.gen")
+)
+
+_PENDING_KEY = "user_cache_pending"
+_USER_COLUMNS = [attr.key for attr in models.User.__mapper__.column_attrs]
+
+
+def _snapshot(user: models.User) -> models.User:
+    """Отсоединенная копия загруженных колонок пользователя"""
+    copy = models.User(**{key: getattr(user, key) for key in _USER_COLUMNS})
+    make_transient_to_detached(copy)
+    return copy
+
+
+class UserCache:
+    """LRU с TTL: username -> (срок, копия пользователя)"""
+
+    def __init__(self, ttl: float, max_size: int, sync_file: str = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sync_file = sync_file
+        self.counters = Counter()
+        self._entries = OrderedDict()
+        self._usernames_by_id = {}
+        self._lock = threading.Lock()
+        self._seen_generation = self._read_generation()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def _read_generation(self):
+        if not self.sync_file:
+            return None
+        try:
+            return os.stat(self.sync_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _sync(self):
+        # Под self._lock: другой воркер что-то сбросил - чистим все
+        generation = self._read_generation()
+        if generation != self._seen_generation:
+            self._seen_generation = generation
+            if self._entries:
+                self.counters["remote_invalidations"] += 1
+                self._entries.clear()
+                self._usernames_by_id.clear()
+
+    def sync(self):
+        """Проверить файл-маркер других воркеров (stat файла)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._sync()
+
+    def get(self, username: str, sync: bool = True):
+        if not self.enabled:
+            return None
+        with self._lock:
+            if sync:
+                self._sync()
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(username)
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(username)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, username: str, user: models.User):
+        if not self.enabled:
+            return
+        snapshot = _snapshot(user)
+        with self._lock:
+            self._drop(username)
+            self._entries[username] = (time.monotonic() + self.ttl, snapshot)
+            self._usernames_by_id[snapshot.id] = username
+            while len(self._entries) > self.max_size:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._usernames_by_id.pop(evicted.id, None)
+                self.counters["evictions"] += 1
+
+    def _drop(self, username):
+        entry = self._entries.pop(username, None)
+        if entry is not None:
+            self._usernames_by_id.pop(entry[1].id, None)
+
+    def invalidate(self, user_ids=None):
+        """Сбросить пользователей по id (None - весь кэш) и оповестить воркеры"""
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+                self._usernames_by_id.clear()
+            else:
+                for user_id in user_ids:
+                    username = self._usernames_by_id.pop(user_id, None)
+                    if username is not None:
+                        self._entries.pop(username, None)
+            self.counters["invalidations"] += 1
+            self._publish()
+
+    def _publish(self):
+        if not self.sync_file:
+            return
+        try:
+            with open(self.sync_file, "a"):
+                pass
+            os.utime(self.sync_file, None)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        hits, misses = self.counters["hits"], self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "max_size": self.max_size,
+            "size": len(self._entries),
+            **{name: self.counters[name] for name in ("hits", "misses", "evictions", "invalidations", "remote_invalidations")},
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_MAX_SIZE, USER_CACHE_SYNC_FILE)
+
+
+def get_cached_user(db: Session, username: str, load, sync: bool = True):
+    """Пользователь по username: из кэша (merge в сессию) или через load(db, username).
+
+    sync=False - файл-маркер уже проверен через user_cache.sync()
+    """
+    cached = user_cache.get(username, sync)
+    if cached is not None:
+        return db.merge(cached, load=False)
+    user = load(db, username)
+    if user is not None:
+        user_cache.put(username, user)
+    return user
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = {
+        obj.id for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, models.User) and obj.id is not None
+    }
+    if changed:
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        if pending is not None:
+            pending.update(changed)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _collect_bulk_user_changes(context):
+    # query(User).update()/delete(): какие строки затронуты, неизвестно
+    if context.mapper.class_ is models.User:
+        context.session.info[_PENDING_KEY] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    if _PENDING_KEY in session.info:
+        user_cache.invalidate(session.info.pop(_PENDING_KEY))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_users(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,144 @@
+"""
+Бенчмарк пропускной способности списков и аналитики при 200 одновременных клиентах.
+
+Сравнивает два режима одних и тех же маршрутов (/tasks/, /projects/, /leads/,
+/analytics, /expense-reports/):
+- DB_ASYNC_ENABLED=false - синхронная сессия в threadpool Starlette, как до
+  async-движка: каждый запрос держит слот пула на все время работы с БД;
+- DB_ASYNC_ENABLED=true - AsyncSession на aiosqlite/asyncpg.
+
+Каждый режим запускается в отдельном процессе (движки создаются при импорте
+app.database) на своей временной SQLite-базе с одинаковыми данными. Клиенты -
+httpx.AsyncClient поверх ASGI-приложения, без сети: меряется само приложение.
+Ошибки в режиме sync - таймауты пула reader-подключений (pool_timeout): потоки
+threadpool стоят в очереди за подключением дольше, чем его ждет пул.
+
+Запуск из agency_backend:
+    python benchmark_async_endpoints.py --clients 200 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+ENDPOINTS = [
+    "/tasks/",
+    "/projects/",
+    "/leads/",
+    "/analytics",
+    "/expense-reports/",
+]
+
+
+def seed(tasks):
+    """Схема, админ по умолчанию и tasks задач"""
+    from app import migrations, models
+    from app.database import SessionLocal
+
+    migrations.run_migrations()
+    db = SessionLocal()
+    try:
+        db.add_all(
+            models.Task(title=f"Задача {i}", status=models.TaskStatus.new, task_type="Дизайн")
+            for i in range(tasks)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def client_loop(client, deadline, latencies, errors, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        url = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        response = await client.get(url)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+async def load(clients, seconds):
+    import httpx
+    from app import auth
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers,
+                                 timeout=120) as client:
+        # Прогрев: кэши пользователя и скомпилированных запросов
+        for url in ENDPOINTS:
+            await client.get(url)
+        latencies, errors = [], []
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(
+            client_loop(client, deadline, latencies, errors, n) for n in range(clients)
+        ))
+    return latencies, errors
+
+
+def run_mode(args):
+    """Дочерний процесс: один режим, результат - JSON в stdout"""
+    seed(args.tasks)
+    latencies, errors = asyncio.run(load(args.clients, args.seconds))
+    from app.database import async_engine
+
+    ordered = sorted(latencies)
+    print(json.dumps({
+        "async_engine": async_engine is not None,
+        "requests": len(ordered),
+        "errors": len(errors),
+        "rps": len(ordered) / args.seconds,
+        "p50_ms": statistics.median(ordered) * 1000 if ordered else None,
+        "p95_ms": ordered[int(len(ordered) * 0.95)] * 1000 if ordered else None,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Списки и аналитика: sync threadpool против async-движка")
+    parser.add_argument("--clients", type=int, default=200, help="одновременных клиентов")
+    parser.add_argument("--seconds", type=float, default=10, help="длительность прогона каждого режима")
+    parser.add_argument("--tasks", type=int, default=2000, help="задач в базе")
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"Нагрузка: {args.clients} клиентов, {args.seconds:g} с на режим, {args.tasks} задач")
+    for mode, enabled in (("sync (до)", "false"), ("async (после)", "true")):
+        with tempfile.TemporaryDirectory(prefix="async-bench-") as tmp:
+            env = {
+                **os.environ,
+                "DB_ENGINE": "sqlite",
+                "SQLITE_PATH": os.path.join(tmp, "bench.db"),
+                "DB_ASYNC_ENABLED": enabled,
+                "EVENTS_BROKER_DB": "",
+                "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-" + "x" * 40),
+            }
+            child = subprocess.run(
+                [sys.executable, __file__, "--mode", "async" if enabled == "true" else "sync",
+                 "--clients", str(args.clients), "--seconds", str(args.seconds), "--tasks", str(args.tasks)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"\n{mode}: async-движок {'включен' if result['async_engine'] else 'выключен'}")
+        print(f"  {result['requests']} запросов ({result['rps']:.0f}/с), ошибок {result['errors']}, "
+              f"p50 {result['p50_ms']:.1f} мс, p95 {result['p95_ms']:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
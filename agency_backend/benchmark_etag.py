@@ -0,0 +1,112 @@
+"""
+Бенчмарк ETag/304 на справочных маршрутах (app.change_versions).
+
+Одна "загрузка страницы" - GET всех маршрутов ROUTES. Сначала без
+If-None-Match (200 и полное тело), затем с ETag из первых ответов (304 без
+тела, как при повторной загрузке в браузере). Печатает байты тел и время
+загрузки (медиана --repeat загрузок).
+
+Справочники заполняются через ORM-сессию, поэтому счетчики версий таблиц
+растут, как в работе. База создается во временном каталоге, рабочая база не
+затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_etag.py --projects 200 --repeat 20
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+ROUTES = [
+    "/projects/",
+    "/operators/",
+    "/taxes/",
+    "/expense-categories/",
+    "/digital/services",
+    "/users/",
+    "/tasks/types",
+]
+
+
+def seed(projects, users):
+    """Схема, начальные данные и справочники через ORM"""
+    from app import crud, migrations, models, schemas
+    from app.database import SessionLocal
+
+    migrations.run_migrations()
+    db = SessionLocal()
+    try:
+        db.add_all(models.Project(name=f"Проект {i}") for i in range(projects))
+        db.add_all(
+            models.Operator(name=f"Оператор {i}", role=list(models.OperatorRole)[i % len(models.OperatorRole)])
+            for i in range(20)
+        )
+        db.add_all(models.DigitalService(name=f"Услуга {i}") for i in range(10))
+        db.commit()
+        for i in range(users):
+            crud.create_user(db, schemas.UserCreate(
+                telegram_username=f"designer{i}", name=f"Дизайнер {i}", password="bench12345",
+                role=models.RoleEnum.designer,
+            ))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Справочные маршруты: 200 против 304")
+    parser.add_argument("--projects", type=int, default=200, help="проектов в справочнике")
+    parser.add_argument("--users", type=int, default=30, help="пользователей")
+    parser.add_argument("--repeat", type=int, default=20, help="загрузок, берется медиана")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="etag-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    logging.disable(logging.INFO)
+    seed(args.projects, args.users)
+    from fastapi.testclient import TestClient
+    from app import auth
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'})}"}
+    with TestClient(app) as client:
+        etags = {}
+
+        def page_load(revalidate):
+            body_bytes = 0
+            for route in ROUTES:
+                request_headers = dict(headers)
+                if revalidate:
+                    request_headers["If-None-Match"] = etags[route]
+                response = client.get(route, headers=request_headers)
+                assert response.status_code == (304 if revalidate else 200), (route, response.status_code)
+                etags[route] = response.headers["ETag"]
+                body_bytes += len(response.content)
+            return body_bytes
+
+        print(f"Загрузка {len(ROUTES)} маршрутов, медиана {args.repeat} загрузок")
+        for name, revalidate in (("200", False), ("304", True)):
+            body_bytes = page_load(revalidate)
+            runs = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                page_load(revalidate)
+                runs.append((time.perf_counter() - started) * 1000)
+            print(f"  {name}: тела {body_bytes} Б, {statistics.median(runs):.1f} мс")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
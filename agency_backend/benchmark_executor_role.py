@@ -0,0 +1,154 @@
+"""
+Бенчмарк фильтра видимости списка задач: JOIN с users против tasks.executor_role.
+
+Для ролей с фильтром (designer, smm_manager) замеряется keyset-страница
+read_models.task_page на первой странице и на странице --deep-page:
+- join - фильтр по users.role через LEFT JOIN, как до миграции 0011;
+- executor_role - фильтр по колонке tasks.executor_role (crud.task_visible_to)
+  по индексу ix_tasks_rank_visibility.
+
+Печатает план каждого запроса и медиану --repeat выполнений в миллисекундах.
+База создается во временном каталоге, рабочая база не затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_executor_role.py --tasks 200000 --page-size 200
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+STATUSES = ("new", "in_progress", "overdue", "done", "cancelled")
+
+
+def seed(tasks, batch=20000):
+    """Схема, исполнители всех ролей и tasks задач сырым SQL (executor_role пишут триггеры)"""
+    from app import crud, migrations, models, schemas
+    from app.database import SessionLocal, engine
+
+    migrations.run_migrations()
+    db = SessionLocal()
+    try:
+        executors = [
+            crud.create_user(db, schemas.UserCreate(
+                telegram_username=f"{role.value}{i}", name=f"{role.value} {i}", password="bench12345", role=role,
+            )).id
+            for role in (models.RoleEnum.designer, models.RoleEnum.smm_manager, models.RoleEnum.admin)
+            for i in range(5)
+        ]
+    finally:
+        db.close()
+
+    rnd = random.Random(1)
+    conn = engine.raw_connection()
+    try:
+        for start in range(0, tasks, batch):
+            conn.executemany(
+                "INSERT INTO tasks (title, status, executor_id, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        f"Задача {i}", rnd.choice(STATUSES),
+                        # Каждая десятая задача без исполнителя
+                        None if i % 10 == 0 else rnd.choice(executors),
+                        f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:00:00.000000",
+                    )
+                    for i in range(start, min(start + batch, tasks))
+                ],
+            )
+            conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def join_statement(visible_roles, after_cursor):
+    """Тот же запрос страницы с фильтром через LEFT JOIN users"""
+    from app import read_models
+
+    Task, User = read_models.Task, read_models.User
+    stmt = read_models._build_task_page_statement(None, after_cursor)
+    return stmt.join_from(Task, User, Task.c.executor_id == User.c.id, isouter=True).where(
+        User.c.role.in_(visible_roles) | Task.c.executor_id.is_(None)
+    )
+
+
+def query_plan(db, stmt, params) -> str:
+    """План SQL, который SQLAlchemy отправляет для stmt"""
+    from sqlalchemy import event
+
+    captured = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        db.execute(stmt, params).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    statement, parameters = captured[-1]
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "; ".join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фильтр видимости: JOIN против executor_role")
+    parser.add_argument("--tasks", type=int, default=200_000, help="задач в базе")
+    parser.add_argument("--page-size", type=int, default=200, help="строк на странице")
+    parser.add_argument("--deep-page", type=int, default=101, help="номер дальней страницы")
+    parser.add_argument("--repeat", type=int, default=30, help="выполнений, берется медиана")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="executor-role-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    logging.disable(logging.INFO)
+    seed(args.tasks)
+    from app import crud, models, read_models
+    from app.database import ReadSessionLocal
+
+    print(f"{args.tasks} задач, страница {args.page_size} строк, медиана {args.repeat}, мс")
+    db = ReadSessionLocal()
+    try:
+        for role in (models.RoleEnum.designer, models.RoleEnum.smm_manager):
+            visible_roles = crud.TASK_VISIBILITY[role]
+            cursor = None
+            for _ in range(args.deep_page - 1):
+                cursor = read_models.task_page(db, role, args.page_size, cursor)[1]
+            for page, page_cursor in ((1, None), (args.deep_page, cursor)):
+                params = {**(read_models.decode_task_cursor(page_cursor) if page_cursor else {}),
+                          "limit": args.page_size + 1}
+                results = []
+                for name, stmt in (
+                    ("join", join_statement(visible_roles, bool(page_cursor))),
+                    ("executor_role", read_models._build_task_page_statement(visible_roles, bool(page_cursor))),
+                ):
+                    plan = query_plan(db, stmt, params)
+                    runs = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        db.execute(stmt, params).all()
+                        runs.append((time.perf_counter() - started) * 1000)
+                    results.append(f"{name} {statistics.median(runs):.1f}")
+                    print(f"  {role.value} стр. {page} {name}: {plan}")
+                print(f"{role.value} стр. {page}: " + ", ".join(results))
+    finally:
+        db.close()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Бенчмарк финансовых отчетов с индексами по дате и без них.
+
+Заполняет project_expenses и employee_expenses по --rows строк (common_expenses -
+пятую часть) за несколько лет на --projects проектов и замеряет отчеты за
+один месяц:
+- crud.get_project_expenses_summary - суммы по каждому проекту
+  (индексы (project_id, date, amount));
+- get_expense_report_summary_sync (/expense-reports/summary) - суммы за месяц
+  по всем проектам (индексы (date, amount)).
+
+Сначала замер с индексами миграций 0005/0018, затем те же отчеты после
+DROP INDEX - как было до них. Время - медиана --repeat вызовов, в
+миллисекундах. База создается во временном каталоге, рабочая база не
+затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_finance_indexes.py --rows 500000 --repeat 10
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+FIRST_DAY = date(2022, 1, 1)
+DAYS = 4 * 365
+MONTH = (date(2024, 6, 1), date(2024, 6, 30))
+
+
+def seed(rows, projects, batch=20000):
+    """Схема, проекты и расходы сырым SQL пачками по batch"""
+    from app import migrations
+    from app.database import engine
+
+    migrations.run_migrations()
+    rnd = random.Random(1)
+    conn = engine.raw_connection()
+    try:
+        conn.executemany("INSERT INTO projects (name) VALUES (?)", [(f"Проект {i}",) for i in range(projects)])
+        project_ids = [row[0] for row in conn.execute("SELECT id FROM projects")]
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+
+        def day():
+            return (FIRST_DAY + timedelta(days=rnd.randrange(DAYS))).isoformat()
+
+        tables = (
+            ("project_expenses", "project_id, name, amount, date", rows,
+             lambda: (rnd.choice(project_ids), "Расход", rnd.randint(1, 1000) * 1000.0, day())),
+            ("employee_expenses", "user_id, project_id, name, amount, date", rows,
+             lambda: (rnd.choice(user_ids), rnd.choice(project_ids), "Расход", rnd.randint(1, 100) * 1000.0, day())),
+            ("common_expenses", "name, amount, date", rows // 5,
+             lambda: ("Аренда", rnd.randint(1, 1000) * 1000.0, day())),
+        )
+        for table, columns, count, row in tables:
+            placeholders = ", ".join("?" * len(columns.split(",")))
+            for start in range(0, count, batch):
+                conn.executemany(
+                    f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                    [row() for _ in range(min(batch, count - start))],
+                )
+            conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def date_indexes():
+    """Индексы отчетов по дате на таблицах расходов (без индексов по id)"""
+    from app import models
+
+    return [
+        index.name
+        for model in (models.ProjectExpense, models.EmployeeExpense, models.CommonExpense)
+        for index in model.__table__.indexes
+        if "date" in index.columns
+    ]
+
+
+def median_ms(fn, repeat):
+    fn()  # прогрев: страницы таблицы в кэше SQLite/ОС
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1000)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Финансовые отчеты с индексами по дате и без них")
+    parser.add_argument("--rows", type=int, default=500_000, help="строк в project_expenses и employee_expenses")
+    parser.add_argument("--projects", type=int, default=100, help="проектов")
+    parser.add_argument("--repeat", type=int, default=10, help="вызовов, берется медиана")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="finance-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    seed(args.rows, args.projects)
+    logging.disable(logging.INFO)
+    from app import crud
+    from app.database import ReadSessionLocal, engine
+    from app.main import get_expense_report_summary_sync
+
+    start, end = MONTH
+    reports = [
+        (f"get_project_expenses_summary ({args.projects} проектов)",
+         lambda db: crud.get_project_expenses_summary(db, None, start.isoformat(), end.isoformat())),
+        ("get_expense_report_summary_sync",
+         lambda db: get_expense_report_summary_sync(db, start, end, None)),
+    ]
+
+    def measure():
+        db = ReadSessionLocal()
+        try:
+            return [median_ms(lambda: report(db), args.repeat) for _, report in reports]
+        finally:
+            db.close()
+
+    print(f"{args.rows} строк расходов, отчет за {start:%m.%Y}, медиана {args.repeat} вызовов, мс")
+    with_indexes = measure()
+    with engine.begin() as conn:
+        for name in date_indexes():
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    engine.dispose()
+    without_indexes = measure()
+
+    for (name, _), before, after in zip(reports, without_indexes, with_indexes):
+        print(f"  {name}: без индексов {before:.1f}, с индексами {after:.2f} (x{before / after:.0f})")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
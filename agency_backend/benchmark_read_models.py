@@ -0,0 +1,152 @@
+"""
+Бенчмарк read-моделей: ORM-сущности против Core Row для списка задач.
+
+Сравнивает на одной базе и одних данных:
+- ORM: crud.get_tasks_for_user - объекты models.Task в identity map сессии;
+- Row: read_models.task_page - кортежи Row по колонкам tasks.
+
+Для каждого варианта замеряются время выборки, время выборки вместе с
+проверкой list[schemas.Task] (как в ответе /tasks/) и пик памяти выборки
+по tracemalloc. Роли - admin (все задачи) и designer (фильтр видимости).
+Время - медиана --repeat запусков. Под tracemalloc время выше, поэтому память
+меряется отдельным запуском.
+
+База создается во временном каталоге, рабочая база не затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_read_models.py --tasks 100000 --repeat 3
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+STATUSES = ("new", "in_progress", "overdue", "done", "cancelled")
+
+
+def seed(tasks, batch=20000):
+    """Схема, исполнители разных ролей и tasks задач сырым SQL"""
+    from app import crud, migrations, models, schemas
+    from app.database import SessionLocal, engine
+
+    migrations.run_migrations()
+    db = SessionLocal()
+    try:
+        executors = [
+            crud.create_user(db, schemas.UserCreate(
+                telegram_username=f"{role.value}{i}", name=f"{role.value} {i}", password="bench12345", role=role,
+            )).id
+            for role in (models.RoleEnum.designer, models.RoleEnum.smm_manager)
+            for i in range(5)
+        ]
+    finally:
+        db.close()
+
+    rnd = random.Random(1)
+    conn = engine.raw_connection()
+    try:
+        for start in range(0, tasks, batch):
+            conn.executemany(
+                "INSERT INTO tasks (title, description, project, status, executor_id, author_id, deadline, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        f"Задача {i}", "Описание задачи " * 5, f"Проект {i % 50}", rnd.choice(STATUSES),
+                        rnd.choice(executors), executors[0],
+                        f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 18:00:00.000000",
+                        f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00.000000",
+                    )
+                    for i in range(start, min(start + batch, tasks))
+                ],
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def median_seconds(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def peak_mb(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM-сущности против Row для списка задач")
+    parser.add_argument("--tasks", type=int, default=100_000, help="задач в базе")
+    parser.add_argument("--repeat", type=int, default=3, help="запусков, берется медиана")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="read-models-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    seed(args.tasks)
+    logging.disable(logging.INFO)
+    from app import crud, models, read_models, schemas
+    from app.database import ReadSessionLocal
+
+    def orm(role):
+        def fetch():
+            db = ReadSessionLocal()
+            try:
+                return crud.get_tasks_for_user(db, models.User(role=role), 0, args.tasks), db
+            finally:
+                db.close()
+        return fetch
+
+    def rows(role):
+        def fetch():
+            db = ReadSessionLocal()
+            try:
+                return read_models.task_page(db, role, limit=args.tasks)[0], db
+            finally:
+                db.close()
+        return fetch
+
+    def validated(fetch):
+        def run():
+            items, _ = fetch()
+            return [schemas.Task.model_validate(item) for item in items]
+        return run
+
+    print(f"{args.tasks} задач, медиана {args.repeat} запусков")
+    for role in (models.RoleEnum.admin, models.RoleEnum.designer):
+        count = len(rows(role)()[0])
+        print(f"{role.value} ({count} строк):")
+        for name, fetch in (("ORM", orm(role)), ("Row", rows(role))):
+            fetch_s = median_seconds(fetch, args.repeat)
+            validate_s = median_seconds(validated(fetch), args.repeat)
+            memory = peak_mb(fetch)
+            print(f"  {name}: выборка {fetch_s:.2f} с, с schemas.Task {validate_s:.2f} с, пик памяти {memory:.0f} МБ")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
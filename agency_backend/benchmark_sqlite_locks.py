@@ -0,0 +1,178 @@
+"""
+Бенчмарк ожидания блокировок SQLite при одновременных чтении и записи.
+
+Сравнивает журнал по умолчанию (rollback, DELETE) и профиль из
+app.database.SQLITE_PROFILE (WAL и остальные PRAGMA) на одинаковой нагрузке:
+читатели строят список задач, писатели обновляют и вставляют задачи, как
+веб-воркеры, планировщик и бот. Для каждой операции отдельно замеряется время
+ожидания блокировки:
+- читатель - получение SHARED-блокировки (первое чтение в транзакции);
+- писатель - BEGIN IMMEDIATE (RESERVED) и COMMIT (EXCLUSIVE, ждет читателей).
+
+База создается во временном каталоге, рабочая база не затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_sqlite_locks.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from app.database import SQLITE_PROFILE, apply_sqlite_profile
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+# Настройки SQLite по умолчанию - как до профиля (sqlite3.connect(timeout=30))
+ROLLBACK_PROFILE = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "busy_timeout": SQLITE_PROFILE["busy_timeout"],
+    "mmap_size": 0,
+    "cache_size": -2000,
+    "temp_store": "DEFAULT",
+    "foreign_keys": "OFF",
+}
+
+STATUSES = ("new", "in_progress", "done", "overdue")
+
+
+def create_database(path, rows):
+    """Таблица задач с индексом для списка и rows строками"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            status TEXT NOT NULL,
+            executor_id INTEGER,
+            created_at TEXT NOT NULL
+        );
+        CREATE INDEX ix_tasks_status_created_at ON tasks (status, created_at);
+    """)
+    conn.executemany(
+        "INSERT INTO tasks (title, description, status, executor_id, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"Задача {i}", "x" * 200, random.choice(STATUSES), random.randint(1, 50),
+             f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00")
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile["busy_timeout"] / 1000,
+                           isolation_level=None, check_same_thread=False)
+    apply_sqlite_profile(conn, profile)
+    return conn
+
+
+def reader(path, profile, stop, waits, counts):
+    conn = connect(path, profile)
+    try:
+        while not stop.is_set():
+            conn.execute("BEGIN")
+            started = time.perf_counter()
+            # Первое чтение берет SHARED-блокировку: в rollback-журнале ждет писателя
+            conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchall()
+            waits.append(time.perf_counter() - started)
+            conn.execute(
+                "SELECT id, title, status, created_at FROM tasks WHERE status = ? "
+                "ORDER BY created_at DESC LIMIT 200",
+                (random.choice(STATUSES),),
+            ).fetchall()
+            conn.execute("SELECT status, count(*) FROM tasks GROUP BY status").fetchall()
+            conn.execute("COMMIT")
+            counts.append(1)
+    finally:
+        conn.close()
+
+
+def writer(path, profile, stop, waits, counts, rows):
+    conn = connect(path, profile)
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            wait = time.perf_counter() - started
+            conn.execute("UPDATE tasks SET status = ? WHERE id = ?",
+                         (random.choice(STATUSES), random.randint(1, rows)))
+            conn.execute(
+                "INSERT INTO tasks (title, status, executor_id, created_at) VALUES (?, 'new', ?, datetime('now'))",
+                ("Новая задача", random.randint(1, 50)),
+            )
+            started = time.perf_counter()
+            # COMMIT ждет EXCLUSIVE: в rollback-журнале - пока не уйдут читатели
+            conn.execute("COMMIT")
+            waits.append(wait + time.perf_counter() - started)
+            counts.append(1)
+    finally:
+        conn.close()
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory(prefix="sqlite-locks-") as tmp:
+        path = os.path.join(tmp, "bench.db")
+        create_database(path, args.rows)
+        stop = threading.Event()
+        read_waits, write_waits, reads, writes = [], [], [], []
+        threads = [
+            threading.Thread(target=reader, args=(path, profile, stop, read_waits, reads))
+            for _ in range(args.readers)
+        ] + [
+            threading.Thread(target=writer, args=(path, profile, stop, write_waits, writes, args.rows))
+            for _ in range(args.writers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return {
+        "reads": (len(reads), read_waits),
+        "writes": (len(writes), write_waits),
+    }
+
+
+def describe(waits):
+    if not waits:
+        return "нет операций"
+    ordered = sorted(waits)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"ожидание p50 {statistics.median(ordered) * 1000:.2f} мс, "
+            f"p95 {p95 * 1000:.2f} мс, max {ordered[-1] * 1000:.2f} мс, "
+            f"всего {sum(ordered):.2f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ожидание блокировок SQLite: rollback-журнал против WAL-профиля")
+    parser.add_argument("--rows", type=int, default=20000, help="строк в tasks")
+    parser.add_argument("--readers", type=int, default=8, help="потоков-читателей")
+    parser.add_argument("--writers", type=int, default=2, help="потоков-писателей")
+    parser.add_argument("--seconds", type=float, default=10, help="длительность прогона каждого профиля")
+    args = parser.parse_args()
+
+    print(f"Нагрузка: {args.readers} читателей, {args.writers} писателей, "
+          f"{args.rows} строк, {args.seconds:g} с на профиль")
+    for name, profile in (("rollback (до)", ROLLBACK_PROFILE), ("WAL-профиль (после)", SQLITE_PROFILE)):
+        result = run(profile, args)
+        print(f"\n{name}: journal_mode={profile['journal_mode']}, synchronous={profile['synchronous']}")
+        for kind, label in (("reads", "чтения"), ("writes", "записи")):
+            count, waits = result[kind]
+            print(f"  {label}: {count} операций ({count / args.seconds:.0f}/с), {describe(waits)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Микробенчмарк готовых select() горячих запросов.
+
+Сравнивает на одной сессии и одних данных:
+- поиск пользователя при авторизации: Query, собираемый на каждый вызов
+  (как было), против auth.USER_BY_USERNAME через auth.get_user;
+- список задач: select(), собираемый на каждый вызов с offset/limit
+  литералами, против crud._cached_statement через crud.get_tasks_for_user.
+
+В обоих вариантах SQLAlchemy берет скомпилированный SQL из кэша движка;
+разница - построение выражения и вычисление его ключа кэша. Время - медиана
+нескольких повторов по --calls вызовов, в микросекундах на вызов.
+
+База создается во временном каталоге, рабочая база не затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_statements.py --calls 2000 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+
+def seed(tasks):
+    """Схема, админ по умолчанию и tasks задач"""
+    from app import migrations, models
+    from app.database import SessionLocal
+
+    migrations.run_migrations()
+    db = SessionLocal()
+    try:
+        db.add_all(
+            models.Task(title=f"Задача {i}", status=models.TaskStatus.new, task_type="Дизайн")
+            for i in range(tasks)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def per_call_user(db, username):
+    """auth.get_user до готового запроса"""
+    from app import models
+
+    return db.query(models.User).filter(models.User.telegram_username == username).first()
+
+
+def per_call_tasks(db, visible_roles, skip, limit):
+    """Список задач с select(), собранным заново на этот вызов"""
+    from sqlalchemy import select
+    from app import crud, models
+
+    stmt = select(models.Task)
+    if visible_roles is not None:
+        stmt = stmt.where(crud.task_visible_to(visible_roles))
+    stmt = stmt.where(crud.TASK_NOT_ARCHIVED).order_by(*crud.TASK_LIST_ORDER).offset(skip).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+
+def measure(fn, calls, repeat):
+    fn()  # прогрев: компиляция попадает в кэш движка до замера
+    runs = timeit.repeat(fn, number=calls, repeat=repeat)
+    return statistics.median(runs) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Готовые select() против сборки на каждый вызов")
+    parser.add_argument("--calls", type=int, default=2000, help="вызовов в одном повторе")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов, берется медиана")
+    parser.add_argument("--tasks", type=int, default=200, help="задач в базе")
+    parser.add_argument("--limit", type=int, default=50, help="размер страницы списка задач")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="statements-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    seed(args.tasks)
+    from app import auth, crud, models
+    from app.database import ReadSessionLocal
+
+    designer = models.User(role=models.RoleEnum.designer)
+    visible_roles = crud.TASK_VISIBILITY[designer.role]
+    cases = [
+        ("get_user", lambda db: per_call_user(db, "admin"), lambda db: auth.get_user(db, "admin")),
+        (
+            f"get_tasks_for_user (limit {args.limit})",
+            lambda db: per_call_tasks(db, visible_roles, 0, args.limit),
+            lambda db: crud.get_tasks_for_user(db, designer, 0, args.limit),
+        ),
+    ]
+
+    print(f"{args.calls} вызовов x {args.repeat} повторов, {args.tasks} задач, мкс на вызов")
+    db = ReadSessionLocal()
+    try:
+        for name, before, after in cases:
+            before_us = measure(lambda: before(db), args.calls, args.repeat)
+            after_us = measure(lambda: after(db), args.calls, args.repeat)
+            db.expunge_all()
+            print(f"  {name}: на каждый вызов {before_us:.1f}, готовый {after_us:.1f} "
+                  f"(x{before_us / after_us:.2f})")
+    finally:
+        db.close()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Бенчмарк полнотекстового поиска задач (/tasks/search) на большой таблице.
+
+Замеряет на одной базе:
+- task_search.search_tasks для запросов из одного и нескольких слов
+  (страница --limit результатов), p50/p95 в миллисекундах;
+- запрос GET /tasks/search целиком (TestClient, авторизация, сериализация);
+- для сравнения - загрузку --list-rows задач списком (read_models.task_page),
+  как при фильтрации на клиенте до поиска на сервере.
+
+Задачи вставляются сырым SQL пачками, поэтому индекс tasks_fts заполняют
+триггеры миграции 0010 - как при записях бота. База создается во временном
+каталоге, рабочая база не затрагивается. Заполнение 1M задач занимает
+несколько минут.
+
+Запуск из agency_backend:
+    python benchmark_task_search.py --tasks 1000000 --repeat 30
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+WORDS = (
+    "баннер сторис пост видео ролик реклама макет логотип презентация съемка "
+    "монтаж обложка листовка каталог сайт лендинг анимация афиша визитка меню "
+    "упаковка этикетка буклет инфографика карусель таргет контент план отчет"
+).split()
+PROJECTS = [f"Проект {i}" for i in range(200)]
+TASK_TYPES = ("Дизайн", "Видео", "Контент", "Таргет")
+QUERIES = {
+    "одно слово": ["баннер", "сторисы", "видео", "презентации"],
+    "несколько слов": ["баннер сторис", "монтаж видео ролика", "макет афиши меню"],
+}
+
+
+def seed(tasks, batch=10000):
+    """Схема, админ по умолчанию и tasks задач сырым SQL пачками по batch"""
+    from app import migrations
+    from app.database import engine
+
+    migrations.run_migrations()
+    rnd = random.Random(1)
+    conn = engine.raw_connection()
+    try:
+        for start in range(0, tasks, batch):
+            conn.executemany(
+                "INSERT INTO tasks (title, description, project, task_type, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'new', ?)",
+                [
+                    (
+                        " ".join(rnd.sample(WORDS, 3)).capitalize(),
+                        " ".join(rnd.choices(WORDS, k=12)),
+                        rnd.choice(PROJECTS),
+                        rnd.choice(TASK_TYPES),
+                        f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00.000000",
+                    )
+                    for i in range(start, min(start + batch, tasks))
+                ],
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def timings(fn, repeat):
+    """Время вызовов fn в миллисекундах (первый вызов - прогрев)"""
+    fn()
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        result.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def p50_p95(values):
+    return statistics.median(values), statistics.quantiles(values, n=20)[18]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск задач по полнотекстовому индексу")
+    parser.add_argument("--tasks", type=int, default=1_000_000, help="задач в базе")
+    parser.add_argument("--repeat", type=int, default=30, help="замеров на запрос")
+    parser.add_argument("--limit", type=int, default=50, help="результатов на странице поиска")
+    parser.add_argument("--list-rows", type=int, default=10000, help="задач в загрузке списком")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="search-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    started = time.perf_counter()
+    seed(args.tasks)
+    print(f"{args.tasks} задач заполнены за {time.perf_counter() - started:.0f} с")
+
+    # Строка лога на каждый запрос (sql_stats, httpx) мешает читать результат
+    logging.disable(logging.INFO)
+    from fastapi.testclient import TestClient
+    from app import auth, read_models, task_search
+    from app.database import ReadSessionLocal
+    from app.main import app
+
+    db = ReadSessionLocal()
+    try:
+        for kind, queries in QUERIES.items():
+            print(f"search_tasks, {kind} (limit {args.limit}), мс p50 / p95:")
+            for q in queries:
+                found = len(task_search.search_tasks(db, q, None, args.limit)[0])
+                p50, p95 = p50_p95(timings(lambda: task_search.search_tasks(db, q, None, args.limit), args.repeat))
+                print(f"  {q!r}: {p50:.1f} / {p95:.1f} ({found} на странице)")
+
+        p50, p95 = p50_p95(timings(lambda: read_models.task_page(db, None, args.list_rows), max(args.repeat // 5, 3)))
+        print(f"список {args.list_rows} задач (task_page): {p50:.0f} / {p95:.0f} мс")
+    finally:
+        db.close()
+
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'})}"}
+    with TestClient(app) as client:
+        def request():
+            response = client.get("/tasks/search", params={"q": "баннер сторис", "limit": args.limit}, headers=headers)
+            assert response.status_code == 200, response.text
+
+        p50, p95 = p50_p95(timings(request, args.repeat))
+        print(f"GET /tasks/search: {p50:.1f} / {p95:.1f} мс")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Микробенчмарк кэша авторизованных пользователей (app.user_cache).
+
+Разрешение subject токена в пользователя так, как это делает зависимость
+авторизации - на новой reader-сессии на каждый вызов:
+- auth.get_user - SELECT по telegram_username;
+- user_cache.get_cached_user - попадание в кэш и merge(load=False) без SQL.
+
+Печатает мкс на вызов (медиана --repeat повторов по --calls вызовов) и
+счетчики кэша. Затем - запрос GET /users/me через TestClient с кэшем и с
+выключенным кэшем (USER_CACHE_TTL=0 в этом процессе).
+
+База создается во временном каталоге, рабочая база не затрагивается.
+
+Запуск из agency_backend:
+    python benchmark_user_cache.py --calls 2000 --repeat 5
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
+
+
+def per_call_us(fn, calls, repeat):
+    fn()  # прогрев: запрос в кэше движка, пользователь в кэше
+    runs = timeit.repeat(fn, number=calls, repeat=repeat)
+    return statistics.median(runs) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="auth.get_user против кэша пользователей")
+    parser.add_argument("--calls", type=int, default=2000, help="вызовов в одном повторе")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов, берется медиана")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="user-cache-bench-")
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["EVENTS_BROKER_DB"] = ""
+    os.environ["USER_CACHE_SYNC_FILE"] = os.path.join(tmp.name, "user_cache.gen")
+    os.environ.setdefault("SECRET_KEY", "benchmark-" + "x" * 40)
+
+    logging.disable(logging.INFO)
+    from fastapi.testclient import TestClient
+    from app import auth, migrations, user_cache
+    from app.database import ReadSessionLocal
+    from app.main import app
+
+    migrations.run_migrations()
+
+    def resolve(lookup):
+        def call():
+            db = ReadSessionLocal()
+            try:
+                return lookup(db)
+            finally:
+                db.close()
+        return call
+
+    uncached = per_call_us(resolve(lambda db: auth.get_user(db, "admin")), args.calls, args.repeat)
+    cached = per_call_us(
+        resolve(lambda db: user_cache.get_cached_user(db, "admin", auth.get_user)), args.calls, args.repeat
+    )
+    print(f"{args.calls} вызовов x {args.repeat} повторов, мкс на вызов")
+    print(f"  auth.get_user: {uncached:.0f}")
+    print(f"  get_cached_user: {cached:.0f} (x{uncached / cached:.1f})")
+    stats = user_cache.user_cache.stats()
+    print(f"  кэш: hits {stats['hits']}, misses {stats['misses']}, hit_ratio {stats['hit_ratio']}")
+
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'})}"}
+    calls = max(args.calls // 10, 50)
+    with TestClient(app) as client:
+        def request():
+            assert client.get("/users/me", headers=headers).status_code == 200
+
+        with_cache = per_call_us(request, calls, args.repeat)
+        user_cache.user_cache.ttl = 0
+        without_cache = per_call_us(request, calls, args.repeat)
+    print(f"GET /users/me, {calls} запросов: с кэшем {with_cache:.0f} мкс, без кэша {without_cache:.0f} мкс")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
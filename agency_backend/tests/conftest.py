@@ -0,0 +1,24 @@
+"""Общая настройка тестов: отдельная SQLite-база с примененными миграциями.
+
+Переменные окружения выставляются до импорта app - engine создается при
+импорте app.database.
+"""
+
+import os
+import tempfile
+
+os.environ["DB_ENGINE"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="agency-tests-"), "app.db")
+os.environ.setdefault("SECRET_KEY", "tests-" + "x" * 40)
+# События - брокер в памяти процесса (один воркер)
+os.environ["EVENTS_BROKER_DB"] = ""
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def migrated_db():
+    """База со всеми миграциями (схема, индексы, триггеры, начальные данные)"""
+    from app import migrations
+
+    migrations.run_migrations()
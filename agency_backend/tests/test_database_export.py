@@ -0,0 +1,80 @@
+"""/admin/export-database на полностью мигрированной базе: копия - рабочая база.
+
+Кроме таблиц в копию должны попасть представление tasks_all, триггеры
+миграций и полнотекстовый индекс tasks_fts со служебными таблицами.
+"""
+
+import io
+import sqlite3
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import auth, models
+from app.database import SessionLocal, engine
+
+
+@pytest.fixture(scope="module")
+def export_path(migrated_db, tmp_path_factory):
+    from app.main import app
+
+    db = SessionLocal()
+    try:
+        db.add(models.Task(title="Экспорт баннера", status=models.TaskStatus.new))
+        db.commit()
+    finally:
+        db.close()
+
+    token = auth.create_access_token({"sub": "admin"})
+    with TestClient(app) as client:
+        response = client.get("/admin/export-database", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+
+    path = tmp_path_factory.mktemp("export") / "export.db"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        (name,) = [n for n in archive.namelist() if n.endswith(".db")]
+        path.write_bytes(archive.read(name))
+    return path
+
+
+def _schema(conn):
+    return set(conn.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"))
+
+
+def test_export_keeps_schema(export_path):
+    with engine.connect() as conn:
+        source = set(conn.execute(
+            text("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")
+        ).all())
+    exported = sqlite3.connect(export_path)
+    try:
+        schema = _schema(exported)
+        assert exported.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    finally:
+        exported.close()
+
+    assert schema == source
+    assert ("view", "tasks_all") in schema
+    assert ("table", "tasks_fts") in schema
+
+
+def test_exported_search_index_and_triggers_work(export_path):
+    exported = sqlite3.connect(export_path)
+    try:
+        found = exported.execute(
+            "SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'баннера'"
+        ).fetchone()[0]
+        version = exported.execute("SELECT version FROM change_counters WHERE name = 'tasks'").fetchone()[0]
+        exported.execute("INSERT INTO tasks (title, status) VALUES ('после экспорта', 'new')")
+        row_version = exported.execute(
+            "SELECT row_version FROM tasks WHERE title = 'после экспорта'"
+        ).fetchone()[0]
+        total = exported.execute("SELECT count(*) FROM tasks_all").fetchone()[0]
+    finally:
+        exported.close()
+
+    assert found == 1
+    assert row_version == version + 1
+    assert total >= 2
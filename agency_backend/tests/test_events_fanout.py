@@ -0,0 +1,88 @@
+"""/ws/events: одно событие доходит до 500 подключенных клиентов за бюджет задержки,
+событие по задаче чужой роли - только тем, кому она видна (crud.TASK_VISIBILITY).
+
+Клиенты - WebSocket-сессии Starlette TestClient в одном event loop
+приложения, брокер - в памяти процесса (InProcessBroker).
+"""
+
+import time
+from contextlib import ExitStack
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import auth, crud, events, models, schemas
+from app.database import SessionLocal
+
+CLIENTS = 500
+# От publish до получения события последним из CLIENTS клиентов, секунды
+LATENCY_BUDGET_SECONDS = 2.0
+
+
+@pytest.fixture(scope="module")
+def tokens(migrated_db):
+    """JWT админа и дизайнера - клиенты с разным фильтром видимости"""
+    db = SessionLocal()
+    try:
+        if not crud.get_user_by_login(db, "fanout_designer"):
+            crud.create_user(db, schemas.UserCreate(
+                telegram_username="fanout_designer",
+                name="Fanout Designer",
+                password="designer123",
+                role=models.RoleEnum.designer,
+            ))
+    finally:
+        db.close()
+    return [auth.create_access_token({"sub": login}) for login in ("admin", "fanout_designer")]
+
+
+def test_update_reaches_500_clients_within_budget(tokens):
+    from app.main import app
+
+    assert isinstance(events.event_hub.broker, events.InProcessBroker)
+    with TestClient(app) as client, ExitStack() as stack:
+        sockets = [
+            stack.enter_context(client.websocket_connect(
+                "/ws/events", subprotocols=["bearer", tokens[i % len(tokens)]]
+            ))
+            for i in range(CLIENTS)
+        ]
+        assert events.event_hub.stats()["subscribers"] >= CLIENTS
+
+        update = {
+            "type": "task.status",
+            "id": 1,
+            "status": models.TaskStatus.in_progress.value,
+            "executor_id": None,
+            "executor_roles": [models.RoleEnum.designer.value],
+        }
+        started = time.perf_counter()
+        events.event_hub.publish([update])
+        received = [socket.receive_json() for socket in sockets]
+        elapsed = time.perf_counter() - started
+
+        # Задача SMM менеджера дизайнеру не видна; следом - видимое всем событие,
+        # первым у дизайнера должно прийти оно
+        hidden = {**update, "id": 2, "executor_roles": [models.RoleEnum.smm_manager.value]}
+        marker = {**update, "id": 3, "executor_roles": [None]}
+        delivered = events.event_hub.stats()["delivered"]
+        events.event_hub.publish([hidden, marker])
+        filtered = [
+            [socket.receive_json() for _ in range(2 if i % len(tokens) == 0 else 1)]
+            for i, socket in enumerate(sockets)
+        ]
+        designer_queues = [
+            subscription.queue.qsize()
+            for subscription in events.event_hub._subscribers
+            if subscription.visible_roles is not None
+        ]
+        delivered = events.event_hub.stats()["delivered"] - delivered
+
+    assert received == [update] * CLIENTS
+    assert elapsed < LATENCY_BUDGET_SECONDS, f"{CLIENTS} clients took {elapsed:.3f}s"
+
+    admins = CLIENTS // len(tokens)
+    assert filtered[0::2] == [[hidden, marker]] * admins
+    assert filtered[1::2] == [[marker]] * (CLIENTS - admins)
+    assert designer_queues == [0] * (CLIENTS - admins)
+    assert delivered == 2 * admins + (CLIENTS - admins)
@@ -0,0 +1,87 @@
+"""Лимит попыток входа: в окне IP копятся только неудачные попытки.
+
+Успешные входы из одного офиса за NAT не должны блокировать этот IP,
+неудачные - по-прежнему блокируют после LOGIN_MAX_ATTEMPTS_PER_IP, в том
+числе под параллельной нагрузкой. Заголовок прокси с IP - только явно заданный.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import login_limiter
+
+MAX_PER_IP = 3
+PARALLEL_LOGINS = 200
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    store = (
+        login_limiter.MemoryAttemptStore() if request.param == "memory"
+        else login_limiter.SQLiteAttemptStore(str(tmp_path / "limiter.db"))
+    )
+    return login_limiter.LoginRateLimiter(store, 900, 5, MAX_PER_IP, 900)
+
+
+def test_successful_logins_do_not_fill_ip_window(limiter):
+    for i in range(MAX_PER_IP * 5):
+        username = f"user{i}"
+        assert limiter.hit(username, "10.0.0.1") is None
+        limiter.login_succeeded(username, "10.0.0.1")
+
+
+def test_failed_logins_lock_ip(limiter):
+    for i in range(MAX_PER_IP):
+        assert limiter.hit(f"user{i}", "10.0.0.2") is None
+    assert limiter.hit("admin", "10.0.0.2") is not None
+
+
+def test_token_route_keeps_ip_open_after_successful_logins(migrated_db, monkeypatch, limiter):
+    from app.main import app
+
+    monkeypatch.setattr(login_limiter, "login_limiter", limiter)
+    with TestClient(app) as client:
+        for _ in range(MAX_PER_IP + 2):
+            response = client.post("/token", data={"username": "admin", "password": "admin123"})
+            assert response.status_code == 200, response.text
+        for _ in range(MAX_PER_IP):
+            response = client.post("/token", data={"username": "nobody", "password": "wrong"})
+            assert response.status_code == 401
+        response = client.post("/token", data={"username": "admin", "password": "admin123"})
+    assert response.status_code == 429
+
+
+def test_client_ip_header_only_when_configured(monkeypatch):
+    request = type("Request", (), {
+        "headers": {"X-Real-IP": "203.0.113.7"},
+        "client": type("Client", (), {"host": "10.0.0.3"})(),
+    })()
+    assert login_limiter.client_ip(request) == "10.0.0.3"
+    monkeypatch.setattr(login_limiter, "LOGIN_CLIENT_IP_HEADER", "X-Real-IP")
+    assert login_limiter.client_ip(request) == "203.0.113.7"
+
+
+def test_parallel_failed_logins_get_429(migrated_db, monkeypatch, limiter):
+    """Нагрузочный: PARALLEL_LOGINS неудачных входов с одного IP одновременно.
+
+    Пароль проверяется ровно MAX_PER_IP раз (401), остальные отклоняются
+    до хеширования (429) - подмена X-Real-IP при выключенном заголовке
+    не помогает.
+    """
+    from app.main import app
+
+    monkeypatch.setattr(login_limiter, "login_limiter", limiter)
+    with TestClient(app) as client, ThreadPoolExecutor(max_workers=32) as pool:
+        statuses = Counter(pool.map(
+            lambda i: client.post(
+                "/token",
+                data={"username": f"intruder{i}", "password": "wrong"},
+                headers={"X-Real-IP": f"198.51.100.{i % 250}"},
+            ).status_code,
+            range(PARALLEL_LOGINS),
+        ))
+
+    assert statuses == {401: MAX_PER_IP, 429: PARALLEL_LOGINS - MAX_PER_IP}
@@ -0,0 +1,72 @@
+"""Бюджет SQL-запросов маршрутов в режиме SQL_QUERY_BUDGET_MODE=raise и пометка N+1."""
+
+import json
+import logging
+
+import pytest
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import auth, models, sql_metrics
+from app.main import HOT_LIST_QUERY_BUDGET, app
+
+# Маршрут только для тестов: n одинаковых запросов при бюджете QUERIES_BUDGET
+QUERIES_PATH = "/_tests/sql-queries/{n}"
+QUERIES_BUDGET = sql_metrics.N_PLUS_ONE_THRESHOLD + 5
+
+
+def _run_queries(n: int, db=Depends(auth.get_db)):
+    for i in range(n):
+        db.execute(text("SELECT :i"), {"i": i}).scalar()
+    return {"queries": n}
+
+
+app.add_api_route(
+    QUERIES_PATH, _run_queries, methods=["GET"],
+    dependencies=[Depends(sql_metrics.query_budget(QUERIES_BUDGET))],
+)
+
+
+@pytest.fixture(scope="module")
+def client(migrated_db):
+    token = auth.create_access_token({"sub": "admin"})
+    with TestClient(app) as client:
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def raise_mode(monkeypatch):
+    monkeypatch.setattr(sql_metrics, "QUERY_BUDGET_MODE", "raise")
+
+
+def _sql_stats(caplog, path):
+    records = [json.loads(r.getMessage()) for r in caplog.records if '"sql_stats"' in r.getMessage()]
+    return [r for r in records if r["path"] == path][-1]
+
+
+@pytest.mark.parametrize("path", ["/tasks/", "/tasks/all", "/users/"])
+def test_hot_routes_fit_query_budget(client, path):
+    client.post("/tasks/", json={"title": "budget"})
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    queries = int(response.headers["Server-Timing"].split('desc="')[1].split()[0])
+    assert queries <= HOT_LIST_QUERY_BUDGET
+
+
+def test_route_over_budget_fails(client):
+    response = client.get(QUERIES_PATH.format(n=QUERIES_BUDGET + 1))
+    assert response.status_code == 500
+    assert "Query budget exceeded" in response.json()["detail"]
+
+
+def test_repeated_queries_are_flagged_as_n_plus_one(client, caplog):
+    n = sql_metrics.N_PLUS_ONE_THRESHOLD + 1
+    with caplog.at_level(logging.INFO, logger="app.main"):
+        response = client.get(QUERIES_PATH.format(n=n))
+    # В пределах бюджета ответ обычный, N+1 только помечается в логе
+    assert response.status_code == 200
+    stats = _sql_stats(caplog, QUERIES_PATH.format(n=n))
+    assert stats["n_plus_one"] and stats["n_plus_one"][0]["count"] == n
+    assert any(r.levelno == logging.WARNING and '"sql_stats"' in r.getMessage() for r in caplog.records)
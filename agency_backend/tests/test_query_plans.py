@@ -0,0 +1,203 @@
+"""EXPLAIN QUERY PLAN горячих запросов к tasks и финансам: каждый идет по своему индексу.
+
+Запросы не переписываются в тестах - перехватываются SQL и параметры,
+которые код действительно отправляет в SQLite, и для каждого строится план.
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, select
+
+from app import crud, deadline_monitor, models, read_models, recurring_scheduler, schemas
+from app.database import ReadSessionLocal, SessionLocal, read_engine
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executor(migrated_db):
+    """Не-админ: /analytics считает выполненные задачи по каждому такому пользователю"""
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_login(db, "plan_designer") or crud.create_user(db, schemas.UserCreate(
+            telegram_username="plan_designer",
+            name="Plan Designer",
+            password="designer123",
+            role=models.RoleEnum.designer,
+        ))
+        return user.id
+    finally:
+        db.close()
+
+
+@contextmanager
+def captured_statements():
+    """Собрать (sql, параметры) всех запросов к read_engine внутри блока"""
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(read_engine, "before_cursor_execute", collect)
+    try:
+        yield statements
+    finally:
+        event.remove(read_engine, "before_cursor_execute", collect)
+
+
+def query_plan(statement, parameters=()) -> str:
+    with read_engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def executed_plan(stmt, parameters=None) -> str:
+    """Выполнить select() и вернуть план отправленного SQL"""
+    with captured_statements() as statements:
+        with read_engine.connect() as conn:
+            conn.execute(stmt, parameters or {}).all()
+    (plan,) = plans_matching(statements, "FROM tasks")
+    return plan
+
+
+def plans_matching(statements, *fragments, exclude=None):
+    plans = [
+        query_plan(statement, parameters)
+        for statement, parameters in statements
+        if all(fragment in statement for fragment in fragments)
+        and (exclude is None or exclude not in statement)
+    ]
+    assert plans, f"no captured query contains {fragments}"
+    return plans
+
+
+def scanned_tables(plan) -> set:
+    """Таблицы tasks/tasks_archive, которые план читает целиком (SCAN, а не SEARCH)"""
+    return {
+        line.split()[1]
+        for line in plan.splitlines()
+        if line.startswith("SCAN ") and line.split()[1] in ("tasks", "tasks_archive")
+    }
+
+
+@pytest.mark.parametrize("role", list(crud.TASK_VISIBILITY))
+def test_task_list_reads_rank_visibility_index(role):
+    db = ReadSessionLocal()
+    try:
+        with captured_statements() as statements:
+            crud.get_tasks_for_user(db, SimpleNamespace(role=role), skip=0, limit=50)
+    finally:
+        db.close()
+
+    (plan,) = plans_matching(statements, "FROM tasks", "ORDER BY")
+    assert "ix_tasks_rank_visibility" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.parametrize("role", [models.RoleEnum.designer, models.RoleEnum.smm_manager])
+def test_task_page_after_cursor_is_one_index_range(role):
+    """Страница после курсора - один диапазон ix_tasks_rank_visibility, без users"""
+    cursor = read_models.encode_task_cursor(
+        SimpleNamespace(status_rank=1, created_at=datetime(2025, 1, 1), id=1)
+    )
+    db = ReadSessionLocal()
+    try:
+        with captured_statements() as statements:
+            read_models.task_page(db, role, limit=50, cursor=cursor)
+    finally:
+        db.close()
+
+    (plan,) = plans_matching(statements, "FROM tasks", "ORDER BY")
+    assert plan.splitlines() == [
+        "SEARCH tasks USING INDEX ix_tasks_rank_visibility (status_rank>? AND status_rank<?)"
+    ]
+
+
+def test_analytics_executor_counts_use_executor_index():
+    from app.main import get_analytics_sync
+
+    db = ReadSessionLocal()
+    try:
+        with captured_statements() as statements:
+            get_analytics_sync(db, "30d", None)
+    finally:
+        db.close()
+
+    for plan in plans_matching(statements, "executor_id = ?", "finished_at >= ?"):
+        assert "ix_tasks_executor_status_finished" in plan
+        assert "ix_tasks_archive_executor_status_finished" in plan
+        assert not scanned_tables(plan)
+
+
+def test_recurring_analytics_uses_instances_index():
+    from app.main import get_recurring_tasks_analytics_sync
+
+    db = ReadSessionLocal()
+    try:
+        with captured_statements() as statements:
+            get_recurring_tasks_analytics_sync(db, "30d", None, None)
+    finally:
+        db.close()
+
+    for plan in plans_matching(statements, "original_task_id IS NOT NULL", "created_at >= ?"):
+        assert not scanned_tables(plan)
+        assert "ix_tasks_archive_created_at" in plan
+    # С фильтром по статусу SQLite берет (status, created_at) - тоже диапазон
+    for plan in plans_matching(statements, "original_task_id IS NOT NULL", "created_at >= ?", exclude="status ="):
+        assert "ix_tasks_original_created_at" in plan
+
+
+@pytest.mark.parametrize("stmt", [recurring_scheduler.SCHEDULE, recurring_scheduler.DUE_TEMPLATES])
+def test_scheduler_reads_recurring_due_index(stmt):
+    plan = executed_plan(stmt, {"now": deadline_monitor._local_now()})
+    assert "ix_tasks_recurring_due" in plan
+    assert not scanned_tables(plan)
+
+
+def test_deadline_monitor_reads_deadline_and_version_indexes():
+    now = deadline_monitor._local_now()
+    since = now - timedelta(minutes=1)
+
+    expired = select(deadline_monitor.Task.c.id).where(*deadline_monitor._expired(now, since))
+    assert "ix_tasks_status_deadline" in executed_plan(expired)
+
+    changed = deadline_monitor._changed_expired(now, since, 0)
+    assert "ix_tasks_row_version" in executed_plan(changed)
+
+
+def test_expense_summary_sums_read_covering_date_indexes():
+    from app.main import get_expense_report_summary_sync
+
+    db = ReadSessionLocal()
+    try:
+        with captured_statements() as statements:
+            get_expense_report_summary_sync(db, date(2031, 1, 1), date(2031, 1, 31), None)
+    finally:
+        db.close()
+
+    for table in ("common_expenses", "project_expenses", "employee_expenses"):
+        (plan,) = plans_matching(statements, f"FROM {table}")
+        # amount в индексе: сумма за месяц без чтения строк таблицы
+        assert f"USING COVERING INDEX ix_{table}_date" in plan
+
+
+def test_project_expense_summary_reads_project_date_indexes():
+    db = SessionLocal()
+    try:
+        if not db.query(models.Project).first():
+            db.add(models.Project(name="plan project"))
+            db.commit()
+    finally:
+        db.close()
+
+    db = ReadSessionLocal()
+    try:
+        with captured_statements() as statements:
+            crud.get_project_expenses_summary(db, None, "2031-01-01", "2031-01-31")
+    finally:
+        db.close()
+
+    for table in ("project_expenses", "employee_expenses"):
+        for plan in plans_matching(statements, f"FROM {table}", "project_id = ?"):
+            assert f"USING COVERING INDEX ix_{table}_project_date" in plan
@@ -0,0 +1,43 @@
+"""Архиватор задач переносит только у держателя аренды scheduler_leases['task_archive']."""
+
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import models, task_archive
+from app.database import SessionLocal
+from app.recurring_scheduler import LeaderLease
+
+OLD = datetime(2020, 1, 1, 12, 0)
+
+
+def _archiver(lease_name):
+    return task_archive.TaskArchiver(LeaderLease(lease_name, 60), after_days=30, batch_size=10, pause=0)
+
+
+def test_only_lease_holder_archives(migrated_db):
+    db = SessionLocal()
+    try:
+        task = models.Task(title="старая закрытая", status=models.TaskStatus.done,
+                           created_at=OLD, finished_at=OLD)
+        db.add(task)
+        db.commit()
+        task_id = task.id
+    finally:
+        db.close()
+
+    leader, other = _archiver("test_task_archive"), _archiver("test_task_archive")
+    assert leader.lease.acquire()
+
+    assert other.run() == 0
+    assert other.counters["skipped_not_leader"] == 1
+    assert leader.run() >= 1
+
+    db = SessionLocal()
+    try:
+        archived = db.execute(
+            select(task_archive.TaskArchive.c.id).where(task_archive.TaskArchive.c.id == task_id)
+        ).scalar()
+    finally:
+        db.close()
+    assert archived == task_id
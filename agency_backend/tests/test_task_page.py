@@ -0,0 +1,144 @@
+"""Keyset-пагинация списка задач не теряет строки, записанные ботом.
+
+Бот вставляет задачи сырым SQL с datetime.isoformat() ('T' между датой и
+временем, без долей секунды при нулевых микросекундах), ORM - через пробел
+с шестью знаками долей; миграции 0017/0019 приводят даты к формату ORM.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text
+
+from app import models, read_models
+from app.database import ReadSessionLocal, SessionLocal, engine
+
+BASE = datetime(2032, 5, 10, 12, 0)
+# Целые секунды, как у CURRENT_TIMESTAMP и старых строк
+WHOLE_SECONDS_BASE = datetime(2032, 6, 1, 9, 0)
+
+
+@pytest.fixture(scope="module")
+def mixed_tasks(migrated_db):
+    """По очереди задачи ORM и задачи как от бота, все в один день"""
+    ids = []
+    db = SessionLocal()
+    try:
+        for i in range(0, 10, 2):
+            task = models.Task(title=f"orm {i}", status=models.TaskStatus.new,
+                               created_at=BASE + timedelta(minutes=i))
+            db.add(task)
+            db.commit()
+            ids.append(task.id)
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        for i in range(1, 10, 2):
+            created_at = (BASE + timedelta(minutes=i)).isoformat()
+            ids.append(conn.execute(
+                text("INSERT INTO tasks (title, status, created_at, deadline) VALUES (:title, 'new', :at, :at)"),
+                {"title": f"bot {i}", "at": created_at},
+            ).lastrowid)
+    return ids
+
+
+@pytest.fixture(scope="module")
+def whole_second_tasks(migrated_db):
+    """Шесть задач сырым SQL с датами без долей секунды, подряд в списке"""
+    ids = []
+    with engine.begin() as conn:
+        for i in range(6):
+            created_at = (WHOLE_SECONDS_BASE + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+            ids.append(conn.execute(
+                text("INSERT INTO tasks (title, status, created_at) VALUES (:title, 'new', :at)"),
+                {"title": f"raw {i}", "at": created_at},
+            ).lastrowid)
+    return ids
+
+
+def walk_pages(db, limit):
+    """id всех страниц по порядку; повтор строки на границе страниц - ошибка"""
+    seen, cursor = [], None
+    while True:
+        rows, cursor = read_models.task_page(db, None, limit=limit, cursor=cursor)
+        ids = [row.id for row in rows]
+        # Без проверки повтор на границе зациклил бы обход при limit=1
+        assert not set(ids) & set(seen), f"page repeats {sorted(set(ids) & set(seen))}"
+        seen += ids
+        if cursor is None:
+            return seen
+
+
+def test_bot_dates_are_stored_in_orm_format(mixed_tasks):
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT created_at, deadline FROM tasks WHERE title LIKE 'bot %'")
+        ).all()
+    assert rows
+    for created_at, deadline in rows:
+        assert created_at[10] == " " and deadline[10] == " "
+
+
+def test_whole_second_dates_get_microseconds(whole_second_tasks):
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE tasks SET finished_at = '2032-06-02 10:00:00' WHERE id = :id"),
+            {"id": whole_second_tasks[0]},
+        )
+        rows = dict(conn.execute(
+            text("SELECT id, created_at FROM tasks WHERE title LIKE 'raw %'")
+        ).all())
+        finished_at = conn.execute(
+            text("SELECT finished_at FROM tasks WHERE id = :id"), {"id": whole_second_tasks[0]}
+        ).scalar()
+    assert rows[whole_second_tasks[0]] == "2032-06-01 09:00:00.000000"
+    assert finished_at == "2032-06-02 10:00:00.000000"
+
+
+def test_pages_return_every_task_once(mixed_tasks):
+    db = ReadSessionLocal()
+    try:
+        expected = db.execute(
+            select(read_models.Task.c.id).where(read_models.TASK_NOT_ARCHIVED)
+        ).scalars().all()
+        seen = walk_pages(db, limit=2)
+    finally:
+        db.close()
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == set(expected)
+    assert set(mixed_tasks) <= set(seen)
+
+
+def test_page_boundary_on_whole_second_row(whole_second_tasks):
+    db = ReadSessionLocal()
+    try:
+        # Страница кончается на каждой строке без долей секунды
+        seen = walk_pages(db, limit=1)
+    finally:
+        db.close()
+
+    assert len(seen) == len(set(seen))
+    raw = [task_id for task_id in seen if task_id in whole_second_tasks]
+    assert raw == sorted(whole_second_tasks, reverse=True)
+
+
+def test_null_created_at_is_filled_and_pages(migrated_db):
+    """Задача без created_at (сырой SQL) получает дату и не ломает курсор"""
+    with engine.begin() as conn:
+        task_id = conn.execute(
+            text("INSERT INTO tasks (title, status) VALUES ('no date', 'new')")
+        ).lastrowid
+        created_at = conn.execute(text("SELECT created_at FROM tasks WHERE id = :id"), {"id": task_id}).scalar()
+        # Обнуление created_at оставляет прежнее значение
+        conn.execute(text("UPDATE tasks SET created_at = NULL WHERE id = :id"), {"id": task_id})
+        kept = conn.execute(text("SELECT created_at FROM tasks WHERE id = :id"), {"id": task_id}).scalar()
+    assert created_at is not None and len(created_at) == 26
+    assert kept == created_at
+
+    db = ReadSessionLocal()
+    try:
+        seen = walk_pages(db, limit=1)
+    finally:
+        db.close()
+    assert task_id in seen
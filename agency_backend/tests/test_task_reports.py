@@ -0,0 +1,79 @@
+"""Сводка и отчет по задачам считаются в БД (read_models.task_summary/task_report)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models, read_models
+from app.database import ReadSessionLocal, SessionLocal
+
+START = datetime(2031, 3, 1)
+END = datetime(2031, 4, 1)
+ARCHIVED_ID = 900001
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tasks(migrated_db):
+    """Задачи в марте 2031: вне окна остальных тестов, счетчики только по ним"""
+    rows = [
+        models.Task(title="new smm", task_type="SMM пост", project="report",
+                    status=models.TaskStatus.new, created_at=START + timedelta(days=1)),
+        models.Task(title="in progress", task_type="Дизайн", project="report",
+                    status=models.TaskStatus.in_progress, created_at=START + timedelta(days=1),
+                    deadline=START + timedelta(days=2)),
+        models.Task(title="done", project="report",
+                    status=models.TaskStatus.done, created_at=START + timedelta(days=2),
+                    finished_at=START + timedelta(days=3)),
+        models.Task(title="next month", project="report",
+                    status=models.TaskStatus.new, created_at=END + timedelta(days=1)),
+    ]
+    db = SessionLocal()
+    try:
+        db.add_all(rows)
+        db.commit()
+        # Закрытая задача, которую архиватор уже перенес в tasks_archive
+        db.execute(models.TaskArchive.__table__.insert().values(
+            id=ARCHIVED_ID, title="archived", project="report",
+            status=models.TaskStatus.done, status_rank=models.TASK_STATUS_RANK[models.TaskStatus.done],
+            created_at=START + timedelta(days=2, hours=1), finished_at=START + timedelta(days=3),
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_task_summary_counts_period_and_days():
+    db = ReadSessionLocal()
+    try:
+        summary = read_models.task_summary(db, None, START, END, END, END + timedelta(days=30))
+    finally:
+        db.close()
+
+    # Просрочка - статус overdue: прошедший дедлайн "in progress" сам по себе не считается
+    assert summary["current"] == {"total": 4, "completed": 2, "overdue": 0}
+    assert summary["previous"] == {"total": 1, "completed": 0, "overdue": 0}
+    assert summary["days"] == [
+        {"day": "2031-03-02", "created": 2, "completed": 0},
+        {"day": "2031-03-03", "created": 2, "completed": 0},
+        {"day": "2031-03-04", "created": 0, "completed": 2},
+    ]
+
+
+def test_task_report_filters_counts_and_pages():
+    db = ReadSessionLocal()
+    try:
+        counts, rows, next_offset = read_models.task_report(db, START, END, project="report", limit=2)
+        _, rest, last_offset = read_models.task_report(db, START, END, project="report", limit=2, offset=next_offset)
+        smm_counts, smm_rows, _ = read_models.task_report(db, START, END, project="report", source="smm")
+        other_counts, _, _ = read_models.task_report(db, START, END, project="report", source="tasks")
+        _, done_rows, _ = read_models.task_report(db, START, END, project="report", status="done")
+    finally:
+        db.close()
+
+    assert counts == {"all": 4, "done": 2, "in_progress": 1, "new": 1}
+    # Незавершенные первыми, дальше по дедлайну или дате создания
+    assert [row.title for row in rows + rest] == ["new smm", "in progress", "done", "archived"]
+    assert (next_offset, last_offset) == (2, None)
+    assert smm_counts["all"] == 1 and smm_rows[0].title == "new smm"
+    assert other_counts["all"] == 3
+    assert [row.title for row in done_rows] == ["done", "archived"]
@@ -0,0 +1,105 @@
+"""Одно изменение задачи - одна новая row_version (миграция 0021).
+
+Производные колонки (status_rank, executor_role, формат дат, created_at)
+пишет тот же UPDATE, что и row_version, поэтому счетчик 'tasks' растет на 1.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from app import crud, models, schemas
+from app.database import SessionLocal, engine
+
+
+@pytest.fixture(scope="module")
+def executors(migrated_db):
+    db = SessionLocal()
+    try:
+        return {
+            role: (crud.get_user_by_login(db, f"version_{role.value}") or crud.create_user(db, schemas.UserCreate(
+                telegram_username=f"version_{role.value}",
+                name=f"Version {role.value}",
+                password="version123",
+                role=role,
+            ))).id
+            for role in (models.RoleEnum.designer, models.RoleEnum.smm_manager)
+        }
+    finally:
+        db.close()
+
+
+def counter(conn) -> int:
+    return conn.execute(text("SELECT version FROM change_counters WHERE name = 'tasks'")).scalar()
+
+
+def task_row(conn, task_id):
+    return conn.execute(
+        text("SELECT row_version, status_rank, executor_role, created_at FROM tasks WHERE id = :id"),
+        {"id": task_id},
+    ).one()
+
+
+@pytest.fixture
+def bot_task(executors):
+    """Задача как от бота: сырой SQL, isoformat() без долей секунды"""
+    with engine.begin() as conn:
+        before = counter(conn)
+        task_id = conn.execute(
+            text("INSERT INTO tasks (title, status, executor_id, created_at) "
+                 "VALUES ('version', 'new', :executor, '2033-01-02T10:00:00')"),
+            {"executor": executors[models.RoleEnum.designer]},
+        ).lastrowid
+        return task_id, before
+
+
+def test_insert_bumps_once_and_fills_derived_columns(bot_task):
+    task_id, before = bot_task
+    with engine.connect() as conn:
+        row = task_row(conn, task_id)
+        assert counter(conn) == before + 1
+    assert row.row_version == before + 1
+    assert row.status_rank == models.TASK_STATUS_RANK[models.TaskStatus.new]
+    assert row.executor_role == models.RoleEnum.designer.name
+    assert row.created_at == "2033-01-02 10:00:00.000000"
+
+
+@pytest.mark.parametrize("update", [
+    "UPDATE tasks SET status = 'in_progress' WHERE id = :id",
+    # Тот же ранг: раньше триггер ранга все равно делал второй UPDATE
+    "UPDATE tasks SET status = 'new', title = 'renamed' WHERE id = :id",
+    "UPDATE tasks SET executor_id = :other WHERE id = :id",
+    "UPDATE tasks SET deadline = '2033-01-05T18:00:00' WHERE id = :id",
+    "UPDATE tasks SET created_at = NULL WHERE id = :id",
+])
+def test_raw_update_bumps_once(bot_task, executors, update):
+    task_id, _ = bot_task
+    with engine.begin() as conn:
+        before = counter(conn)
+        created_at = task_row(conn, task_id).created_at
+        conn.execute(text(update), {"id": task_id, "other": executors[models.RoleEnum.smm_manager]})
+        row = task_row(conn, task_id)
+        assert counter(conn) == before + 1
+    assert row.row_version == before + 1
+    assert row.created_at == created_at
+    if "in_progress" in update:
+        assert row.status_rank == models.TASK_STATUS_RANK[models.TaskStatus.in_progress]
+    if "executor_id" in update:
+        assert row.executor_role == models.RoleEnum.smm_manager.name
+
+
+def test_orm_status_change_bumps_once(bot_task):
+    task_id, _ = bot_task
+    with engine.connect() as conn:
+        before = counter(conn)
+    db = SessionLocal()
+    try:
+        task = db.get(models.Task, task_id)
+        task.status = models.TaskStatus.done
+        db.commit()
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        row = task_row(conn, task_id)
+        assert counter(conn) == before + 1
+    assert row.row_version == before + 1
+    assert row.status_rank == models.TASK_STATUS_RANK[models.TaskStatus.done]
@@ -0,0 +1,29 @@
+"""Кэш пользователей в get_current_user: stat файла-маркера и merge не в event loop."""
+
+import asyncio
+import threading
+
+from app import auth, user_cache
+from app.database import SessionLocal
+
+
+def test_cache_lookup_runs_off_event_loop(migrated_db, monkeypatch):
+    threads = []
+    read_generation = user_cache.user_cache._read_generation
+
+    def recording_read_generation():
+        threads.append(threading.get_ident())
+        return read_generation()
+
+    monkeypatch.setattr(user_cache.user_cache, "_read_generation", recording_read_generation)
+    token = auth.create_access_token({"sub": "admin"})
+    db = SessionLocal()
+    try:
+        # Второй вызов - попадание в кэш
+        users = [asyncio.run(auth.get_current_user(token, db)) for _ in range(2)]
+    finally:
+        db.close()
+
+    assert [user.telegram_username for user in users] == ["admin", "admin"]
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -78,6 +78,38 @@ interface Task {
   finished_at?: string | null
 }
 
+interface SummaryCounts {
+  total: number
+  completed: number
+  overdue: number
+}
+
+// Сводка /analytics/tasks/summary: счетчики задач считает сервер
+interface TasksSummary {
+  current: SummaryCounts
+  previous: SummaryCounts | null
+  executors: Array<{ executor_id: number; assigned: number; completed: number }>
+  days: Array<{ day: string; created: number; completed: number }>
+  roles: Array<{ role: string; count: number }>
+}
+
+interface Period {
+  start: Date
+  end: Date
+}
+
+// Дата без часового пояса, как хранит сервер: YYYY-MM-DDTHH:mm:ss
+const toNaiveISO = (d: Date) => {
+  const pad = (n: number) => String(n).padStart(2, '0')
+  return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())}T${pad(d.getHours())}:${pad(d.getMinutes())}:${pad(d.getSeconds())}`
+}
+
+// 'YYYY-MM-DD' -> локальная полночь этого дня
+const parseDay = (day: string) => {
+  const [y, m, d] = day.split('-').map(Number)
+  return new Date(y, m - 1, d)
+}
+
 interface ServiceTypeData {
   service_type: string
   created: number
@@ -106,8 +138,6 @@ function Analytics() {
   const [loading, setLoading] = useState(true)
   const [timeRange, setTimeRange] = useState('month')
   const [users, setUsers] = useState<User[]>([])
-  const [tasks, setTasks] = useState<Task[]>([])
-  const [digitalTasks, setDigitalTasks] = useState<any[]>([])
   const [customStartDate, setCustomStartDate] = useState('')
   const [customEndDate, setCustomEndDate] = useState('')
 
@@ -131,16 +161,35 @@ function Analytics() {
       const token = localStorage.getItem('token')
       const headers = { Authorization: `Bearer ${token}` }
 
-      // Загружаем пользователей, задачи и проекты
-      const [usersRes, tasksRes, digitalProjectsRes, projectsRes] = await Promise.all([
+      // Сводку по задачам за период и прошлый период считает сервер
+      const params = new URLSearchParams()
+      const period = getPeriod()
+      if (period) {
+        params.append('start', toNaiveISO(period.start))
+        params.append('end', toNaiveISO(period.end))
+      }
+      const previousPeriod = getPreviousPeriod()
+      if (previousPeriod) {
+        params.append('previous_start', toNaiveISO(previousPeriod.start))
+        params.append('previous_end', toNaiveISO(previousPeriod.end))
+      }
+
+      // Загружаем пользователей, сводку по задачам и проекты
+      const [usersRes, summaryRes, digitalProjectsRes, projectsRes] = await Promise.all([
         fetch(`${API_URL}/users/`, { headers }),
-        fetch(`${API_URL}/tasks/`, { headers }),
+        fetch(`${API_URL}/analytics/tasks/summary?${params.toString()}`, { headers }),
         fetch(`${API_URL}/digital/projects`, { headers }),
         fetch(`${API_URL}/projects/`, { headers })
       ])
 
       const usersData = usersRes.ok ? await usersRes.json() : []
-      const tasksData = tasksRes.ok ? await tasksRes.json() : []
+      const summary: TasksSummary = summaryRes.ok ? await summaryRes.json() : {
+        current: { total: 0, completed: 0, overdue: 0 },
+        previous: null,
+        executors: [],
+        days: [],
+        roles: []
+      }
       const digitalProjects = digitalProjectsRes.ok ? await digitalProjectsRes.json() : []
       const projectsData = projectsRes.ok ? await projectsRes.json() : []
 
@@ -167,11 +216,9 @@ function Analytics() {
       const digitalTasksData = digitalTasksArrays.flat()
 
       setUsers(usersData)
-      setTasks(tasksData)
-      setDigitalTasks(digitalTasksData)
 
       // Вычисляем аналитику
-      const analyticsData = calculateAnalytics(usersData, tasksData, digitalTasksData, projectsData)
+      const analyticsData = calculateAnalytics(usersData, summary, digitalTasksData, projectsData)
       setData(analyticsData)
     } catch (error) {
       console.error('Failed to fetch data:', error)
@@ -201,45 +248,53 @@ function Analytics() {
     }
   }
 
-  const calculateAnalytics = (users: User[], tasks: Task[], digitalTasks: any[], projects: any[]): AnalyticsData => {
-    const allTasks = [...tasks, ...digitalTasks]
+  // Счетчики Digital-задач в том же виде, что и сводка сервера
+  const countDigitalTasks = (digitalTasks: any[]): SummaryCounts => ({
+    total: digitalTasks.length,
+    completed: digitalTasks.filter(t => t.status === 'done' || t.status === 'completed').length,
+    overdue: digitalTasks.filter(t => t.deadline && new Date(t.deadline) < new Date() && t.status !== 'done' && t.status !== 'completed').length
+  })
 
+  const calculateAnalytics = (users: User[], summary: TasksSummary, digitalTasks: any[], projects: any[]): AnalyticsData => {
     // Фильтруем архивированные проекты
     const activeProjects = projects.filter((p: any) => !p.is_archived)
 
-    // Фильтруем задачи по времени
-    const filteredTasks = filterTasksByTimeRange(allTasks)
-    const previousPeriodTasks = filterTasksByPreviousPeriod(allTasks)
+    // Digital-задачи фильтруем по времени на клиенте
+    const filteredDigitalTasks = filterTasksByTimeRange(digitalTasks)
+    const previousDigitalTasks = filterTasksByPreviousPeriod(digitalTasks)
 
-    // Статистика задач
-    const completedTasks = filteredTasks.filter(t => t.status === 'done' || t.status === 'completed')
-    const inProgressTasks = filteredTasks.filter(t => t.status !== 'done' && t.status !== 'completed')
-    const overdueTasks = filteredTasks.filter(t => t.deadline && new Date(t.deadline) < new Date() && t.status !== 'done' && t.status !== 'completed')
+    // Статистика задач: сводка сервера плюс Digital-задачи
+    const digitalCounts = countDigitalTasks(filteredDigitalTasks)
+    const total = summary.current.total + digitalCounts.total
+    const completed = summary.current.completed + digitalCounts.completed
+    const overdue = summary.current.overdue + digitalCounts.overdue
 
     // Статистика за предыдущий период для трендов
-    const previousCompletedTasks = previousPeriodTasks.filter(t => t.status === 'done' || t.status === 'completed')
-    const previousOverdueTasks = previousPeriodTasks.filter(t => t.deadline && new Date(t.deadline) < new Date() && t.status !== 'done' && t.status !== 'completed')
+    const previousDigitalCounts = countDigitalTasks(previousDigitalTasks)
+    const previousTotal = (summary.previous?.total ?? 0) + previousDigitalCounts.total
+    const previousCompleted = (summary.previous?.completed ?? 0) + previousDigitalCounts.completed
+    const previousOverdue = (summary.previous?.overdue ?? 0) + previousDigitalCounts.overdue
 
     // Задачи по типам (по ролям исполнителей) - используем все задачи
-    const tasksByRole = calculateTasksByRole(users, tasks, digitalTasks)
+    const tasksByRole = calculateTasksByRole(summary, digitalTasks)
 
     // Производительность команды - используем отфильтрованные по времени задачи
-    const teamProductivity = calculateTeamProductivity(users, filteredTasks)
+    const teamProductivity = calculateTeamProductivity(users, summary, filteredDigitalTasks)
 
     // Динамика задач по периодам - используем отфильтрованные задачи
-    const tasksByPeriod = calculateTasksByPeriod(filteredTasks)
+    const tasksByPeriod = calculateTasksByPeriod(summary, filteredDigitalTasks)
 
     // Расчет трендов
-    const totalTrend = calculateTrend(filteredTasks.length, previousPeriodTasks.length)
-    const completedTrend = calculateTrend(completedTasks.length, previousCompletedTasks.length)
-    const overdueTrend = calculateTrend(overdueTasks.length, previousOverdueTasks.length)
+    const totalTrend = calculateTrend(total, previousTotal)
+    const completedTrend = calculateTrend(completed, previousCompleted)
+    const overdueTrend = calculateTrend(overdue, previousOverdue)
 
     return {
       tasksStats: {
-        total: filteredTasks.length,
-        completed: completedTasks.length,
-        inProgress: inProgressTasks.length,
-        overdue: overdueTasks.length,
+        total,
+        completed,
+        inProgress: total - completed,
+        overdue,
         totalTrend,
         completedTrend,
         overdueTrend
@@ -255,13 +310,14 @@ function Analytics() {
     }
   }
 
-  const filterTasksByTimeRange = (tasks: Task[]) => {
+  // Текущий период; null - без ограничения по времени
+  const getPeriod = (): Period | null => {
     const now = new Date()
     let startDate: Date
     let endDate: Date
 
     if (timeRange === 'custom') {
-      if (!customStartDate || !customEndDate) return tasks
+      if (!customStartDate || !customEndDate) return null
       startDate = new Date(customStartDate)
       endDate = new Date(customEndDate)
       endDate.setHours(23, 59, 59, 999)
@@ -286,23 +342,22 @@ function Analytics() {
           endDate.setHours(23, 59, 59, 999)
           break
         default:
-          return tasks
+          return null
       }
     }
 
-    return tasks.filter(task => {
-      const taskDate = new Date(task.created_at)
-      return taskDate >= startDate && taskDate <= endDate
-    })
+    // Сервер считает полуинтервал [start, end)
+    return { start: startDate, end: new Date(endDate.getTime() + 1) }
   }
 
-  const filterTasksByPreviousPeriod = (tasks: Task[]) => {
+  // Предыдущий период для трендов; null - сравнивать не с чем
+  const getPreviousPeriod = (): Period | null => {
     const now = new Date()
     let startDate: Date
     let endDate: Date
 
     if (timeRange === 'custom') {
-      if (!customStartDate || !customEndDate) return []
+      if (!customStartDate || !customEndDate) return null
       const currentStart = new Date(customStartDate)
       const currentEnd = new Date(customEndDate)
       const periodLength = currentEnd.getTime() - currentStart.getTime()
@@ -323,16 +378,28 @@ function Analytics() {
           startDate = new Date(now.getFullYear() - 1, 0, 1) // 1 января предыдущего года
           break
         default:
-          return []
+          return null
       }
     }
 
+    return { start: startDate, end: new Date(endDate.getTime() + 1) }
+  }
+
+  const filterTasksByPeriod = (tasks: Task[], period: Period | null) => {
+    if (!period) return tasks
     return tasks.filter(task => {
       const taskDate = new Date(task.created_at)
-      return taskDate >= startDate && taskDate <= endDate
+      return taskDate >= period.start && taskDate < period.end
     })
   }
 
+  const filterTasksByTimeRange = (tasks: Task[]) => filterTasksByPeriod(tasks, getPeriod())
+
+  const filterTasksByPreviousPeriod = (tasks: Task[]) => {
+    const period = getPreviousPeriod()
+    return period ? filterTasksByPeriod(tasks, period) : []
+  }
+
   const calculateTrend = (currentValue: number, previousValue: number): number => {
     if (previousValue === 0) {
       return currentValue > 0 ? 100 : 0
@@ -340,7 +407,7 @@ function Analytics() {
     return Math.round(((currentValue - previousValue) / previousValue) * 100)
   }
 
-  const calculateTasksByRole = (users: User[], tasks: Task[], digitalTasks: any[]) => {
+  const calculateTasksByRole = (summary: TasksSummary, digitalTasks: any[]) => {
     const roleCategories = {
       'Дизайн-задачи': ['designer'],
       'Digital-задачи': [], // Digital задачи определяются по источнику
@@ -355,11 +422,10 @@ function Analytics() {
         // Считаем все Digital задачи
         count = digitalTasks.length
       } else {
-        // Считаем все задачи по ролям исполнителей
-        count = tasks.filter(task => {
-          const executor = users.find(u => u.id === task.executor_id)
-          return executor && roles.includes(executor.role)
-        }).length
+        // Все задачи по ролям исполнителей - из сводки сервера
+        count = summary.roles
+          .filter(r => (roles as string[]).includes(r.role))
+          .reduce((sum, r) => sum + r.count, 0)
       }
 
       const colors = {
@@ -379,26 +445,47 @@ function Analytics() {
     return result
   }
 
-  const calculateTeamProductivity = (users: User[], filteredTasks: Task[]) => {
+  const calculateTeamProductivity = (users: User[], summary: TasksSummary, digitalTasks: any[]) => {
     const filteredUsers = users.filter(user => user.role !== 'inactive')
 
     return filteredUsers.map(user => {
-      // Используем уже отфильтрованные по времени задачи
-      const userTasks = filteredTasks.filter(t => t.executor_id === user.id)
-      const completedTasks = userTasks.filter(t => t.status === 'done' || t.status === 'completed')
+      // Счетчики за период: сводка сервера плюс Digital-задачи исполнителя
+      const counts = summary.executors.find(e => e.executor_id === user.id)
+      const userDigitalTasks = digitalTasks.filter(t => t.executor_id === user.id)
+      const assigned = (counts?.assigned ?? 0) + userDigitalTasks.length
+      const completed = (counts?.completed ?? 0) +
+        userDigitalTasks.filter(t => t.status === 'done' || t.status === 'completed').length
 
       return {
         name: user.name,
-        tasksAssigned: userTasks.length, // Задачи за выбранный период
-        tasksCompleted: completedTasks.length, // Завершенные задачи за период
-        efficiency: userTasks.length > 0 ? Math.round((completedTasks.length / userTasks.length) * 100) : 0
+        tasksAssigned: assigned, // Задачи за выбранный период
+        tasksCompleted: completed, // Завершенные задачи за период
+        efficiency: assigned > 0 ? Math.round((completed / assigned) * 100) : 0
       }
     })
   }
 
-  const calculateTasksByPeriod = (allTasks: Task[]) => {
+  const calculateTasksByPeriod = (summary: TasksSummary, digitalTasks: any[]) => {
     const now = new Date()
     let periods: any[] = []
+    const days = summary.days.map(d => ({ ...d, date: parseDay(d.day) }))
+
+    // Создано в [from, to]: дни из сводки сервера плюс Digital-задачи
+    const countCreated = (from: Date, to: Date) =>
+      days.filter(d => d.date >= from && d.date <= to).reduce((sum, d) => sum + d.created, 0) +
+      digitalTasks.filter(t => {
+        const taskDate = new Date(t.created_at)
+        return taskDate >= from && taskDate <= to
+      }).length
+
+    // Завершено в [from, to]: по дате finished_at
+    const countCompleted = (from: Date, to: Date) =>
+      days.filter(d => d.date >= from && d.date <= to).reduce((sum, d) => sum + d.completed, 0) +
+      digitalTasks.filter(t => {
+        if (!t.finished_at) return false
+        const finishedDate = new Date(t.finished_at)
+        return finishedDate >= from && finishedDate <= to
+      }).length
 
     if (timeRange === 'week') {
       // Находим понедельник текущей недели
@@ -414,16 +501,8 @@ function Analytics() {
         const dayStart = new Date(date.getFullYear(), date.getMonth(), date.getDate())
         const dayEnd = new Date(date.getFullYear(), date.getMonth(), date.getDate(), 23, 59, 59)
 
-        const created = allTasks.filter(t => {
-          const taskDate = new Date(t.created_at)
-          return taskDate >= dayStart && taskDate <= dayEnd
-        }).length
-
-        const completed = allTasks.filter(t => {
-          if (!t.finished_at) return false
-          const finishedDate = new Date(t.finished_at)
-          return finishedDate >= dayStart && finishedDate <= dayEnd
-        }).length
+        const created = countCreated(dayStart, dayEnd)
+        const completed = countCompleted(dayStart, dayEnd)
 
         periods.push({ period: dayName, created, completed })
       }
@@ -435,16 +514,8 @@ function Analytics() {
         const monthStart = new Date(date.getFullYear(), date.getMonth(), 1)
         const monthEnd = new Date(date.getFullYear(), date.getMonth() + 1, 0)
 
-        const created = allTasks.filter(t => {
-          const taskDate = new Date(t.created_at)
-          return taskDate >= monthStart && taskDate <= monthEnd
-        }).length
-
-        const completed = allTasks.filter(t => {
-          if (!t.finished_at) return false
-          const finishedDate = new Date(t.finished_at)
-          return finishedDate >= monthStart && finishedDate <= monthEnd
-        }).length
+        const created = countCreated(monthStart, monthEnd)
+        const completed = countCompleted(monthStart, monthEnd)
 
         periods.push({ period: monthName, created, completed })
       }
@@ -461,16 +532,8 @@ function Analytics() {
         const dayStart = new Date(date.getFullYear(), date.getMonth(), date.getDate())
         const dayEnd = new Date(date.getFullYear(), date.getMonth(), date.getDate(), 23, 59, 59)
 
-        const created = allTasks.filter(t => {
-          const taskDate = new Date(t.created_at)
-          return taskDate >= dayStart && taskDate <= dayEnd
-        }).length
-
-        const completed = allTasks.filter(t => {
-          if (!t.finished_at) return false
-          const finishedDate = new Date(t.finished_at)
-          return finishedDate >= dayStart && finishedDate <= dayEnd
-        }).length
+        const created = countCreated(dayStart, dayEnd)
+        const completed = countCompleted(dayStart, dayEnd)
 
         periods.push({ period: dayName, created, completed })
       }
@@ -485,16 +548,8 @@ function Analytics() {
         const dayStart = new Date(date.getFullYear(), date.getMonth(), date.getDate())
         const dayEnd = new Date(date.getFullYear(), date.getMonth(), date.getDate(), 23, 59, 59)
 
-        const created = allTasks.filter(t => {
-          const taskDate = new Date(t.created_at)
-          return taskDate >= dayStart && taskDate <= dayEnd
-        }).length
-
-        const completed = allTasks.filter(t => {
-          if (!t.finished_at) return false
-          const finishedDate = new Date(t.finished_at)
-          return finishedDate >= dayStart && finishedDate <= dayEnd
-        }).length
+        const created = countCreated(dayStart, dayEnd)
+        const completed = countCompleted(dayStart, dayEnd)
 
         periods.push({ period: dayName, created, completed })
       }
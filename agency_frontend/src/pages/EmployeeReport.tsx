@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { API_URL } from '../api'
 import { formatDateTimeUTC5, formatDeadlineUTC5, formatDateAsIs } from '../utils/dateUtils'
 
@@ -45,6 +45,15 @@ interface DigitalTask {
   high_priority?: boolean
 }
 
+interface ReportCounts {
+  all: number
+  done: number
+  in_progress: number
+  new: number
+}
+
+const EMPTY_COUNTS: ReportCounts = { all: 0, done: 0, in_progress: 0, new: 0 }
+
 const ROLE_NAMES: Record<string, string> = {
   designer: 'Дизайнер',
   smm_manager: 'СММ-менеджер',
@@ -92,7 +101,16 @@ function EmployeeReport() {
   const token = localStorage.getItem('token')
   const [users, setUsers] = useState<User[]>([])
   const [projects, setProjects] = useState<Project[]>([])
-  const [tasks, setTasks] = useState<Task[]>([])
+  // Обычные задачи - страницами из /analytics/tasks/report, счетчики по ним
+  // считает сервер; Digital-задачи загружаются целиком и фильтруются здесь
+  const [reportTasks, setReportTasks] = useState<Task[]>([])
+  const [reportCounts, setReportCounts] = useState<ReportCounts>(EMPTY_COUNTS)
+  const [nextOffset, setNextOffset] = useState<number | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [digitalTasks, setDigitalTasks] = useState<Task[]>([])
+  const [, setTick] = useState(0)
+  // Номер последнего запроса отчета: ответы на устаревшие фильтры отбрасываются
+  const reportRequest = useRef(0)
   const [modalTask, setModalTask] = useState<Task | null>(null)
 
   const [userId, setUserId] = useState('')
@@ -118,10 +136,6 @@ function EmployeeReport() {
       setUsers(u)
       setProjects(p)
       
-      // Загружаем ВСЕ задачи для отчета (включая задачи без исполнителя)
-      const tasksRes = await fetch(`${API_URL}/tasks/all`, { headers })
-      const regularTasks = tasksRes.ok ? await tasksRes.json() : []
-      
       // Загружаем Digital проекты
       const digitalProjectsRes = await fetch(`${API_URL}/digital/projects`, { headers })
       const digitalProjects = digitalProjectsRes.ok ? await digitalProjectsRes.json() : []
@@ -157,27 +171,67 @@ function EmployeeReport() {
       })
       
       const digitalTasksArrays = await Promise.all(digitalTasksPromises)
-      const digitalTasks: Task[] = digitalTasksArrays.flat()
-      
-      // Помечаем обычные задачи
-      const markedRegularTasks = regularTasks.map((t: any) => ({
-        ...t,
-        source: 'tasks' as const
-      }))
-      
-      // Объединяем все задачи
-      setTasks([...markedRegularTasks, ...digitalTasks])
+      setDigitalTasks(digitalTasksArrays.flat())
     } catch (error) {
       console.error('Failed to load data:', error)
       setUsers([])
       setProjects([])
-      setTasks([])
+      setDigitalTasks([])
+    }
+  }
+
+  // Страница обычных задач по текущим фильтрам; offset 0 - заново с начала
+  const loadReport = async (offset: number) => {
+    const request = ++reportRequest.current
+    if (taskSource === 'digital') {
+      setReportTasks([])
+      setReportCounts(EMPTY_COUNTS)
+      setNextOffset(null)
+      return
+    }
+    const params = new URLSearchParams({
+      start: startDate,
+      end: endDate,
+      source: taskSource,
+      status,
+      offset: String(offset),
+    })
+    if (userId) params.append('executor_id', userId)
+    if (project) params.append('project', project)
+    try {
+      const res = await fetch(`${API_URL}/analytics/tasks/report?${params.toString()}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`)
+      const report = await res.json()
+      if (request !== reportRequest.current) return
+      const items: Task[] = report.items.map((t: any) => ({ ...t, source: 'tasks' as const }))
+      setReportTasks(ts => offset ? [...ts, ...items] : items)
+      setReportCounts(report.counts)
+      setNextOffset(report.next_offset ?? null)
+    } catch (error) {
+      console.error('Failed to load report:', error)
+      if (request !== reportRequest.current || offset) return
+      setReportTasks([])
+      setReportCounts(EMPTY_COUNTS)
+      setNextOffset(null)
+    }
+  }
+
+  const loadMoreReport = async () => {
+    if (nextOffset === null || loadingMore) return
+    setLoadingMore(true)
+    try {
+      await loadReport(nextOffset)
+    } finally {
+      setLoadingMore(false)
     }
   }
 
   useEffect(() => { loadData() }, [])
+  useEffect(() => { loadReport(0) }, [userId, project, startDate, endDate, taskSource, status])
   useEffect(() => {
-    const id = setInterval(() => setTasks(ts => [...ts]), 1000)
+    const id = setInterval(() => setTick(t => t + 1), 1000)
     return () => clearInterval(id)
   }, [])
 
@@ -204,8 +258,8 @@ function EmployeeReport() {
     }
   }
 
-  // Pre-filter tasks WITHOUT status filter to get correct counts
-  const baseFilteredTasks = tasks.filter(t => {
+  // Digital-задачи по фильтрам, кроме статуса (для счетчиков)
+  const baseFilteredDigitalTasks = digitalTasks.filter(t => {
     // Фильтр по пользователю: если выбран конкретный пользователь, показываем только его задачи
     if (userId && String(t.executor_id || '') !== userId) return false
     if (project && t.project !== project) return false
@@ -214,21 +268,19 @@ function EmployeeReport() {
     const end = new Date(endDate).getTime() + 86400000 - 1
     if (created < start || created > end) return false
     
-    // Фильтр по источнику задач
-    if (taskSource === 'digital' && t.source !== 'digital') return false
-    if (taskSource === 'smm' && !(t.source === 'tasks' && t.task_type?.toLowerCase().includes('smm'))) return false
-    if (taskSource === 'tasks' && (t.source === 'digital' || t.task_type?.toLowerCase().includes('smm'))) return false
+    // Фильтр по источнику задач: в "СММ" и "Общих" Digital-задач нет
+    if (taskSource === 'smm' || taskSource === 'tasks') return false
     
     return true
   })
 
-  // Apply status filter for display
-  const filteredTasks = baseFilteredTasks.filter(t => {
+  // Apply status filter for display: обычные задачи сервер уже отфильтровал
+  const filteredTasks = [...reportTasks, ...baseFilteredDigitalTasks.filter(t => {
     if (status === 'new' && t.status !== 'new') return false
     if (status === 'in_progress' && (t.status === 'done' || t.status === 'cancelled' || t.status === 'new')) return false
     if (status === 'done' && t.status !== 'done') return false
     return true
-  }).sort((a,b)=>{
+  })].sort((a,b)=>{
     const sa = a.status === 'done' ? 1 : 0
     const sb = b.status === 'done' ? 1 : 0
     if (sa !== sb) return sa - sb
@@ -237,11 +289,11 @@ function EmployeeReport() {
     return da - db
   })
 
-  // Calculate counts from base filtered tasks
-  const allTasksCount = baseFilteredTasks.length
-  const doneTasksCount = baseFilteredTasks.filter(t => t.status === 'done').length
-  const inProgressTasksCount = baseFilteredTasks.filter(t => t.status === 'in_progress').length
-  const newTasksCount = baseFilteredTasks.filter(t => t.status === 'new').length
+  // Counts: сервер по обычным задачам плюс Digital-задачи
+  const allTasksCount = reportCounts.all + baseFilteredDigitalTasks.length
+  const doneTasksCount = reportCounts.done + baseFilteredDigitalTasks.filter(t => t.status === 'done').length
+  const inProgressTasksCount = reportCounts.in_progress + baseFilteredDigitalTasks.filter(t => t.status === 'in_progress').length
+  const newTasksCount = reportCounts.new + baseFilteredDigitalTasks.filter(t => t.status === 'new').length
 
   const getUserName = (id?: number) => {
     const u = users.find(x => x.id === id)
@@ -689,6 +741,17 @@ function EmployeeReport() {
                 </tbody>
               </table>
             </div>
+            {nextOffset !== null && (
+              <div className="text-center py-4 border-t border-gray-200">
+                <button
+                  className="px-4 py-2 rounded-lg text-sm font-medium bg-gray-100 text-gray-700 hover:bg-gray-200 transition-colors disabled:opacity-50"
+                  onClick={loadMoreReport}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Загрузка...' : 'Загрузить еще'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       {modalTask && (
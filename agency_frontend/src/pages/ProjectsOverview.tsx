@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { API_URL } from '../api'
+import { subscribeEvents } from '../utils/api'
 
 interface Project {
   id: number
@@ -285,18 +286,18 @@ function Projects() {
       }
     }
 
-    // Автообновление каждые 10 секунд с проверкой версии БД
-    const interval = setInterval(async () => {
-      console.log('⏰ Auto-refreshing: checking database version and projects data...')
-      await checkDatabaseVersion()
-      load(month)
-    }, 10000)
+    // Обновление по событиям сервера вместо опроса каждые 10 секунд
+    const unsubscribe = subscribeEvents((event) => {
+      if (event.type.startsWith('project') || event.type === 'resync') {
+        load(month)
+      }
+    })
 
     window.addEventListener('focus', handleFocus)
     document.addEventListener('visibilitychange', handleVisibilityChange)
 
     return () => {
-      clearInterval(interval)
+      unsubscribe()
       window.removeEventListener('focus', handleFocus)
       document.removeEventListener('visibilitychange', handleVisibilityChange)
     }
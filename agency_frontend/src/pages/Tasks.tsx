@@ -1,8 +1,9 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { API_URL } from '../api'
 import { formatDateShortUTC5, getCurrentTimeUTC5, formatDateUTC5, formatDeadline, formatDateAsIs } from '../utils/dateUtils'
 import { usePersistedState } from '../utils/filterStorage'
 import { isAdmin } from '../utils/roleUtils'
+import { fetchTaskChanges, fetchTaskPage, subscribeEvents } from '../utils/api'
 
 interface Task {
   id: number
@@ -25,6 +26,7 @@ interface Task {
   recurrence_time?: string
   recurrence_days?: string
   next_run_at?: string
+  row_version?: number
 }
 
 interface User {
@@ -217,8 +219,26 @@ const getRecurrenceTypeLabel = (type: string): string => {
   }
 }
 
+// Слить задачи в список по id: более новая версия строки заменяет старую,
+// задачи, которых в списке нет, добавляются в конец
+function mergeTasks(current: Task[], incoming: Task[]) {
+  const byId = new Map(current.map((t) => [t.id, t]))
+  for (const task of incoming) {
+    const known = byId.get(task.id)
+    if (!known || (task.row_version ?? 0) >= (known.row_version ?? 0)) byId.set(task.id, task)
+  }
+  return Array.from(byId.values())
+}
+
 function Tasks() {
   const [tasks, setTasks] = useState<Task[]>([])
+  // Курсор следующей страницы задач; null - загружены все страницы
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  // Версия, до которой загруженный список согласован с сервером (см. syncTasks)
+  const tasksVersion = useRef(0)
+  // Очередь синхронизаций: дельты применяются по одной, по порядку версий
+  const syncQueue = useRef<Promise<void>>(Promise.resolve())
   const [showModal, setShowModal] = useState(false)
   const [selectedTask, setSelectedTask] = useState<Task | null>(null)
   const [isEditing, setIsEditing] = useState(false)
@@ -348,6 +368,54 @@ function Tasks() {
     return u ? u.name : ''
   }
   
+  // Первая страница задач: заменяет загруженный список
+  const loadTasks = async () => {
+    const token = localStorage.getItem('token')
+    const page = await fetchTaskPage(`${API_URL}/tasks/`, null, {
+      headers: { Authorization: `Bearer ${token}` },
+    })
+    tasksVersion.current = page.version
+    setTasks(page.items)
+    setNextCursor(page.next_cursor)
+  }
+
+  // Догнать загруженный список до сервера: изменения и удаления после
+  // tasksVersion; заново с первой страницы - только если сервер сбросил версию
+  const syncTasks = () => {
+    syncQueue.current = syncQueue.current.then(async () => {
+      const token = localStorage.getItem('token')
+      const delta = await fetchTaskChanges(tasksVersion.current, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      if (delta.reset) {
+        await loadTasks()
+        return
+      }
+      tasksVersion.current = delta.version
+      const deleted = new Set(delta.deleted)
+      setTasks((ts) => mergeTasks(ts, delta.changes).filter((t) => !deleted.has(t.id)))
+    }).catch((error) => console.error('Failed to sync tasks:', error))
+    return syncQueue.current
+  }
+
+  // Следующая страница задач: дописывается к загруженным
+  const loadMoreTasks = async () => {
+    if (!nextCursor || loadingMore) return
+    const token = localStorage.getItem('token')
+    setLoadingMore(true)
+    try {
+      const page = await fetchTaskPage(`${API_URL}/tasks/`, nextCursor, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      setTasks((ts) => mergeTasks(ts, page.items))
+      setNextCursor(page.next_cursor)
+    } catch (error) {
+      console.error('Failed to load more tasks:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     const token = localStorage.getItem('token')
     
@@ -358,18 +426,8 @@ function Tasks() {
       return
     }
 
-    fetch(`${API_URL}/tasks/`, {
-      headers: { Authorization: `Bearer ${token}` },
-    })
-      .then((res) => {
-        if (res.ok) return res.json()
-        throw new Error('Unauthorized')
-      })
-      .then((data) => {
-        console.log('Tasks from API:', data);
-        setTasks(Array.isArray(data) ? data : []);
-      })
-      .catch(() => setTasks([]))
+    // Через очередь: дельты по событиям ждут первую страницу и ее версию
+    syncQueue.current = syncQueue.current.then(loadTasks).catch(() => setTasks([]))
       
     fetch(`${API_URL}/users/`, { headers: { Authorization: `Bearer ${token}` } })
       .then((res) => {
@@ -398,6 +456,27 @@ function Tasks() {
     return () => clearInterval(id)
   }, [])
 
+  // По событиям задач догоняем список дельтой (пачку событий - одним запросом);
+  // после переподключения (resync) пропущенные события неизвестны - грузим заново
+  useEffect(() => {
+    let timer: ReturnType<typeof setTimeout> | null = null
+    const unsubscribe = subscribeEvents((event) => {
+      if (event.type === 'resync') {
+        if (timer) clearTimeout(timer)
+        timer = null
+        syncQueue.current = syncQueue.current.then(loadTasks).catch(() => {})
+        return
+      }
+      if (!event.type.startsWith('task')) return
+      if (timer) clearTimeout(timer)
+      timer = setTimeout(syncTasks, 300)
+    })
+    return () => {
+      if (timer) clearTimeout(timer)
+      unsubscribe()
+    }
+  }, [])
+
   const filteredTasks = Array.isArray(tasks) ? tasks.filter((t) => {
     if (!Array.isArray(users)) return true
 
@@ -533,14 +612,7 @@ function Tasks() {
     setIsRecurring(false)
     setRecurrenceType('')
     setRecurrenceDays([])
-    const res = await fetch(`${API_URL}/tasks/`, {
-      headers: {
-        Authorization: `Bearer ${token}`,
-      },
-    })
-    const data = await res.json()
-    console.log('Tasks refreshed:', data);
-    setTasks(Array.isArray(data) ? data : [])
+    await syncTasks()
   }
 
   const saveTask = async () => {
@@ -602,12 +674,7 @@ function Tasks() {
     setIsRecurring(false)
     setRecurrenceType('')
     setRecurrenceDays([])
-    const res = await fetch(`${API_URL}/tasks/`, {
-      headers: { Authorization: `Bearer ${token}` },
-    })
-    const data = await res.json()
-    console.log('Tasks after save:', data);
-    setTasks(Array.isArray(data) ? data : [])
+    await syncTasks()
   }
 
   const deleteTask = async (id: number) => {
@@ -637,11 +704,7 @@ function Tasks() {
 
       if (response.ok) {
         // Обновляем список задач
-        const res = await fetch(`${API_URL}/tasks/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        })
-        const data = await res.json()
-        setTasks(Array.isArray(data) ? data : [])
+        await syncTasks()
 
         // Если модальное окно открыто для этой задачи, обновляем состояние
         if (selectedTask && selectedTask.id === id) {
@@ -682,11 +745,7 @@ function Tasks() {
 
         if (putResponse.ok) {
           // Обновляем список задач
-          const res = await fetch(`${API_URL}/tasks/`, {
-            headers: { Authorization: `Bearer ${token}` },
-          })
-          const data = await res.json()
-          setTasks(Array.isArray(data) ? data : [])
+          await syncTasks()
 
           // Если модальное окно открыто для этой задачи, обновляем состояние
           if (selectedTask && selectedTask.id === id) {
@@ -1385,6 +1444,17 @@ function Tasks() {
               </tbody>
             </table>
           </div>
+          {nextCursor && (
+            <div className="text-center py-4 border-t border-gray-200">
+              <button
+                className="px-4 py-2 rounded-lg text-sm font-medium bg-gray-100 text-gray-700 hover:bg-gray-200 transition-colors disabled:opacity-50"
+                onClick={loadMoreTasks}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Загрузка...' : 'Загрузить еще'}
+              </button>
+            </div>
+          )}
           {sortedTasks.length === 0 && (
             <div className="text-center py-12">
               <div className="text-gray-400 text-6xl mb-4">
@@ -95,4 +95,83 @@ export const apiRequest = async (
 
   const response = await authFetch(url, options);
   return handleResponse(response);
-};
\ No newline at end of file
+};
+
+// Списки задач (/tasks/, /tasks/all) отдаются страницами: { items, next_cursor }.
+// Загружает одну страницу; cursor - next_cursor предыдущей (null - первая).
+// next_cursor === null в ответе - страниц больше нет. version (только /tasks/) -
+// с какой версии догонять загруженный список через fetchTaskChanges.
+export const fetchTaskPage = async (url: string, cursor: string | null = null, options: RequestInit = {}) => {
+  const pageUrl = cursor ? `${url}?cursor=${encodeURIComponent(cursor)}` : url;
+  const res = await fetch(pageUrl, options);
+  if (!res.ok) {
+    throw new Error(`HTTP error! status: ${res.status}`);
+  }
+  const page = await res.json();
+  return {
+    items: Array.isArray(page.items) ? page.items : [],
+    next_cursor: (page.next_cursor ?? null) as string | null,
+    version: (page.version ?? 0) as number,
+  };
+};
+
+// Изменения задач после версии since (/tasks/changes), все порции has_more подряд.
+// changes - новые и измененные задачи, deleted - id задач, которые нужно убрать.
+// reset === true - версия клиента неизвестна серверу, список нужно загрузить заново.
+export const fetchTaskChanges = async (since: number, options: RequestInit = {}) => {
+  const changes: any[] = [];
+  const deleted: number[] = [];
+  let version = since;
+  let hasMore = true;
+  while (hasMore) {
+    const res = await fetch(`${API_URL}/tasks/changes?since=${version}`, options);
+    if (!res.ok) {
+      throw new Error(`HTTP error! status: ${res.status}`);
+    }
+    const delta = await res.json();
+    if (delta.reset) {
+      return { version: delta.version as number, changes: [], deleted: [], reset: true };
+    }
+    changes.push(...delta.changes);
+    deleted.push(...delta.deleted);
+    version = delta.version;
+    hasMore = delta.has_more;
+  }
+  return { version, changes, deleted, reset: false };
+};
+
+// Push-события задач и проектов (/ws/events). JWT передается подпротоколом.
+// После переподключения приходит { type: 'resync' }: пропущенные события
+// неизвестны, данные нужно перечитать. Возвращает функцию отписки.
+export const subscribeEvents = (onEvent: (event: any) => void) => {
+  let socket: WebSocket | null = null;
+  let retry: ReturnType<typeof setTimeout> | null = null;
+  let closed = false;
+  let connected = false;
+
+  const connect = () => {
+    const token = localStorage.getItem('token');
+    if (!token || closed) return;
+    const url = new URL(`${API_URL}/ws/events`, window.location.href);
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    socket = new WebSocket(url.href, ['bearer', token]);
+    socket.onopen = () => {
+      if (connected) onEvent({ type: 'resync' });
+      connected = true;
+    };
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type !== 'ping') onEvent(event);
+    };
+    socket.onclose = () => {
+      if (!closed) retry = setTimeout(connect, 5000);
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    if (retry) clearTimeout(retry);
+    socket?.close();
+  };
+};
@@ -2285,19 +2285,20 @@ class AdminTaskHandlers:
                 start_date = None
                 period_label = "за все время"
 
-            # Получаем завершенные задачи пользователя (только статус "done")
+            # Получаем завершенные задачи пользователя (только статус "done");
+            # tasks_all - вместе со старыми задачами из tasks_archive
             if start_date:
                 cursor = self._execute_query(conn, """
                     SELECT id, title, description, project, task_type, deadline, created_at, finished_at
-                    FROM tasks
+                    FROM tasks_all
                     WHERE executor_id = ? AND status = 'done' AND finished_at >= ?
                     ORDER BY finished_at DESC
                     LIMIT 50
-                """, (user['id'], start_date.isoformat()))
+                """, (user['id'], start_date.isoformat(sep=' ', timespec='microseconds')))
             else:
                 cursor = self._execute_query(conn, """
                     SELECT id, title, description, project, task_type, deadline, created_at, finished_at
-                    FROM tasks
+                    FROM tasks_all
                     WHERE executor_id = ? AND status = 'done'
                     ORDER BY finished_at DESC
                     LIMIT 50
@@ -60,6 +60,23 @@ except ImportError:
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 DATABASE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'shared_database.db'))
 
+# Профиль PRAGMA для SQLite - те же переменные окружения, что и у backend
+SQLITE_PROFILE = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '30000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+    'foreign_keys': os.getenv('SQLITE_FOREIGN_KEYS', 'OFF'),
+}
+
+# Колонки задач для списков в боте (вместо t.*): только то, что показываем
+TASK_LIST_COLUMNS = (
+    "t.id, t.title, t.description, t.project, t.project AS project_name, "
+    "t.status, t.deadline, t.high_priority, t.created_at"
+)
+
 # API URL: в Docker используем имя контейнера, локально - localhost
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://backend:8000')
 if os.path.exists('/.dockerenv'):
@@ -357,6 +374,14 @@ class TelegramBot:
                     check_same_thread=False
                 )
                 conn.row_factory = sqlite3.Row
+                # busy_timeout первым, чтобы смена journal_mode не упала на блокировке
+                conn.execute(f"PRAGMA busy_timeout = {SQLITE_PROFILE['busy_timeout']}")
+                conn.execute(f"PRAGMA journal_mode = {SQLITE_PROFILE['journal_mode']}")
+                conn.execute(f"PRAGMA synchronous = {SQLITE_PROFILE['synchronous']}")
+                conn.execute(f"PRAGMA mmap_size = {SQLITE_PROFILE['mmap_size']}")
+                conn.execute(f"PRAGMA cache_size = {SQLITE_PROFILE['cache_size']}")
+                conn.execute(f"PRAGMA temp_store = {SQLITE_PROFILE['temp_store']}")
+                conn.execute(f"PRAGMA foreign_keys = {SQLITE_PROFILE['foreign_keys']}")
                 logger.info("✅ Подключение к SQLite создано успешно")
                 # Возвращаем обертку для унификации интерфейса
                 return DBConnection(conn, db_type='sqlite')
@@ -427,8 +452,8 @@ class TelegramBot:
             return []
 
         try:
-            cursor = self._execute_query(conn, """
-                SELECT t.*
+            cursor = self._execute_query(conn, f"""
+                SELECT {TASK_LIST_COLUMNS}
                 FROM tasks t
                 WHERE t.executor_id = ? AND t.status = 'in_progress'
                 ORDER BY t.created_at DESC
@@ -449,8 +474,8 @@ class TelegramBot:
             return []
 
         try:
-            cursor = self._execute_query(conn, """
-                SELECT t.*
+            cursor = self._execute_query(conn, f"""
+                SELECT {TASK_LIST_COLUMNS}
                 FROM tasks t
                 WHERE t.executor_id = ? AND t.status = 'in_progress'
                 ORDER BY t.created_at DESC
@@ -1264,7 +1289,7 @@ class TelegramBot:
 
             # Обновляем статус задачи
             from datetime import datetime
-            accepted_at = datetime.now().isoformat()
+            accepted_at = datetime.now().isoformat(sep=' ', timespec='microseconds')
 
             cursor = self._execute_query(conn,
                 "UPDATE tasks SET status = 'in_progress', accepted_at = ? WHERE id = ?",
@@ -503,7 +503,7 @@ class UserTaskHandlers:
                 )
                 return
 
-        context.user_data['user_task_creation']['deadline'] = deadline.isoformat() if deadline else None
+        context.user_data['user_task_creation']['deadline'] = deadline.isoformat(sep=' ', timespec='microseconds') if deadline else None
 
         # Форматируем дедлайн для отображения
         if deadline:
@@ -730,7 +730,7 @@ class UserTaskHandlers:
                 creator_id,
                 task_data['executor_id'],
                 'new',
-                datetime.now().isoformat()
+                datetime.now().isoformat(sep=' ', timespec='microseconds')
             ))
 
             # Получаем ID созданной задачи
@@ -842,7 +842,7 @@ class UserTaskHandlers:
         tasks = conn.execute("""
             SELECT t.id, t.title, t.description, t.project, t.task_type, t.deadline, t.created_at, t.task_format
             FROM tasks t
-            WHERE t.executor_id = ? AND t.status IN ('new', 'in_progress')
+            WHERE t.executor_id = ? AND t.status IN ('new', 'in_progress', 'overdue')
             ORDER BY
                 CASE WHEN t.deadline IS NULL THEN 1 ELSE 0 END,
                 t.deadline ASC,
@@ -991,10 +991,10 @@ class UserTaskHandlers:
             conn.close()
             return
 
-        # Получаем завершенные задачи
+        # Получаем завершенные задачи (tasks_all - вместе с архивом)
         tasks = conn.execute("""
             SELECT t.id, t.title, t.description, t.project, t.task_type, t.finished_at, t.created_at, t.task_format
-            FROM tasks t
+            FROM tasks_all t
             WHERE t.executor_id = ? AND t.status = 'done'
             ORDER BY t.finished_at DESC
             LIMIT 50
@@ -1176,7 +1176,7 @@ class UserTaskHandlers:
         )
 
         # Кнопки управления (только если задача активна)
-        if task['status'] in ('new', 'in_progress'):
+        if task['status'] in ('new', 'in_progress', 'overdue'):
             keyboard = [
                 ["✅ Завершить задачу"],
                 ["🗑️ Удалить задачу"],
@@ -1237,7 +1237,7 @@ class UserTaskHandlers:
             UPDATE tasks
             SET status = 'done', finished_at = ?
             WHERE id = ?
-        """, (datetime.now().isoformat(), task_id))
+        """, (datetime.now().isoformat(sep=' ', timespec='microseconds'), task_id))
 
         conn.commit()
         conn.close()
@@ -1349,7 +1349,7 @@ class UserTaskHandlers:
             # Завершаем задачу
             conn.execute(
                 "UPDATE tasks SET status = 'done', finished_at = ? WHERE id = ?",
-                (datetime.now().isoformat(), task_id)
+                (datetime.now().isoformat(sep=' ', timespec='microseconds'), task_id)
             )
             conn.commit()
             conn.close()
@@ -1363,9 +1363,9 @@ class UserTaskHandlers:
         elif data.startswith("delete_task_"):
             task_id = int(data.replace("delete_task_", ""))
 
-            # Проверяем, что задача существует и пользователь - её исполнитель
+            # Проверяем, что задача существует (в том числе в архиве) и пользователь - её исполнитель
             task = conn.execute(
-                "SELECT * FROM tasks WHERE id = ? AND executor_id = ?",
+                "SELECT * FROM tasks_all WHERE id = ? AND executor_id = ?",
                 (task_id, db_user['id'])
             ).fetchone()
 
@@ -1374,8 +1374,9 @@ class UserTaskHandlers:
                 conn.close()
                 return
 
-            # Удаляем задачу
+            # Удаляем задачу - из горячей таблицы или из архива
             conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            conn.execute("DELETE FROM tasks_archive WHERE id = ?", (task_id,))
             conn.commit()
             conn.close()
 
@@ -1402,7 +1403,7 @@ class UserTaskHandlers:
             # Принимаем задачу в работу (меняем статус на in_progress)
             conn.execute(
                 "UPDATE tasks SET status = 'in_progress', accepted_at = ? WHERE id = ?",
-                (datetime.now().isoformat(), task_id)
+                (datetime.now().isoformat(sep=' ', timespec='microseconds'), task_id)
             )
             conn.commit()
             conn.close()